@@ -0,0 +1,171 @@
+# =============================================
+# ANTIGÜEDAD DE SALDOS (0-30, 31-60, 61-90, MÁS DE 90 DÍAS)
+# =============================================
+# Cuánto de la deuda de cada cliente viene de despachos de hace cuántos días.
+# Los pagos se aplican a los despachos del más antiguo al más nuevo (FIFO), sin
+# importar a qué despacho se registró el pago, igual que el saldo del cliente
+# (total despachado - total pagado, incluidos los despachos cancelados).
+#
+# Con movimientos archivados (ver clientes/archivo.py) el SaldoInicial entra
+# como un cargo más, fechado al corte del archivo, si es deuda, o como un pago
+# si es saldo a favor. El informe de un día anterior al corte no es exacto.
+#
+# Todo se calcula en una consulta: una suma acumulada por cliente
+# (SUM ... OVER) dice hasta qué despacho alcanzan los pagos; lo pendiente de
+# cada despacho se reparte en tramos según su fecha y se suma por cliente.
+#
+# El informe es al cierre de un día ya terminado, así que su resultado no cambia
+# con la actividad del día y se guarda en caché por empresa y fecha. Las correcciones
+# retroactivas (editar un pago viejo, cambiar el precio de un cliente) se ven
+# al día siguiente o pidiendo el informe con recalcular.
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.utils import timezone
+
+from water_delivery.cache import CacheCompartida
+from water_delivery.empresas import clave_empresa, sql_empresa
+
+from .estado_cuenta import _a_decimal, inicio_del_dia
+from .models import Cliente, Despacho, Pago, SaldoInicial
+
+cache_antiguedad = CacheCompartida('antiguedad')
+
+CLAVE_INFORME = 'informe:{empresa}:{fecha}'
+TIEMPO_CACHE = 60 * 60 * 24
+
+# (clave, etiqueta, días máximos del tramo); el último tramo no tiene límite
+TRAMOS = (
+    ('dias_0_30', '0-30 días', 30),
+    ('dias_31_60', '31-60 días', 60),
+    ('dias_61_90', '61-90 días', 90),
+    ('mas_90', 'Más de 90 días', None),
+)
+
+
+def fecha_por_defecto():
+    """Último día cerrado: ayer."""
+    return timezone.localdate() - timedelta(days=1)
+
+
+def consulta_antiguedad(fecha):
+    """
+    SQL y parámetros del informe al cierre de `fecha`: una fila por cliente
+    con deuda, con lo pendiente de cada tramo y el total (de la empresa del ámbito).
+    """
+    empresa_pagos, params_pagos = sql_empresa('empresa_id')
+    empresa_despachos, params_despachos = sql_empresa('empresa_id')
+    empresa_saldos, params_saldos = sql_empresa('empresa_id')
+    qn = connection.ops.quote_name
+    adaptar = connection.ops.adapt_datetimefield_value
+    limite = adaptar(inicio_del_dia(fecha + timedelta(days=1)))
+    # Un despacho del día `fecha - dias` tiene `dias` de antigüedad
+    cortes = [adaptar(inicio_del_dia(fecha - timedelta(days=dias))) for _, _, dias in TRAMOS if dias]
+
+    columnas_tramos = []
+    params_tramos = []
+    anterior = None
+    for (clave, _, dias), corte in zip(TRAMOS, cortes + [None]):
+        condiciones = []
+        if anterior is not None:
+            condiciones.append('fecha < %s')
+            params_tramos.append(anterior)
+        if corte is not None:
+            condiciones.append('fecha >= %s')
+            params_tramos.append(corte)
+        columnas_tramos.append(
+            f"SUM(CASE WHEN {' AND '.join(condiciones)} THEN pendiente ELSE 0 END) AS {clave}"
+        )
+        anterior = corte
+
+    sql = f"""
+        WITH saldos_iniciales AS (
+            SELECT cliente_id, archivado_hasta, saldo
+            FROM {qn(SaldoInicial._meta.db_table)}
+            WHERE saldo <> 0{empresa_saldos}
+        ),
+        pagado AS (
+            SELECT cliente_id, SUM(monto) AS pagado
+            FROM (
+                SELECT cliente_id, monto
+                FROM {qn(Pago._meta.db_table)}
+                WHERE fecha < %s{empresa_pagos}
+                UNION ALL
+                SELECT cliente_id, -saldo FROM saldos_iniciales WHERE saldo < 0
+            ) abonos
+            GROUP BY cliente_id
+        ),
+        cargos AS (
+            SELECT d.cliente_id, d.fecha, d.total,
+                   SUM(d.total) OVER (
+                       PARTITION BY d.cliente_id ORDER BY d.fecha, d.id
+                       ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+                   ) AS acumulado,
+                   COALESCE(p.pagado, 0) AS pagado
+            FROM (
+                SELECT cliente_id, fecha, id, total
+                FROM {qn(Despacho._meta.db_table)}
+                WHERE fecha < %s{empresa_despachos}
+                UNION ALL
+                SELECT cliente_id, archivado_hasta, 0, saldo FROM saldos_iniciales WHERE saldo > 0
+            ) d
+            LEFT JOIN pagado p ON p.cliente_id = d.cliente_id
+        ),
+        pendientes AS (
+            -- Los pagos cubren los despachos hasta que el acumulado los supera
+            SELECT cliente_id, fecha,
+                   CASE WHEN acumulado <= pagado THEN 0
+                        WHEN acumulado - total >= pagado THEN total
+                        ELSE acumulado - pagado END AS pendiente
+            FROM cargos
+        )
+        SELECT c.id, c.nombre, c.apellido, {', '.join(columnas_tramos)}, SUM(pendiente) AS total
+        FROM pendientes
+        JOIN {qn(Cliente._meta.db_table)} c ON c.id = pendientes.cliente_id
+        WHERE pendiente > 0
+        GROUP BY c.id, c.nombre, c.apellido
+        ORDER BY total DESC, c.id
+    """
+    return sql, [*params_saldos, limite, *params_pagos, limite, *params_despachos] + params_tramos
+
+
+def calcular_antiguedad(fecha):
+    """Informe al cierre de `fecha`: totales por tramo y detalle por cliente."""
+    sql, params = consulta_antiguedad(fecha)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        filas = cursor.fetchall()
+
+    claves = [clave for clave, _, _ in TRAMOS]
+    totales = {clave: Decimal('0.00') for clave in claves + ['total']}
+    clientes = []
+    for pk, nombre, apellido, *montos in filas:
+        fila = {'id': pk, 'nombre': f'{nombre} {apellido}'}
+        fila.update(zip(claves + ['total'], (_a_decimal(monto) for monto in montos)))
+        # Las sumas en coma flotante de SQLite pueden dejar restos de centavos
+        if fila['total'] <= 0:
+            continue
+        for clave in totales:
+            totales[clave] += fila[clave]
+        clientes.append(fila)
+    return {
+        'fecha': fecha,
+        'calculado': timezone.now(),
+        'totales': totales,
+        'clientes': clientes,
+    }
+
+
+def informe_antiguedad(fecha=None, recalcular=False):
+    """Informe al cierre de `fecha` (por defecto ayer), desde la caché del día."""
+    fecha = fecha or fecha_por_defecto()
+    if fecha >= timezone.localdate():
+        raise ValueError('El informe es al cierre de un día ya terminado.')
+    clave = CLAVE_INFORME.format(empresa=clave_empresa(), fecha=fecha.isoformat())
+    if recalcular:
+        informe = calcular_antiguedad(fecha)
+        cache_antiguedad.set(clave, informe, timeout=TIEMPO_CACHE)
+        return informe
+    return cache_antiguedad.obtener(clave, lambda: calcular_antiguedad(fecha), timeout=TIEMPO_CACHE)
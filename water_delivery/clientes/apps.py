@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ClientesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'clientes'
+
+    def ready(self):
+        # Registrar las señales de invalidación de caché
+        from . import signals  # noqa: F401
@@ -0,0 +1,178 @@
+# =============================================
+# ARCHIVO DE MOVIMIENTOS DE PERÍODOS CERRADOS
+# =============================================
+# Despacho y Pago solo crecen, y el saldo, el estado de cuenta y los informes
+# recorren el historial de cada cliente. Los movimientos de períodos cerrados
+# (despachos entregados o cancelados y pagos anteriores al corte) se mueven a
+# DespachoArchivado y PagoArchivado, y lo que suman queda en el SaldoInicial
+# del cliente, de donde parten los cálculos de clientes/estado_cuenta.py y
+# clientes/antiguedad.py. Así las tablas activas y sus índices solo guardan
+# los últimos meses.
+#
+# Se archiva por lotes de filas, cada uno en su transacción: copiar al
+# archivo, borrar de la tabla activa y sumar al SaldoInicial van juntos, así
+# que un corte a medias deja los saldos correctos y se puede retomar. El
+# borrado es SQL directo: no es una baja del despacho o pago (no se audita
+# ni recorre señales fila por fila); la caché se invalida al final.
+#
+# Lo ejecuta el comando `manage.py archivar_movimientos` (por ejemplo una vez
+# al mes, fuera de horario).
+#
+# Cambiar el precio del botellón de un cliente recalcula también sus
+# despachos archivados (cambiar_precio_archivado): el saldo no depende de si
+# el archivo ya corrió o no.
+
+import logging
+from collections import defaultdict
+from datetime import date
+
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from water_delivery.auditoria import registrar_actualizacion
+from water_delivery.cache import etiqueta_modelo, invalidar_etiquetas
+
+from .estado_cuenta import inicio_del_dia
+from .models import Despacho, DespachoArchivado, Pago, PagoArchivado, SaldoInicial
+
+logger = logging.getLogger(__name__)
+
+# La predicción de pedidos usa el último año: se archiva lo anterior
+MESES_POR_DEFECTO = 12
+MESES_MINIMOS = 3
+TAMANO_LOTE = 1000
+
+
+def corte_de_archivo(meses, hoy=None):
+    """Medianoche del primer día del mes de hace `meses` meses: se archiva lo anterior."""
+    hoy = hoy or timezone.localdate()
+    mes = hoy.year * 12 + hoy.month - 1 - meses
+    return inicio_del_dia(date(mes // 12, mes % 12 + 1, 1))
+
+
+def despachos_archivables(corte):
+    """Despachos cerrados (entregados o cancelados) anteriores a `corte`, de todas las empresas."""
+    return Despacho.todos.filter(Q(entregado=True) | Q(cancelado=True), fecha__lt=corte)
+
+
+def pagos_archivables(corte):
+    """Pagos anteriores a `corte`, de todas las empresas."""
+    return Pago.todos.filter(fecha__lt=corte)
+
+
+def _campos_copiados(archivo):
+    return [campo.attname for campo in archivo._meta.concrete_fields if campo.name != 'archivado']
+
+
+def _delta_despacho(fila):
+    return {
+        'cargos': fila['total'], 'despachos': 1, 'entregados': int(fila['entregado']),
+        'botellones': fila['cantidad_botellones'],
+    }
+
+
+def _delta_pago(fila):
+    return {'abonos': fila['monto'], 'pagos': 1}
+
+
+def _acumular_saldos(deltas, empresas, corte, ahora):
+    """Suma los movimientos archivados al SaldoInicial de cada cliente (lo crea si no tiene)."""
+    saldos = SaldoInicial.todos.select_for_update().in_bulk(list(deltas))
+    nuevos = []
+    for cliente_id, delta in deltas.items():
+        saldo = saldos.get(cliente_id)
+        if saldo is None:
+            saldo = SaldoInicial(cliente_id=cliente_id, empresa_id=empresas[cliente_id], archivado_hasta=corte)
+            nuevos.append(saldo)
+        for campo, valor in delta.items():
+            setattr(saldo, campo, getattr(saldo, campo) + valor)
+        saldo.saldo = saldo.cargos - saldo.abonos
+        saldo.archivado_hasta = max(saldo.archivado_hasta, corte)
+        saldo.actualizado = ahora
+    SaldoInicial.todos.bulk_create(nuevos)
+    SaldoInicial.todos.bulk_update(list(saldos.values()), [
+        'archivado_hasta', 'cargos', 'abonos', 'saldo', 'despachos', 'entregados', 'botellones',
+        'pagos', 'actualizado',
+    ])
+
+
+def _archivar_lote(modelo, archivo, archivables, delta_de, corte, lote):
+    """Mueve hasta `lote` filas al archivo en una transacción; devuelve cuántas."""
+    campos = _campos_copiados(archivo)
+    ahora = timezone.now()
+    with transaction.atomic():
+        filas = list(archivables.select_for_update().order_by('id').values(*campos)[:lote])
+        if not filas:
+            return 0
+        archivo.todos.bulk_create(archivo(**fila, archivado=ahora) for fila in filas)
+        qn = connection.ops.quote_name
+        marcadores = ', '.join(['%s'] * len(filas))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {qn(modelo._meta.db_table)} WHERE id IN ({marcadores})',
+                [fila['id'] for fila in filas],
+            )
+        deltas, empresas = {}, {}
+        for fila in filas:
+            acumulado = deltas.setdefault(fila['cliente_id'], {})
+            for campo, valor in delta_de(fila).items():
+                acumulado[campo] = acumulado.get(campo, 0) + valor
+            empresas[fila['cliente_id']] = fila['empresa_id']
+        _acumular_saldos(deltas, empresas, corte, ahora)
+    return len(filas)
+
+
+def _archivar(modelo, archivo, archivables, delta_de, corte, lote):
+    total = 0
+    while True:
+        movidos = _archivar_lote(modelo, archivo, archivables, delta_de, corte, lote)
+        if not movidos:
+            return total
+        total += movidos
+        logger.info('Archivados %d %s (%d en total)', movidos, modelo._meta.verbose_name_plural, total)
+
+
+def archivar(corte, lote=TAMANO_LOTE):
+    """
+    Archiva los despachos cerrados y los pagos anteriores a `corte`, por lotes
+    de `lote` filas. Devuelve {'despachos': n, 'pagos': n}.
+    """
+    resumen = {
+        'despachos': _archivar(
+            Despacho, DespachoArchivado, despachos_archivables(corte), _delta_despacho, corte, lote,
+        ),
+        'pagos': _archivar(Pago, PagoArchivado, pagos_archivables(corte), _delta_pago, corte, lote),
+    }
+    if any(resumen.values()):
+        # El borrado directo no envía señales: los resúmenes en caché se invalidan aquí
+        invalidar_etiquetas(etiqueta_modelo(Despacho), etiqueta_modelo(Pago))
+    return resumen
+
+
+def cambiar_precio_archivado(cliente_id, precio):
+    """
+    Pasa los despachos archivados del cliente a `precio` y suma la diferencia
+    a los cargos de su SaldoInicial, como la edición del cliente hace con los
+    despachos activos. Va dentro de la transacción del cambio de precio.
+    Devuelve cuántos despachos archivados cambiaron.
+    """
+    saldo = SaldoInicial.todos.select_for_update().filter(cliente_id=cliente_id).first()
+    if saldo is None:
+        return 0
+    archivados = DespachoArchivado.todos.filter(cliente_id=cliente_id).exclude(precio_unitario=precio)
+    por_precio, diferencia = defaultdict(list), 0
+    for despacho_id, anterior, cantidad, total in archivados.values_list(
+        'id', 'precio_unitario', 'cantidad_botellones', 'total',
+    ):
+        por_precio[anterior].append(despacho_id)
+        diferencia += cantidad * precio - total
+    if not por_precio:
+        return 0
+    cambiados = archivados.update(precio_unitario=precio, total=F('cantidad_botellones') * precio)
+    saldo.cargos += diferencia
+    saldo.saldo = saldo.cargos - saldo.abonos
+    saldo.save(update_fields=['cargos', 'saldo', 'actualizado'])
+    for anterior, ids in por_precio.items():
+        registrar_actualizacion(DespachoArchivado, ids, {'precio_unitario': anterior}, {'precio_unitario': precio})
+    return cambiados
@@ -0,0 +1,121 @@
+# =============================================
+# ASIGNACIÓN DE DESPACHOS A CONDUCTORES Y CAMIONES
+# =============================================
+# Cada despacho lo reparte un conductor; al asignarlo se copia también su
+# camión (Usuario.camion_asignado), para que la carga de cada camión se pueda
+# consultar aunque después cambie de conductor. Con el índice
+# (conductor, fecha, entregado) el manifiesto de un conductor lee solo sus
+# despachos del día.
+#
+# Los despachos que crea la empresa sin elegir conductor van al que lleva menos
+# botellones ese día, y `repartir` reparte de una vez los que quedaron sin
+# asignar, empezando por los más grandes, para equilibrar la carga.
+
+import heapq
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, FilteredRelation, Q, Sum
+from django.db.models.functions import Coalesce
+
+from usuarios.models import Usuario
+from water_delivery.auditoria import registrar_actualizacion
+from water_delivery.cache import etiqueta_modelo, invalidar_etiquetas
+from water_delivery.empresas import filtrar_por_empresa
+
+from .estado_cuenta import inicio_del_dia
+from .models import Despacho
+
+
+def rango_del_dia(fecha):
+    """Límites [inicio, fin) del día local `fecha`, para filtrar usando los índices por fecha."""
+    return inicio_del_dia(fecha), inicio_del_dia(fecha + timedelta(days=1))
+
+
+def conductores_activos():
+    """Conductores activos de la empresa del ámbito (ver water_delivery/empresas.py)."""
+    return filtrar_por_empresa(Usuario.objects.filter(tipo_usuario=Usuario.CONDUCTOR, is_active=True))
+
+
+def carga_del_dia(fecha):
+    """
+    Conductores activos con los despachos y botellones (sin contar cancelados)
+    que tienen asignados en `fecha`, de menor a mayor carga.
+    """
+    inicio, fin = rango_del_dia(fecha)
+    # La condición va en el JOIN: solo se leen los despachos del día de cada conductor
+    del_dia = FilteredRelation('despachos_asignados', condition=Q(
+        despachos_asignados__fecha__gte=inicio,
+        despachos_asignados__fecha__lt=fin,
+        despachos_asignados__cancelado=False,
+    ))
+    return conductores_activos().only(
+        'id', 'username', 'first_name', 'last_name', 'camion_asignado',
+    ).annotate(del_dia=del_dia).annotate(
+        despachos=Count('del_dia'),
+        botellones=Coalesce(Sum('del_dia__cantidad_botellones'), 0),
+        pendientes=Count('del_dia', filter=Q(del_dia__entregado=False)),
+    ).order_by('botellones', 'id')
+
+
+def conductor_menos_cargado(fecha):
+    """El conductor activo con menos botellones en `fecha` (None si no hay conductores)."""
+    return carga_del_dia(fecha).first()
+
+
+def asignar(despacho, conductor):
+    """Asigna el despacho al conductor y su camión (o lo deja sin asignar con None)."""
+    despacho.conductor = conductor
+    despacho.camion = conductor.camion_asignado if conductor else ''
+    despacho.save(update_fields=['conductor', 'camion'])
+    return despacho
+
+
+def repartir(fecha):
+    """
+    Asigna los despachos pendientes sin conductor de `fecha` al conductor con
+    menos botellones en cada momento, del despacho más grande al más pequeño.
+    Devuelve ({conductor: cantidad de despachos asignados}, omitidos): los
+    omitidos dejaron de estar pendientes o sin conductor mientras se repartía
+    (otro reparto, una asignación a mano o una entrega) y no se tocan.
+    """
+    inicio, fin = rango_del_dia(fecha)
+    sin_asignar = list(
+        Despacho.objects.filter(
+            fecha__gte=inicio, fecha__lt=fin, conductor__isnull=True, entregado=False, cancelado=False,
+        ).order_by('-cantidad_botellones', 'fecha').values_list('id', 'cantidad_botellones')
+    )
+    conductores = list(carga_del_dia(fecha))
+    if not sin_asignar or not conductores:
+        return {}, 0
+
+    cola = [(conductor.botellones, conductor.id, conductor) for conductor in conductores]
+    heapq.heapify(cola)
+    por_conductor = {}
+    for despacho_id, cantidad in sin_asignar:
+        botellones, conductor_id, conductor = heapq.heappop(cola)
+        por_conductor.setdefault(conductor, []).append(despacho_id)
+        heapq.heappush(cola, (botellones + cantidad, conductor_id, conductor))
+
+    asignados = {}
+    with transaction.atomic():
+        pendientes = Despacho.objects.filter(conductor__isnull=True, entregado=False, cancelado=False)
+        # Solo los que siguen pendientes y sin conductor, bloqueados hasta el final
+        libres = set(pendientes.select_for_update().filter(
+            pk__in=[despacho_id for despacho_id, _ in sin_asignar],
+        ).values_list('id', flat=True))
+        for conductor, ids in por_conductor.items():
+            ids = [despacho_id for despacho_id in ids if despacho_id in libres]
+            if not ids:
+                continue
+            # update() no envía señales: la versión de la fila, la caché y la auditoría van aquí
+            pendientes.filter(pk__in=ids).update(
+                conductor=conductor, camion=conductor.camion_asignado, version=F('version') + 1,
+            )
+            registrar_actualizacion(
+                Despacho, ids, {'conductor_id': None, 'camion': ''},
+                {'conductor_id': conductor.id, 'camion': conductor.camion_asignado},
+            )
+            asignados[conductor] = len(ids)
+        transaction.on_commit(lambda: invalidar_etiquetas(etiqueta_modelo(Despacho)))
+    return asignados, len(sin_asignar) - len(libres)
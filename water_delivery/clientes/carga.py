@@ -0,0 +1,321 @@
+# =============================================
+# GENERADOR DE CARGA: CONDUCTORES Y DESPACHADORES SIMULADOS
+# =============================================
+# Usuarios virtuales que recorren las rutas reales de la app contra un
+# servidor local (runserver, gunicorn o el perfil ASGI), cada uno con su
+# sesión y su conexión keep-alive, como un navegador o la app del camión:
+#
+# - Conductor: envía su posición GPS a api_guardar_ubicacion y, de vez en
+#   cuando, crea un despacho, lo marca entregado o registra un cliente nuevo.
+# - Despachador (usuario empresa): consulta api_despachos_hoy, ruta_camion,
+#   el dashboard y la lista de clientes, como la pantalla de la oficina.
+#
+# Todo corre en un solo event loop con un cliente HTTP/1.1 mínimo sobre
+# asyncio (sin dependencias nuevas). Lo usa el comando `prueba_carga`.
+
+import asyncio
+import json
+import random
+import re
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlencode, urlsplit
+
+from .sintetico import LATITUD_BASE, LONGITUD_BASE, PREFIJO
+
+_RE_CSRF = re.compile(rb'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+class ErrorHTTP(Exception):
+    """La respuesta no se pudo leer (conexión cerrada o formato inválido)."""
+
+
+class ConexionHTTP:
+    """Una conexión keep-alive con cookies propias; se reabre si el servidor la cierra."""
+
+    def __init__(self, base, tiempo_maximo=30):
+        partes = urlsplit(base)
+        if partes.scheme != 'http':
+            raise ValueError('Solo se admite http:// (servidor local)')
+        self.host = partes.hostname
+        self.puerto = partes.port or 80
+        self.tiempo_maximo = tiempo_maximo
+        self.cookies = {}
+        self.lector = self.escritor = None
+
+    async def _abrir(self):
+        self.lector, self.escritor = await asyncio.open_connection(self.host, self.puerto)
+
+    async def cerrar(self):
+        if self.escritor is not None:
+            self.escritor.close()
+            try:
+                await self.escritor.wait_closed()
+            except OSError:
+                pass
+            self.lector = self.escritor = None
+
+    async def pedir(self, metodo, ruta, cuerpo=b'', tipo=None, cabeceras=None):
+        """Devuelve (estado, cabeceras, cuerpo). Reintenta una vez si la conexión estaba cerrada."""
+        for intento in (1, 2):
+            if self.escritor is None:
+                await self._abrir()
+            try:
+                return await asyncio.wait_for(
+                    self._intercambio(metodo, ruta, cuerpo, tipo, cabeceras or {}), self.tiempo_maximo,
+                )
+            except (ConnectionError, asyncio.IncompleteReadError, ErrorHTTP):
+                await self.cerrar()
+                if intento == 2:
+                    raise
+            except asyncio.TimeoutError:
+                await self.cerrar()
+                raise
+
+    async def _intercambio(self, metodo, ruta, cuerpo, tipo, extra):
+        cabeceras = {
+            'Host': f'{self.host}:{self.puerto}',
+            'Connection': 'keep-alive',
+            'Content-Length': str(len(cuerpo)),
+            **extra,
+        }
+        if tipo:
+            cabeceras['Content-Type'] = tipo
+        if self.cookies:
+            cabeceras['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        if 'csrftoken' in self.cookies and metodo != 'GET':
+            cabeceras['X-CSRFToken'] = self.cookies['csrftoken']
+        peticion = f'{metodo} {ruta} HTTP/1.1\r\n' + ''.join(f'{k}: {v}\r\n' for k, v in cabeceras.items())
+        self.escritor.write(peticion.encode('latin-1') + b'\r\n' + cuerpo)
+        await self.escritor.drain()
+
+        linea = await self.lector.readline()
+        if not linea:
+            raise ErrorHTTP('el servidor cerró la conexión')
+        try:
+            estado = int(linea.split()[1])
+        except (IndexError, ValueError):
+            raise ErrorHTTP(f'línea de estado inválida: {linea[:80]!r}')
+        respuesta = {}
+        while True:
+            linea = (await self.lector.readline()).decode('latin-1').rstrip('\r\n')
+            if not linea:
+                break
+            nombre, _, valor = linea.partition(':')
+            nombre, valor = nombre.strip().lower(), valor.strip()
+            if nombre == 'set-cookie':
+                clave, _, resto = valor.partition('=')
+                self.cookies[clave] = resto.split(';', 1)[0]
+            respuesta[nombre] = valor
+
+        if respuesta.get('transfer-encoding', '').lower() == 'chunked':
+            partes = []
+            while True:
+                tamano = int((await self.lector.readline()).split(b';')[0], 16)
+                if tamano == 0:
+                    await self.lector.readline()
+                    break
+                partes.append(await self.lector.readexactly(tamano))
+                await self.lector.readline()
+            contenido = b''.join(partes)
+        elif 'content-length' in respuesta:
+            contenido = await self.lector.readexactly(int(respuesta['content-length']))
+        else:
+            contenido = await self.lector.read()
+            respuesta['connection'] = 'close'
+        if respuesta.get('connection', '').lower() == 'close':
+            await self.cerrar()
+        return estado, respuesta, contenido
+
+
+class Estadisticas:
+    """Latencias y estados por nombre de URL; solo cuenta lo ocurrido tras el calentamiento."""
+
+    def __init__(self):
+        self.latencias = defaultdict(list)
+        self.estados = defaultdict(Counter)
+        self.errores = Counter()
+        self.midiendo = False
+        self.inicio = None
+        self.fin = None
+
+    def empezar(self):
+        self.midiendo = True
+        self.inicio = time.monotonic()
+
+    def terminar(self):
+        self.midiendo = False
+        self.fin = time.monotonic()
+
+    def anotar(self, nombre, milisegundos, estado):
+        if self.midiendo:
+            self.latencias[nombre].append(milisegundos)
+            self.estados[nombre][estado] += 1
+
+    def anotar_error(self, nombre, error):
+        if self.midiendo:
+            self.errores[nombre] += 1
+            self.estados[nombre][type(error).__name__] += 1
+
+
+class UsuarioVirtual:
+    """Sesión de un usuario simulado: inicia sesión y repite su escenario hasta que se detiene."""
+
+    def __init__(self, base, rutas, estadisticas, username, clave, pausa, azar):
+        self.http = ConexionHTTP(base)
+        self.rutas = rutas
+        self.estadisticas = estadisticas
+        self.username = username
+        self.clave = clave
+        self.pausa = pausa
+        self.azar = azar
+
+    async def pedir(self, nombre, metodo='GET', datos=None, ruta=None, formulario=None):
+        """Petición medida bajo `nombre`; devuelve (estado, JSON decodificado o cuerpo en bytes)."""
+        ruta = ruta or self.rutas[nombre]
+        if formulario is not None:
+            cuerpo, tipo = urlencode(formulario).encode(), 'application/x-www-form-urlencoded'
+        elif datos is not None:
+            cuerpo, tipo = json.dumps(datos).encode(), 'application/json'
+        else:
+            cuerpo, tipo = b'', None
+        inicio = time.perf_counter()
+        try:
+            estado, cabeceras, contenido = await self.http.pedir(metodo, ruta, cuerpo, tipo)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ErrorHTTP) as error:
+            self.estadisticas.anotar_error(nombre, error)
+            return None, None
+        self.estadisticas.anotar(nombre, (time.perf_counter() - inicio) * 1000, estado)
+        if 'json' in cabeceras.get('content-type', ''):
+            try:
+                return estado, json.loads(contenido)
+            except ValueError:
+                pass
+        return estado, contenido
+
+    async def iniciar_sesion(self):
+        _, pagina = await self.pedir('usuarios:login')
+        encontrado = _RE_CSRF.search(pagina or b'')
+        estado, _ = await self.pedir('usuarios:login', 'POST', formulario={
+            'username': self.username,
+            'password': self.clave,
+            'csrfmiddlewaretoken': encontrado.group(1).decode() if encontrado else '',
+        })
+        if estado != 302:
+            raise RuntimeError(f'No se pudo iniciar sesión como {self.username} (estado {estado})')
+
+    async def esperar(self):
+        # Pausa con variación para que los usuarios no vayan sincronizados
+        await asyncio.sleep(self.pausa * self.azar.uniform(0.5, 1.5))
+
+    async def ejecutar(self, detener):
+        try:
+            await self.iniciar_sesion()
+            await self.preparar()
+            while not detener.is_set():
+                await self.paso()
+                await self.esperar()
+        finally:
+            await self.http.cerrar()
+
+    async def preparar(self):
+        pass
+
+    async def paso(self):
+        raise NotImplementedError
+
+
+class ConductorVirtual(UsuarioVirtual):
+    """Envía GPS en cada paso; a veces crea y entrega despachos o registra clientes."""
+
+    async def preparar(self):
+        _, datos = await self.pedir('clientes:api_clientes')
+        self.clientes = [c['id'] for c in datos.get('clientes', [])] if isinstance(datos, dict) else []
+        self.latitud = LATITUD_BASE + self.azar.uniform(-0.05, 0.05)
+        self.longitud = LONGITUD_BASE + self.azar.uniform(-0.05, 0.05)
+
+    async def paso(self):
+        self.latitud += self.azar.uniform(-0.0005, 0.0005)
+        self.longitud += self.azar.uniform(-0.0005, 0.0005)
+        await self.pedir('clientes:api_guardar_ubicacion', 'POST', {
+            'latitud': round(self.latitud, 7),
+            'longitud': round(self.longitud, 7),
+            'precision': self.azar.randint(3, 30),
+            'velocidad': round(self.azar.uniform(0, 50), 1),
+            'bateria': self.azar.randint(20, 100),
+        })
+        suerte = self.azar.random()
+        if suerte < 0.2 and self.clientes:
+            _, respuesta = await self.pedir('clientes:api_crear_despacho', 'POST', {
+                'cliente_id': self.azar.choice(self.clientes),
+                'cantidad': self.azar.randint(1, 5),
+                'notas': 'prueba de carga',
+            })
+            despacho = isinstance(respuesta, dict) and respuesta.get('despacho', {}).get('id')
+            if despacho:
+                ruta = self.rutas['clientes:api_marcar_entregado'].replace('/0/', f'/{despacho}/')
+                await self.pedir('clientes:api_marcar_entregado', 'POST', {'entregado': True}, ruta=ruta)
+        elif suerte < 0.22:
+            _, respuesta = await self.pedir('clientes:api_crear_cliente', 'POST', {
+                # Con el prefijo de los datos sintéticos, para que `sembrar_datos --borrar` los limpie
+                'nombre': f'{PREFIJO}carga',
+                'apellido': 'Simulado',
+                'telefono': f'0412{self.azar.randint(1000000, 9999999)}',
+                'direccion': f'Calle {self.azar.randint(1, 200)}, casa {self.azar.randint(1, 99)}',
+            })
+            cliente = isinstance(respuesta, dict) and respuesta.get('cliente', {}).get('id')
+            if cliente:
+                self.clientes.append(cliente)
+
+
+class DespachadorVirtual(UsuarioVirtual):
+    """Usuario empresa que refresca las pantallas de la oficina."""
+
+    PANTALLAS = (
+        ('clientes:api_despachos_hoy', 4),
+        ('clientes:ruta_camion', 2),
+        ('clientes:api_resumen_header', 2),
+        ('clientes:dashboard', 1),
+        ('clientes:lista_clientes', 1),
+    )
+
+    async def paso(self):
+        nombres, pesos = zip(*self.PANTALLAS)
+        await self.pedir(self.azar.choices(nombres, weights=pesos)[0])
+
+
+async def ejecutar_carga(base, rutas, conductores, despachadores, duracion, calentamiento,
+                         pausa_conductor, pausa_despachador, semilla=1, aviso=None):
+    """
+    Lanza los usuarios virtuales, mide durante `duracion` segundos (después
+    de `calentamiento`) y devuelve las Estadisticas. `conductores` y
+    `despachadores` son listas de (username, clave), una por usuario virtual.
+    """
+    estadisticas = Estadisticas()
+    detener = asyncio.Event()
+    azar = random.Random(semilla)
+    usuarios = [
+        ConductorVirtual(base, rutas, estadisticas, nombre, clave, pausa_conductor, random.Random(azar.random()))
+        for nombre, clave in conductores
+    ] + [
+        DespachadorVirtual(base, rutas, estadisticas, nombre, clave, pausa_despachador, random.Random(azar.random()))
+        for nombre, clave in despachadores
+    ]
+    tareas = [asyncio.create_task(usuario.ejecutar(detener)) for usuario in usuarios]
+
+    await asyncio.sleep(calentamiento)
+    # Si todos fallaron al iniciar sesión no tiene sentido seguir esperando
+    caidas = [t for t in tareas if t.done() and t.exception()]
+    if len(caidas) == len(tareas):
+        raise caidas[0].exception()
+    estadisticas.empezar()
+    if aviso:
+        aviso(f'Midiendo {duracion}s con {len(conductores)} conductores y {len(despachadores)} despachadores...')
+    await asyncio.sleep(duracion)
+    estadisticas.terminar()
+    detener.set()
+    resultados = await asyncio.gather(*tareas, return_exceptions=True)
+    fallidos = [r for r in resultados if isinstance(r, Exception)]
+    if fallidos and aviso:
+        aviso(f'{len(fallidos)} usuarios virtuales terminaron con error: {fallidos[0]}')
+    return estadisticas
@@ -0,0 +1,331 @@
+# =============================================
+# ESTADO DE CUENTA DE CLIENTES
+# =============================================
+# Combina despachos (cargos) y pagos (abonos) de uno o varios clientes en una
+# sola secuencia cronológica. El saldo acumulado después de cada movimiento y
+# el saldo inicial del rango consultado se calculan en la base de datos con
+# funciones de ventana (SUM/FIRST_VALUE ... OVER), así que ninguna página
+# necesita recorrer el historial completo en Python.
+#
+# Los movimientos de períodos cerrados se archivan (ver clientes/archivo.py):
+# el saldo de cada cliente parte de su SaldoInicial y las consultas solo leen
+# las tablas activas. Los movimientos archivados cuentan como anteriores a
+# cualquier fecha consultada.
+#
+# recalcular_saldo() es el único cálculo de Cliente.saldo que usan las vistas.
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Despacho, Pago, SaldoInicial
+
+CENTAVOS = Decimal('0.01')
+
+
+def inicio_del_dia(fecha):
+    """Convierte una fecha local en el datetime consciente de su medianoche."""
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def _a_decimal(valor):
+    """SQLite devuelve float/int en columnas calculadas; PostgreSQL, Decimal."""
+    if valor is None:
+        return Decimal('0.00')
+    return Decimal(str(valor)).quantize(CENTAVOS)
+
+
+def _a_datetime(valor):
+    """Normaliza la fecha devuelta por el cursor (texto en SQLite)."""
+    if isinstance(valor, str):
+        valor = parse_datetime(valor)
+    if valor is not None and timezone.is_naive(valor):
+        valor = timezone.make_aware(valor, timezone.utc)
+    return valor
+
+
+def _filtros_fecha(desde, hasta):
+    """
+    Devuelve los límites del rango como datetimes adaptados al motor.
+    `hasta` es inclusivo: se filtra hasta la medianoche del día siguiente.
+    """
+    limite_desde = limite_hasta = None
+    if desde:
+        limite_desde = connection.ops.adapt_datetimefield_value(inicio_del_dia(desde))
+    if hasta:
+        limite_hasta = connection.ops.adapt_datetimefield_value(inicio_del_dia(hasta + timedelta(days=1)))
+    return limite_desde, limite_hasta
+
+
+def _union_movimientos(cliente_ids, columnas_despacho, columnas_pago, desde=None, hasta=None,
+                       columnas_saldo_inicial=None):
+    """
+    Construye el UNION ALL de despachos y pagos de los clientes indicados.
+    Cada rama recibe las mismas condiciones de cliente y de fecha
+    (`desde` inclusivo, `hasta` exclusivo, ambos ya adaptados al motor).
+    Con `columnas_saldo_inicial` se agrega una rama con el SaldoInicial de
+    cada cliente, sin filtro de fecha.
+    """
+    qn = connection.ops.quote_name
+    marcadores = ', '.join(['%s'] * len(cliente_ids))
+    condiciones = [f'cliente_id IN ({marcadores})']
+    params_rama = list(cliente_ids)
+    if desde is not None:
+        condiciones.append('fecha >= %s')
+        params_rama.append(desde)
+    if hasta is not None:
+        condiciones.append('fecha < %s')
+        params_rama.append(hasta)
+    where = ' AND '.join(condiciones)
+    sql = (
+        f'SELECT {columnas_despacho} FROM {qn(Despacho._meta.db_table)} WHERE {where} '
+        f'UNION ALL '
+        f'SELECT {columnas_pago} FROM {qn(Pago._meta.db_table)} WHERE {where}'
+    )
+    params = params_rama + params_rama
+    if columnas_saldo_inicial is not None:
+        sql += (
+            f' UNION ALL SELECT {columnas_saldo_inicial} FROM {qn(SaldoInicial._meta.db_table)}'
+            f' WHERE cliente_id IN ({marcadores})'
+        )
+        params += list(cliente_ids)
+    return sql, params
+
+
+COLUMNAS_DESPACHO = (
+    "cliente_id, 'despacho' AS tipo, 0 AS orden, id, fecha, "
+    "cantidad_botellones AS cantidad, notas AS detalle, entregado, cancelado, "
+    "total AS cargo, 0 AS abono"
+)
+COLUMNAS_PAGO = (
+    "cliente_id, 'pago', 1, id, fecha, NULL, observaciones, NULL, NULL, 0, monto"
+)
+
+
+def consulta_movimientos(cliente_ids, desde=None, hasta=None):
+    """
+    SQL de los movimientos en [desde, hasta] con su saldo acumulado.
+
+    El CTE `movimientos` incluye todo lo anterior a `hasta` para que la ventana
+    acumule el historial previo (más el SaldoInicial archivado); el filtro por
+    `desde` se aplica después, por lo que FIRST_VALUE(saldo - cargo + abono)
+    es el saldo inicial de cada cliente.
+    """
+    limite_desde, limite_hasta = _filtros_fecha(desde, hasta)
+    union, params = _union_movimientos(cliente_ids, COLUMNAS_DESPACHO, COLUMNAS_PAGO, hasta=limite_hasta)
+    filtro_desde = ''
+    if limite_desde is not None:
+        filtro_desde = 'WHERE fecha >= %s'
+        params.append(limite_desde)
+    qn = connection.ops.quote_name
+    sql = f"""
+        WITH movimientos AS ({union}),
+        acumulado AS (
+            SELECT movimientos.*,
+                   COALESCE(apertura.saldo, 0) + SUM(cargo - abono) OVER (
+                       PARTITION BY movimientos.cliente_id
+                       ORDER BY movimientos.fecha, movimientos.orden, movimientos.id
+                       ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+                   ) AS saldo
+            FROM movimientos
+            LEFT JOIN {qn(SaldoInicial._meta.db_table)} apertura ON apertura.cliente_id = movimientos.cliente_id
+        )
+        SELECT cliente_id, tipo, orden, id, fecha, cantidad, detalle, entregado, cancelado,
+               cargo, abono, saldo,
+               FIRST_VALUE(saldo - cargo + abono) OVER (
+                   PARTITION BY cliente_id ORDER BY fecha, orden, id
+               ) AS saldo_inicial
+        FROM acumulado
+        {filtro_desde}
+    """
+    return sql, params
+
+
+def _fila_a_movimiento(fila):
+    """Convierte una fila del cursor en el diccionario que usan vistas y plantillas."""
+    (cliente_id, tipo, _orden, pk, fecha, cantidad, detalle, entregado, cancelado,
+     cargo, abono, saldo, saldo_inicial) = fila
+    return {
+        'cliente_id': cliente_id,
+        'tipo': tipo,
+        'id': pk,
+        'fecha': _a_datetime(fecha),
+        'cantidad': cantidad,
+        'detalle': detalle or '',
+        'entregado': bool(entregado) if entregado is not None else None,
+        'cancelado': bool(cancelado) if cancelado is not None else None,
+        'cargo': _a_decimal(cargo),
+        'abono': _a_decimal(abono),
+        'saldo': _a_decimal(saldo),
+        'saldo_inicial': _a_decimal(saldo_inicial),
+    }
+
+
+def saldos_previos(cliente_ids, desde):
+    """
+    Saldo de cada cliente antes de `desde` (para rangos sin movimientos):
+    su SaldoInicial más los movimientos activos anteriores.
+    """
+    saldos = {cliente_id: Decimal('0.00') for cliente_id in cliente_ids}
+    if not desde:
+        # Sin `desde` no hay movimientos activos anteriores: solo el saldo archivado
+        saldos.update(SaldoInicial.todos.filter(cliente_id__in=cliente_ids).values_list('cliente_id', 'saldo'))
+        return saldos
+    limite_desde, _ = _filtros_fecha(desde, None)
+    union, params = _union_movimientos(
+        cliente_ids,
+        'cliente_id, total AS cargo, 0 AS abono',
+        'cliente_id, 0, monto',
+        hasta=limite_desde,
+        columnas_saldo_inicial='cliente_id, saldo, 0',
+    )
+    sql = f'SELECT cliente_id, SUM(cargo - abono) FROM ({union}) previos GROUP BY cliente_id'
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for cliente_id, saldo in cursor.fetchall():
+            saldos[cliente_id] = _a_decimal(saldo)
+    return saldos
+
+
+def saldo_actual(cliente_id):
+    """Saldo al día de un cliente: SaldoInicial + despachos - pagos, en una consulta."""
+    union, params = _union_movimientos(
+        [cliente_id], 'total AS cargo, 0 AS abono', '0, monto', columnas_saldo_inicial='saldo, 0',
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT SUM(cargo - abono) FROM ({union}) movimientos', params)
+        return _a_decimal(cursor.fetchone()[0])
+
+
+def botellones_adeudados(saldo, precio_botellon):
+    """Botellones que cubre una deuda al precio del cliente (0 si no debe)."""
+    if float(precio_botellon) <= 0 or float(saldo) <= 0:
+        return 0
+    return int(round(float(saldo) / float(precio_botellon)))
+
+
+def recalcular_saldo(cliente, debe_total=False):
+    """
+    Recalcula y guarda Cliente.saldo desde sus movimientos (y `debe_total`
+    si se pide). Es el cálculo que usan todas las vistas tras editar o
+    borrar despachos y pagos.
+    """
+    cliente.saldo = saldo_actual(cliente.pk)
+    campos = ['saldo']
+    if debe_total:
+        cliente.debe_total = botellones_adeudados(cliente.saldo, cliente.precio_botellon)
+        campos.append('debe_total')
+    cliente.save(update_fields=campos)
+    return cliente.saldo
+
+
+class EstadoCuenta:
+    """
+    Estado de cuenta paginable de un cliente.
+
+    Implementa `count()` y el corte por slices, de modo que se puede pasar
+    directamente a `django.core.paginator.Paginator`: cada página ejecuta una
+    única consulta con LIMIT/OFFSET sobre el resultado ya acumulado.
+    """
+
+    def __init__(self, cliente, desde=None, hasta=None):
+        self.cliente = cliente
+        self.desde = desde
+        self.hasta = hasta
+        self._resumen = None
+        self._saldo_inicial = None
+
+    def _calcular_resumen(self):
+        limite_desde, limite_hasta = _filtros_fecha(self.desde, self.hasta)
+        union, params = _union_movimientos(
+            [self.cliente.pk],
+            'total AS cargo, 0 AS abono',
+            '0, monto',
+            desde=limite_desde,
+            hasta=limite_hasta,
+        )
+        sql = f'SELECT COUNT(*), SUM(cargo), SUM(abono) FROM ({union}) rango'
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            total, cargos, abonos = cursor.fetchone()
+        self._resumen = {
+            'movimientos': total,
+            'total_cargos': _a_decimal(cargos),
+            'total_abonos': _a_decimal(abonos),
+        }
+
+    @property
+    def resumen(self):
+        if self._resumen is None:
+            self._calcular_resumen()
+        return self._resumen
+
+    def count(self):
+        return self.resumen['movimientos']
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, indice):
+        if not isinstance(indice, slice):
+            raise TypeError('EstadoCuenta solo admite slices.')
+        inicio = indice.start or 0
+        fin = indice.stop if indice.stop is not None else self.count()
+        sql, params = consulta_movimientos([self.cliente.pk], self.desde, self.hasta)
+        sql = f'{sql} ORDER BY fecha, orden, id LIMIT %s OFFSET %s'
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + [max(fin - inicio, 0), inicio])
+            movimientos = [_fila_a_movimiento(fila) for fila in cursor.fetchall()]
+        if movimientos and self._saldo_inicial is None:
+            self._saldo_inicial = movimientos[0]['saldo_inicial']
+        return movimientos
+
+    @property
+    def saldo_inicial(self):
+        """Saldo del cliente justo antes del primer movimiento del rango."""
+        if self._saldo_inicial is None:
+            if self.count():
+                self[0:1]
+            else:
+                self._saldo_inicial = saldos_previos([self.cliente.pk], self.desde)[self.cliente.pk]
+        return self._saldo_inicial
+
+    @property
+    def saldo_final(self):
+        return self.saldo_inicial + self.resumen['total_cargos'] - self.resumen['total_abonos']
+
+
+def movimientos_por_cliente(cliente_ids, desde=None, hasta=None):
+    """
+    Estados de cuenta de varios clientes con dos consultas en total.
+
+    Devuelve {cliente_id: {'saldo_inicial', 'saldo_final', 'movimientos'}}.
+    Se usa en la generación masiva de estados de cuenta.
+    """
+    resultado = {
+        cliente_id: {'saldo_inicial': None, 'saldo_final': None, 'movimientos': []}
+        for cliente_id in cliente_ids
+    }
+    if not cliente_ids:
+        return resultado
+    sql, params = consulta_movimientos(cliente_ids, desde, hasta)
+    with connection.cursor() as cursor:
+        cursor.execute(f'{sql} ORDER BY cliente_id, fecha, orden, id', params)
+        for fila in cursor.fetchall():
+            movimiento = _fila_a_movimiento(fila)
+            estado = resultado[movimiento['cliente_id']]
+            if estado['saldo_inicial'] is None:
+                estado['saldo_inicial'] = movimiento['saldo_inicial']
+            estado['movimientos'].append(movimiento)
+            estado['saldo_final'] = movimiento['saldo']
+
+    sin_movimientos = [cid for cid, estado in resultado.items() if estado['saldo_inicial'] is None]
+    if sin_movimientos:
+        previos = saldos_previos(sin_movimientos, desde)
+        for cliente_id in sin_movimientos:
+            resultado[cliente_id]['saldo_inicial'] = previos[cliente_id]
+            resultado[cliente_id]['saldo_final'] = previos[cliente_id]
+    return resultado
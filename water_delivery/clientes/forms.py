@@ -7,9 +7,12 @@
 from django import forms
 from django.core.exceptions import ValidationError
 from decimal import Decimal
+import logging
 import re
 from .models import Cliente, Pago
 
+logger = logging.getLogger(__name__)
+
 class ClienteForm(forms.ModelForm):
     """
     Formulario personalizado para crear y editar clientes.
@@ -177,23 +180,20 @@ class ClienteForm(forms.ModelForm):
         """
         precio = self.cleaned_data.get('precio_botellon')
         
-        # Log para depuración
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.info(f"[DEBUG] clean_precio_botellon - precio original: {precio} (tipo: {type(precio)})")
+        logger.debug("clean_precio_botellon - precio original: %r", precio)
         
         # Si el precio es None o vacío, usar el valor por defecto
         if precio is None or precio == '':
             precio = Decimal('2.50')
-            logger.info(f"[DEBUG] Precio vacío, usando valor por defecto: {precio}")
+            logger.debug("Precio vacío, usando valor por defecto: %s", precio)
         
         # Convertir a Decimal si es necesario
         if not isinstance(precio, Decimal):
             try:
                 precio = Decimal(str(precio))
-                logger.info(f"[DEBUG] Precio convertido a Decimal: {precio}")
+                logger.debug("Precio convertido a Decimal: %s", precio)
             except (ValueError, TypeError) as e:
-                logger.error(f"[DEBUG] Error convirtiendo precio: {e}")
+                logger.warning("Error convirtiendo precio %r: %s", precio, e)
                 raise ValidationError('El precio debe ser un número válido.')
         
         # Validar que el precio sea positivo
@@ -273,10 +273,7 @@ class ClienteEditForm(ClienteForm):
         """
         cleaned_data = super().clean()
         
-        # Log para depuración
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.info(f"[DEBUG] clean() - datos limpios: {cleaned_data}")
+        logger.debug("clean() - datos limpios: %s", cleaned_data)
         
         # Asegurarse de que el precio_botellon sea un número válido
         precio_botellon = cleaned_data.get('precio_botellon')
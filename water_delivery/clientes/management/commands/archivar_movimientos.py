@@ -0,0 +1,36 @@
+# =============================================
+# COMANDO PARA ARCHIVAR MOVIMIENTOS DE PERÍODOS CERRADOS
+# =============================================
+# Mueve los despachos entregados o cancelados y los pagos anteriores al corte
+# a las tablas de archivo y deja lo que suman en el SaldoInicial de cada
+# cliente (ver clientes/archivo.py). El corte es el primer día del mes de hace
+# --meses meses. Pensado para ejecutarse una vez al mes, fuera de horario:
+#
+#   python manage.py archivar_movimientos --meses 12
+
+from django.core.management.base import BaseCommand, CommandError
+
+from clientes.archivo import MESES_MINIMOS, MESES_POR_DEFECTO, TAMANO_LOTE, archivar, corte_de_archivo
+
+
+class Command(BaseCommand):
+    help = 'Archiva los despachos cerrados y los pagos de períodos anteriores a --meses meses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses', type=int, default=MESES_POR_DEFECTO,
+                            help='Meses de movimientos que se quedan en las tablas activas')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE,
+                            help='Filas movidas en cada transacción')
+
+    def handle(self, *args, **options):
+        if options['meses'] < MESES_MINIMOS:
+            raise CommandError(f'--meses debe ser al menos {MESES_MINIMOS}')
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser al menos 1')
+
+        corte = corte_de_archivo(options['meses'])
+        resumen = archivar(corte, lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {resumen['despachos']} despachos y {resumen['pagos']} pagos anteriores al "
+            f"{corte.strftime('%d/%m/%Y')} archivados"
+        ))
@@ -0,0 +1,130 @@
+# =============================================
+# COMANDO DE ARRANQUE IDEMPOTENTE (FASE RELEASE)
+# =============================================
+# Sustituye a `migrate && createcachetable && collectstatic` en cada arranque:
+# solo migra si el plan tiene migraciones, solo crea la tabla de caché si falta
+# y solo recolecta estáticos si su huella cambió (ver water_delivery/arranque.py).
+# En PostgreSQL crea además las particiones mensuales de los próximos meses
+# que falten (ver water_delivery/particiones.py).
+# Sin cambios tarda lo que tarda cargar Django, así que puede ir también antes
+# de gunicorn en plataformas sin fase release.
+#
+# En Heroku y Railway lo que escribe la fase release (o el arranque de web) se
+# pierde: los estáticos y su huella tienen que quedar en la imagen. Por eso se
+# recolectan al construir, con --solo-estaticos (no toca la base de datos), y
+# release y web van con --sin-estaticos:
+#
+#   build (bin/post_compile, railway.json): python manage.py arranque --solo-estaticos
+#   release: python manage.py arranque --sin-estaticos
+#   web: python manage.py arranque --sin-estaticos && gunicorn water_delivery.wsgi:application
+#
+# Con --comprobar no cambia nada: termina con error si queda trabajo pendiente.
+
+import time
+from contextlib import contextmanager
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from water_delivery import arranque, particiones
+
+# Clave del bloqueo consultivo de PostgreSQL que evita que dos réplicas migren a la vez
+CLAVE_BLOQUEO = 0x61677561
+
+
+@contextmanager
+def bloqueo_despliegue():
+    connection = connections[DEFAULT_DB_ALIAS]
+    if connection.vendor != 'postgresql':
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_lock(%s)', [CLAVE_BLOQUEO])
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_unlock(%s)', [CLAVE_BLOQUEO])
+
+
+class Command(BaseCommand):
+    help = 'Migra, crea la tabla de caché y recolecta estáticos solo si hay cambios'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--comprobar', action='store_true',
+                            help='No cambiar nada; error si hay migraciones o estáticos pendientes')
+        alcance = parser.add_mutually_exclusive_group()
+        alcance.add_argument('--sin-estaticos', action='store_true',
+                             help='No revisar los estáticos (p. ej. ya recolectados en la imagen)')
+        alcance.add_argument('--solo-estaticos', action='store_true',
+                             help='Solo los estáticos, sin base de datos (paso de construcción de la imagen)')
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        pendiente = []
+
+        if not options['solo_estaticos']:
+            pendiente += self._base_de_datos(options['comprobar'])
+
+        if options['sin_estaticos']:
+            # Deben venir en la imagen: sin ellos whitenoise no encuentra el manifiesto
+            if arranque.huella_recolectada() is None:
+                self.stdout.write(self.style.WARNING(
+                    '  estáticos: no están recolectados (falta `arranque --solo-estaticos` al construir)'
+                ))
+        else:
+            paso = time.monotonic()
+            huella = arranque.huella_estaticos()
+            if huella == arranque.huella_recolectada():
+                self._paso('estáticos', f'al día ({huella[:12]})', paso)
+            elif options['comprobar']:
+                pendiente.append('estáticos')
+            else:
+                call_command('collectstatic', interactive=False, verbosity=0)
+                arranque.guardar_huella(huella)
+                self._paso('estáticos', f'recolectados ({huella[:12]})', paso)
+
+        if pendiente:
+            raise CommandError('Pendiente: ' + '; '.join(pendiente))
+        self.stdout.write(self.style.SUCCESS(f'✓ Arranque listo en {time.monotonic() - inicio:.2f}s'))
+
+    def _base_de_datos(self, comprobar):
+        """Migraciones, tabla de caché y particiones; devuelve lo pendiente si `comprobar`."""
+        pendiente = []
+        with bloqueo_despliegue():
+            paso = time.monotonic()
+            migraciones = arranque.migraciones_pendientes()
+            if not migraciones:
+                self._paso('migraciones', 'al día', paso)
+            elif comprobar:
+                pendiente.append(f'{len(migraciones)} migraciones ({", ".join(migraciones[:5])})')
+            else:
+                call_command('migrate', interactive=False, verbosity=0)
+                self._paso('migraciones', f'aplicadas {len(migraciones)}', paso)
+
+            paso = time.monotonic()
+            tablas = arranque.tablas_cache_pendientes()
+            if not tablas:
+                self._paso('tabla de caché', 'al día', paso)
+            elif comprobar:
+                pendiente.append(f'tablas de caché ({", ".join(tablas)})')
+            else:
+                call_command('createcachetable', verbosity=0)
+                self._paso('tabla de caché', f'creada {", ".join(tablas)}', paso)
+
+            paso = time.monotonic()
+            faltan = particiones.particiones_pendientes()
+            if not particiones.particionado():
+                self._paso('particiones', 'no aplica', paso)
+            elif not faltan:
+                self._paso('particiones', 'al día', paso)
+            elif comprobar:
+                pendiente.append(f'{len(faltan)} particiones')
+            else:
+                creadas = particiones.asegurar_particiones()
+                self._paso('particiones', f'creadas {", ".join(creadas)}', paso)
+        return pendiente
+
+    def _paso(self, nombre, estado, inicio):
+        self.stdout.write(f'  {nombre}: {estado} ({(time.monotonic() - inicio) * 1000:.0f} ms)')
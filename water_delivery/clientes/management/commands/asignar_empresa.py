@@ -0,0 +1,80 @@
+# =============================================
+# COMANDO PARA ASIGNAR DATOS SIN EMPRESA A UNA EMPRESA
+# =============================================
+# Las filas anteriores a las empresas quedan sin empresa (ámbito None, ver
+# water_delivery/empresas.py) cuando la migración 0013 encontró varios
+# usuarios empresa y no pudo adivinar de quién eran. Este comando se las
+# asigna a una empresa: los clientes indicados (o todos los que no tienen
+# empresa) con sus despachos, pagos, saldos iniciales y archivo, y los
+# conductores indicados.
+#
+#   python manage.py asignar_empresa --empresa distribuidora_norte
+#   python manage.py asignar_empresa --empresa distribuidora_sur --clientes 12 15 --conductores pedro
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from clientes.models import Cliente, Despacho, DespachoArchivado, Pago, PagoArchivado, SaldoInicial
+from usuarios.backends import invalidar_usuario
+from usuarios.models import Usuario
+from water_delivery.cache import etiqueta_modelo, invalidar_etiquetas
+
+# Modelos que siguen a la empresa de su cliente
+MODELOS_DEL_CLIENTE = {
+    'despachos': Despacho,
+    'pagos': Pago,
+    'saldos iniciales': SaldoInicial,
+    'despachos archivados': DespachoArchivado,
+    'pagos archivados': PagoArchivado,
+}
+
+
+class Command(BaseCommand):
+    help = 'Asigna a una empresa los clientes (con sus movimientos) y conductores que no tienen empresa'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', required=True, help='Usuario de la empresa principal')
+        parser.add_argument('--clientes', type=int, nargs='+',
+                            help='Ids de los clientes a asignar (por defecto todos los que no tienen empresa)')
+        parser.add_argument('--conductores', nargs='+', default=[],
+                            help='Usuarios de los conductores sin empresa a asignar')
+
+    def handle(self, *args, **options):
+        empresa = Usuario.objects.filter(
+            username=options['empresa'], tipo_usuario=Usuario.EMPRESA, empresa__isnull=True,
+        ).first()
+        if empresa is None:
+            raise CommandError(f"No hay una empresa principal con el usuario {options['empresa']!r}")
+
+        clientes = Cliente.todos.filter(empresa__isnull=True)
+        if options['clientes']:
+            clientes = clientes.filter(pk__in=options['clientes'])
+        conductores = Usuario.objects.filter(
+            username__in=options['conductores'], tipo_usuario=Usuario.CONDUCTOR, empresa__isnull=True,
+        )
+        faltan = set(options['conductores']) - set(conductores.values_list('username', flat=True))
+        if faltan:
+            raise CommandError(f"Conductores inexistentes o que ya tienen empresa: {', '.join(sorted(faltan))}")
+
+        with transaction.atomic():
+            ids = list(clientes.select_for_update().values_list('pk', flat=True))
+            movimientos = {
+                nombre: modelo.todos.filter(cliente_id__in=ids, empresa__isnull=True).update(empresa=empresa)
+                for nombre, modelo in MODELOS_DEL_CLIENTE.items()
+            }
+            Cliente.todos.filter(pk__in=ids).update(empresa=empresa)
+            ids_conductores = list(conductores.values_list('pk', flat=True))
+            Usuario.objects.filter(pk__in=ids_conductores).update(empresa=empresa)
+
+        # update() no envía señales: las cachés se invalidan aquí
+        invalidar_etiquetas(*(etiqueta_modelo(modelo) for modelo in [Cliente, *MODELOS_DEL_CLIENTE.values()]))
+        for conductor_id in ids_conductores:
+            invalidar_usuario(conductor_id)
+
+        detalle = ', '.join(f'{cantidad} {nombre}' for nombre, cantidad in movimientos.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {len(ids)} clientes ({detalle}) y {len(ids_conductores)} conductores asignados a {empresa.username}'
+        ))
+        restantes = Cliente.todos.filter(empresa__isnull=True).count()
+        if restantes:
+            self.stdout.write(self.style.WARNING(f'Quedan {restantes} clientes sin empresa'))
@@ -0,0 +1,147 @@
+# =============================================
+# COMANDO PARA RESUMIR EL REGISTRO DE CONSULTAS LENTAS
+# =============================================
+# Lee el archivo de CONSULTAS_LENTAS (ver water_delivery/consultas_lentas.py),
+# agrupa por huella y muestra las consultas que más tiempo total consumieron,
+# con las vistas que las originan. Con --explain obtiene además el plan de
+# ejecución de la muestra más lenta de cada una (solo SELECT, sin ejecutarla).
+#
+# Uso: python manage.py consultas_lentas --top 10 --explain
+
+import json
+from collections import Counter
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+LARGO_SQL_MOSTRADO = 300
+
+
+def leer_registros(archivo, desde=None, vista=None):
+    """Registros del archivo, opcionalmente desde una fecha y para una vista."""
+    try:
+        with open(archivo, encoding='utf-8') as origen:
+            for linea in origen:
+                try:
+                    registro = json.loads(linea)
+                except ValueError:
+                    # Línea cortada (p. ej. el proceso murió escribiendo)
+                    continue
+                if desde and datetime.fromisoformat(registro['fecha']) < desde:
+                    continue
+                if vista and registro.get('vista') != vista:
+                    continue
+                yield registro
+    except FileNotFoundError:
+        raise CommandError(f'No existe el archivo {archivo}: ¿está activo CONSULTAS_LENTAS?')
+
+
+def resumir(registros):
+    """
+    Una entrada por huella, ordenadas por tiempo total estimado (cada muestra
+    pesa 1/muestreo). Guarda la muestra más lenta para el EXPLAIN.
+    """
+    grupos = {}
+    for registro in registros:
+        grupo = grupos.setdefault(registro['huella'], {
+            'huella': registro['huella'],
+            'sql_normalizado': registro['sql_normalizado'],
+            'muestras': 0,
+            'veces_estimadas': 0.0,
+            'total_ms': 0.0,
+            'max_ms': 0.0,
+            'vistas': Counter(),
+            'peor': None,
+        })
+        peso = 1 / (registro.get('muestreo') or 1.0)
+        grupo['muestras'] += 1
+        grupo['veces_estimadas'] += peso
+        grupo['total_ms'] += registro['duracion_ms'] * peso
+        grupo['vistas'][registro.get('vista')] += 1
+        if registro['duracion_ms'] >= grupo['max_ms']:
+            grupo['max_ms'] = registro['duracion_ms']
+            grupo['peor'] = registro
+    for grupo in grupos.values():
+        grupo['media_ms'] = grupo['total_ms'] / grupo['veces_estimadas']
+    return sorted(grupos.values(), key=lambda g: g['total_ms'], reverse=True)
+
+
+def plan_de_ejecucion(registro):
+    """EXPLAIN de la muestra (sin ANALYZE: la consulta no se ejecuta). Solo SELECT."""
+    sql = registro['sql'].lstrip()
+    if not sql.upper().startswith(('SELECT', 'WITH')):
+        return None, 'solo se explican consultas SELECT'
+    if registro.get('parametros') is None and '%s' in sql:
+        return None, 'el registro no guardó parámetros (PARAMETROS=False)'
+    connection = connections[registro.get('alias') or DEFAULT_DB_ALIAS]
+    prefijo = connection.ops.explain_query_prefix()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefijo} {sql}', registro.get('parametros') or ())
+            filas = cursor.fetchall()
+    except Exception as error:
+        return None, f'no se pudo obtener el plan: {error}'
+    # SQLite devuelve (id, padre, -, detalle); PostgreSQL una columna de texto
+    return [str(fila[-1]) for fila in filas], None
+
+
+class Command(BaseCommand):
+    help = 'Resume el registro de consultas lentas por huella, con EXPLAIN opcional'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--archivo', help='Archivo JSONL (por defecto CONSULTAS_LENTAS["ARCHIVO"])')
+        parser.add_argument('--top', type=int, default=10, help='Cantidad de huellas a mostrar')
+        parser.add_argument('--desde', help='Solo registros desde esta fecha (AAAA-MM-DD)')
+        parser.add_argument('--vista', help='Solo consultas originadas en esta vista (p. ej. clientes:dashboard)')
+        parser.add_argument('--explain', action='store_true',
+                            help='Incluir el plan de ejecución de la muestra más lenta de cada huella')
+        parser.add_argument('--json', action='store_true', help='Salida en JSON')
+
+    def handle(self, *args, **options):
+        archivo = options['archivo'] or getattr(settings, 'CONSULTAS_LENTAS', {}).get('ARCHIVO')
+        if not archivo:
+            raise CommandError('Indique --archivo o configure CONSULTAS_LENTAS["ARCHIVO"].')
+        desde = None
+        if options['desde']:
+            try:
+                desde = timezone.make_aware(datetime.strptime(options['desde'], '%Y-%m-%d'))
+            except ValueError:
+                raise CommandError('--desde debe tener el formato AAAA-MM-DD')
+
+        grupos = resumir(leer_registros(archivo, desde, options['vista']))[:options['top']]
+        if options['explain']:
+            for grupo in grupos:
+                grupo['plan'], grupo['sin_plan'] = plan_de_ejecucion(grupo['peor'])
+
+        if options['json']:
+            for grupo in grupos:
+                grupo['vistas'] = dict(grupo['vistas'])
+            self.stdout.write(json.dumps(grupos, ensure_ascii=False, indent=2))
+            return
+
+        if not grupos:
+            self.stdout.write('No hay consultas lentas registradas.')
+            return
+        self.stdout.write(f'Consultas con más tiempo total ({archivo}):')
+        for posicion, grupo in enumerate(grupos, 1):
+            self.stdout.write(
+                f'\n{posicion:2d}. {grupo["huella"]}  total {grupo["total_ms"]:.1f} ms  '
+                f'({grupo["veces_estimadas"]:.0f} veces, media {grupo["media_ms"]:.1f} ms, '
+                f'máx {grupo["max_ms"]:.1f} ms, {grupo["muestras"]} muestras)'
+            )
+            vistas = ', '.join(f'{vista} ({n})' for vista, n in grupo['vistas'].most_common(5))
+            self.stdout.write(f'    vistas: {vistas}')
+            sql = grupo['sql_normalizado']
+            if len(sql) > LARGO_SQL_MOSTRADO:
+                sql = sql[:LARGO_SQL_MOSTRADO] + '…'
+            self.stdout.write(f'    {sql}')
+            if options['explain']:
+                if grupo['plan'] is None:
+                    self.stdout.write(f'    (sin plan: {grupo["sin_plan"]})')
+                else:
+                    self.stdout.write('    plan:')
+                    for linea in grupo['plan']:
+                        self.stdout.write(f'      {linea}')
@@ -0,0 +1,210 @@
+# =============================================
+# COMANDO PARA GENERAR LOS ESTADOS DE CUENTA MENSUALES
+# =============================================
+# Genera un archivo HTML con el estado de cuenta del mes para cada cliente
+# activo, más un índice con el resumen de todos. El trabajo se reparte en
+# lotes de clientes entre varios procesos; cada lote obtiene sus despachos y
+# pagos con un par de consultas en bloque (ver clientes/estado_cuenta.py).
+#
+# Es reanudable: cada cliente terminado se anota en `progreso.jsonl` dentro
+# del directorio destino, y una nueva ejecución solo procesa los pendientes.
+#
+# Uso: python manage.py generar_estados_cuenta --mes 2025-01 --destino /ruta/salida
+
+import calendar
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from clientes.estado_cuenta import movimientos_por_cliente
+from clientes.models import Cliente
+
+ARCHIVO_PROGRESO = 'progreso.jsonl'
+ARCHIVO_INDICE = 'index.html'
+
+
+def _nombre_archivo(cliente_id):
+    return f'cliente_{cliente_id:06d}.html'
+
+
+def _escribir_atomico(ruta, contenido):
+    """Escribe en un temporal y renombra, para no dejar archivos a medias."""
+    temporal = f'{ruta}.tmp'
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        archivo.write(contenido)
+    os.replace(temporal, ruta)
+
+
+def _inicializar_proceso():
+    """Prepara Django en cada proceso del pool (necesario con 'spawn')."""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def generar_lote(cliente_ids, desde, hasta, destino):
+    """
+    Genera los estados de cuenta de un lote de clientes.
+
+    Se ejecuta dentro de un proceso del pool. Usa tres consultas para todo el
+    lote (clientes, movimientos con saldo acumulado y saldos previos de los
+    clientes sin movimientos) y devuelve el resumen de cada cliente generado.
+    """
+    clientes = Cliente.objects.in_bulk(cliente_ids)
+    estados = movimientos_por_cliente(list(clientes), desde, hasta)
+    generado = timezone.localtime().strftime('%d/%m/%Y %H:%M')
+    resultados = []
+    for cliente_id, cliente in clientes.items():
+        estado = estados[cliente_id]
+        movimientos = estado['movimientos']
+        contenido = render_to_string('clientes/estado_cuenta_mensual.html', {
+            'cliente': cliente,
+            'desde': desde,
+            'hasta': hasta,
+            'saldo_inicial': estado['saldo_inicial'],
+            'saldo_final': estado['saldo_final'],
+            'total_cargos': sum((m['cargo'] for m in movimientos), Decimal('0.00')),
+            'total_abonos': sum((m['abono'] for m in movimientos), Decimal('0.00')),
+            'movimientos': movimientos,
+            'generado': generado,
+        })
+        archivo = _nombre_archivo(cliente_id)
+        _escribir_atomico(os.path.join(destino, archivo), contenido)
+        resultados.append({
+            'id': cliente_id,
+            'nombre': f'{cliente.nombre} {cliente.apellido}',
+            'movimientos': len(movimientos),
+            'saldo_inicial': str(estado['saldo_inicial']),
+            'saldo_final': str(estado['saldo_final']),
+            'archivo': archivo,
+            'mes': desde.strftime('%Y-%m'),
+        })
+    return resultados
+
+
+class Command(BaseCommand):
+    help = 'Genera los estados de cuenta mensuales (HTML) de todos los clientes activos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mes',
+            help='Mes a generar en formato AAAA-MM (por defecto, el mes anterior)'
+        )
+        parser.add_argument(
+            '--destino',
+            required=True,
+            help='Directorio donde se escriben los estados de cuenta y el índice'
+        )
+        parser.add_argument(
+            '--procesos',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Cantidad de procesos en paralelo (1 = sin pool)'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=200,
+            help='Clientes por lote de trabajo'
+        )
+        parser.add_argument(
+            '--reiniciar',
+            action='store_true',
+            help='Ignora el progreso guardado y regenera todos los estados de cuenta'
+        )
+
+    def _rango_mes(self, mes):
+        if mes:
+            try:
+                inicio = datetime.strptime(mes, '%Y-%m').date()
+            except ValueError:
+                raise CommandError('El mes debe tener el formato AAAA-MM.')
+        else:
+            hoy = timezone.localdate()
+            anio, numero = (hoy.year, hoy.month - 1) if hoy.month > 1 else (hoy.year - 1, 12)
+            inicio = date(anio, numero, 1)
+        fin = inicio.replace(day=calendar.monthrange(inicio.year, inicio.month)[1])
+        return inicio, fin
+
+    def _leer_progreso(self, ruta_progreso, destino, mes):
+        """Clientes ya generados para este mes en ejecuciones anteriores (con su archivo presente)."""
+        completados = {}
+        if not os.path.exists(ruta_progreso):
+            return completados
+        with open(ruta_progreso, encoding='utf-8') as archivo:
+            for linea in archivo:
+                try:
+                    registro = json.loads(linea)
+                except ValueError:
+                    continue  # Línea truncada por una interrupción
+                if registro.get('mes') != mes:
+                    continue
+                if os.path.exists(os.path.join(destino, registro['archivo'])):
+                    completados[registro['id']] = registro
+        return completados
+
+    def handle(self, *args, **options):
+        desde, hasta = self._rango_mes(options['mes'])
+        destino = os.path.abspath(options['destino'])
+        os.makedirs(destino, exist_ok=True)
+        ruta_progreso = os.path.join(destino, ARCHIVO_PROGRESO)
+        if options['reiniciar'] and os.path.exists(ruta_progreso):
+            os.remove(ruta_progreso)
+
+        completados = self._leer_progreso(ruta_progreso, destino, desde.strftime('%Y-%m'))
+        activos = list(Cliente.objects.filter(activo=True).order_by('pk').values_list('pk', flat=True))
+        pendientes = [pk for pk in activos if pk not in completados]
+        tamano = max(options['lote'], 1)
+        lotes = [pendientes[i:i + tamano] for i in range(0, len(pendientes), tamano)]
+
+        self.stdout.write(
+            f'Estados de cuenta {desde:%m/%Y}: {len(activos)} clientes activos, '
+            f'{len(completados)} ya generados, {len(pendientes)} pendientes en {len(lotes)} lotes.'
+        )
+
+        inicio = time.monotonic()
+        hechos = 0
+        with open(ruta_progreso, 'a', encoding='utf-8') as progreso:
+            def registrar(resultados):
+                nonlocal hechos
+                for resultado in resultados:
+                    progreso.write(json.dumps(resultado) + '\n')
+                    completados[resultado['id']] = resultado
+                progreso.flush()
+                hechos += len(resultados)
+                transcurrido = time.monotonic() - inicio
+                ritmo = hechos / transcurrido if transcurrido else 0
+                self.stdout.write(
+                    f'  [{hechos}/{len(pendientes)}] {hechos * 100 // max(len(pendientes), 1)}% '
+                    f'({ritmo:.0f} clientes/s)'
+                )
+
+            if options['procesos'] <= 1 or len(lotes) <= 1:
+                for lote in lotes:
+                    registrar(generar_lote(lote, desde, hasta, destino))
+            else:
+                # Las conexiones abiertas no deben heredarse a los procesos hijos
+                connections.close_all()
+                with ProcessPoolExecutor(max_workers=options['procesos'], initializer=_inicializar_proceso) as pool:
+                    futuros = [pool.submit(generar_lote, lote, desde, hasta, destino) for lote in lotes]
+                    for futuro in as_completed(futuros):
+                        registrar(futuro.result())
+
+        resumen = [completados[pk] for pk in activos if pk in completados]
+        _escribir_atomico(os.path.join(destino, ARCHIVO_INDICE), render_to_string(
+            'clientes/estados_cuenta_indice.html',
+            {'desde': desde, 'hasta': hasta, 'estados': resumen},
+        ))
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {len(resumen)} estados de cuenta en {destino} '
+            f'({time.monotonic() - inicio:.1f}s). Índice: {ARCHIVO_INDICE}'
+        ))
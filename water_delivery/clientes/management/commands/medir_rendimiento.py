@@ -0,0 +1,285 @@
+# =============================================
+# COMANDO PARA MEDIR EL RENDIMIENTO DE LAS VISTAS
+# =============================================
+# Crea una base de datos aparte (con el motor configurado, SQLite o PostgreSQL),
+# la llena con datos sintéticos en volumen (ver clientes/sintetico.py) y
+# recorre todas las URLs de las apps `clientes` y `usuarios` midiendo la
+# latencia (p50/p90/p99) y la cantidad de consultas de cada una.
+#
+# Cada petición corre dentro de una transacción que se deshace al terminar,
+# así las vistas que modifican datos (entregar, eliminar, ...) no alteran la
+# medición siguiente. El resultado se guarda en JSON para comparar commits:
+#
+#   python manage.py medir_rendimiento --salida antes.json --mantener
+#   (cambios)
+#   python manage.py medir_rendimiento --salida despues.json --mantener --comparar antes.json
+
+import json
+import logging
+import os
+import platform
+import subprocess
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLResolver, get_resolver, reverse
+from django.utils import timezone
+
+from clientes import sintetico
+from clientes.models import Despacho, Pago
+
+APPS_MEDIDAS = ('clientes', 'usuarios')
+# URLs que cierran la sesión: tras cada petición se vuelve a iniciar
+CIERRAN_SESION = {'usuarios:logout'}
+PERCENTILES = (50, 90, 99)
+
+
+def percentil(valores_ordenados, p):
+    """Percentil por rango más cercano de una lista ya ordenada."""
+    if not valores_ordenados:
+        return None
+    indice = max(int(round(p / 100 * len(valores_ordenados) + 0.5)) - 1, 0)
+    return valores_ordenados[min(indice, len(valores_ordenados) - 1)]
+
+
+def rutas_medidas(apps=APPS_MEDIDAS):
+    """(nombre completo, ruta, parámetros) de cada URL con nombre de las apps indicadas."""
+    for patron in get_resolver().url_patterns:
+        if not isinstance(patron, URLResolver) or patron.namespace not in apps:
+            continue
+        for ruta in patron.url_patterns:
+            if getattr(ruta, 'name', None):
+                yield f'{patron.namespace}:{ruta.name}', str(ruta.pattern), list(ruta.pattern.converters)
+
+
+def muestras_para_rutas():
+    """
+    Ids reales para completar las URLs: el cliente con más despachos (el peor
+    caso de historial y estado de cuenta) y su último despacho y pago.
+    """
+    mayor = (Despacho.objects.values('cliente').annotate(n=Count('pk')).order_by('-n').first())
+    if mayor is None:
+        raise CommandError('No hay despachos: la base de datos de medición está vacía.')
+    cliente_id = mayor['cliente']
+    despacho = Despacho.objects.filter(cliente_id=cliente_id).order_by('-fecha').first()
+    pago = Pago.objects.filter(cliente_id=cliente_id).order_by('-fecha').first() or Pago.objects.first()
+    return {'cliente': cliente_id, 'despacho': despacho.pk, 'pago': pago.pk if pago else 0}
+
+
+def argumentos_ruta(ruta, parametros, muestras):
+    """Valores para los parámetros de una ruta según el modelo al que se refieren."""
+    kwargs = {}
+    for parametro in parametros:
+        if parametro == 'despacho_id' or (parametro == 'pk' and ruta.startswith('despacho/')):
+            kwargs[parametro] = muestras['despacho']
+        elif parametro == 'pago_id':
+            kwargs[parametro] = muestras['pago']
+        elif parametro == 'token':
+            kwargs[parametro] = 'token-invalido'
+        else:
+            kwargs[parametro] = muestras['cliente']
+    return kwargs
+
+
+def resumen_tiempos(tiempos, consultas):
+    ordenados = sorted(tiempos)
+    resumen = {f'p{p}_ms': round(percentil(ordenados, p) * 1000, 2) for p in PERCENTILES}
+    resumen.update({
+        'media_ms': round(sum(ordenados) / len(ordenados) * 1000, 2),
+        'max_ms': round(ordenados[-1] * 1000, 2),
+        'consultas': max(consultas),
+    })
+    return resumen
+
+
+class Command(BaseCommand):
+    help = 'Mide latencia y consultas de todas las URLs de clientes y usuarios con datos en volumen'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=10_000, help='Clientes a generar')
+        parser.add_argument('--despachos', type=int, default=1_000_000, help='Despachos a generar')
+        parser.add_argument('--pagos', type=int, help='Pagos a generar (por defecto, despachos / 4)')
+        parser.add_argument('--ubicaciones', type=int, default=5_000_000, help='Posiciones GPS a generar')
+        parser.add_argument('--semilla', type=int, default=1, help='Semilla de los datos sintéticos')
+        parser.add_argument('--repeticiones', type=int, default=20, help='Peticiones medidas por URL')
+        parser.add_argument('--calentamiento', type=int, default=2, help='Peticiones previas sin medir por URL')
+        parser.add_argument('--usuario', choices=['empresa', 'conductor'], default='empresa',
+                            help='Tipo de usuario con el que se hacen las peticiones')
+        parser.add_argument('--solo', nargs='*', default=None,
+                            help='Medir solo estas URLs (p. ej. clientes:dashboard)')
+        parser.add_argument('--salida', help='Archivo JSON donde guardar los resultados')
+        parser.add_argument('--comparar', help='JSON de una medición anterior para mostrar las diferencias')
+        parser.add_argument('--umbral', type=float, default=20.0,
+                            help='Porcentaje de aumento del p50 que se marca como regresión')
+        parser.add_argument('--base', default='benchmark_water_delivery',
+                            help='Nombre de la base de datos de medición (archivo en BASE_DIR con SQLite)')
+        parser.add_argument('--mantener', action='store_true',
+                            help='Conserva la base de medición y sus datos para la próxima ejecución')
+        parser.add_argument('--base-actual', action='store_true',
+                            help='Usa la base configurada en lugar de una aparte (solo si es desechable, p. ej. en tests)')
+
+    def handle(self, *args, **options):
+        if options['base_actual']:
+            return self._medir_y_reportar(options)
+
+        nombre_original = connection.settings_dict['NAME']
+        nombre = options['base']
+        if connection.vendor == 'sqlite':
+            nombre = os.path.join(settings.BASE_DIR, f'{nombre}.sqlite3')
+        connection.settings_dict['TEST']['NAME'] = nombre
+        self.stdout.write(f'Base de medición: {nombre} ({connection.vendor})')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['mantener'])
+        try:
+            self._medir_y_reportar(options)
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0, keepdb=options['mantener'])
+
+    def _medir_y_reportar(self, options):
+        volumenes = self._preparar_datos(options)
+        # El cliente de pruebas usa el host 'testserver'; ningún correo sale del proceso
+        # Los 4xx esperados (p. ej. APIs de conductor pedidas como empresa) no se registran
+        registro = logging.getLogger('django.request')
+        nivel_original = registro.level
+        registro.setLevel(logging.ERROR)
+        try:
+            with override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+            ):
+                resultados = self._medir(options)
+        finally:
+            registro.setLevel(nivel_original)
+
+        informe = {
+            'meta': {
+                'fecha': timezone.now().isoformat(),
+                'commit': self._commit_actual(),
+                'motor': connection.vendor,
+                'python': platform.python_version(),
+                'usuario': options['usuario'],
+                'repeticiones': options['repeticiones'],
+                'volumenes': volumenes,
+            },
+            'resultados': resultados,
+        }
+        self._imprimir(resultados)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump(informe, archivo, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f'✓ Resultados guardados en {options["salida"]}'))
+        if options['comparar']:
+            self._comparar(resultados, options['comparar'], options['umbral'])
+        return None
+
+    def _preparar_datos(self, options):
+        actuales = sintetico.volumenes_actuales()
+        if actuales['clientes']:
+            self.stdout.write(f'Reutilizando datos existentes: {actuales}')
+            return actuales
+        self.stdout.write('Generando datos sintéticos...')
+        inicio = time.monotonic()
+        volumenes = sintetico.sembrar(
+            clientes=options['clientes'],
+            despachos=options['despachos'],
+            pagos=options['pagos'],
+            ubicaciones=options['ubicaciones'],
+            semilla=options['semilla'],
+            progreso=lambda texto: self.stdout.write(f'  {texto}'),
+        )
+        self.stdout.write(f'Datos generados en {time.monotonic() - inicio:.0f}s')
+        return volumenes
+
+    def _medir(self, options):
+        empresa, conductores = sintetico.usuarios_sinteticos()
+        usuario = empresa if options['usuario'] == 'empresa' else conductores[0]
+        # Una vista que falla se registra con estado 500 en lugar de detener la medición
+        client = Client(raise_request_exception=False)
+        client.force_login(usuario)
+        muestras = muestras_para_rutas()
+        cache.clear()
+
+        resultados = []
+        for nombre, ruta, parametros in rutas_medidas():
+            if options['solo'] and nombre not in options['solo']:
+                continue
+            url = reverse(nombre, kwargs=argumentos_ruta(ruta, parametros, muestras))
+            metodo = 'GET'
+            tiempos, consultas, estados = [], [], set()
+            for intento in range(options['calentamiento'] + options['repeticiones']):
+                # Cada petición se deshace para que las vistas que escriben no alteren los datos
+                with transaction.atomic():
+                    with CaptureQueriesContext(connection) as capturadas:
+                        inicio = time.perf_counter()
+                        respuesta = client.get(url) if metodo == 'GET' else client.post(url)
+                        transcurrido = time.perf_counter() - inicio
+                    transaction.set_rollback(True)
+                if respuesta.status_code == 405 and metodo == 'GET':
+                    metodo = 'POST'  # Vista que solo acepta POST: se mide con POST desde el inicio
+                    tiempos, consultas, estados = [], [], set()
+                    continue
+                if nombre in CIERRAN_SESION:
+                    client.force_login(usuario)
+                if intento >= options['calentamiento']:
+                    tiempos.append(transcurrido)
+                    consultas.append(len(capturadas))
+                    estados.add(respuesta.status_code)
+            if not tiempos:
+                continue
+            resultados.append({
+                'nombre': nombre,
+                'url': url,
+                'metodo': metodo,
+                'estados': sorted(estados),
+                'peticiones': len(tiempos),
+                **resumen_tiempos(tiempos, consultas),
+            })
+        return resultados
+
+    def _commit_actual(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                cwd=settings.BASE_DIR, timeout=5,
+            ).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    def _imprimir(self, resultados):
+        self.stdout.write(f'\n{"URL":<40} {"método":<6} {"estado":<8} {"p50":>9} {"p90":>9} {"p99":>9} {"consultas":>9}')
+        for r in sorted(resultados, key=lambda r: r['p50_ms'], reverse=True):
+            estados = ','.join(str(e) for e in r['estados'])
+            self.stdout.write(
+                f'{r["nombre"]:<40} {r["metodo"]:<6} {estados:<8} {r["p50_ms"]:>7.1f}ms '
+                f'{r["p90_ms"]:>7.1f}ms {r["p99_ms"]:>7.1f}ms {r["consultas"]:>9}'
+            )
+
+    def _comparar(self, resultados, ruta_anterior, umbral):
+        try:
+            with open(ruta_anterior, encoding='utf-8') as archivo:
+                anteriores = {r['nombre']: r for r in json.load(archivo)['resultados']}
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f'No se pudo leer {ruta_anterior}: {error}')
+
+        self.stdout.write(f'\nComparación con {ruta_anterior}:')
+        regresiones = 0
+        for r in resultados:
+            antes = anteriores.get(r['nombre'])
+            if not antes:
+                continue
+            variacion = (r['p50_ms'] - antes['p50_ms']) / antes['p50_ms'] * 100 if antes['p50_ms'] else 0
+            mas_consultas = r['consultas'] - antes['consultas']
+            regresion = variacion > umbral or mas_consultas > 0
+            regresiones += regresion
+            linea = (f'{r["nombre"]:<40} p50 {antes["p50_ms"]:.1f} → {r["p50_ms"]:.1f}ms ({variacion:+.0f}%), '
+                     f'consultas {antes["consultas"]} → {r["consultas"]}')
+            self.stdout.write(self.style.ERROR(linea) if regresion else linea)
+        if regresiones:
+            self.stdout.write(self.style.WARNING(f'{regresiones} URL(s) con regresión'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Sin regresiones'))
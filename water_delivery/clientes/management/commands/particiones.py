@@ -0,0 +1,44 @@
+# =============================================
+# COMANDO DE MANTENIMIENTO DE PARTICIONES MENSUALES
+# =============================================
+# Crea las particiones de Despacho y UbicacionCamion de los próximos meses,
+# reparte en particiones propias las filas que cayeron en la partición por
+# defecto y suelta las vencidas (ver water_delivery/particiones.py). Pensado
+# para ejecutarse una vez al día, después de `archivar_movimientos`:
+#
+#   python manage.py particiones
+#
+# Con --sin-soltar solo crea. En SQLite no hace nada.
+
+from django.core.management.base import BaseCommand, CommandError
+
+from water_delivery.particiones import asegurar_particiones, meses_adelante, particionado, soltar_vencidas
+
+
+class Command(BaseCommand):
+    help = 'Crea las particiones mensuales de los próximos meses y suelta las vencidas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses', type=int, default=None,
+                            help='Meses futuros con partición (por defecto PARTICIONES["MESES_ADELANTE"])')
+        parser.add_argument('--sin-soltar', action='store_true',
+                            help='No soltar las particiones vencidas')
+
+    def handle(self, *args, **options):
+        meses = meses_adelante() if options['meses'] is None else options['meses']
+        if meses < 1:
+            raise CommandError('--meses debe ser al menos 1')
+        if not particionado():
+            self.stdout.write('  La base de datos no es PostgreSQL: las tablas no están particionadas')
+            return
+
+        creadas = asegurar_particiones(meses, repartir_defecto=True)
+        self.stdout.write(f"  creadas: {', '.join(creadas) or 'ninguna'}")
+        if not options['sin_soltar']:
+            soltadas, conservadas = soltar_vencidas()
+            self.stdout.write(f"  soltadas: {', '.join(soltadas) or 'ninguna'}")
+            if conservadas:
+                self.stdout.write(self.style.WARNING(
+                    f"  vencidas con filas sin archivar: {', '.join(conservadas)} (ver archivar_movimientos)"
+                ))
+        self.stdout.write(self.style.SUCCESS('✓ Particiones al día'))
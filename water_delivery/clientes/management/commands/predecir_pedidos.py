@@ -0,0 +1,40 @@
+# =============================================
+# COMANDO PARA PREDECIR EL PRÓXIMO PEDIDO DE CADA CLIENTE
+# =============================================
+# Recalcula la tabla PrediccionPedido con el historial de despachos del último
+# año (ver clientes/prediccion.py). Pensado para ejecutarse una vez al día,
+# por ejemplo de madrugada desde cron o el programador de la plataforma:
+#
+#   python manage.py predecir_pedidos
+
+from django.core.management.base import BaseCommand, CommandError
+
+from clientes.prediccion import MIN_PEDIDOS, VIDA_MEDIA, Z_BANDA, predecir_pedidos
+
+
+class Command(BaseCommand):
+    help = 'Calcula la fecha prevista del próximo pedido de cada cliente activo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vida-media', type=float, default=VIDA_MEDIA,
+                            help='Pedidos tras los cuales un intervalo pesa la mitad')
+        parser.add_argument('--min-pedidos', type=int, default=MIN_PEDIDOS,
+                            help='Días con despacho necesarios para predecir')
+        parser.add_argument('--z', type=float, default=Z_BANDA,
+                            help='Ancho de la banda de confianza en desviaciones')
+
+    def handle(self, *args, **options):
+        if options['vida_media'] <= 0:
+            raise CommandError('--vida-media debe ser mayor que 0')
+        if options['min_pedidos'] < 2:
+            raise CommandError('--min-pedidos debe ser al menos 2')
+
+        resumen = predecir_pedidos(
+            vida_media=options['vida_media'], min_pedidos=options['min_pedidos'], z=options['z'],
+        )
+        self.stdout.write(
+            f"  historial: {resumen['dias_con_pedido']} días con pedido ({resumen['segundos_carga'] * 1000:.0f} ms)\n"
+            f"  cálculo: {resumen['segundos_calculo'] * 1000:.0f} ms\n"
+            f"  guardado: {resumen['segundos_guardado'] * 1000:.0f} ms"
+        )
+        self.stdout.write(self.style.SUCCESS(f"✓ {resumen['predicciones']} predicciones guardadas"))
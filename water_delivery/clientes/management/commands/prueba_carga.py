@@ -0,0 +1,142 @@
+# =============================================
+# COMANDO DE PRUEBA DE CARGA CONTRA UN SERVIDOR LOCAL
+# =============================================
+# Simula conductores y despachadores concurrentes (ver clientes/carga.py)
+# contra un servidor ya levantado y muestra, por URL, el rendimiento
+# (peticiones/s) y la latencia p50/p90/p99. Sirve para saber cuántos camiones
+# y despachadores aguanta un servidor con una configuración dada.
+#
+# Necesita los usuarios de los datos sintéticos en la misma base de datos que
+# usa el servidor:
+#
+#   python manage.py sembrar_datos --clientes 5000 --despachos 200000 --conductores 50
+#   gunicorn water_delivery.wsgi:application --workers 4 --bind 127.0.0.1:8000 &
+#   python manage.py prueba_carga --conductores 200 --despachadores 10 --duracion 120
+
+import asyncio
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from clientes import sintetico
+from clientes.carga import ejecutar_carga
+from clientes.management.commands.medir_rendimiento import percentil
+from usuarios.models import Usuario
+
+RUTAS = (
+    'usuarios:login',
+    'clientes:api_clientes',
+    'clientes:api_guardar_ubicacion',
+    'clientes:api_crear_despacho',
+    'clientes:api_crear_cliente',
+    'clientes:api_despachos_hoy',
+    'clientes:api_resumen_header',
+    'clientes:ruta_camion',
+    'clientes:dashboard',
+    'clientes:lista_clientes',
+)
+
+
+def resumen_carga(estadisticas):
+    """Por URL: peticiones, errores (4xx, 5xx o sin respuesta), peticiones/s y percentiles."""
+    duracion = max((estadisticas.fin or 0) - (estadisticas.inicio or 0), 0.001)
+    filas = []
+    for nombre in sorted(set(estadisticas.latencias) | set(estadisticas.errores)):
+        latencias = sorted(estadisticas.latencias[nombre])
+        estados = estadisticas.estados[nombre]
+        errores = estadisticas.errores[nombre] + sum(
+            n for estado, n in estados.items() if isinstance(estado, int) and estado >= 400
+        )
+        total = len(latencias) + estadisticas.errores[nombre]
+        filas.append({
+            'nombre': nombre,
+            'peticiones': total,
+            'errores': errores,
+            'por_segundo': round(total / duracion, 2),
+            'p50_ms': percentil(latencias, 50),
+            'p90_ms': percentil(latencias, 90),
+            'p99_ms': percentil(latencias, 99),
+            'max_ms': latencias[-1] if latencias else None,
+            'estados': {str(estado): n for estado, n in estados.items()},
+        })
+    return {'duracion_s': round(duracion, 2), 'resultados': filas}
+
+
+class Command(BaseCommand):
+    help = 'Prueba de carga con conductores y despachadores simulados contra un servidor local'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Servidor a probar')
+        parser.add_argument('--conductores', type=int, default=50, help='Conductores simulados')
+        parser.add_argument('--despachadores', type=int, default=5, help='Despachadores simulados')
+        parser.add_argument('--duracion', type=float, default=60, help='Segundos de medición')
+        parser.add_argument('--calentamiento', type=float, default=5,
+                            help='Segundos iniciales sin medir (inicio de sesión, conexiones)')
+        parser.add_argument('--pausa-conductor', type=float, default=5.0,
+                            help='Segundos medios entre envíos de GPS de cada conductor')
+        parser.add_argument('--pausa-despachador', type=float, default=10.0,
+                            help='Segundos medios entre consultas de cada despachador')
+        parser.add_argument('--clave', default=sintetico.CLAVE_USUARIOS,
+                            help='Contraseña de los usuarios sintéticos')
+        parser.add_argument('--semilla', type=int, default=1)
+        parser.add_argument('--salida', help='Guardar los resultados en este archivo JSON')
+
+    def handle(self, *args, **options):
+        cuentas_conductor = list(Usuario.objects.filter(
+            username__startswith=f'{sintetico.PREFIJO}_conductor_', tipo_usuario=Usuario.CONDUCTOR,
+        ).order_by('username').values_list('username', flat=True))
+        empresa = f'{sintetico.PREFIJO}_empresa'
+        if not cuentas_conductor or not Usuario.objects.filter(username=empresa).exists():
+            raise CommandError('No hay usuarios sintéticos: ejecute antes `manage.py sembrar_datos`.')
+
+        # Varios usuarios virtuales pueden compartir cuenta: cada uno tiene su sesión
+        conductores = [
+            (cuentas_conductor[n % len(cuentas_conductor)], options['clave'])
+            for n in range(options['conductores'])
+        ]
+        despachadores = [(empresa, options['clave'])] * options['despachadores']
+        rutas = {nombre: reverse(nombre) for nombre in RUTAS}
+        rutas['clientes:api_marcar_entregado'] = reverse('clientes:api_marcar_entregado', args=[0])
+
+        estadisticas = asyncio.run(ejecutar_carga(
+            options['url'], rutas, conductores, despachadores,
+            duracion=options['duracion'],
+            calentamiento=options['calentamiento'],
+            pausa_conductor=options['pausa_conductor'],
+            pausa_despachador=options['pausa_despachador'],
+            semilla=options['semilla'],
+            aviso=self.stdout.write,
+        ))
+        informe = resumen_carga(estadisticas)
+        informe['meta'] = {
+            'url': options['url'],
+            'conductores': options['conductores'],
+            'despachadores': options['despachadores'],
+            'pausa_conductor': options['pausa_conductor'],
+            'pausa_despachador': options['pausa_despachador'],
+        }
+        self._imprimir(informe)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump(informe, archivo, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f'✓ Resultados guardados en {options["salida"]}'))
+
+    def _imprimir(self, informe):
+        def ms(valor):
+            return '-' if valor is None else f'{valor:.1f}'
+
+        self.stdout.write(
+            f'\n{"URL":<34} {"pet.":>7} {"err.":>6} {"pet/s":>8} {"p50":>8} {"p90":>8} {"p99":>8} {"máx":>8}'
+        )
+        for fila in informe['resultados']:
+            self.stdout.write(
+                f'{fila["nombre"]:<34} {fila["peticiones"]:>7} {fila["errores"]:>6} {fila["por_segundo"]:>8.1f} '
+                f'{ms(fila["p50_ms"]):>8} {ms(fila["p90_ms"]):>8} {ms(fila["p99_ms"]):>8} {ms(fila["max_ms"]):>8}'
+            )
+        total = sum(f['peticiones'] for f in informe['resultados'])
+        errores = sum(f['errores'] for f in informe['resultados'])
+        self.stdout.write(
+            f'\nTotal: {total} peticiones en {informe["duracion_s"]}s '
+            f'({total / informe["duracion_s"]:.1f} pet/s), {errores} errores'
+        )
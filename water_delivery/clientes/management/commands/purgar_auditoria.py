@@ -0,0 +1,27 @@
+# =============================================
+# COMANDO PARA BORRAR REGISTROS DE AUDITORÍA VENCIDOS
+# =============================================
+# El hilo de auditoría ya los borra una vez al día (ver
+# water_delivery/auditoria.py); este comando lo hace a mano o desde cron, por
+# ejemplo tras bajar AUDIT_RETENTION_DAYS:
+#
+#   python manage.py purgar_auditoria --dias 90
+
+from django.core.management.base import BaseCommand, CommandError
+
+from water_delivery.auditoria import dias_retencion, purgar_vencidos
+
+
+class Command(BaseCommand):
+    help = 'Borra los registros de auditoría más antiguos que la retención configurada'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=None,
+                            help='Días a conservar (por defecto AUDIT_CONFIG["AUDIT_RETENTION_DAYS"])')
+
+    def handle(self, *args, **options):
+        dias = dias_retencion() if options['dias'] is None else options['dias']
+        if dias < 1:
+            raise CommandError('--dias debe ser al menos 1')
+        borrados = purgar_vencidos(dias)
+        self.stdout.write(self.style.SUCCESS(f'✓ {borrados} registros de auditoría anteriores a {dias} días borrados'))
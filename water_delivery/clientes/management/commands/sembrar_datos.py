@@ -0,0 +1,93 @@
+# =============================================
+# COMANDO PARA GENERAR DATOS SINTÉTICOS EN VOLUMEN
+# =============================================
+# Llena la base de datos configurada con clientes, historiales de despachos,
+# pagos, conductores, dispositivos y recorridos GPS (ver clientes/sintetico.py)
+# para pruebas de carga y de escala. Con la misma semilla y la misma fecha de
+# referencia genera siempre los mismos datos.
+#
+# En PostgreSQL usa COPY y varios procesos; un entorno de 10 millones de filas:
+#
+#   python manage.py sembrar_datos --clientes 100000 --despachos 8000000 \
+#       --pagos 1500000 --ubicaciones 500000 --procesos 8 --fecha-referencia 2025-01-01
+#
+# No usar contra la base de datos de producción: los datos se reconocen por el
+# prefijo 'bench' y se eliminan con --borrar.
+
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from clientes import sintetico
+
+
+class Command(BaseCommand):
+    help = 'Genera datos sintéticos deterministas en volumen para pruebas de carga y escala'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=10000)
+        parser.add_argument('--despachos', type=int, default=1000000)
+        parser.add_argument('--pagos', type=int, default=None, help='Por defecto, un cuarto de los despachos')
+        parser.add_argument('--ubicaciones', type=int, default=1000000, help='Posiciones GPS en total')
+        parser.add_argument('--conductores', type=int, default=10, help='Conductores (y dispositivos)')
+        parser.add_argument('--dias', type=int, default=365, help='Días de historial')
+        parser.add_argument('--semilla', type=int, default=1)
+        parser.add_argument(
+            '--fecha-referencia',
+            help='Fin del historial (AAAA-MM-DD). Por defecto, ahora: fijarla para repetir exactamente los datos',
+        )
+        parser.add_argument('--procesos', type=int, default=1,
+                            help='Procesos en paralelo (solo PostgreSQL: SQLite admite un escritor)')
+        parser.add_argument('--lote', type=int, default=5000, help='Filas por inserción')
+        parser.add_argument('--sin-copy', action='store_true', help='Usar bulk_create también en PostgreSQL')
+        parser.add_argument('--borrar', action='store_true',
+                            help='Eliminar antes los datos sintéticos existentes')
+
+    def handle(self, *args, **options):
+        referencia = None
+        if options['fecha_referencia']:
+            try:
+                referencia = timezone.make_aware(datetime.strptime(options['fecha_referencia'], '%Y-%m-%d'))
+            except ValueError:
+                raise CommandError('--fecha-referencia debe tener el formato AAAA-MM-DD')
+
+        procesos = options['procesos']
+        if procesos > 1 and connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING('SQLite admite un solo escritor: se usa un proceso.'))
+            procesos = 1
+
+        if options['borrar']:
+            sintetico.borrar()
+            self.stdout.write('Datos sintéticos anteriores eliminados.')
+        elif sintetico.volumenes_actuales()['clientes']:
+            raise CommandError('Ya hay datos sintéticos: use --borrar para regenerarlos.')
+
+        copiar = sintetico.usa_copy() and not options['sin_copy']
+        self.stdout.write(
+            f'Generando con semilla {options["semilla"]} en {connection.vendor} '
+            f'({"COPY" if copiar else "bulk_create"}, {procesos} proceso(s))...'
+        )
+        inicio = time.monotonic()
+        totales = sintetico.sembrar(
+            clientes=options['clientes'],
+            despachos=options['despachos'],
+            pagos=options['pagos'],
+            ubicaciones=options['ubicaciones'],
+            conductores=options['conductores'],
+            dias=options['dias'],
+            semilla=options['semilla'],
+            lote=options['lote'],
+            fecha_referencia=referencia,
+            procesos=procesos,
+            copiar=copiar,
+            progreso=lambda texto: self.stdout.write(f'  {texto}'),
+        )
+        duracion = time.monotonic() - inicio
+        filas = sum(totales.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {filas} filas en {duracion:.1f}s ({filas / max(duracion, 0.001):.0f} filas/s): '
+            + ', '.join(f'{valor} {clave}' for clave, valor in totales.items())
+        ))
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0007_alter_despacho_fecha'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='despacho',
+            index=models.Index(fields=['cliente', 'fecha'], name='clientes_de_cliente_73ca34_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pago',
+            index=models.Index(fields=['cliente', 'fecha'], name='clientes_pa_cliente_db57ef_idx'),
+        ),
+    ]
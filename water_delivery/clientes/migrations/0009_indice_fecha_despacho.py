@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0008_indices_estado_cuenta'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='despacho',
+            index=models.Index(fields=['fecha'], name='clientes_de_fecha_13f64a_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0009_indice_fecha_despacho'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='despacho',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0010_version_filas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrediccionPedido',
+            fields=[
+                ('cliente', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='prediccion', serialize=False, to='clientes.cliente')),
+                ('ultimo_pedido', models.DateField()),
+                ('pedidos', models.PositiveIntegerField()),
+                ('intervalo_dias', models.FloatField()),
+                ('desviacion_dias', models.FloatField()),
+                ('proxima_fecha', models.DateField()),
+                ('desde', models.DateField()),
+                ('hasta', models.DateField()),
+                ('calculado', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['desde'], name='clientes_pr_desde_381952_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('clientes', '0011_prediccion_pedido'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='despacho',
+            name='camion',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='despacho',
+            name='conductor',
+            field=models.ForeignKey(blank=True, limit_choices_to={'tipo_usuario': 'conductor'}, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='despachos_asignados', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='despacho',
+            index=models.Index(fields=['conductor', 'fecha', 'entregado'], name='clientes_de_conduct_62990e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='despacho',
+            index=models.Index(fields=['camion', 'fecha', 'entregado'], name='clientes_de_camion_d2445e_idx'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:54
+
+import sys
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def asignar_empresa_unica(apps, schema_editor):
+    """
+    Con una sola empresa registrada (el caso de todas las instalaciones
+    anteriores), sus clientes, despachos, pagos y conductores pasan a ser suyos.
+    Con varias no se puede adivinar: quedan sin empresa (las empresas no las
+    ven) y se avisa cómo asignarlas con el comando asignar_empresa.
+    """
+    Usuario = apps.get_model('usuarios', 'Usuario')
+    empresas = dict(Usuario.objects.filter(tipo_usuario='empresa').values_list('pk', 'username'))
+    if len(empresas) != 1:
+        sin_empresa = apps.get_model('clientes', 'Cliente').objects.count()
+        if sin_empresa:
+            sys.stderr.write(
+                f'\n  ATENCIÓN: {sin_empresa} clientes (con sus despachos y pagos) y los conductores '
+                f'quedan sin empresa porque hay {len(empresas)} usuarios empresa ({", ".join(empresas.values())}).\n'
+                f'  Ninguna empresa los verá hasta asignarlos, por ejemplo:\n'
+                f'    python manage.py asignar_empresa --empresa <usuario> [--clientes ID ...] '
+                f'[--conductores USUARIO ...]\n'
+            )
+        return
+    empresa_id, = empresas
+    for modelo in ('Cliente', 'Despacho', 'Pago'):
+        apps.get_model('clientes', modelo).objects.filter(empresa__isnull=True).update(empresa_id=empresa_id)
+    Usuario.objects.filter(tipo_usuario='conductor', empresa__isnull=True).update(empresa_id=empresa_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('clientes', '0012_asignacion_despachos'),
+        ('usuarios', '0013_empresa_conductor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='empresa',
+            field=models.ForeignKey(blank=True, editable=False, limit_choices_to={'tipo_usuario': 'empresa'}, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='despacho',
+            name='empresa',
+            field=models.ForeignKey(blank=True, editable=False, limit_choices_to={'tipo_usuario': 'empresa'}, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='pago',
+            name='empresa',
+            field=models.ForeignKey(blank=True, editable=False, limit_choices_to={'tipo_usuario': 'empresa'}, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['empresa', 'activo', 'nombre'], name='clientes_cl_empresa_19f18f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='despacho',
+            index=models.Index(fields=['empresa', 'fecha'], name='clientes_de_empresa_c36fd1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pago',
+            index=models.Index(fields=['empresa', 'fecha'], name='clientes_pa_empresa_c78d54_idx'),
+        ),
+        migrations.RunPython(asignar_empresa_unica, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:00
+
+from django.conf import settings
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('clientes', '0013_empresa_filas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroAuditoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField()),
+                ('accion', models.CharField(choices=[('crear', 'Creación'), ('editar', 'Edición'), ('eliminar', 'Eliminación')], max_length=10)),
+                ('modelo', models.CharField(max_length=50)),
+                ('objeto_id', models.CharField(max_length=50)),
+                ('antes', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('despues', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('empresa', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('usuario', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['modelo', 'objeto_id', 'fecha'], name='clientes_re_modelo_b72c98_idx'), models.Index(fields=['empresa', 'fecha'], name='clientes_re_empresa_6d4fb4_idx'), models.Index(fields=['fecha'], name='clientes_re_fecha_0feca3_idx')],
+            },
+        ),
+    ]
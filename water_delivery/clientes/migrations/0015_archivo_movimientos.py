@@ -0,0 +1,72 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('clientes', '0014_registro_auditoria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoInicial',
+            fields=[
+                ('cliente', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='saldo_inicial', serialize=False, to='clientes.cliente')),
+                ('archivado_hasta', models.DateTimeField()),
+                ('cargos', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('abonos', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('saldo', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('despachos', models.PositiveIntegerField(default=0)),
+                ('entregados', models.PositiveIntegerField(default=0)),
+                ('botellones', models.PositiveIntegerField(default=0)),
+                ('pagos', models.PositiveIntegerField(default=0)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('empresa', models.ForeignKey(blank=True, editable=False, limit_choices_to={'tipo_usuario': 'empresa'}, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='PagoArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('fecha', models.DateTimeField()),
+                ('monto', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('observaciones', models.TextField(blank=True, null=True)),
+                ('archivado', models.DateTimeField()),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pagos_archivados', to='clientes.cliente')),
+                ('empresa', models.ForeignKey(blank=True, editable=False, limit_choices_to={'tipo_usuario': 'empresa'}, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['cliente', 'fecha'], name='clientes_pa_cliente_911f5f_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DespachoArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('fecha', models.DateTimeField()),
+                ('cantidad_botellones', models.IntegerField()),
+                ('entregado', models.BooleanField()),
+                ('cancelado', models.BooleanField()),
+                ('notas', models.TextField(blank=True, null=True)),
+                ('precio_unitario', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('camion', models.CharField(blank=True, default='', max_length=50)),
+                ('version', models.PositiveIntegerField()),
+                ('archivado', models.DateTimeField()),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='despachos_archivados', to='clientes.cliente')),
+                ('conductor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('empresa', models.ForeignKey(blank=True, editable=False, limit_choices_to={'tipo_usuario': 'empresa'}, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['cliente', 'fecha'], name='clientes_de_cliente_7c051a_idx')],
+            },
+        ),
+    ]
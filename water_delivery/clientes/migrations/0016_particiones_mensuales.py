@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:20
+
+from django.db import migrations
+
+from water_delivery.particiones import particionar
+
+
+def particionar_tablas(apps, schema_editor):
+    """
+    En PostgreSQL, Despacho y UbicacionCamion pasan a estar particionadas por
+    mes (ver water_delivery/particiones.py). Reescribe las dos tablas: en
+    instalaciones grandes conviene aplicarla fuera de horario. En otros
+    motores no hace nada.
+    """
+    for modelo in ('Despacho', 'UbicacionCamion'):
+        particionar(schema_editor, apps.get_model('clientes', modelo))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0015_archivo_movimientos'),
+    ]
+
+    operations = [
+        migrations.RunPython(particionar_tablas, migrations.RunPython.noop),
+    ]
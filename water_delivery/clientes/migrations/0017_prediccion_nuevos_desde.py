@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-19 20:10
+
+from datetime import datetime, time, timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def calcular_nuevos_desde(apps, schema_editor):
+    """Medianoche local del día siguiente al último pedido de cada predicción."""
+    PrediccionPedido = apps.get_model('clientes', 'PrediccionPedido')
+    predicciones = list(PrediccionPedido.objects.only('ultimo_pedido'))
+    for prediccion in predicciones:
+        prediccion.nuevos_desde = timezone.make_aware(
+            datetime.combine(prediccion.ultimo_pedido + timedelta(days=1), time.min)
+        )
+    PrediccionPedido.objects.bulk_update(predicciones, ['nuevos_desde'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0016_particiones_mensuales'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prediccionpedido',
+            name='nuevos_desde',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(calcular_nuevos_desde, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='prediccionpedido',
+            name='nuevos_desde',
+            field=models.DateTimeField(),
+        ),
+    ]
@@ -5,11 +5,64 @@
 # Cliente: información y saldo del cliente.
 # Despacho: registro de entregas de botellones.
 # Pago: registro de abonos realizados por el cliente.
+# RegistroAuditoria: altas, ediciones y bajas de los anteriores y de Device.
+# SaldoInicial, DespachoArchivado y PagoArchivado: movimientos de períodos
+# cerrados sacados de las tablas activas (ver clientes/archivo.py).
 
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils import timezone
 
-class Cliente(models.Model):
+from water_delivery.auditoria import AuditadoMixin
+from water_delivery.empresas import SIN_AMBITO, EmpresaManager, empresa_actual
+
+
+class VersionFilaMixin(models.Model):
+    """
+    Versión de la fila: sube en cada save() y forma parte de la clave de sus
+    fragmentos en caché (ver water_delivery/fragmentos.py), así que un cambio
+    solo obliga a volver a renderizar esa fila. Los update() masivos deben
+    subirla a mano con F('version') + 1.
+    """
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            self.version += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        super().save(*args, **kwargs)
+
+class EmpresaMixin(models.Model):
+    """
+    Fila que pertenece a una empresa (ver water_delivery/empresas.py). `objects`
+    solo ve las filas de la empresa de la petición; `todos` las ve todas.
+    Al crearse sin empresa toma la de empresa_por_defecto().
+    """
+    empresa = models.ForeignKey(
+        'usuarios.Usuario', on_delete=models.PROTECT, null=True, blank=True, editable=False,
+        related_name='+', limit_choices_to={'tipo_usuario': 'empresa'},
+    )
+
+    objects = EmpresaManager()
+    todos = models.Manager()
+
+    class Meta:
+        abstract = True
+
+    def empresa_por_defecto(self):
+        empresa = empresa_actual()
+        return None if empresa is SIN_AMBITO else empresa
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.empresa_id is None:
+            self.empresa_id = self.empresa_por_defecto()
+        super().save(*args, **kwargs)
+
+class Cliente(AuditadoMixin, EmpresaMixin, VersionFilaMixin):
     """
     Modelo que representa a un cliente de la empresa.
     Guarda datos personales, dirección, teléfono, estado y saldo.
@@ -22,12 +75,18 @@ class Cliente(models.Model):
     debe_total = models.IntegerField(default=0)  # Deuda total acumulada
     precio_botellon = models.DecimalField(max_digits=5, decimal_places=2, default=2.5)  # Precio por botellón
     saldo = models.DecimalField(max_digits=10, decimal_places=2, default=0)  # Saldo actual del cliente
+
+    class Meta:
+        indexes = [
+            # Lista de clientes de la empresa: activos primero, por nombre
+            models.Index(fields=['empresa', 'activo', 'nombre']),
+        ]
     
     def __str__(self):
         """Representación legible del cliente"""
         return f"{self.nombre} {self.apellido}"
 
-class Despacho(models.Model):
+class Despacho(AuditadoMixin, EmpresaMixin, VersionFilaMixin):
     """
     Modelo que representa un despacho (entrega) de botellones a un cliente.
     Guarda cantidad, fecha, notas, precio y estado de entrega.
@@ -40,12 +99,34 @@ class Despacho(models.Model):
     notas = models.TextField(blank=True, null=True)  # Notas adicionales
     precio_unitario = models.DecimalField(max_digits=5, decimal_places=2, default=2.5)  # Precio por botellón
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0)  # Total del despacho
+    conductor = models.ForeignKey(
+        'usuarios.Usuario', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='despachos_asignados', limit_choices_to={'tipo_usuario': 'conductor'},
+    )  # Conductor que lo reparte (ver clientes/asignacion.py)
+    camion = models.CharField(max_length=50, blank=True, default='')  # Camión del conductor al asignarlo
+
+    class Meta:
+        indexes = [
+            # Estado de cuenta: movimientos de un cliente en orden cronológico
+            models.Index(fields=['cliente', 'fecha']),
+            # Resúmenes del día: despachos de la empresa en un rango de fechas
+            models.Index(fields=['empresa', 'fecha']),
+            # Lo mismo para todas las empresas (comandos, sin ámbito)
+            models.Index(fields=['fecha']),
+            # Manifiesto del conductor: sus despachos del día, pendientes o entregados
+            models.Index(fields=['conductor', 'fecha', 'entregado']),
+            # Carga de cada camión en el día
+            models.Index(fields=['camion', 'fecha', 'entregado']),
+        ]
     
+    def empresa_por_defecto(self):
+        return self.cliente.empresa_id
+
     def __str__(self):
         """Representación legible del despacho"""
         return f"Despacho a {self.cliente} - {self.cantidad_botellones} botellones"
 
-class Pago(models.Model):
+class Pago(AuditadoMixin, EmpresaMixin):
     """
     Modelo que representa un pago realizado por un cliente.
     Guarda monto, fecha, observaciones y cliente asociado.
@@ -54,10 +135,159 @@ class Pago(models.Model):
     fecha = models.DateTimeField(auto_now_add=True)  # Fecha y hora del pago
     monto = models.DecimalField(max_digits=10, decimal_places=2)  # Monto del pago
     observaciones = models.TextField(blank=True, null=True)  # Observaciones adicionales
+    
+    class Meta:
+        indexes = [
+            # Estado de cuenta: movimientos de un cliente en orden cronológico
+            models.Index(fields=['cliente', 'fecha']),
+            # Pagos de la empresa en un rango de fechas (antigüedad de saldos)
+            models.Index(fields=['empresa', 'fecha']),
+        ]
+
+    def empresa_por_defecto(self):
+        return self.cliente.empresa_id
+    
     def __str__(self):
         """Representación legible del pago"""
         return f"Pago de {self.monto} $ de {self.cliente} el {self.fecha.strftime('%d/%m/%Y')}"
 
+class SaldoInicial(EmpresaMixin):
+    """
+    Lo que suman los movimientos archivados de un cliente (ver
+    clientes/archivo.py): su saldo es el punto de partida del saldo, los
+    estados de cuenta y la antigüedad de saldos, que solo leen las tablas activas.
+    """
+    cliente = models.OneToOneField(Cliente, on_delete=models.CASCADE, primary_key=True, related_name='saldo_inicial')
+    archivado_hasta = models.DateTimeField()  # Los movimientos archivados son anteriores a esta fecha
+    cargos = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # Total de los despachos archivados
+    abonos = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # Total de los pagos archivados
+    saldo = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # cargos - abonos
+    despachos = models.PositiveIntegerField(default=0)  # Despachos archivados
+    entregados = models.PositiveIntegerField(default=0)  # De ellos, entregados (el resto, cancelados)
+    botellones = models.PositiveIntegerField(default=0)  # Botellones de los despachos archivados
+    pagos = models.PositiveIntegerField(default=0)  # Pagos archivados
+    actualizado = models.DateTimeField(auto_now=True)
+
+    def empresa_por_defecto(self):
+        return self.cliente.empresa_id
+
+    def __str__(self):
+        """Representación legible del saldo inicial"""
+        return f"Saldo inicial de {self.cliente}: {self.saldo} $ hasta el {self.archivado_hasta.strftime('%d/%m/%Y')}"
+
+class DespachoArchivado(EmpresaMixin):
+    """Despacho entregado o cancelado de un período cerrado, fuera de la tabla activa."""
+    id = models.BigIntegerField(primary_key=True)  # El mismo id que tenía el despacho
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='despachos_archivados')
+    fecha = models.DateTimeField()
+    cantidad_botellones = models.IntegerField()
+    entregado = models.BooleanField()
+    cancelado = models.BooleanField()
+    notas = models.TextField(blank=True, null=True)
+    precio_unitario = models.DecimalField(max_digits=5, decimal_places=2)
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+    conductor = models.ForeignKey('usuarios.Usuario', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    camion = models.CharField(max_length=50, blank=True, default='')
+    version = models.PositiveIntegerField()
+    archivado = models.DateTimeField()  # Cuándo se archivó
+
+    class Meta:
+        indexes = [
+            # Historial archivado de un cliente
+            models.Index(fields=['cliente', 'fecha']),
+        ]
+
+    def __str__(self):
+        """Representación legible del despacho archivado"""
+        return f"Despacho archivado a {self.cliente} - {self.cantidad_botellones} botellones"
+
+class PagoArchivado(EmpresaMixin):
+    """Pago de un período cerrado, fuera de la tabla activa."""
+    id = models.BigIntegerField(primary_key=True)  # El mismo id que tenía el pago
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='pagos_archivados')
+    fecha = models.DateTimeField()
+    monto = models.DecimalField(max_digits=10, decimal_places=2)
+    observaciones = models.TextField(blank=True, null=True)
+    archivado = models.DateTimeField()  # Cuándo se archivó
+
+    class Meta:
+        indexes = [
+            # Historial archivado de un cliente
+            models.Index(fields=['cliente', 'fecha']),
+        ]
+
+    def __str__(self):
+        """Representación legible del pago archivado"""
+        return f"Pago archivado de {self.monto} $ de {self.cliente} el {self.fecha.strftime('%d/%m/%Y')}"
+
+class RegistroAuditoria(models.Model):
+    """
+    Un alta, edición o baja de un modelo auditado (ver water_delivery/auditoria.py).
+    Solo se agregan filas; las borra la retención de AUDIT_CONFIG. Usuario y
+    empresa no llevan clave foránea: el registro sobrevive a sus filas.
+    """
+    ACCIONES = [('crear', 'Creación'), ('editar', 'Edición'), ('eliminar', 'Eliminación')]
+
+    fecha = models.DateTimeField()  # Cuándo se hizo el cambio (no cuándo se escribió)
+    usuario = models.ForeignKey(
+        'usuarios.Usuario', on_delete=models.DO_NOTHING, db_constraint=False,
+        null=True, blank=True, related_name='+',
+    )  # Quién lo hizo (None fuera de una petición)
+    empresa = models.ForeignKey(
+        'usuarios.Usuario', on_delete=models.DO_NOTHING, db_constraint=False,
+        null=True, blank=True, related_name='+',
+    )  # Empresa de la fila modificada
+    accion = models.CharField(max_length=10, choices=ACCIONES)
+    modelo = models.CharField(max_length=50)  # app.modelo, p. ej. clientes.despacho
+    objeto_id = models.CharField(max_length=50)
+    antes = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)  # Campos cambiados, valor anterior
+    despues = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)  # Campos cambiados, valor nuevo
+
+    class Meta:
+        indexes = [
+            # Historial de una fila
+            models.Index(fields=['modelo', 'objeto_id', 'fecha']),
+            # Actividad de la empresa y purga por retención
+            models.Index(fields=['empresa', 'fecha']),
+            models.Index(fields=['fecha']),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Los registros de auditoría no se modifican')
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        """Representación legible del registro"""
+        return f"{self.get_accion_display()} de {self.modelo} #{self.objeto_id} el {self.fecha.strftime('%d/%m/%Y %H:%M')}"
+
+class PrediccionPedido(models.Model):
+    """
+    Próximo pedido previsto de un cliente según el intervalo entre sus pedidos.
+    La calcula el comando predecir_pedidos (ver clientes/prediccion.py); las
+    vistas solo la leen.
+    """
+    cliente = models.OneToOneField(Cliente, on_delete=models.CASCADE, primary_key=True, related_name='prediccion')
+    ultimo_pedido = models.DateField()  # Último día con despacho usado en el cálculo
+    nuevos_desde = models.DateTimeField()  # Medianoche del día siguiente: desde ahí los despachos son nuevos
+    pedidos = models.PositiveIntegerField()  # Días con despacho usados en el cálculo
+    intervalo_dias = models.FloatField()  # Intervalo medio con peso exponencial
+    desviacion_dias = models.FloatField()  # Desviación del intervalo con el mismo peso
+    proxima_fecha = models.DateField()  # Fecha prevista del próximo pedido
+    desde = models.DateField()  # Inicio de la banda de confianza
+    hasta = models.DateField()  # Fin de la banda de confianza
+    calculado = models.DateTimeField()  # Cuándo se calculó
+
+    class Meta:
+        indexes = [
+            # Pedidos para hoy: predicciones cuya banda ya empezó
+            models.Index(fields=['desde']),
+        ]
+
+    def __str__(self):
+        """Representación legible de la predicción"""
+        return f"Próximo pedido de {self.cliente} el {self.proxima_fecha.strftime('%d/%m/%Y')}"
+
 class UbicacionCamion(models.Model):
     """
     Modelo para almacenar la ubicación del camión en tiempo real.
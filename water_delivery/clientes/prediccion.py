@@ -0,0 +1,157 @@
+# =============================================
+# PREDICCIÓN DEL PRÓXIMO PEDIDO DE CADA CLIENTE
+# =============================================
+# Cada cliente pide con cierta regularidad (un botellón por semana, dos por
+# quincena...). Con los días en que recibió despachos se calcula el intervalo
+# medio entre pedidos, dando más peso a los más recientes (media con peso
+# exponencial y vida media en pedidos), y su desviación con los mismos pesos.
+# El próximo pedido se espera al cabo de ese intervalo desde el último, dentro
+# de una banda de ± Z_BANDA desviaciones.
+#
+# El historial se lee en una sola consulta (cliente, día) ordenada y se calcula
+# para todos los clientes a la vez con NumPy: los intervalos son diferencias
+# entre días consecutivos del mismo cliente y las sumas por cliente se hacen con
+# bincount, sin recorrer los clientes en Python.
+#
+# Lo ejecuta el comando `manage.py predecir_pedidos` (una vez al día, fuera de
+# horario) y el resultado queda en PrediccionPedido; la API de pedidos para hoy
+# solo lee esa tabla.
+
+import time
+from datetime import date, timedelta
+from itertools import chain
+
+import numpy as np
+from django.db import transaction
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .estado_cuenta import inicio_del_dia
+from .models import Despacho, PrediccionPedido
+
+# Pedidos tras los cuales un intervalo pesa la mitad que el más reciente
+VIDA_MEDIA = 3
+# Días con despacho necesarios para predecir (dos intervalos como mínimo)
+MIN_PEDIDOS = 3
+# Ancho de la banda en desviaciones, y mínimo en días a cada lado
+Z_BANDA = 1.0
+BANDA_MINIMA = 1
+# Solo se usa el último año: lo anterior ya casi no pesa en la media
+HISTORIAL_DIAS = 365
+
+
+def cargar_historial(desde):
+    """
+    Días con despacho de los clientes activos desde `desde`, como dos arrays
+    (clientes, días en ordinal) ordenados por cliente y día, sin repetidos.
+    """
+    filas = (
+        Despacho.objects.filter(cliente__activo=True, fecha__gte=inicio_del_dia(desde))
+        .annotate(dia=TruncDate('fecha'))
+        .values_list('cliente_id', 'dia')
+        .order_by('cliente_id', 'dia')
+        .distinct()
+        .iterator(chunk_size=10000)
+    )
+    plano = np.fromiter(
+        chain.from_iterable((cliente_id, dia.toordinal()) for cliente_id, dia in filas),
+        dtype=np.int64,
+    )
+    pares = plano.reshape(-1, 2)
+    return pares[:, 0], pares[:, 1]
+
+
+def calcular_predicciones(clientes, dias, vida_media=VIDA_MEDIA, min_pedidos=MIN_PEDIDOS, z=Z_BANDA):
+    """
+    Predicción de todos los clientes a partir de los arrays de cargar_historial.
+    Devuelve un dict de arrays alineados: cliente, ultimo, pedidos, intervalo,
+    desviacion, proxima, desde y hasta (las fechas en ordinal).
+    """
+    mismo_cliente = clientes[1:] == clientes[:-1]
+    intervalos = (dias[1:] - dias[:-1])[mismo_cliente].astype(float)
+    duenos = clientes[1:][mismo_cliente]
+    dias_fin = dias[1:][mismo_cliente]
+
+    # Los intervalos de cada cliente son contiguos: `grupo` dice de qué cliente es cada uno
+    ids, inicio, cuenta = np.unique(duenos, return_index=True, return_counts=True)
+    grupo = np.repeat(np.arange(len(ids)), cuenta)
+    fin = inicio + cuenta - 1
+    # 0 para el intervalo más reciente de cada cliente, 1 para el anterior...
+    antiguedad = fin[grupo] - np.arange(len(intervalos))
+    pesos = 0.5 ** (antiguedad / vida_media)
+
+    suma_pesos = np.bincount(grupo, weights=pesos, minlength=len(ids))
+    media = np.bincount(grupo, weights=pesos * intervalos, minlength=len(ids)) / suma_pesos
+    varianza = np.bincount(grupo, weights=pesos * (intervalos - media[grupo]) ** 2, minlength=len(ids)) / suma_pesos
+    desviacion = np.sqrt(varianza)
+
+    ultimo = dias_fin[fin]
+    pedidos = cuenta + 1
+    ancho = np.maximum(z * desviacion, BANDA_MINIMA)
+    proxima = ultimo + np.maximum(np.rint(media), 1).astype(np.int64)
+    desde = ultimo + np.maximum(np.rint(media - ancho), 1).astype(np.int64)
+    hasta = ultimo + np.maximum(np.rint(media + ancho), 1).astype(np.int64)
+
+    validos = pedidos >= min_pedidos
+    return {
+        'cliente': ids[validos],
+        'ultimo': ultimo[validos],
+        'pedidos': pedidos[validos],
+        'intervalo': media[validos],
+        'desviacion': desviacion[validos],
+        'proxima': proxima[validos],
+        'desde': desde[validos],
+        'hasta': hasta[validos],
+    }
+
+
+def guardar_predicciones(resultado, calculado):
+    """
+    Reemplaza las predicciones por las de `resultado`: actualiza las existentes,
+    crea las nuevas y borra las de clientes que ya no tienen predicción.
+    """
+    predicciones = [
+        PrediccionPedido(
+            cliente_id=int(cliente_id),
+            ultimo_pedido=date.fromordinal(int(ultimo)),
+            nuevos_desde=inicio_del_dia(date.fromordinal(int(ultimo) + 1)),
+            pedidos=int(pedidos),
+            intervalo_dias=round(float(intervalo), 2),
+            desviacion_dias=round(float(desviacion), 2),
+            proxima_fecha=date.fromordinal(int(proxima)),
+            desde=date.fromordinal(int(desde)),
+            hasta=date.fromordinal(int(hasta)),
+            calculado=calculado,
+        )
+        for cliente_id, ultimo, pedidos, intervalo, desviacion, proxima, desde, hasta in zip(
+            resultado['cliente'], resultado['ultimo'], resultado['pedidos'], resultado['intervalo'],
+            resultado['desviacion'], resultado['proxima'], resultado['desde'], resultado['hasta'],
+        )
+    ]
+    campos = ['ultimo_pedido', 'nuevos_desde', 'pedidos', 'intervalo_dias', 'desviacion_dias',
+              'proxima_fecha', 'desde', 'hasta', 'calculado']
+    with transaction.atomic():
+        PrediccionPedido.objects.bulk_create(
+            predicciones, batch_size=1000,
+            update_conflicts=True, unique_fields=['cliente'], update_fields=campos,
+        )
+        PrediccionPedido.objects.filter(calculado__lt=calculado).delete()
+    return len(predicciones)
+
+
+def predecir_pedidos(vida_media=VIDA_MEDIA, min_pedidos=MIN_PEDIDOS, z=Z_BANDA):
+    """Recalcula y guarda las predicciones de todos los clientes activos."""
+    inicio = time.monotonic()
+    calculado = timezone.now()
+    clientes, dias = cargar_historial(timezone.localdate() - timedelta(days=HISTORIAL_DIAS))
+    carga = time.monotonic()
+    resultado = calcular_predicciones(clientes, dias, vida_media=vida_media, min_pedidos=min_pedidos, z=z)
+    calculo = time.monotonic()
+    guardadas = guardar_predicciones(resultado, calculado)
+    return {
+        'dias_con_pedido': len(dias),
+        'predicciones': guardadas,
+        'segundos_carga': carga - inicio,
+        'segundos_calculo': calculo - carga,
+        'segundos_guardado': time.monotonic() - calculo,
+    }
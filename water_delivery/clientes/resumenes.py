@@ -0,0 +1,124 @@
+# =============================================
+# RESÚMENES AGREGADOS DE CLIENTES Y DESPACHOS
+# =============================================
+# Cifras globales que se muestran en pantallas de resumen (dashboard y
+# contadores del encabezado).
+# Se calculan con una sola consulta de agregados condicionales sobre el saldo
+# "vivo" de cada cliente (despachos - pagos), en lugar de confiar en campos
+# denormalizados como `debe_total`, y se guardan en la caché compartida
+# etiquetados con los modelos de los que dependen: guardar un Cliente, Despacho
+# o Pago invalida sus etiquetas (ver clientes/signals.py).
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from water_delivery.cache import CacheCompartida, etiqueta_modelo
+from water_delivery.empresas import clave_empresa
+
+from .models import Cliente, Despacho, Pago
+
+cache_clientes = CacheCompartida('clientes')
+
+# Cada empresa tiene sus propias cifras (ver water_delivery/empresas.py)
+CLAVE_DASHBOARD = 'resumen_dashboard:{empresa}'
+CLAVE_HEADER = 'resumen_header:{empresa}:{fecha}'
+ETIQUETAS_DASHBOARD = [etiqueta_modelo(Cliente), etiqueta_modelo(Despacho), etiqueta_modelo(Pago)]
+ETIQUETAS_HEADER = [etiqueta_modelo(Cliente), etiqueta_modelo(Despacho)]
+# Las invalidaciones mantienen la caché al día; el tiempo es solo una red de seguridad
+TIEMPO_CACHE = 60 * 10
+
+DINERO = DecimalField(max_digits=12, decimal_places=2)
+
+
+def _suma_por_cliente(modelo, campo, **filtros):
+    """Subconsulta correlacionada con la suma de `campo` para el cliente externo."""
+    return Subquery(
+        modelo.objects.filter(cliente=OuterRef('pk'), **filtros)
+        .order_by()
+        .values('cliente')
+        .annotate(total=Sum(campo))
+        .values('total'),
+        output_field=DINERO,
+    )
+
+
+def anotar_saldo_vivo(queryset):
+    """
+    Anota `saldo_vivo` (saldo inicial archivado + total despachado - total
+    pagado) en un queryset de clientes. Es el mismo cálculo que hace
+    recalcular_saldo() para `Cliente.saldo` (ver clientes/estado_cuenta.py).
+    """
+    cero = Value(Decimal('0.00'), output_field=DINERO)
+    return queryset.annotate(
+        saldo_vivo=Coalesce(F('saldo_inicial__saldo'), cero)
+        + Coalesce(_suma_por_cliente(Despacho, 'total'), cero)
+        - Coalesce(_suma_por_cliente(Pago, 'monto'), cero),
+    )
+
+
+def calcular_resumen_dashboard():
+    """
+    Clientes activos, deuda total y despachos pendientes en una sola consulta.
+    La deuda suma solo saldos positivos: un saldo a favor no compensa la deuda de otro cliente.
+    """
+    pendientes = Subquery(
+        Despacho.objects.filter(cliente=OuterRef('pk'), entregado=False, cancelado=False)
+        .order_by()
+        .values('cliente')
+        .annotate(total=Count('pk'))
+        .values('total'),
+    )
+    resumen = anotar_saldo_vivo(Cliente.objects.all()).annotate(
+        pendientes=Coalesce(pendientes, 0),
+    ).aggregate(
+        total_clientes=Count('pk', filter=Q(activo=True)),
+        total_deuda=Sum('saldo_vivo', filter=Q(saldo_vivo__gt=0)),
+        despachos_pendientes=Sum('pendientes'),
+    )
+    return {
+        'total_clientes': resumen['total_clientes'] or 0,
+        'total_deuda': resumen['total_deuda'] or Decimal('0.00'),
+        'despachos_pendientes': resumen['despachos_pendientes'] or 0,
+    }
+
+
+def resumen_dashboard():
+    """Resumen del dashboard desde la caché (se recalcula tras cada invalidación)."""
+    return cache_clientes.obtener(
+        CLAVE_DASHBOARD.format(empresa=clave_empresa()), calcular_resumen_dashboard,
+        ETIQUETAS_DASHBOARD, TIEMPO_CACHE,
+    )
+
+
+def calcular_resumen_header(fecha):
+    """
+    Contadores del encabezado: despachos y botellones del día y clientes activos.
+    El día se filtra por rango [00:00, 24:00) local para aprovechar el índice de `fecha`
+    (un filtro `fecha__date` aplica una función a la columna y no puede usarlo).
+    """
+    inicio = timezone.make_aware(datetime.combine(fecha, time.min))
+    del_dia = Despacho.objects.filter(fecha__gte=inicio, fecha__lt=inicio + timedelta(days=1)).aggregate(
+        despachos=Count('pk'),
+        botellones=Sum('cantidad_botellones'),
+    )
+    return {
+        'fecha': fecha.strftime('%Y-%m-%d'),
+        'despachos_hoy': del_dia['despachos'] or 0,
+        'botellones_hoy': del_dia['botellones'] or 0,
+        'clientes_activos': Cliente.objects.filter(activo=True).count(),
+    }
+
+
+def resumen_header():
+    """Contadores del encabezado para el día actual, desde la caché."""
+    hoy = timezone.localdate()
+    return cache_clientes.obtener(
+        CLAVE_HEADER.format(empresa=clave_empresa(), fecha=hoy.isoformat()),
+        lambda: calcular_resumen_header(hoy),
+        ETIQUETAS_HEADER,
+        TIEMPO_CACHE,
+    )
@@ -0,0 +1,44 @@
+# =============================================
+# SEÑALES DE LA APP DE CLIENTES
+# =============================================
+# Mantiene coherente la caché compartida: cualquier alta, edición o baja de
+# Cliente, Despacho o Pago invalida la etiqueta del modelo (y con ella todo lo
+# guardado que dependa de él) una vez confirmada la transacción, para que
+# ninguna petición concurrente vuelva a guardar datos anteriores.
+#
+# También deja cada cambio en el registro de auditoría (ver
+# water_delivery/auditoria.py), que se escribe fuera de la petición.
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from water_delivery.auditoria import registrar_borrado, registrar_guardado
+from water_delivery.cache import etiqueta_modelo, invalidar_etiquetas
+
+from .models import Cliente, Despacho, Pago
+
+
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+@receiver(post_save, sender=Despacho)
+@receiver(post_delete, sender=Despacho)
+@receiver(post_save, sender=Pago)
+@receiver(post_delete, sender=Pago)
+def invalidar_cache_modelo(sender, **kwargs):
+    etiqueta = etiqueta_modelo(sender)
+    transaction.on_commit(lambda: invalidar_etiquetas(etiqueta))
+
+
+@receiver(post_save, sender=Cliente)
+@receiver(post_save, sender=Despacho)
+@receiver(post_save, sender=Pago)
+def auditar_guardado(sender, instance, created, **kwargs):
+    registrar_guardado(instance, created)
+
+
+@receiver(post_delete, sender=Cliente)
+@receiver(post_delete, sender=Despacho)
+@receiver(post_delete, sender=Pago)
+def auditar_borrado(sender, instance, **kwargs):
+    registrar_borrado(instance)
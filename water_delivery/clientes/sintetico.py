@@ -0,0 +1,355 @@
+# =============================================
+# DATOS SINTÉTICOS PARA PRUEBAS DE RENDIMIENTO
+# =============================================
+# Genera clientes, despachos, pagos, conductores, dispositivos y recorridos GPS
+# en volumen (decenas de miles de clientes, millones de despachos) para medir
+# las vistas con tablas del tamaño de producción.
+#
+# - Determinista: el trabajo se divide en bloques de clientes de tamaño fijo y
+#   cada bloque usa su propia semilla derivada de `semilla`, así que la misma
+#   semilla y la misma fecha de referencia producen los mismos datos con
+#   cualquier cantidad de procesos.
+# - Rápido: bulk_create por lotes, o COPY en PostgreSQL para las tablas
+#   grandes; los bloques pueden repartirse entre varios procesos.
+# - Los datos se reconocen por el prefijo de sus usuarios, nombres y
+#   dispositivos (ver `borrar`).
+
+import csv
+import io
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from usuarios.models import Device, Usuario
+from water_delivery.cache import etiqueta_modelo, invalidar_etiquetas
+
+from .models import Cliente, Despacho, Pago, UbicacionCamion
+
+PREFIJO = 'bench'
+CLAVE_USUARIOS = 'benchmark'
+PRECIOS = [Decimal('2.00'), Decimal('2.50'), Decimal('3.00')]
+# Centro aproximado de la zona de reparto (Caracas)
+LATITUD_BASE, LONGITUD_BASE = 10.4806, -66.9036
+# Clientes por bloque de trabajo (cambiarlo cambia los datos generados)
+TAMANO_BLOQUE = 2000
+# Jornada de los conductores y frecuencia de su GPS
+HORA_INICIO_JORNADA, HORA_FIN_JORNADA = 7, 19
+SEGUNDOS_ENTRE_UBICACIONES = 15
+
+
+@contextmanager
+def _fecha_manual(modelo, campo):
+    """Permite fijar a mano un campo auto_now_add durante bulk_create."""
+    field = modelo._meta.get_field(campo)
+    original = field.auto_now_add
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = original
+
+
+def _en_lotes(generador, tamano):
+    lote = []
+    for objeto in generador:
+        lote.append(objeto)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _parte(total, inicio, fin, universo):
+    """Porción entera de `total` que corresponde a [inicio, fin) de `universo` (suma exacta)."""
+    if not universo:
+        return 0
+    return total * fin // universo - total * inicio // universo
+
+
+def _azar(semilla, *partes):
+    """Generador propio de cada unidad de trabajo, independiente del orden de ejecución."""
+    return random.Random(':'.join(str(p) for p in (semilla, *partes)))
+
+
+def usa_copy(alias='default'):
+    return connections[alias].vendor == 'postgresql'
+
+
+def _copiar(modelo, objetos):
+    """Inserta con COPY ... FROM STDIN (PostgreSQL); el id lo asigna la secuencia."""
+    campos = [f for f in modelo._meta.concrete_fields if not f.primary_key]
+    buffer = io.StringIO()
+    # Con QUOTE_NONNUMERIC los textos van entre comillas y None queda vacío sin
+    # comillas, que es como COPY en formato csv distingue '' de NULL
+    escritor = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+    for objeto in objetos:
+        escritor.writerow([
+            campo.get_db_prep_save(getattr(objeto, campo.attname), connection) for campo in campos
+        ])
+    buffer.seek(0)
+    columnas = ', '.join(connection.ops.quote_name(campo.column) for campo in campos)
+    tabla = connection.ops.quote_name(modelo._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f'COPY {tabla} ({columnas}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+
+def _insertar(modelo, objetos, lote, copiar, campo_fecha=None):
+    with _fecha_manual(modelo, campo_fecha) if campo_fecha else nullcontext():
+        for grupo in _en_lotes(objetos, lote):
+            if copiar:
+                _copiar(modelo, grupo)
+            else:
+                modelo.objects.bulk_create(grupo)
+
+
+def usuarios_sinteticos(conductores=3):
+    """Crea (o reutiliza) el usuario empresa y los conductores de las pruebas."""
+    def usuario(nombre, tipo, camion='', empresa=None):
+        instancia, creado = Usuario.objects.get_or_create(
+            username=nombre,
+            defaults={'email': f'{nombre}@example.com', 'tipo_usuario': tipo, 'camion_asignado': camion,
+                      'empresa': empresa},
+        )
+        if creado:
+            instancia.set_password(CLAVE_USUARIOS)
+            instancia.save(update_fields=['password'])
+        return instancia
+
+    empresa = usuario(f'{PREFIJO}_empresa', Usuario.EMPRESA)
+    return empresa, [
+        usuario(f'{PREFIJO}_conductor_{n}', Usuario.CONDUCTOR, f'Camión {n + 1:03d}', empresa)
+        for n in range(conductores)
+    ]
+
+
+def dispositivos_sinteticos(cantidad, semilla=1):
+    """Un dispositivo autorizado por conductor, con token determinista."""
+    azar = _azar(semilla, 'dispositivos')
+    existentes = set(Device.objects.filter(name__startswith=PREFIJO).values_list('name', flat=True))
+    nuevos = []
+    for n in range(cantidad):
+        token = f'{azar.getrandbits(256):064x}'
+        nombre = f'{PREFIJO}_dispositivo_{n}'
+        if nombre not in existentes:
+            nuevos.append(Device(name=nombre, token=token, active=azar.random() > 0.1))
+    Device.objects.bulk_create(nuevos)
+    return len(nuevos)
+
+
+def volumenes_actuales():
+    """Cantidad de registros sintéticos que ya hay en la base de datos."""
+    clientes = Cliente.objects.filter(nombre__startswith=PREFIJO)
+    return {
+        'clientes': clientes.count(),
+        'despachos': Despacho.objects.filter(cliente__nombre__startswith=PREFIJO).count(),
+        'pagos': Pago.objects.filter(cliente__nombre__startswith=PREFIJO).count(),
+        'ubicaciones': UbicacionCamion.objects.filter(conductor__username__startswith=PREFIJO).count(),
+    }
+
+
+def borrar():
+    """
+    Elimina todos los datos sintéticos con DELETE directos: con millones de
+    filas, el borrado en cascada del ORM (que carga cada objeto) no es viable.
+    """
+    def tabla(modelo):
+        return connection.ops.quote_name(modelo._meta.db_table)
+
+    patron = f'{PREFIJO}%'
+    with transaction.atomic(), connection.cursor() as cursor:
+        for modelo in (Despacho, Pago):
+            cursor.execute(
+                f'DELETE FROM {tabla(modelo)} WHERE cliente_id IN '
+                f'(SELECT id FROM {tabla(Cliente)} WHERE nombre LIKE %s)', [patron],
+            )
+        cursor.execute(
+            f'DELETE FROM {tabla(UbicacionCamion)} WHERE conductor_id IN '
+            f'(SELECT id FROM {tabla(Usuario)} WHERE username LIKE %s)', [patron],
+        )
+        cursor.execute(f'DELETE FROM {tabla(Cliente)} WHERE nombre LIKE %s', [patron])
+        cursor.execute(f'DELETE FROM {tabla(Device)} WHERE name LIKE %s', [patron])
+    # Los DELETE directos no envían señales: la caché se invalida aquí
+    transaction.on_commit(lambda: invalidar_etiquetas(*(etiqueta_modelo(m) for m in (Cliente, Despacho, Pago))))
+
+
+def sembrar_bloque(numero, clientes, despachos, pagos, semilla, referencia, dias, lote, copiar, empresa_id=None):
+    """
+    Genera el bloque `numero` de clientes (de la empresa `empresa_id`) con su parte de despachos y pagos.
+    Los saldos se calculan en memoria, así que cada cliente se inserta ya con
+    el saldo coherente con sus movimientos. Devuelve lo insertado.
+    """
+    desde = numero * TAMANO_BLOQUE
+    hasta = min(desde + TAMANO_BLOQUE, clientes)
+    azar = _azar(semilla, 'bloque', numero)
+    n_despachos = _parte(despachos, desde, hasta, clientes)
+    n_pagos = _parte(pagos, desde, hasta, clientes)
+    inicio = referencia - timedelta(days=dias)
+    segundos = dias * 24 * 3600
+
+    nuevos = [
+        Cliente(
+            nombre=f'{PREFIJO}{n:06d}',
+            apellido=azar.choice(['García', 'Pérez', 'Rodríguez', 'López', 'Martínez']),
+            direccion=f'Calle {azar.randint(1, 200)}, casa {azar.randint(1, 99)}',
+            telefono=f'0414{azar.randint(1000000, 9999999)}',
+            activo=azar.random() > 0.05,
+            precio_botellon=azar.choice(PRECIOS),
+            saldo=Decimal('0.00'),
+            empresa_id=empresa_id,
+        )
+        for n in range(desde, hasta)
+    ]
+    # Cada cliente tiene su frecuencia de pedidos: unos piden mucho más que otros
+    pesos = [azar.paretovariate(1.5) for _ in nuevos]
+    elegidos = azar.choices(range(len(nuevos)), weights=pesos, k=n_despachos)
+
+    movimientos = []
+    for indice in elegidos:
+        cliente = nuevos[indice]
+        cantidad = azar.randint(1, 6)
+        precio = cliente.precio_botellon if azar.random() > 0.1 else azar.choice(PRECIOS)
+        fecha = inicio + timedelta(seconds=azar.randrange(segundos))
+        cancelado = azar.random() < 0.03
+        total = precio * cantidad
+        # Como en la app, el saldo es la suma de los despachos (también los
+        # cancelados) menos los pagos
+        cliente.saldo += total
+        movimientos.append(('despacho', indice, dict(
+            fecha=fecha,
+            cantidad_botellones=cantidad,
+            precio_unitario=precio,
+            total=total,
+            entregado=not cancelado and (fecha < referencia - timedelta(days=1) or azar.random() > 0.5),
+            cancelado=cancelado,
+            notas=azar.choice([None, '', 'Dejar en portería', 'Llamar antes']),
+        )))
+    for indice in azar.choices(range(len(nuevos)), weights=pesos, k=n_pagos):
+        cliente = nuevos[indice]
+        monto = Decimal(azar.randint(1, 40)) / 2
+        cliente.saldo -= monto
+        movimientos.append(('pago', indice, dict(
+            fecha=inicio + timedelta(seconds=azar.randrange(segundos)),
+            monto=monto,
+            observaciones=azar.choice([None, 'Efectivo', 'Transferencia', 'Pago móvil']),
+        )))
+
+    with transaction.atomic():
+        # Los clientes van con bulk_create (se necesitan sus ids); son pocos frente a los movimientos
+        for grupo in _en_lotes(nuevos, lote):
+            Cliente.objects.bulk_create(grupo)
+        _insertar(Despacho, (
+            Despacho(cliente_id=nuevos[indice].pk, empresa_id=empresa_id, **datos)
+            for tipo, indice, datos in movimientos if tipo == 'despacho'
+        ), lote, copiar)
+        _insertar(Pago, (
+            Pago(cliente_id=nuevos[indice].pk, empresa_id=empresa_id, **datos)
+            for tipo, indice, datos in movimientos if tipo == 'pago'
+        ), lote, copiar, campo_fecha='fecha')
+    return {'clientes': len(nuevos), 'despachos': n_despachos, 'pagos': n_pagos}
+
+
+def recorrido_conductor(numero, conductor_id, cantidad, semilla, referencia):
+    """
+    Recorrido GPS de un conductor hacia atrás desde `referencia`: una posición
+    cada SEGUNDOS_ENTRE_UBICACIONES durante la jornada, con deriva de posición,
+    velocidad y batería realistas. Solo la última queda activa.
+    """
+    azar = _azar(semilla, 'gps', numero)
+    latitud = LATITUD_BASE + azar.uniform(-0.05, 0.05)
+    longitud = LONGITUD_BASE + azar.uniform(-0.05, 0.05)
+    fin_jornada = time(HORA_FIN_JORNADA - 1, 59, 59)
+    momento = timezone.localtime(referencia)
+    for n in range(cantidad):
+        # Fuera de la jornada se salta al final de la jornada (anterior, si es de madrugada)
+        if momento.hour < HORA_INICIO_JORNADA:
+            anterior = momento.date() - timedelta(days=1)
+            momento = timezone.make_aware(datetime.combine(anterior, fin_jornada))
+        elif momento.hour >= HORA_FIN_JORNADA:
+            momento = timezone.make_aware(datetime.combine(momento.date(), fin_jornada))
+        velocidad = max(0.0, azar.gauss(25, 12)) if azar.random() > 0.2 else 0.0
+        paso = velocidad / 111000 * SEGUNDOS_ENTRE_UBICACIONES / 3.6
+        latitud += azar.uniform(-paso, paso)
+        longitud += azar.uniform(-paso, paso)
+        minutos_jornada = (momento.hour - HORA_INICIO_JORNADA) * 60 + momento.minute
+        yield UbicacionCamion(
+            conductor_id=conductor_id,
+            latitud=Decimal(f'{latitud:.8f}'),
+            longitud=Decimal(f'{longitud:.8f}'),
+            velocidad=Decimal(f'{velocidad:.2f}'),
+            bateria=max(5, 100 - minutos_jornada // 9),
+            senal_gps=azar.choice(['Buena', 'Buena', 'Buena', 'Regular', 'Mala']),
+            timestamp=momento,
+            activo=n == 0,
+        )
+        momento -= timedelta(seconds=SEGUNDOS_ENTRE_UBICACIONES)
+
+
+def sembrar_recorrido(numero, conductor_id, cantidad, semilla, referencia, lote, copiar):
+    with transaction.atomic():
+        _insertar(UbicacionCamion, recorrido_conductor(numero, conductor_id, cantidad, semilla, referencia),
+                  lote, copiar, campo_fecha='timestamp')
+    return {'ubicaciones': cantidad}
+
+
+def _inicializar_proceso():
+    """Prepara Django en cada proceso del pool (necesario con 'spawn')."""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def sembrar(clientes=100, despachos=1000, pagos=None, ubicaciones=1000, conductores=3,
+            dias=365, semilla=1, lote=5000, progreso=None, fecha_referencia=None,
+            procesos=1, copiar=None):
+    """
+    Inserta los volúmenes indicados y devuelve la cantidad creada de cada modelo.
+
+    Los despachos y pagos se reparten entre los clientes de cada bloque en los
+    `dias` días previos a `fecha_referencia` (por defecto, ahora); las
+    ubicaciones, entre los conductores. `procesos` > 1 reparte los bloques en
+    un pool de procesos; `copiar` usa COPY (por defecto, solo en PostgreSQL).
+    `progreso(texto)` recibe un aviso por cada bloque terminado.
+    """
+    avisar = progreso or (lambda texto: None)
+    pagos = despachos // 4 if pagos is None else pagos
+    referencia = fecha_referencia or timezone.now()
+    copiar = usa_copy() if copiar is None else copiar
+
+    empresa, lista_conductores = usuarios_sinteticos(conductores)
+    dispositivos_sinteticos(conductores, semilla)
+    tareas = [
+        (sembrar_bloque, (numero, clientes, despachos, pagos, semilla, referencia, dias, lote, copiar, empresa.pk))
+        for numero in range((clientes + TAMANO_BLOQUE - 1) // TAMANO_BLOQUE)
+    ] + [
+        (sembrar_recorrido, (numero, conductor.pk, _parte(ubicaciones, numero, numero + 1, len(lista_conductores)),
+                             semilla, referencia, lote, copiar))
+        for numero, conductor in enumerate(lista_conductores)
+    ]
+
+    totales = {'clientes': 0, 'despachos': 0, 'pagos': 0, 'ubicaciones': 0}
+
+    def sumar(resultado):
+        for clave, valor in resultado.items():
+            totales[clave] += valor
+        avisar(', '.join(f'{valor} {clave}' for clave, valor in totales.items()))
+
+    if procesos <= 1 or len(tareas) <= 1:
+        for funcion, argumentos in tareas:
+            sumar(funcion(*argumentos))
+    else:
+        # Las conexiones abiertas no deben heredarse a los procesos hijos
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar_proceso) as pool:
+            futuros = [pool.submit(funcion, *argumentos) for funcion, argumentos in tareas]
+            for futuro in as_completed(futuros):
+                sumar(futuro.result())
+
+    transaction.on_commit(lambda: invalidar_etiquetas(*(etiqueta_modelo(m) for m in (Cliente, Despacho, Pago))))
+    return totales
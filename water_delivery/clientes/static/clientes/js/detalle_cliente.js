@@ -0,0 +1,294 @@
+// Página detalle cliente (clientes/detalle_cliente.html)
+document.addEventListener('DOMContentLoaded', function() {
+    // Inicializar tooltips
+    const tooltipTriggerList = [].slice.call(document.querySelectorAll('[data-bs-toggle="tooltip"]'));
+    tooltipTriggerList.map(function (tooltipTriggerEl) {
+        return new bootstrap.Tooltip(tooltipTriggerEl);
+    });
+});
+
+// --- Historial de despachos y pagos (carga por partes desde la API) ---
+
+function urlConId(plantilla, id) {
+    return plantilla.replace('/0/', '/' + id + '/');
+}
+
+function escaparHtml(texto) {
+    const div = document.createElement('div');
+    div.textContent = texto == null ? '' : String(texto);
+    return div.innerHTML.replace(/"/g, '&quot;');
+}
+
+function badgeEstadoDespacho(despacho, claseExtra) {
+    if (despacho.cancelado) {
+        return `<span class="status-badge success-badge ${claseExtra}"><i class="fas fa-ban me-1"></i> Cancelado</span>`;
+    }
+    if (despacho.entregado) {
+        return `<span class="status-badge success-badge ${claseExtra}"><i class="fas fa-check-circle me-1"></i> Entregado</span>`;
+    }
+    return `<span class="status-badge pending-badge ${claseExtra}"><i class="fas fa-clock me-1"></i> Pendiente</span>`;
+}
+
+function accionesDespacho(despacho, clases) {
+    const eliminar = urlConId(historial.urls.eliminarDespacho, despacho.id);
+    let principal;
+    if (!despacho.entregado) {
+        const url = urlConId(historial.urls.entregar, despacho.id);
+        principal = `<a href="${url}" class="${clases.entregar}" onclick="showConfirmEntregar('${url}', event)" title="Marcar como entregado"><i class="fas fa-check me-1"></i> Entregar</a>`;
+    } else {
+        const url = urlConId(historial.urls.pendiente, despacho.id);
+        principal = `<a href="${url}" class="${clases.pendiente}" onclick="showConfirmPendiente('${url}', event)" title="Marcar como pendiente"><i class="fas fa-undo me-1"></i> Pendiente</a>`;
+    }
+    return principal + `<a href="${eliminar}" class="${clases.eliminar}" onclick="showConfirmEliminarDespacho('${eliminar}', event)" title="Eliminar despacho"><i class="fas fa-trash me-1"></i> Eliminar</a>`;
+}
+
+function filaDespacho(despacho) {
+    const notas = escaparHtml(despacho.notas || '-');
+    return `
+        <tr class="${despacho.entregado ? '' : 'table-warning'}">
+            <td class="ps-4 py-3">
+                <div class="date-info">
+                    <div class="fw-semibold">${despacho.fecha}</div>
+                    <small class="text-muted">${despacho.hora}</small>
+                </div>
+            </td>
+            <td class="py-3"><span class="quantity-badge"><i class="fas fa-bottle-water me-1"></i> ${despacho.cantidad}</span></td>
+            <td class="py-3">${badgeEstadoDespacho(despacho, '')}</td>
+            <td class="py-3"><span class="notes-text">${notas}</span></td>
+            <td class="text-center py-3">${accionesDespacho(despacho, {
+                entregar: 'btn btn-success btn-sm',
+                pendiente: 'btn btn-warning btn-sm',
+                eliminar: 'btn btn-danger btn-sm ml-2',
+            })}</td>
+        </tr>`;
+}
+
+function tarjetaDespacho(despacho) {
+    const boton = 'px-3 py-1 rounded text-white text-xs font-semibold shadow transition flex items-center';
+    return `
+        <div class="rounded-lg border border-gray-200 p-3 shadow-sm bg-gray-50">
+            <div class="flex justify-between items-center mb-2">
+                <div>
+                    <div class="font-semibold text-gray-900">${despacho.fecha}</div>
+                    <div class="text-xs text-gray-500">${despacho.hora}</div>
+                </div>
+                <span class="quantity-badge"><i class="fas fa-bottle-water me-1"></i> ${despacho.cantidad}</span>
+            </div>
+            <div class="flex items-center gap-2 mb-1">${badgeEstadoDespacho(despacho, 'text-xs')}</div>
+            <div class="notes-text mb-2">${escaparHtml(despacho.notas || '-')}</div>
+            <div class="flex justify-end">${accionesDespacho(despacho, {
+                entregar: `${boton} bg-green-500 hover:bg-green-600`,
+                pendiente: `${boton} bg-yellow-500 hover:bg-yellow-600`,
+                eliminar: `${boton} bg-red-500 hover:bg-red-600 ml-2`,
+            })}</div>
+        </div>`;
+}
+
+function filaPago(pago) {
+    let acciones = '';
+    if (historial.puedeEditarPagos) {
+        acciones = `
+            <td class="py-2 text-center">
+                <div class="flex justify-center gap-2">
+                    <button type="button"
+                            class="px-3 py-1 bg-agua-blue text-white text-xs font-semibold rounded shadow hover:bg-agua-dark transition"
+                            data-edit-url="${urlConId(historial.urls.editarPago, pago.id)}"
+                            data-monto="${pago.monto}"
+                            data-observaciones="${escaparHtml(pago.observaciones)}"
+                            onclick="showEditarPagoModal(this)">
+                        <i class="fas fa-edit me-1"></i> Editar
+                    </button>
+                    <button type="button"
+                            class="px-3 py-1 bg-red-500 text-white text-xs font-semibold rounded shadow hover:bg-red-600 transition"
+                            data-delete-url="${urlConId(historial.urls.eliminarPago, pago.id)}"
+                            onclick="showEliminarPagoModal(this)">
+                        <i class="fas fa-trash me-1"></i> Eliminar
+                    </button>
+                </div>
+            </td>`;
+    }
+    return `
+        <tr>
+            <td class="py-2 text-center">${pago.fecha}</td>
+            <td class="py-2 text-center">$${pago.monto}</td>
+            <td class="py-2 text-center">${escaparHtml(pago.observaciones || '-')}</td>
+            ${acciones}
+        </tr>`;
+}
+
+function cargarHistorialDespachos() {
+    const tabla = document.getElementById('historial-despachos-tabla');
+    if (!tabla) {
+        return;  // Cliente sin despachos
+    }
+    const boton = document.getElementById('historial-despachos-mas');
+    const cargando = document.getElementById('historial-despachos-cargando');
+    boton.classList.add('hidden');
+    cargando.classList.remove('hidden');
+    fetch(`${historial.despachosUrl}?page=${historial.paginaDespachos + 1}`)
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                throw new Error(data.message);
+            }
+            historial.paginaDespachos = data.pagina;
+            tabla.insertAdjacentHTML('beforeend', data.despachos.map(filaDespacho).join(''));
+            document.getElementById('historial-despachos-tarjetas')
+                .insertAdjacentHTML('beforeend', data.despachos.map(tarjetaDespacho).join(''));
+            cargando.classList.add('hidden');
+            boton.classList.toggle('hidden', !data.hay_mas);
+        })
+        .catch(error => {
+            console.error('Error al cargar el historial de despachos:', error);
+            cargando.innerHTML = '<i class="fas fa-exclamation-triangle me-1"></i> No se pudo cargar el historial.';
+        });
+}
+
+function cargarHistorialPagos() {
+    const tabla = document.getElementById('historial-pagos-tabla');
+    const boton = document.getElementById('historial-pagos-mas');
+    boton.classList.add('hidden');
+    fetch(`${historial.pagosUrl}?page=${historial.paginaPagos + 1}`)
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                throw new Error(data.message);
+            }
+            historial.paginaPagos = data.pagina;
+            if (data.pagina === 1 && data.pagos.length === 0) {
+                const columnas = historial.puedeEditarPagos ? 4 : 3;
+                tabla.innerHTML = `<tr><td colspan="${columnas}" class="text-center text-gray-400 py-4">Sin pagos registrados</td></tr>`;
+                return;
+            }
+            tabla.insertAdjacentHTML('beforeend', data.pagos.map(filaPago).join(''));
+            boton.classList.toggle('hidden', !data.hay_mas);
+        })
+        .catch(error => console.error('Error al cargar el historial de pagos:', error));
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    cargarHistorialDespachos();
+    cargarHistorialPagos();
+});
+
+let despachoAEntregar = null;
+function showConfirmEntregar(url, event) {
+    if (event) event.preventDefault();
+    despachoAEntregar = url;
+    document.getElementById('confirm-entregar-modal').classList.remove('hidden');
+    return false;
+}
+function closeConfirmEntregar() {
+    despachoAEntregar = null;
+    document.getElementById('confirm-entregar-modal').classList.add('hidden');
+}
+document.getElementById('confirm-entregar-accept').onclick = function() {
+    if (despachoAEntregar) {
+        window.location.href = despachoAEntregar;
+        closeConfirmEntregar();
+    }
+};
+
+// Reemplazar el confirm nativo en el botón de entregar
+// Busca el botón y cambia el onclick
+window.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('a[data-entregar-url]').forEach(function(btn) {
+        btn.onclick = function(e) {
+            e.preventDefault();
+            despachoAEntregar = btn.getAttribute('href');
+            showConfirmEntregar(despachoAEntregar);
+            return false;
+        };
+    });
+});
+
+let despachoAPendiente = null;
+function showConfirmPendiente(url, event) {
+    if (event) event.preventDefault();
+    despachoAPendiente = url;
+    document.getElementById('confirm-pendiente-modal').classList.remove('hidden');
+    return false;
+}
+function closeConfirmPendiente() {
+    despachoAPendiente = null;
+    document.getElementById('confirm-pendiente-modal').classList.add('hidden');
+}
+document.getElementById('confirm-pendiente-accept').onclick = function() {
+    if (despachoAPendiente) {
+        window.location.href = despachoAPendiente;
+        closeConfirmPendiente();
+    }
+};
+let despachoAEliminar = null;
+function showConfirmEliminarDespacho(url, event) {
+    if (event) event.preventDefault();
+    despachoAEliminar = url;
+    document.getElementById('confirm-eliminar-despacho-modal').classList.remove('hidden');
+    return false;
+}
+function closeConfirmEliminarDespacho() {
+    despachoAEliminar = null;
+    document.getElementById('confirm-eliminar-despacho-modal').classList.add('hidden');
+}
+document.getElementById('confirm-eliminar-despacho-accept').onclick = function() {
+    if (despachoAEliminar) {
+        // Enviar un formulario POST para eliminar
+        const form = document.createElement('form');
+        form.method = 'POST';
+        form.action = despachoAEliminar;
+        const csrf = document.createElement('input');
+        csrf.type = 'hidden';
+        csrf.name = 'csrfmiddlewaretoken';
+        csrf.value = document.querySelector('[name=csrfmiddlewaretoken]').value;
+        form.appendChild(csrf);
+        document.body.appendChild(form);
+        form.submit();
+        closeConfirmEliminarDespacho();
+    }
+};
+const pagoAEditarForm = document.getElementById('edit-payment-form');
+const deletePaymentForm = document.getElementById('delete-payment-form');
+
+function showEditarPagoModal(button) {
+    if (!pagoAEditarForm || !button) {
+        return;
+    }
+    const url = button.getAttribute('data-edit-url');
+    const monto = button.getAttribute('data-monto') || '';
+    const observaciones = button.getAttribute('data-observaciones') || '';
+    pagoAEditarForm.action = url;
+    const montoInput = document.getElementById('edit-payment-monto');
+    const observacionesInput = document.getElementById('edit-payment-observaciones');
+    if (montoInput) {
+        montoInput.value = (monto || '').toString().replace(',', '.');
+    }
+    if (observacionesInput) {
+        observacionesInput.value = observaciones || '';
+    }
+    document.getElementById('edit-payment-modal').classList.remove('hidden');
+}
+
+function closeEditarPagoModal() {
+    const modal = document.getElementById('edit-payment-modal');
+    if (!modal || !pagoAEditarForm) {
+        return;
+    }
+    modal.classList.add('hidden');
+    pagoAEditarForm.reset();
+}
+
+function showEliminarPagoModal(button) {
+    if (!deletePaymentForm || !button) {
+        return;
+    }
+    const url = button.getAttribute('data-delete-url');
+    deletePaymentForm.action = url;
+    document.getElementById('delete-payment-modal').classList.remove('hidden');
+}
+
+function closeEliminarPagoModal() {
+    const modal = document.getElementById('delete-payment-modal');
+    if (modal) {
+        modal.classList.add('hidden');
+    }
+}
@@ -0,0 +1,202 @@
+// Página editar cliente (clientes/editar_cliente.html)
+document.addEventListener('DOMContentLoaded', function() {
+    const form = document.querySelector('.edit-form');
+    if (!form) return;
+
+    const submitBtn = document.getElementById('submit-btn');
+    const csrftoken = document.querySelector('[name=csrfmiddlewaretoken]').value;
+
+    // Función para mostrar errores
+    function showError(field, message) {
+        let errorDiv = field.nextElementSibling;
+        if (!errorDiv || !errorDiv.classList.contains('error-message')) {
+            errorDiv = document.createElement('div');
+            errorDiv.className = 'text-red-500 text-xs mt-1 error-message';
+            field.parentNode.insertBefore(errorDiv, field.nextSibling);
+        }
+        errorDiv.textContent = message;
+        field.classList.add('border-red-500');
+    }
+
+    // Función para limpiar errores
+    function clearError(field) {
+        field.classList.remove('border-red-500');
+        const errorDiv = field.nextElementSibling;
+        if (errorDiv && errorDiv.classList.contains('error-message')) {
+            errorDiv.remove();
+        }
+    }
+
+    // Validación en tiempo real
+    form.querySelectorAll('input[required], textarea[required]').forEach(field => {
+        field.addEventListener('blur', function() {
+            if (!this.value.trim()) {
+                showError(this, 'Este campo es obligatorio');
+            } else {
+                clearError(this);
+            }
+        });
+
+        field.addEventListener('input', function() {
+            if (this.value.trim()) {
+                clearError(this);
+            }
+        });
+    });
+
+    // Validación del precio
+    const precioInput = document.getElementById('id_precio_botellon');
+    if (precioInput) {
+        precioInput.addEventListener('blur', function() {
+            const value = parseFloat(this.value);
+            if (isNaN(value) || value < 0) {
+                showError(this, 'Ingrese un precio válido (ej: 2.50)');
+            } else if ((value * 10) % 5 !== 0) {
+                showError(this, 'El precio debe ser múltiplo de 0.50');
+            } else {
+                clearError(this);
+                this.value = value.toFixed(2);
+            }
+        });
+    }
+
+    // Función para mostrar errores del servidor
+    function showServerErrors(errors) {
+        // Limpiar errores anteriores
+        document.querySelectorAll('.error-message').forEach(el => el.remove());
+        document.querySelectorAll('.border-red-500').forEach(el => 
+            el.classList.remove('border-red-500')
+        );
+
+        // Mostrar nuevos errores
+        if (typeof errors === 'object') {
+            Object.entries(errors).forEach(([field, message]) => {
+                const input = form.querySelector(`[name="${field}"]`);
+                if (input) {
+                    showError(input, Array.isArray(message) ? message[0] : message);
+                }
+            });
+        }
+
+        // Desplazarse al primer error
+        const firstError = form.querySelector('.border-red-500');
+        if (firstError) {
+            firstError.scrollIntoView({ behavior: 'smooth', block: 'center' });
+        }
+    }
+
+    // Envío del formulario
+    form.addEventListener('submit', async function(e) {
+        e.preventDefault();
+        console.log('Iniciando envío del formulario');
+
+        // Validar campos requeridos
+        let isValid = true;
+        form.querySelectorAll('[required]').forEach(field => {
+            if (!field.value.trim()) {
+                showError(field, 'Este campo es obligatorio');
+                isValid = false;
+            }
+        });
+
+        // Validar precio
+        if (precioInput) {
+            const value = parseFloat(precioInput.value);
+            if (isNaN(value) || value < 0) {
+                showError(precioInput, 'Ingrese un precio válido (ej: 2.50)');
+                isValid = false;
+            } else if ((value * 100) % 5 !== 0) {
+                showError(precioInput, 'El precio debe ser múltiplo de 0.05 (ej: 2.50, 2.55)');
+                isValid = false;
+            } else {
+                precioInput.value = value.toFixed(2);
+            }
+        }
+
+        if (!isValid) {
+            // Desplazarse al primer error
+            const firstError = form.querySelector('.border-red-500');
+            if (firstError) {
+                firstError.scrollIntoView({ behavior: 'smooth', block: 'center' });
+            }
+            return false;
+        }
+
+        // Deshabilitar botón
+        if (submitBtn) {
+            submitBtn.disabled = true;
+            submitBtn.innerHTML = '<i class="fas fa-spinner fa-spin me-2"></i> Guardando...';
+            submitBtn.classList.add('opacity-75', 'cursor-not-allowed');
+        }
+
+        try {
+            const formData = new FormData(form);
+            console.log('Enviando datos del formulario:', Object.fromEntries(formData.entries()));
+
+            const response = await fetch(form.action, {
+                method: 'POST',
+                headers: {
+                    'X-CSRFToken': csrftoken,
+                    'X-Requested-With': 'XMLHttpRequest',
+                    'Accept': 'application/json'
+                },
+                body: formData
+            });
+
+            console.log('Respuesta del servidor:', response.status);
+
+            if (response.status === 400) {
+                // Manejar errores de validación
+                const data = await response.json();
+                console.log('Errores de validación:', data);
+                showServerErrors(data.errors || data);
+
+                if (submitBtn) {
+                    submitBtn.disabled = false;
+                    submitBtn.innerHTML = '<i class="fas fa-save me-2"></i> Guardar Cambios';
+                    submitBtn.classList.remove('opacity-75', 'cursor-not-allowed');
+                }
+
+                // Mostrar mensaje de error general si existe
+                if (data.error) {
+                    alert(data.error);
+                }
+
+                return;
+            }
+
+            if (!response.ok) {
+                throw new Error('Error en la respuesta del servidor');
+            }
+
+            const data = await response.json();
+            console.log('Respuesta exitosa:', data);
+
+            if (data.success) {
+                // Redirigir a la página de detalle del cliente
+                window.location.href = data.redirect_url || URL_DETALLE_CLIENTE;
+            } else {
+                // Mostrar errores del servidor
+                showServerErrors(data.errors || data);
+                if (submitBtn) {
+                    submitBtn.disabled = false;
+                    submitBtn.innerHTML = '<i class="fas fa-save me-2"></i> Guardar Cambios';
+                    submitBtn.classList.remove('opacity-75', 'cursor-not-allowed');
+                }
+
+                if (data.error) {
+                    alert(data.error);
+                }
+            }
+        } catch (error) {
+            console.error('Error al enviar el formulario:', error);
+            alert('Error de conexión. Por favor, intente nuevamente.');
+
+            if (submitBtn) {
+                submitBtn.disabled = false;
+                submitBtn.innerHTML = '<i class="fas fa-save me-2"></i> Guardar Cambios';
+                submitBtn.classList.remove('opacity-75', 'cursor-not-allowed');
+            }
+        }
+    });
+});
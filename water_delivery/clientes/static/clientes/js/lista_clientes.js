@@ -0,0 +1,142 @@
+// Página lista clientes (clientes/lista_clientes.html)
+document.addEventListener('DOMContentLoaded', function() {
+    const tooltipTriggerList = [].slice.call(document.querySelectorAll('[data-bs-toggle="tooltip"]'));
+    tooltipTriggerList.map(function (tooltipTriggerEl) {
+        return new bootstrap.Tooltip(tooltipTriggerEl);
+    });
+
+    const alerts = document.querySelectorAll('.alert');
+    alerts.forEach(alert => {
+        setTimeout(() => {
+            const bsAlert = new bootstrap.Alert(alert);
+            bsAlert.close();
+        }, 8000);
+    });
+
+    const rows = document.querySelectorAll('.client-row');
+    rows.forEach((row, index) => {
+        row.style.opacity = '0';
+        row.style.transform = 'translateY(20px)';
+        setTimeout(() => {
+            row.style.transition = 'all 0.3s ease';
+            row.style.opacity = '1';
+            row.style.transform = 'translateY(0)';
+        }, index * 100);
+    });
+});
+
+function focusSearch() {
+    const select = $('#cliente-busqueda-select');
+    if (select.length) {
+        select.select2('open');
+    }
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    if (window.location.hash === '#search') {
+        const select = $('#cliente-busqueda-select');
+        if (select.length) {
+            select.select2('open');
+        }
+    }
+});
+
+$(document).ready(function() {
+    const clienteSelect = $('#cliente-busqueda-select');
+    const form = document.getElementById('busqueda-clientes-form');
+    const searchInput = document.getElementById('buscar-hidden');
+    const clienteIdInput = document.getElementById('cliente-id-hidden');
+
+    if (!clienteSelect.length) {
+        return;
+    }
+
+    clienteSelect.select2({
+        placeholder: 'Seleccionar cliente...',
+        allowClear: true,
+        width: '100%',
+        language: {
+            noResults: function() {
+                return 'No se encontraron clientes';
+            },
+            searching: function() {
+                return 'Buscando...';
+            }
+        },
+        templateResult: function(data) {
+            if (!data.id) return data.text;
+            const option = $(data.element);
+            const nombre = option.data('display-name');
+            const direccion = option.data('direccion');
+            const telefono = option.data('telefono');
+            const telefonoHtml = telefono ? `<div class="select2-option-subtext"><i class="fas fa-phone-alt"></i>${telefono}</div>` : '';
+            return $(`
+                <div class="select2-option">
+                    <div class="select2-option-title"><i class="fas fa-user mr-2 text-green-500"></i>${nombre}</div>
+                    <div class="select2-option-subtext"><i class="fas fa-map-marker-alt"></i>${direccion}</div>
+                    ${telefonoHtml}
+                </div>
+            `);
+        },
+        templateSelection: function(data) {
+            if (!data.id) return data.text;
+            const option = $(data.element);
+            const nombre = option.data('display-name');
+            return $('<span><i class="fas fa-user mr-2 text-green-500"></i>' + nombre + '</span>');
+        }
+    });
+
+    const selectedOption = clienteSelect.find('option:selected');
+    if (selectedOption.length && searchInput) {
+        const searchValue = selectedOption.data('search') || '';
+        if (searchValue && !searchInput.value) {
+            searchInput.value = searchValue;
+        }
+        if (clienteIdInput && !clienteIdInput.value) {
+            clienteIdInput.value = selectedOption.val();
+        }
+    }
+
+    clienteSelect.on('change', function() {
+        if (!searchInput) return;
+        const option = $(this).find(':selected');
+        const value = option.data('search') || '';
+
+        searchInput.value = value;
+        if (clienteIdInput) {
+            clienteIdInput.value = option.val() || '';
+        }
+        if (form) {
+            form.submit();
+        }
+    });
+
+    clienteSelect.on('select2:clear', function() {
+        if (!searchInput) return;
+        searchInput.value = '';
+        if (clienteIdInput) {
+            clienteIdInput.value = '';
+        }
+        if (form) {
+            form.submit();
+        }
+    });
+});
+
+function showConfirmModal(link, accion, event) {
+  event.preventDefault();
+  const modal = document.getElementById('confirm-modal');
+  const confirmBtn = document.getElementById('confirm-action');
+
+  document.getElementById('modal-text').textContent = `¿Estás seguro que deseas ${accion.toLowerCase()} este cliente?`;
+
+  confirmBtn.onclick = function() {
+    window.location.href = link.href;
+  };
+
+  modal.classList.remove('hidden');
+}
+
+function closeConfirmModal() {
+  document.getElementById('confirm-modal').classList.add('hidden');
+}
@@ -0,0 +1,215 @@
+// Página nuevo cliente (clientes/nuevo_cliente.html)
+// Validaciones en tiempo real para el formulario de cliente
+document.addEventListener('DOMContentLoaded', function() {
+    const form = document.getElementById('cliente-form');
+    const nombreInput = document.getElementById('id_nombre');
+    const apellidoInput = document.getElementById('id_apellido');
+    const direccionInput = document.getElementById('id_direccion');
+    const telefonoInput = document.getElementById('id_telefono');
+    const precioInput = document.getElementById('id_precio_botellon');
+
+    // Función para mostrar errores
+    function showError(elementId, message) {
+        const errorDiv = document.getElementById(elementId);
+        errorDiv.textContent = message;
+        errorDiv.classList.remove('hidden');
+    }
+
+    // Función para ocultar errores
+    function hideError(elementId) {
+        const errorDiv = document.getElementById(elementId);
+        errorDiv.classList.add('hidden');
+    }
+
+    // Validación de nombre
+    if (nombreInput) {
+        nombreInput.addEventListener('input', function() {
+            const value = this.value.trim();
+
+            if (value.length === 0) {
+                showError('nombre-error', 'El nombre es obligatorio.');
+                this.classList.add('border-red-500');
+                this.classList.remove('border-green-500');
+            } else if (value.length < 2) {
+                showError('nombre-error', 'El nombre debe tener al menos 2 caracteres.');
+                this.classList.add('border-red-500');
+                this.classList.remove('border-green-500');
+            } else if (value.length > 50) {
+                showError('nombre-error', 'El nombre no puede tener más de 50 caracteres.');
+                this.classList.add('border-red-500');
+                this.classList.remove('border-green-500');
+            } else if (!/^[A-Za-záéíóúÁÉÍÓÚñÑ\s]+$/.test(value)) {
+                showError('nombre-error', 'El nombre solo puede contener letras y espacios.');
+                this.classList.add('border-red-500');
+                this.classList.remove('border-green-500');
+            } else {
+                hideError('nombre-error');
+                this.classList.remove('border-red-500');
+                this.classList.add('border-green-500');
+            }
+        });
+    }
+
+    // Validación de apellido
+    if (apellidoInput) {
+        apellidoInput.addEventListener('input', function() {
+            const value = this.value.trim();
+
+            if (value.length === 0) {
+                showError('apellido-error', 'El apellido es obligatorio.');
+                this.classList.add('border-red-500');
+                this.classList.remove('border-green-500');
+            } else if (value.length < 2) {
+                showError('apellido-error', 'El apellido debe tener al menos 2 caracteres.');
+                this.classList.add('border-red-500');
+                this.classList.remove('border-green-500');
+            } else if (value.length > 50) {
+                showError('apellido-error', 'El apellido no puede tener más de 50 caracteres.');
+                this.classList.add('border-red-500');
+                this.classList.remove('border-green-500');
+            } else if (!/^[A-Za-záéíóúÁÉÍÓÚñÑ\s]+$/.test(value)) {
+                showError('apellido-error', 'El apellido solo puede contener letras y espacios.');
+                this.classList.add('border-red-500');
+                this.classList.remove('border-green-500');
+            } else {
+                hideError('apellido-error');
+                this.classList.remove('border-red-500');
+                this.classList.add('border-green-500');
+            }
+        });
+    }
+
+    // Validación de dirección
+    if (direccionInput) {
+        direccionInput.addEventListener('input', function() {
+            const value = this.value.trim();
+
+            if (value.length === 0) {
+                showError('direccion-error', 'La dirección es obligatoria.');
+                this.classList.add('border-red-500');
+                this.classList.remove('border-green-500');
+            } else if (value.length < 10) {
+                showError('direccion-error', 'La dirección debe tener al menos 10 caracteres.');
+                this.classList.add('border-red-500');
+                this.classList.remove('border-green-500');
+            } else if (value.length > 200) {
+                showError('direccion-error', 'La dirección no puede tener más de 200 caracteres.');
+                this.classList.add('border-red-500');
+                this.classList.remove('border-green-500');
+            } else {
+                hideError('direccion-error');
+                this.classList.remove('border-red-500');
+                this.classList.add('border-green-500');
+            }
+        });
+    }
+
+    // Validación de teléfono
+    if (telefonoInput) {
+        telefonoInput.addEventListener('input', function() {
+            const value = this.value.trim();
+
+            if (value.length === 0) {
+                hideError('telefono-error');
+                this.classList.remove('border-red-500', 'border-green-500');
+                return; // Teléfono es opcional
+            }
+
+            if (value.length > 13) {
+                showError('telefono-error', 'El teléfono no puede tener más de 13 caracteres.');
+                this.classList.add('border-red-500');
+                this.classList.remove('border-green-500');
+            } else if (!/^[0-9+\-\s()]+$/.test(value)) {
+                showError('telefono-error', 'El teléfono solo puede contener números, espacios, guiones, paréntesis y +.');
+                this.classList.add('border-red-500');
+                this.classList.remove('border-green-500');
+            } else {
+                const digitos = value.match(/\d/g);
+                if (digitos && digitos.length < 7) {
+                    showError('telefono-error', 'El teléfono debe tener al menos 7 dígitos.');
+                    this.classList.add('border-red-500');
+                    this.classList.remove('border-green-500');
+                } else if (digitos && digitos.length > 11) {
+                    showError('telefono-error', 'El teléfono no puede tener más de 11 dígitos.');
+                    this.classList.add('border-red-500');
+                    this.classList.remove('border-green-500');
+                } else {
+                    hideError('telefono-error');
+                    this.classList.remove('border-red-500');
+                    this.classList.add('border-green-500');
+                }
+            }
+        });
+    }
+
+    // Validación de precio
+    if (precioInput) {
+        precioInput.addEventListener('input', function() {
+            let value = this.value.replace(',', '.');
+            this.value = value;
+
+            if (value.length === 0) {
+                hideError('precio-error');
+                this.classList.remove('border-red-500', 'border-green-500');
+                return;
+            }
+
+            const precio = parseFloat(value);
+
+            if (isNaN(precio)) {
+                showError('precio-error', 'El precio debe ser un número válido.');
+                this.classList.add('border-red-500');
+                this.classList.remove('border-green-500');
+            } else if (precio < 0) {
+                showError('precio-error', 'El precio no puede ser negativo.');
+                this.classList.add('border-red-500');
+                this.classList.remove('border-green-500');
+            } else if (precio > 999.99) {
+                showError('precio-error', 'El precio no puede ser mayor a $999.99.');
+                this.classList.add('border-red-500');
+                this.classList.remove('border-green-500');
+            } else {
+                hideError('precio-error');
+                this.classList.remove('border-red-500');
+                this.classList.add('border-green-500');
+            }
+        });
+    }
+
+    // Validación del formulario antes de enviar
+    form.addEventListener('submit', function(e) {
+        let hasErrors = false;
+
+        // Validar nombre
+        if (nombreInput && nombreInput.value.trim().length < 2) {
+            showError('nombre-error', 'El nombre debe tener al menos 2 caracteres.');
+            hasErrors = true;
+        }
+
+        // Validar apellido
+        if (apellidoInput && apellidoInput.value.trim().length < 2) {
+            showError('apellido-error', 'El apellido debe tener al menos 2 caracteres.');
+            hasErrors = true;
+        }
+
+        // Validar dirección
+        if (direccionInput && direccionInput.value.trim().length < 10) {
+            showError('direccion-error', 'La dirección debe tener al menos 10 caracteres.');
+            hasErrors = true;
+        }
+
+        // Validar precio
+        if (precioInput) {
+            const precio = parseFloat(precioInput.value.replace(',', '.'));
+            if (isNaN(precio) || precio < 0 || precio > 999.99) {
+                showError('precio-error', 'El precio debe ser un número válido entre 0 y 999.99.');
+                hasErrors = true;
+            }
+        }
+
+        if (hasErrors) {
+            e.preventDefault();
+            alert('Por favor, corrige los errores antes de enviar el formulario.');
+        }
+    });
+});
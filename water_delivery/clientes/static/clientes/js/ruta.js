@@ -0,0 +1,702 @@
+// Página ruta (clientes/ruta.html)
+// Variables globales
+let map;
+let truckMarker;
+let accuracyCircle;
+let totalDistance = 0; // Distancia total recorrida en metros
+let lastLocation = null; // Última ubicación para calcular distancia
+let userType = null; // Tipo de usuario (conductor/empresa)
+let workDayStart = null; // Inicio del día de trabajo
+let lastActivityTime = null; // Última actividad del usuario
+
+// Forzar actualización del nombre del conductor
+function forceUpdateConductorName() {
+    // Intentar cargar el nombre del conductor inmediatamente
+    loadConductorInfo();
+
+    // También intentar después de un pequeño delay
+    setTimeout(() => {
+        loadConductorInfo();
+    }, 1000);
+
+    // Y después de 3 segundos por si acaso
+    setTimeout(() => {
+        loadConductorInfo();
+    }, 3000);
+}
+
+// Inicialización cuando el DOM esté listo
+document.addEventListener('DOMContentLoaded', function() {
+    // La inicialización se hace en el script de verificación de Leaflet
+    console.log('DOM cargado, esperando Leaflet...');
+
+    // Forzar actualización del nombre del conductor
+    forceUpdateConductorName();
+});
+
+// Verificar y corregir la precisión del marcador
+function verifyMarkerPosition() {
+    if (!truckMarker || !window.lastKnownLocation) {
+        console.log('No hay marcador o ubicación conocida');
+        return;
+    }
+
+    const currentPosition = truckMarker.getLatLng();
+    const expectedPosition = window.lastKnownLocation;
+
+    console.log('Verificando posición del marcador:');
+    console.log('- Posición actual:', currentPosition);
+    console.log('- Posición esperada:', expectedPosition);
+
+    // Si hay diferencia, corregir
+    if (currentPosition.lat !== expectedPosition[0] || currentPosition.lng !== expectedPosition[1]) {
+        console.log('Corrigiendo posición del marcador...');
+        truckMarker.setLatLng(expectedPosition);
+        map.setView(expectedPosition, 16);
+    }
+}
+
+// Función de debug para verificar el marcador
+function debugMarker() {
+    const markerInfo = {
+        exists: !!truckMarker,
+        position: truckMarker ? truckMarker.getLatLng() : null,
+        isVisible: truckMarker ? truckMarker.getElement() : null,
+        mapCenter: map ? map.getCenter() : null,
+        lastKnownLocation: window.lastKnownLocation || 'No disponible',
+        accuracyCircle: !!accuracyCircle,
+        accuracyRadius: accuracyCircle ? accuracyCircle.getRadius() : null
+    };
+
+    console.log('=== DEBUG DEL MARCADOR ===');
+    console.log('Estado del marcador:', markerInfo);
+
+    // Verificar precisión del marcador
+    verifyMarkerPosition();
+
+    // Mostrar alerta con información del marcador
+    let alertMessage = `🔍 DEBUG DEL MARCADOR\n\n`;
+    alertMessage += `✅ Existe: ${markerInfo.exists ? 'Sí' : 'No'}\n`;
+    alertMessage += `📍 Posición: ${markerInfo.position ? `${markerInfo.position.lat.toFixed(6)}, ${markerInfo.position.lng.toFixed(6)}` : 'No disponible'}\n`;
+    alertMessage += `👁️ Visible: ${markerInfo.isVisible ? 'Sí' : 'No'}\n`;
+    alertMessage += `🗺️ Centro del mapa: ${markerInfo.mapCenter ? `${markerInfo.mapCenter.lat.toFixed(6)}, ${markerInfo.mapCenter.lng.toFixed(6)}` : 'No disponible'}\n`;
+    alertMessage += `💾 Última ubicación conocida: ${markerInfo.lastKnownLocation}\n`;
+    alertMessage += `⭕ Círculo de precisión: ${markerInfo.accuracyCircle ? 'Sí' : 'No'}\n`;
+    alertMessage += `📏 Radio de precisión: ${markerInfo.accuracyRadius ? `${markerInfo.accuracyRadius}m` : 'No disponible'}`;
+
+    alert(alertMessage);
+
+    if (truckMarker) {
+        // Forzar la actualización del marcador
+        truckMarker.setLatLng(truckMarker.getLatLng());
+        console.log('✅ Marcador actualizado');
+    }
+
+    console.log('=== FIN DEBUG ===');
+}
+
+// Inicializar el mapa
+function initializeMap() {
+    // Coordenadas por defecto (Venezuela)
+    const defaultLocation = [10.4806, -66.9036];
+
+    // Crear el mapa con OpenStreetMap
+    map = L.map('map').setView(defaultLocation, 12);
+
+    // Agregar capa de OpenStreetMap
+    L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+        attribution: '© OpenStreetMap contributors',
+        maxZoom: 18
+    }).addTo(map);
+
+    // Crear marcador del camión como círculo azul
+    truckMarker = L.circle(defaultLocation, {
+        color: '#0891b2',
+        fillColor: '#0891b2',
+        fillOpacity: 0.8,
+        radius: 20, // Radio en metros
+        weight: 3
+    }).addTo(map);
+
+    // Debug del marcador (deshabilitado)
+    // setTimeout(debugMarker, 1000);
+
+    // Intentar obtener la ubicación real del usuario al inicializar
+    getMyLocation();
+}
+
+// Calcular distancia entre dos puntos (fórmula de Haversine)
+function calculateDistance(lat1, lon1, lat2, lon2) {
+    const R = 6371e3; // Radio de la Tierra en metros
+    const φ1 = lat1 * Math.PI/180;
+    const φ2 = lat2 * Math.PI/180;
+    const Δφ = (lat2-lat1) * Math.PI/180;
+    const Δλ = (lon2-lon1) * Math.PI/180;
+    const a = Math.sin(Δφ/2) * Math.sin(Δφ/2) +
+            Math.cos(φ1) * Math.cos(φ2) *
+            Math.sin(Δλ/2) * Math.sin(Δλ/2);
+    const c = 2 * Math.atan2(Math.sqrt(a), Math.sqrt(1-a));
+    return R * c; // Distancia en metros
+}
+
+// Cargar despachos de hoy desde la API
+async function loadDespachosHoy() {
+    // Esta función ya no es necesaria en la ruta del camión
+    // Los despachos se muestran en el header principal
+    console.log('ℹ️ Despachos de hoy se muestran en el header principal');
+}
+
+// Actualizar despachos periódicamente
+function startDespachosUpdate() {
+    // Esta función ya no es necesaria en la ruta del camión
+    console.log('ℹ️ Actualización de despachos manejada por el header principal');
+}
+
+// Cargar información del usuario conductor conectado
+async function loadConductorInfo() {
+    try {
+        const response = await fetch('/clientes/api/conductor-info/');
+        const data = await response.json();
+
+        if (data.success) {
+            const conductorName = data.conductor_name || 'Usuario';
+            const driverNameElement = document.getElementById('driver-name');
+            if (driverNameElement) {
+                driverNameElement.textContent = `Conductor: ${conductorName}`;
+                console.log('✅ Información del conductor cargada:', conductorName);
+            } else {
+                console.error('❌ Elemento driver-name no encontrado');
+            }
+        } else {
+            console.error('❌ Error cargando información del conductor:', data.message);
+            // Fallback: usar nombre por defecto
+            const driverNameElement = document.getElementById('driver-name');
+            if (driverNameElement) {
+                driverNameElement.textContent = 'Conductor: Usuario';
+            }
+        }
+    } catch (error) {
+        console.error('❌ Error en la petición del conductor:', error);
+        // Fallback: usar nombre por defecto
+        const driverNameElement = document.getElementById('driver-name');
+        if (driverNameElement) {
+            driverNameElement.textContent = 'Conductor: Usuario';
+        }
+    }
+}
+
+// Actualizar distancia recorrida
+function updateDistanceTraveled(newLat, newLng) {
+    // Verificar si es un nuevo día de trabajo
+    isNewWorkDay();
+
+    // Solo actualizar distancia si es conductor
+    if (userType !== 'conductor') {
+        return;
+    }
+
+    if (lastLocation) {
+        const distance = calculateDistance(
+            lastLocation.lat, 
+            lastLocation.lng, 
+            newLat, 
+            newLng
+        );
+
+        // Solo agregar si la distancia es significativa (más de 10 metros)
+        if (distance > 10) {
+            totalDistance += distance;
+            console.log(`📏 Distancia agregada: ${distance.toFixed(2)}m, Total: ${totalDistance.toFixed(2)}m`);
+        }
+    }
+
+    // Actualizar última ubicación
+    lastLocation = { lat: newLat, lng: newLng };
+
+    // Actualizar tiempo de actividad
+    updateLastActivity();
+
+    // Actualizar display de distancia con formato mejorado
+    const distanceElement = document.getElementById('distance-traveled');
+    if (distanceElement) {
+        if (totalDistance < 1000) {
+            // Si es menos de 1km, mostrar en metros redondeados
+            distanceElement.textContent = `${Math.round(totalDistance)}m`;
+        } else if (totalDistance < 10000) {
+            // Si es entre 1km y 10km, mostrar con un decimal
+            distanceElement.textContent = `${(totalDistance/1000).toFixed(1)}km`;
+        } else {
+            // Si es más de 10km, mostrar sin decimales
+            distanceElement.textContent = `${Math.round(totalDistance/1000)}km`;
+        }
+    }
+}
+
+// Cargar estado del conductor
+function loadDriverStatus() {
+    // Simular datos del conductor (aquí se conectaría con la API real)
+    const driverData = {
+        name: 'Carlos Pérez',
+        status: 'En línea',
+        lastSeen: 'hace 2 minutos',
+        location: 'Ubicación actual',
+        signal: 'Buena'
+    };
+
+    // El nombre se cargará desde la API
+    // document.getElementById('driver-name').textContent = `Conductor: ${driverData.name}`;
+    document.getElementById('driver-status-text').textContent = driverData.status;
+
+    // Actualizar tiempo de última actividad
+    updateLastActivity();
+
+    // Actualizar información adicional si existe
+    const driverInfoContainer = document.getElementById('driver-info');
+    if (driverInfoContainer) {
+        driverInfoContainer.innerHTML = `
+            <div class="space-y-2 text-sm">
+                <div class="flex justify-between">
+                    <span class="text-gray-600">Señal GPS:</span>
+                    <span class="font-semibold ${driverData.signal === 'Buena' ? 'text-green-600' : driverData.signal === 'Regular' ? 'text-yellow-600' : 'text-red-600'}">${driverData.signal}</span>
+                </div>
+                <div class="flex justify-between">
+                    <span class="text-gray-600">Distancia recorrida:</span>
+                    <span class="font-semibold text-green-600" id="distance-traveled">0m</span>
+                </div>
+                <div class="text-xs text-gray-500 mt-2">
+                    <i class="fas fa-info-circle mr-1"></i>
+                    "En línea" indica que el usuario está activo en el sistema
+                </div>
+            </div>
+        `;
+    }
+}
+
+// Cargar próximos despachos
+function loadNextDeliveries() {
+    // Simular datos de despachos (aquí se conectaría con la API real)
+    const deliveries = [
+        { id: 1, client: 'Juan Pérez', address: 'Calle 123, Caracas', time: '14:30' },
+        { id: 2, client: 'María García', address: 'Av. Principal, Caracas', time: '15:00' }
+    ];
+
+    const container = document.getElementById('next-deliveries');
+
+    if (deliveries.length === 0) {
+        container.innerHTML = `
+            <div class="text-center py-4 text-gray-500">
+                <i class="fas fa-truck text-2xl mb-2"></i>
+                <p class="text-sm">No hay despachos pendientes</p>
+            </div>
+        `;
+    } else {
+        container.innerHTML = deliveries.map(delivery => `
+            <div class="bg-gray-50 rounded-lg p-3">
+                <div class="flex justify-between items-start">
+                    <div class="flex-1">
+                        <h5 class="text-sm font-semibold text-gray-900">${delivery.client}</h5>
+                        <p class="text-xs text-gray-600">${delivery.address}</p>
+                    </div>
+                    <span class="text-xs bg-agua-blue text-white px-2 py-1 rounded">${delivery.time}</span>
+                </div>
+            </div>
+        `).join('');
+    }
+}
+
+// Actualizar tiempo de última actualización
+function updateLastUpdate() {
+    const now = new Date();
+    const timeString = now.toLocaleTimeString('es-VE', { 
+        hour: '2-digit', 
+        minute: '2-digit' 
+    });
+    document.getElementById('update-time').textContent = `Última actualización: ${timeString}`;
+}
+
+// Limpiar mensajes de precisión anteriores
+function clearPrecisionMessages() {
+    const existingMessages = document.querySelectorAll('.bg-green-100.border.border-green-400');
+    existingMessages.forEach(message => message.remove());
+}
+
+// Obtener dirección real usando coordenadas
+async function getAddressFromCoords(lat, lng) {
+    try {
+        const response = await fetch(`https://nominatim.openstreetmap.org/reverse?format=json&lat=${lat}&lon=${lng}&zoom=18&addressdetails=1`);
+        const data = await response.json();
+
+        if (data.display_name) {
+            // Extraer solo la parte más relevante de la dirección
+            const addressParts = data.display_name.split(',');
+            return addressParts.slice(0, 3).join(', '); // Tomar solo las primeras 3 partes
+        }
+        return 'Ubicación actual';
+    } catch (error) {
+        console.error('Error obteniendo dirección:', error);
+        return 'Ubicación actual';
+    }
+}
+
+// Actualizar información del conductor con ubicación real
+async function updateDriverLocation(lat, lng) {
+    const address = await getAddressFromCoords(lat, lng);
+
+    const driverInfoContainer = document.getElementById('driver-info');
+    if (driverInfoContainer) {
+        driverInfoContainer.innerHTML = `
+            <div class="space-y-2 text-sm">
+                <div class="flex justify-between">
+                    <span class="text-gray-600">Señal GPS:</span>
+                    <span class="font-semibold text-green-600">Buena</span>
+                </div>
+                <div class="flex justify-between">
+                    <span class="text-gray-600">Distancia recorrida:</span>
+                    <span class="font-semibold text-green-600" id="distance-traveled">0m</span>
+                </div>
+                <div class="flex justify-between">
+                    <span class="text-gray-600">Ubicación:</span>
+                    <span class="font-semibold text-gray-800 text-xs">${address}</span>
+                </div>
+            </div>
+        `;
+    }
+}
+
+// Centrar marcador en ubicación exacta
+function centerMarkerOnLocation(lat, lng) {
+    if (!truckMarker) {
+        console.error('No hay marcador disponible');
+        return;
+    }
+
+    const exactLocation = [lat, lng];
+
+    // Actualizar distancia recorrida
+    updateDistanceTraveled(lat, lng);
+
+    // Posicionar marcador en ubicación exacta
+    truckMarker.setLatLng(exactLocation);
+
+    // Centrar mapa en la ubicación exacta
+    map.setView(exactLocation, 16);
+
+    // Guardar ubicación exacta
+    window.lastKnownLocation = exactLocation;
+
+    console.log('✅ Marcador centrado en ubicación exacta:', exactLocation);
+}
+
+// Seguimiento continuo de ubicación
+function startContinuousTracking() {
+    if (navigator.geolocation) {
+        // Configurar seguimiento continuo
+        navigator.geolocation.watchPosition(
+            function(position) {
+                const lat = position.coords.latitude;
+                const lng = position.coords.longitude;
+                const accuracy = position.coords.accuracy;
+
+                console.log('📍 Ubicación actualizada:', { lat, lng, accuracy });
+
+                // Actualizar marcador sin mostrar mensajes
+                centerMarkerOnLocation(lat, lng);
+
+                // Actualizar círculo de precisión
+                if (accuracyCircle) {
+                    map.removeLayer(accuracyCircle);
+                }
+
+                accuracyCircle = L.circle([lat, lng], {
+                    color: '#3B82F6',
+                    fillColor: '#3B82F6',
+                    fillOpacity: 0.2,
+                    radius: accuracy
+                }).addTo(map);
+
+                // Actualizar timestamp
+                updateLastUpdate();
+
+                // Enviar ubicación al servidor
+                saveLocationToServer(lat, lng, accuracy);
+            },
+            function(error) {
+                console.error('Error en seguimiento continuo:', error);
+            },
+            {
+                enableHighAccuracy: true,
+                timeout: 10000,
+                maximumAge: 30000 // Actualizar cada 30 segundos
+            }
+        );
+
+        console.log('🔄 Seguimiento continuo iniciado');
+    }
+}
+
+// Obtener ubicación real del usuario
+function getMyLocation() {
+    // Verificar si es conductor
+    if (userType !== 'conductor') {
+        showMessage('Solo los conductores pueden usar la función de ubicación', 'error');
+        return;
+    }
+
+    if (navigator.geolocation) {
+        showMessage('Obteniendo tu ubicación...', 'info');
+
+        navigator.geolocation.getCurrentPosition(
+            async function(position) {
+                const lat = position.coords.latitude;
+                const lng = position.coords.longitude;
+                const accuracy = position.coords.accuracy;
+
+                console.log('Ubicación real obtenida:', { lat, lng, accuracy });
+
+                // Limpiar mensajes anteriores
+                clearPrecisionMessages();
+
+                // Centrar marcador en ubicación exacta
+                centerMarkerOnLocation(lat, lng);
+
+                // Crear o actualizar círculo de precisión (solo azul, no verde)
+                if (accuracyCircle) {
+                    map.removeLayer(accuracyCircle);
+                }
+
+                accuracyCircle = L.circle([lat, lng], {
+                    color: '#3B82F6',
+                    fillColor: '#3B82F6',
+                    fillOpacity: 0.2,
+                    radius: accuracy // Radio en metros
+                }).addTo(map);
+
+                // Actualizar información del conductor con ubicación real
+                await updateDriverLocation(lat, lng);
+
+                // Mostrar información de precisión en el header
+                const precisionElement = document.createElement('div');
+                precisionElement.className = 'bg-green-100 border border-green-400 text-green-700 px-4 py-3 rounded mb-4 animate-fade-in precision-message';
+                precisionElement.innerHTML = `
+                    <div class="flex items-center justify-between">
+                        <div class="flex items-center">
+                            <i class="fas fa-check-circle mr-2"></i>
+                            <span>Seguimiento activo - Precisión: ±${Math.round(accuracy)}m</span>
+                        </div>
+                        <button onclick="this.parentElement.parentElement.remove()" class="text-green-600 hover:text-green-800">
+                            <i class="fas fa-times"></i>
+                        </button>
+                    </div>
+                `;
+
+                // Insertar el mensaje de precisión después del header
+                const header = document.querySelector('.header-container');
+                if (header && !document.querySelector('.precision-message')) {
+                    header.parentNode.insertBefore(precisionElement, header.nextSibling);
+
+                    // Auto-ocultar después de 5 segundos
+                    setTimeout(() => {
+                        if (precisionElement.parentNode) {
+                            precisionElement.style.transition = 'opacity 0.5s ease-out';
+                            precisionElement.style.opacity = '0';
+                            setTimeout(() => {
+                                if (precisionElement.parentNode) {
+                                    precisionElement.remove();
+                                }
+                            }, 500);
+                        }
+                    }, 5000);
+                }
+
+                // Actualizar timestamp
+                updateLastUpdate();
+
+                // Aquí podrías enviar la ubicación al servidor
+                saveLocationToServer(lat, lng, accuracy);
+
+                // Iniciar seguimiento continuo
+                startContinuousTracking();
+
+                // NO ejecutar debug automáticamente aquí
+            },
+            function(error) {
+                console.error('Error obteniendo ubicación:', error);
+                let errorMessage = 'Error obteniendo ubicación';
+
+                switch(error.code) {
+                    case error.PERMISSION_DENIED:
+                        errorMessage = 'Permiso denegado. Habilita la ubicación en tu navegador.';
+                        break;
+                    case error.POSITION_UNAVAILABLE:
+                        errorMessage = 'Ubicación no disponible.';
+                        break;
+                    case error.TIMEOUT:
+                        errorMessage = 'Tiempo de espera agotado.';
+                        break;
+                }
+
+                showMessage(errorMessage, 'error');
+            },
+            {
+                enableHighAccuracy: true,
+                timeout: 10000,
+                maximumAge: 60000
+            }
+        );
+    } else {
+        showMessage('Geolocalización no soportada en este navegador', 'error');
+    }
+}
+
+// Guardar ubicación en el servidor
+function saveLocationToServer(lat, lng, accuracy) {
+    // Guardar la ubicación en una variable global para uso posterior
+    window.lastKnownLocation = [lat, lng];
+
+    // Aquí implementarías el envío al servidor
+    console.log('Guardando ubicación en servidor:', { lat, lng, accuracy });
+
+    // Simulación de envío al servidor
+    fetch('/clientes/api/guardar-ubicacion/', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
+        },
+        body: JSON.stringify({
+            latitud: lat,
+            longitud: lng,
+            precision: accuracy,
+            timestamp: new Date().toISOString()
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            console.log('Ubicación guardada exitosamente');
+        } else {
+            console.error('Error guardando ubicación:', data.message);
+        }
+    })
+    .catch(error => {
+        console.error('Error en la petición:', error);
+    });
+}
+
+// Mostrar mensaje
+function showMessage(message, type) {
+    const toast = document.createElement('div');
+    let bgColor, icon;
+
+    switch(type) {
+        case 'success':
+            bgColor = 'bg-green-500 text-white';
+            icon = 'fa-check-circle';
+            break;
+        case 'error':
+            bgColor = 'bg-red-500 text-white';
+            icon = 'fa-exclamation-circle';
+            break;
+        case 'info':
+            bgColor = 'bg-blue-500 text-white';
+            icon = 'fa-info-circle';
+            break;
+        default:
+            bgColor = 'bg-gray-500 text-white';
+            icon = 'fa-info-circle';
+    }
+
+    toast.className = `fixed top-4 right-4 z-50 p-4 rounded-lg shadow-lg transition-all duration-300 ${bgColor} toast-message`;
+    toast.innerHTML = `
+        <div class="flex items-center space-x-2">
+            <i class="fas ${icon}"></i>
+            <span>${message}</span>
+        </div>
+    `;
+
+    document.body.appendChild(toast);
+
+    setTimeout(() => {
+        toast.remove();
+    }, 3000);
+}
+
+// Verificar si es un nuevo día de trabajo (7AM-6PM UTC-4)
+function isNewWorkDay() {
+    const now = new Date();
+    const venezuelaTime = new Date(now.getTime() - (4 * 60 * 60 * 1000)); // UTC-4
+    const currentHour = venezuelaTime.getHours();
+
+    // Si es entre 7AM y 6PM
+    if (currentHour >= 7 && currentHour < 18) {
+        const today = venezuelaTime.toDateString();
+
+        // Si no hay fecha de inicio o es un día diferente
+        if (!workDayStart || workDayStart !== today) {
+            workDayStart = today;
+            totalDistance = 0; // Resetear distancia
+            console.log('🔄 Nuevo día de trabajo - Distancia reseteada');
+            return true;
+        }
+    }
+
+    return false;
+}
+
+// Actualizar tiempo de última actividad
+function updateLastActivity() {
+    lastActivityTime = new Date();
+    const timeString = lastActivityTime.toLocaleTimeString('es-VE', { 
+        hour: '2-digit', 
+        minute: '2-digit' 
+    });
+
+    const lastSeenElement = document.getElementById('driver-last-seen');
+    if (lastSeenElement) {
+        lastSeenElement.textContent = `Última actividad: ${timeString}`;
+    }
+}
+
+// Cargar información del usuario y verificar tipo
+async function loadUserInfo() {
+    try {
+        const response = await fetch('/clientes/api/conductor-info/');
+        const data = await response.json();
+
+        if (data.success) {
+            userType = 'conductor';
+            const conductorName = data.conductor_name || 'Conductor';
+            const driverNameElement = document.getElementById('driver-name');
+            if (driverNameElement) {
+                driverNameElement.textContent = `Conductor: ${conductorName}`;
+            }
+            console.log('✅ Usuario conductor detectado:', conductorName);
+        } else {
+            userType = 'empresa';
+            const driverNameElement = document.getElementById('driver-name');
+            if (driverNameElement) {
+                driverNameElement.textContent = 'Usted es usuario empresa';
+            }
+
+            // Mostrar aviso para empresa
+            showMessage('Usted es usuario empresa. No se puede mostrar su ubicación en el mapa. Solo los conductores pueden usar esta función.', 'info');
+
+            // Deshabilitar botón de ubicación
+            const locationButton = document.querySelector('button[onclick="getMyLocation()"]');
+            if (locationButton) {
+                locationButton.disabled = true;
+                locationButton.className = 'bg-gray-400 text-white px-3 py-2 rounded-lg transition-colors text-sm opacity-50 cursor-not-allowed';
+                locationButton.innerHTML = '<i class="fas fa-location-arrow mr-1"></i>No disponible';
+            }
+
+            console.log('ℹ️ Usuario empresa detectado');
+        }
+    } catch (error) {
+        console.error('❌ Error cargando información del usuario:', error);
+        userType = 'empresa';
+        const driverNameElement = document.getElementById('driver-name');
+        if (driverNameElement) {
+            driverNameElement.textContent = 'Usuario: No identificado';
+        }
+    }
+}
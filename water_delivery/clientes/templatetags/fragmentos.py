@@ -0,0 +1,45 @@
+# =============================================
+# ETIQUETA {% fragmento %}: CACHÉ DE FILAS POR VERSIÓN
+# =============================================
+# Uso en una plantilla (el objeto debe tener pk y version):
+#
+#   {% load fragmentos %}
+#   {% for cliente in clientes %}
+#       {% fragmento 'fila_cliente:v1' cliente %} ...HTML de la fila... {% endfragmento %}
+#   {% endfor %}
+#
+# Si la vista pasa `fragmentos = precargar('fila_cliente:v1', clientes)` en el
+# contexto, todas las filas se leen de la caché con una sola consulta.
+# El HTML de dentro no debe depender del usuario ni de la petición (p. ej. csrf_token).
+
+from django import template
+
+from water_delivery import fragmentos
+
+register = template.Library()
+
+
+class FragmentoNode(template.Node):
+    def __init__(self, nodelist, nombre, objeto):
+        self.nodelist = nodelist
+        self.nombre = nombre
+        self.objeto = objeto
+
+    def render(self, context):
+        nombre = self.nombre.resolve(context)
+        clave = fragmentos.clave_fragmento(nombre, self.objeto.resolve(context))
+        valor = fragmentos.leer(nombre, clave, context.get('fragmentos'))
+        if valor is None:
+            valor = self.nodelist.render(context)
+            fragmentos.guardar(clave, valor)
+        return valor
+
+
+@register.tag('fragmento')
+def do_fragmento(parser, token):
+    partes = token.split_contents()
+    if len(partes) != 3:
+        raise template.TemplateSyntaxError("Uso: {% fragmento 'nombre:v1' objeto %}")
+    nodelist = parser.parse(('endfragmento',))
+    parser.delete_first_token()
+    return FragmentoNode(nodelist, parser.compile_filter(partes[1]), parser.compile_filter(partes[2]))
@@ -4,9 +4,1568 @@
 # Este archivo se utiliza para definir pruebas unitarias y de integración
 # para asegurar el correcto funcionamiento de la app de clientes.
 
-from django.test import TestCase
+import glob
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Aquí puedes crear tus casos de prueba personalizados.
-# class ClienteTestCase(TestCase):
-#     def test_creacion_cliente(self):
-#         ...
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Sum
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.test import Client, LiveServerTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from usuarios.models import Device, Usuario
+from water_delivery import auditoria, bitacora, particiones
+from water_delivery.arranque import guardar_huella
+from water_delivery.cache import CacheCompartida, caches_desde_url, invalidar_etiquetas
+from water_delivery.consultas_lentas import huella, normalizar_sql
+from water_delivery.empresas import en_empresa
+from water_delivery.metricas import (
+    ARCHIVO_TERMINADOS, Medicion, RegistroMetricas, metricas_combinadas, texto_prometheus,
+)
+from water_delivery.presupuestos import PresupuestoExcedido, dentro_del_presupuesto, presupuesto_de
+from . import asignacion, sintetico
+from .antiguedad import calcular_antiguedad, informe_antiguedad
+from .archivo import archivar, corte_de_archivo
+from .prediccion import calcular_predicciones, cargar_historial
+from .management.commands.medir_rendimiento import argumentos_ruta, muestras_para_rutas, rutas_medidas
+from .estado_cuenta import EstadoCuenta, inicio_del_dia, movimientos_por_cliente, saldo_actual
+from .asignacion import repartir
+from .models import (
+    Cliente, Despacho, DespachoArchivado, Pago, PagoArchivado, PrediccionPedido, RegistroAuditoria,
+    SaldoInicial, UbicacionCamion,
+)
+from .resumenes import calcular_resumen_dashboard, resumen_dashboard, resumen_header
+
+
+def _fecha(anio, mes, dia, hora=12):
+    return timezone.make_aware(datetime(anio, mes, dia, hora))
+
+
+class EstadoCuentaTests(TestCase):
+    """
+    Pruebas del estado de cuenta calculado con funciones de ventana.
+    """
+    def setUp(self):
+        self.empresa = Usuario.objects.create_user(
+            username='empresa', email='empresa@example.com', password='testpass123', tipo_usuario='empresa',
+        )
+        self.enterContext(en_empresa(self.empresa))
+        self.cliente = Cliente.objects.create(
+            nombre='Ana', apellido='Pérez', direccion='Calle 1', telefono='123',
+            precio_botellon=Decimal('2.50'),
+        )
+        self.otro = Cliente.objects.create(nombre='Luis', apellido='Gil', direccion='Calle 2', telefono='456')
+        # Enero: despacho de 10 y pago de 4; febrero: despacho de 5 y pago de 3
+        self._despacho(self.cliente, _fecha(2025, 1, 5), 4)
+        self._pago(self.cliente, _fecha(2025, 1, 10), '4.00')
+        self._despacho(self.cliente, _fecha(2025, 2, 3), 2)
+        self._pago(self.cliente, _fecha(2025, 2, 20), '3.00')
+        self._despacho(self.otro, _fecha(2025, 2, 4), 8)
+
+    def _despacho(self, cliente, fecha, cantidad):
+        return Despacho.objects.create(
+            cliente=cliente, fecha=fecha, cantidad_botellones=cantidad,
+            precio_unitario=Decimal('2.50'), total=Decimal('2.50') * cantidad,
+        )
+
+    def _pago(self, cliente, fecha, monto):
+        pago = Pago.objects.create(cliente=cliente, monto=Decimal(monto))
+        # `fecha` es auto_now_add: se fija después de crear el pago
+        Pago.objects.filter(pk=pago.pk).update(fecha=fecha)
+        return pago
+
+    def test_saldo_acumulado_completo(self):
+        estado = EstadoCuenta(self.cliente)
+        movimientos = estado[0:10]
+        self.assertEqual([m['tipo'] for m in movimientos], ['despacho', 'pago', 'despacho', 'pago'])
+        self.assertEqual(
+            [m['saldo'] for m in movimientos],
+            [Decimal('10.00'), Decimal('6.00'), Decimal('11.00'), Decimal('8.00')],
+        )
+        self.assertEqual(estado.saldo_inicial, Decimal('0.00'))
+        self.assertEqual(estado.saldo_final, Decimal('8.00'))
+
+    def test_rango_usa_saldo_inicial_previo(self):
+        estado = EstadoCuenta(self.cliente, desde=date(2025, 2, 1), hasta=date(2025, 2, 28))
+        self.assertEqual(estado.count(), 2)
+        self.assertEqual(estado.saldo_inicial, Decimal('6.00'))
+        self.assertEqual([m['saldo'] for m in estado[0:2]], [Decimal('11.00'), Decimal('8.00')])
+        self.assertEqual(estado.saldo_final, Decimal('8.00'))
+
+    def test_rango_sin_movimientos(self):
+        estado = EstadoCuenta(self.cliente, desde=date(2025, 3, 1))
+        self.assertEqual(estado.count(), 0)
+        self.assertEqual(estado.saldo_inicial, Decimal('8.00'))
+        self.assertEqual(estado.saldo_final, Decimal('8.00'))
+
+    def test_paginas_conservan_saldo_inicial_del_rango(self):
+        estado = EstadoCuenta(self.cliente)
+        segunda_pagina = estado[2:4]
+        self.assertEqual(segunda_pagina[0]['saldo'], Decimal('11.00'))
+        self.assertEqual(estado.saldo_inicial, Decimal('0.00'))
+
+    def test_varios_clientes_en_lote(self):
+        estados = movimientos_por_cliente([self.cliente.pk, self.otro.pk], desde=date(2025, 2, 1))
+        self.assertEqual(estados[self.cliente.pk]['saldo_inicial'], Decimal('6.00'))
+        self.assertEqual(estados[self.cliente.pk]['saldo_final'], Decimal('8.00'))
+        self.assertEqual(estados[self.otro.pk]['saldo_final'], Decimal('20.00'))
+
+    def test_api_estado_cuenta(self):
+        self.client.force_login(self.empresa)
+        url = reverse('clientes:api_estado_cuenta', kwargs={'pk': self.cliente.pk})
+        data = self.client.get(url, {'desde': '2025-02-01'}).json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['saldo_inicial'], 6.0)
+        self.assertEqual(data['total_movimientos'], 2)
+        self.assertEqual(self.client.get(url, {'desde': 'ayer'}).status_code, 400)
+
+        respuesta = self.client.get(reverse('clientes:estado_cuenta', kwargs={'pk': self.cliente.pk}))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, 'Estado de cuenta')
+
+
+class GenerarEstadosCuentaTests(TestCase):
+    """
+    Pruebas del comando de generación masiva de estados de cuenta.
+    """
+    def setUp(self):
+        self.clientes = [
+            Cliente.objects.create(nombre=f'Cliente{i}', apellido='Prueba', direccion='Calle', telefono='1')
+            for i in range(3)
+        ]
+        Cliente.objects.create(nombre='Inactivo', apellido='Prueba', direccion='Calle', telefono='1', activo=False)
+        Despacho.objects.create(
+            cliente=self.clientes[0], fecha=_fecha(2025, 1, 15), cantidad_botellones=2,
+            precio_unitario=Decimal('2.50'), total=Decimal('5.00'),
+        )
+        self.destino = tempfile.mkdtemp()
+
+    def _generar(self, *args):
+        call_command('generar_estados_cuenta', '--mes', '2025-01', '--destino', self.destino,
+                     '--procesos', '1', '--lote', '2', *args, stdout=StringIO())
+
+    def test_genera_estados_e_indice_y_reanuda(self):
+        self._generar()
+        archivos = sorted(f for f in os.listdir(self.destino) if f.startswith('cliente_'))
+        self.assertEqual(len(archivos), 3)
+        with open(os.path.join(self.destino, 'index.html'), encoding='utf-8') as indice:
+            self.assertIn('Cliente0 Prueba', indice.read())
+        with open(os.path.join(self.destino, archivos[0]), encoding='utf-8') as estado:
+            self.assertIn('Despacho #', estado.read())
+
+        # Una segunda ejecución no regenera lo ya completado
+        os.remove(os.path.join(self.destino, archivos[1]))
+        self._generar()
+        with open(os.path.join(self.destino, 'progreso.jsonl'), encoding='utf-8') as progreso:
+            registros = [json.loads(linea) for linea in progreso]
+        self.assertEqual(len(registros), 4)
+        self.assertEqual(len([f for f in os.listdir(self.destino) if f.startswith('cliente_')]), 3)
+
+
+class ResumenDashboardTests(TestCase):
+    """
+    Pruebas del resumen del dashboard (una consulta, en caché e invalidado al escribir).
+    """
+    def setUp(self):
+        cache.clear()
+        self.deudor = Cliente.objects.create(nombre='Deudor', apellido='A', direccion='d', telefono='1')
+        self.a_favor = Cliente.objects.create(nombre='Favor', apellido='B', direccion='d', telefono='1')
+        Cliente.objects.create(nombre='Inactivo', apellido='C', direccion='d', telefono='1', activo=False)
+        Despacho.objects.create(cliente=self.deudor, cantidad_botellones=4, total=Decimal('10.00'))
+        Despacho.objects.create(cliente=self.deudor, cantidad_botellones=2, total=Decimal('5.00'), cancelado=True)
+        Pago.objects.create(cliente=self.a_favor, monto=Decimal('7.00'))
+
+    def test_resumen_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            resumen = calcular_resumen_dashboard()
+        self.assertEqual(resumen['total_clientes'], 2)
+        self.assertEqual(resumen['total_deuda'], Decimal('15.00'))
+        self.assertEqual(resumen['despachos_pendientes'], 1)
+
+    def test_cache_se_invalida_al_escribir(self):
+        resumen_dashboard()
+        with self.assertNumQueries(0):
+            resumen_dashboard()
+        with self.captureOnCommitCallbacks(execute=True):
+            Pago.objects.create(cliente=self.deudor, monto=Decimal('5.00'))
+        self.assertEqual(resumen_dashboard()['total_deuda'], Decimal('10.00'))
+
+    def test_resumen_header(self):
+        conductor = Usuario.objects.create_user(
+            username='conductor', email='conductor@example.com', password='testpass123',
+        )
+        self.client.force_login(conductor)
+        data = self.client.get(reverse('clientes:api_resumen_header')).json()
+        self.assertEqual(data['despachos_hoy'], 2)
+        self.assertEqual(data['botellones_hoy'], 6)
+        self.assertEqual(data['clientes_activos'], 2)
+
+        # La caché es por empresa: la del conductor (sin empresa, como estos clientes)
+        with en_empresa(conductor.empresa_id):
+            with self.assertNumQueries(0):
+                resumen_header()
+            with self.captureOnCommitCallbacks(execute=True):
+                Despacho.objects.create(cliente=self.a_favor, cantidad_botellones=3, total=Decimal('7.50'))
+            self.assertEqual(resumen_header()['botellones_hoy'], 9)
+
+
+class DetalleClienteTests(TestCase):
+    """
+    Pruebas del detalle de cliente: estadísticas agregadas e historial por páginas.
+    """
+    def setUp(self):
+        empresa = Usuario.objects.create_user(
+            username='empresa', email='empresa@example.com', password='testpass123', tipo_usuario='empresa',
+        )
+        self.client.force_login(empresa)
+        self.enterContext(en_empresa(empresa))
+        self.cliente = Cliente.objects.create(nombre='Ana', apellido='Pérez', direccion='Calle 1', telefono='123')
+        for i in range(25):
+            Despacho.objects.create(
+                cliente=self.cliente, fecha=_fecha(2025, 1, 1 + i), cantidad_botellones=2,
+                total=Decimal('5.00'), entregado=i < 20, cancelado=i == 24,
+            )
+        Pago.objects.create(cliente=self.cliente, monto=Decimal('5.00'), observaciones='<b>efectivo</b>')
+
+    def test_estadisticas_agregadas(self):
+        respuesta = self.client.get(reverse('clientes:detalle_cliente', kwargs={'pk': self.cliente.pk}))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.context['total_despachos'], 25)
+        self.assertEqual(respuesta.context['despachos_entregados'], 20)
+        self.assertEqual(respuesta.context['despachos_pendientes'], 4)
+        self.assertEqual(respuesta.context['total_botellones'], 50)
+        # El historial ya no se renderiza en la página
+        self.assertNotIn('despachos', respuesta.context)
+
+    def test_historial_despachos_por_paginas(self):
+        url = reverse('clientes:api_cliente_despachos', kwargs={'pk': self.cliente.pk})
+        primera = self.client.get(url).json()
+        self.assertTrue(primera['hay_mas'])
+        self.assertEqual(len(primera['despachos']), 20)
+        self.assertEqual(primera['despachos'][0]['fecha'], '25/01/2025')
+        segunda = self.client.get(url, {'page': 2}).json()
+        self.assertFalse(segunda['hay_mas'])
+        self.assertEqual(len(segunda['despachos']), 5)
+
+    def test_historial_pagos(self):
+        data = self.client.get(reverse('clientes:api_cliente_pagos', kwargs={'pk': self.cliente.pk})).json()
+        self.assertFalse(data['hay_mas'])
+        self.assertEqual(data['pagos'][0]['monto'], '5.00')
+        self.assertEqual(data['pagos'][0]['observaciones'], '<b>efectivo</b>')
+
+
+class CacheCompartidaTests(TestCase):
+    """
+    Pruebas de la capa de caché: espacios, versiones, etiquetas y reconstrucción única.
+    """
+    def setUp(self):
+        cache.clear()
+
+    def test_espacios_y_versiones_no_se_mezclan(self):
+        CacheCompartida('a').set('x', 1)
+        self.assertIsNone(CacheCompartida('b').get('x'))
+        self.assertIsNone(CacheCompartida('a', version=2).get('x'))
+        self.assertEqual(CacheCompartida('a').get('x'), 1)
+
+    def test_invalidacion_por_etiquetas(self):
+        espacio = CacheCompartida('pruebas')
+        espacio.set('despachos', 10, etiquetas=['clientes.despacho'])
+        espacio.set('pagos', 20, etiquetas=['clientes.pago'])
+        invalidar_etiquetas('clientes.despacho')
+        self.assertIsNone(espacio.get('despachos', etiquetas=['clientes.despacho']))
+        self.assertEqual(espacio.get('pagos', etiquetas=['clientes.pago']), 20)
+
+        # Guardar un despacho invalida su etiqueta al confirmar la transacción
+        espacio.set('despachos', 10, etiquetas=['clientes.despacho'])
+        cliente = Cliente.objects.create(nombre='Ana', apellido='P', direccion='d', telefono='1')
+        with self.captureOnCommitCallbacks(execute=True):
+            Despacho.objects.create(cliente=cliente, cantidad_botellones=1, total=Decimal('2.50'))
+        self.assertIsNone(espacio.get('despachos', etiquetas=['clientes.despacho']))
+
+    def test_una_sola_reconstruccion_concurrente(self):
+        espacio = CacheCompartida('pruebas')
+        construcciones = []
+
+        def construir():
+            construcciones.append(1)
+            time.sleep(0.2)
+            return 'valor'
+
+        resultados = []
+        hilos = [
+            threading.Thread(target=lambda: resultados.append(espacio.obtener('lento', construir)))
+            for _ in range(5)
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(resultados, ['valor'] * 5)
+        self.assertEqual(len(construcciones), 1)
+
+    def test_backend_segun_url(self):
+        self.assertEqual(caches_desde_url('')['default']['BACKEND'],
+                         'django.core.cache.backends.locmem.LocMemCache')
+        self.assertEqual(caches_desde_url('db://')['default']['LOCATION'], 'water_delivery_cache')
+        redis = caches_desde_url('redis://localhost:6379/1?prefijo=wd')['default']
+        self.assertEqual(redis['LOCATION'], 'redis://localhost:6379/1')
+        self.assertEqual(redis['KEY_PREFIX'], 'wd')
+        self.assertEqual(caches_desde_url('file:///tmp/wd')['default']['LOCATION'], '/tmp/wd')
+
+
+class RastreoAsincronoTests(TestCase):
+    """
+    Pruebas de las APIs de rastreo asíncronas (por WSGI y por ASGI).
+    """
+    def setUp(self):
+        cache.clear()
+        self.empresa = Usuario.objects.create_user(
+            username='empresa', email='empresa@example.com', password='testpass123', tipo_usuario='empresa',
+        )
+        self.conductor = Usuario.objects.create_user(
+            username='conductor', email='conductor@example.com', password='testpass123', empresa=self.empresa,
+        )
+        # El login del cliente ASGI es síncrono: se hace aquí y no dentro del test asíncrono
+        self.async_client.force_login(self.conductor)
+
+    async def test_guardar_ubicacion_por_asgi(self):
+        url = reverse('clientes:api_guardar_ubicacion')
+        for latitud in ('10.5', '10.6'):
+            respuesta = await self.async_client.post(
+                url, {'latitud': latitud, 'longitud': '-66.9', 'precision': 10}, content_type='application/json',
+            )
+            self.assertTrue(respuesta.json()['success'])
+        self.assertEqual(await UbicacionCamion.objects.filter(conductor=self.conductor, activo=True).acount(), 1)
+        self.assertEqual((await self.async_client.get(url)).status_code, 405)
+
+    def test_ubicaciones_segun_tipo_de_usuario(self):
+        UbicacionCamion.objects.create(conductor=self.conductor, latitud='10.5', longitud='-66.9')
+        url = reverse('clientes:api_ubicaciones')
+        self.client.force_login(self.empresa)
+        data = self.client.get(url).json()
+        self.assertEqual([u['conductor_name'] for u in data['ubicaciones']], ['conductor'])
+        self.assertEqual(data['ubicaciones'][0]['latitud'], 10.5)
+
+        self.client.force_login(self.empresa)
+        self.assertEqual(self.client.get(reverse('clientes:api_conductor_info')).status_code, 403)
+        self.client.logout()
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+
+class MedirRendimientoTests(TestCase):
+    """
+    Pruebas del comando de medición de rendimiento con un volumen pequeño.
+    """
+    def test_mide_todas_las_urls_sin_modificar_datos(self):
+        cache.clear()
+        salida = os.path.join(tempfile.mkdtemp(), 'resultados.json')
+        call_command(
+            'medir_rendimiento', '--base-actual', '--clientes', '5', '--despachos', '60', '--pagos', '10',
+            '--ubicaciones', '20', '--repeticiones', '2', '--calentamiento', '0', '--salida', salida,
+            stdout=StringIO(),
+        )
+        despachos = Despacho.objects.count()
+        with open(salida, encoding='utf-8') as archivo:
+            informe = json.load(archivo)
+        nombres = {r['nombre'] for r in informe['resultados']}
+        self.assertIn('clientes:detalle_cliente', nombres)
+        self.assertIn('clientes:eliminar_despacho', nombres)
+        self.assertIn('usuarios:login', nombres)
+        self.assertEqual(informe['meta']['volumenes']['despachos'], 60)
+        for resultado in informe['resultados']:
+            self.assertLessEqual(resultado['p50_ms'], resultado['p99_ms'])
+        # Las vistas que eliminan o modifican se midieron dentro de transacciones deshechas
+        self.assertEqual(despachos, 60)
+
+
+class PresupuestoConsultasTests(TestCase):
+    """
+    Cada vista de clientes y usuarios debe quedar dentro de su presupuesto de
+    consultas (settings.PRESUPUESTOS_CONSULTAS), con la caché vacía.
+    """
+    def setUp(self):
+        cache.clear()
+        sintetico.sembrar(clientes=5, despachos=60, pagos=10, ubicaciones=20)
+        self.empresa, conductores = sintetico.usuarios_sinteticos()
+        self.conductor = conductores[0]
+
+    def _pedir(self, cliente, nombre, url, metodo='get', datos=None):
+        """Petición con caché vacía, contada y deshecha al terminar."""
+        cache.clear()
+        with transaction.atomic():
+            with dentro_del_presupuesto(nombre):
+                respuesta = getattr(cliente, metodo)(url, datos or {})
+            transaction.set_rollback(True)
+        return respuesta
+
+    def test_todas_las_urls_tienen_presupuesto(self):
+        sin_presupuesto = [nombre for nombre, _, _ in rutas_medidas() if presupuesto_de(nombre) is None]
+        self.assertEqual(sin_presupuesto, [])
+
+    def test_vistas_dentro_del_presupuesto(self):
+        muestras = muestras_para_rutas()
+        for usuario in (self.empresa, self.conductor):
+            cliente = Client(raise_request_exception=False)
+            cliente.force_login(usuario)
+            for nombre, ruta, parametros in rutas_medidas():
+                url = reverse(nombre, kwargs=argumentos_ruta(ruta, parametros, muestras))
+                with self.subTest(usuario=usuario.username, url=nombre):
+                    if self._pedir(cliente, nombre, url).status_code == 405:
+                        self._pedir(cliente, nombre, url, 'post')
+                cliente.force_login(usuario)
+
+    def test_escrituras_dentro_del_presupuesto(self):
+        muestras = muestras_para_rutas()
+        self.client.force_login(self.empresa)
+        casos = [
+            ('clientes:editar_cliente', {'pk': muestras['cliente']}, {
+                'nombre': 'Ana', 'apellido': 'Pérez', 'direccion': 'Calle 1, casa 12', 'telefono': '04141234567',
+                'precio_botellon': '2.50', 'activo': 'on',
+            }),
+            ('clientes:nuevo_despacho', {}, {'cliente': muestras['cliente'], 'cantidad_botellones': 2}),
+            ('clientes:registrar_pago', {'cliente_id': muestras['cliente']}, {'monto': '3.00'}),
+            ('clientes:editar_pago', {'pago_id': muestras['pago']}, {'monto': '4.00'}),
+            ('clientes:eliminar_despacho', {'pk': muestras['despacho']}, {}),
+        ]
+        for nombre, kwargs, datos in casos:
+            with self.subTest(url=nombre):
+                respuesta = self._pedir(self.client, nombre, reverse(nombre, kwargs=kwargs), 'post', datos)
+                self.assertEqual(respuesta.status_code, 302)
+
+        self.client.logout()
+        respuesta = self._pedir(self.client, 'usuarios:login', reverse('usuarios:login'), 'post', {
+            'username': self.empresa.username, 'password': sintetico.CLAVE_USUARIOS,
+        })
+        self.assertEqual(respuesta.status_code, 302)
+
+    def test_middleware_registra_o_lanza(self):
+        url = reverse('clientes:api_clientes')
+        with override_settings(PRESUPUESTOS_CONSULTAS={'clientes:api_clientes': 0}):
+            with override_settings(PRESUPUESTO_CONSULTAS_MODO='registrar'):
+                cliente = Client()
+                cliente.force_login(self.empresa)
+                with self.assertLogs('water_delivery.presupuestos', 'WARNING') as registros:
+                    self.assertEqual(cliente.get(url).status_code, 200)
+                self.assertIn('clientes:api_clientes', registros.output[0])
+            with override_settings(PRESUPUESTO_CONSULTAS_MODO='error'):
+                cliente = Client()
+                cliente.force_login(self.empresa)
+                with self.assertRaises(PresupuestoExcedido):
+                    cliente.get(url)
+
+
+class MetricasTests(TestCase):
+    """
+    Pruebas del middleware de métricas, Server-Timing y el endpoint de Prometheus.
+    """
+    def setUp(self):
+        cache.clear()
+        self.directorio = tempfile.mkdtemp()
+        self.empresa = Usuario.objects.create_user(
+            username='empresa', email='empresa@example.com', password='testpass123', tipo_usuario='empresa',
+        )
+        self.conductor = Usuario.objects.create_user(
+            username='conductor', email='conductor@example.com', password='testpass123',
+        )
+        Cliente.objects.create(nombre='Ana', apellido='Pérez', direccion='Calle 1', telefono='111')
+
+    def _config(self):
+        return override_settings(MONITORING_CONFIG={
+            'PERFORMANCE_MONITORING': True, 'METRICS_DIR': self.directorio, 'METRICS_TOKEN': 'secreto',
+        })
+
+    def test_server_timing_y_metricas_prometheus(self):
+        url = reverse('clientes:api_clientes')
+        with self._config():
+            empresa = Client()
+            empresa.force_login(self.empresa)
+            respuesta = empresa.get(url)
+            self.assertIn('db;dur=', respuesta['Server-Timing'])
+            self.assertIn('consultas', respuesta['Server-Timing'])
+
+            conductor = Client()
+            conductor.force_login(self.conductor)
+            self.assertNotIn('Server-Timing', conductor.get(url))
+
+            self.assertEqual(Client().get('/metricas/').status_code, 401)
+            self.assertEqual(conductor.get('/metricas/').status_code, 401)
+            texto = Client().get('/metricas/', HTTP_AUTHORIZATION='Bearer secreto').content.decode()
+
+        self.assertIn('# TYPE water_delivery_request_duration_seconds histogram', texto)
+        self.assertIn('water_delivery_request_duration_seconds_count{vista="clientes:api_clientes"} 2', texto)
+        self.assertIn('water_delivery_db_queries_bucket{vista="clientes:api_clientes",le="+Inf"} 2', texto)
+        self.assertIn('water_delivery_requests_total{estado="2xx",vista="clientes:api_clientes"} 2', texto)
+        self.assertIn('water_delivery_response_size_bytes_sum{vista="clientes:api_clientes"}', texto)
+
+    def test_suma_los_archivos_de_todos_los_workers(self):
+        for pid in (101, 102):
+            registro = RegistroMetricas(self.directorio)
+            registro.pid = pid
+            medicion = Medicion()
+            medicion.consultas, medicion.aciertos = 3, 1
+            registro.registrar('clientes:dashboard', 200, 0.02, medicion, 1500)
+            registro.volcar()
+        histogramas, contadores = metricas_combinadas(self.directorio)
+        consultas = histogramas['db_queries']['clientes:dashboard']
+        self.assertEqual(consultas['cuenta'], 2)
+        self.assertEqual(consultas['suma'], 6)
+        self.assertEqual(sum(contadores['cache_hits_total'].values()), 2)
+
+    def test_compacta_los_archivos_de_workers_terminados(self):
+        proceso = subprocess.Popen([sys.executable, '-c', ''])
+        proceso.wait()
+        for pid in (proceso.pid, os.getpid()):
+            registro = RegistroMetricas(self.directorio)
+            registro.pid = pid
+            registro.registrar('clientes:dashboard', 200, 0.02, Medicion(), 1500)
+            registro.volcar()
+
+        for _ in range(2):
+            histogramas, contadores = metricas_combinadas(self.directorio)
+            self.assertEqual(histogramas['db_queries']['clientes:dashboard']['cuenta'], 2)
+        archivos = sorted(os.listdir(self.directorio))
+        self.assertIn(ARCHIVO_TERMINADOS, archivos)
+        self.assertIn(f'metricas-{os.getpid()}.json', archivos)
+        self.assertNotIn(f'metricas-{proceso.pid}.json', archivos)
+
+        # Un worker nuevo con el mismo pid no pisa lo que volcó el anterior
+        RegistroMetricas(self.directorio).volcar()
+        histogramas, contadores = metricas_combinadas(self.directorio)
+        self.assertEqual(histogramas['db_queries']['clientes:dashboard']['cuenta'], 2)
+
+
+class ConsultasLentasTests(TestCase):
+    """
+    Pruebas del registro de consultas lentas y su comando de resumen.
+    """
+    def setUp(self):
+        cache.clear()
+        self.archivo = os.path.join(tempfile.mkdtemp(), 'consultas_lentas.jsonl')
+        self.empresa = Usuario.objects.create_user(
+            username='empresa', email='empresa@example.com', password='testpass123', tipo_usuario='empresa',
+        )
+        Cliente.objects.create(nombre='Ana', apellido='Pérez', direccion='Calle 1', telefono='111')
+
+    def test_huella_ignora_valores(self):
+        a = normalizar_sql("SELECT * FROM t WHERE id IN (%s, %s, %s) AND nombre = 'Ana' LIMIT 21")
+        b = normalizar_sql("SELECT *  FROM t WHERE id IN (%s) AND nombre = 'Luis' LIMIT 5")
+        self.assertEqual(a, 'SELECT * FROM t WHERE id IN (...) AND nombre = ? LIMIT ?')
+        self.assertEqual(huella(a), huella(b))
+
+    def test_registra_con_vista_y_resume_con_explain(self):
+        configuracion = {
+            'ACTIVO': True, 'UMBRAL_MS': 0, 'MUESTREO': 1.0, 'PARAMETROS': True, 'ARCHIVO': self.archivo,
+        }
+        with override_settings(CONSULTAS_LENTAS=configuracion):
+            cliente = Client()
+            cliente.force_login(self.empresa)
+            cliente.get(reverse('clientes:api_clientes'))
+            cliente.get(reverse('clientes:api_clientes'))
+
+        with open(self.archivo, encoding='utf-8') as archivo:
+            registros = [json.loads(linea) for linea in archivo]
+        vistas = {r['vista'] for r in registros}
+        self.assertIn('clientes:api_clientes', vistas)
+        self.assertIn('(middleware)', vistas)
+        self.assertTrue(all(r['ruta'] == reverse('clientes:api_clientes') for r in registros))
+
+        salida = StringIO()
+        call_command('consultas_lentas', '--archivo', self.archivo, '--explain', '--json', stdout=salida)
+        grupos = json.loads(salida.getvalue())
+        consulta_clientes = next(g for g in grupos if 'clientes_cliente' in g['sql_normalizado'])
+        self.assertEqual(consulta_clientes['muestras'], 2)
+        self.assertTrue(consulta_clientes['plan'])
+
+
+class SembrarDatosTests(TestCase):
+    """
+    Pruebas del generador de datos sintéticos: volúmenes exactos, saldos
+    coherentes y los mismos datos para la misma semilla.
+    """
+    def _sembrar(self, *extra):
+        call_command(
+            'sembrar_datos', '--clientes', '7', '--despachos', '90', '--pagos', '20', '--ubicaciones', '50',
+            '--conductores', '2', '--semilla', '7', '--fecha-referencia', '2025-03-01', *extra,
+            stdout=StringIO(),
+        )
+        return (
+            list(Cliente.objects.order_by('nombre').values_list('nombre', 'telefono', 'saldo')),
+            sorted(Despacho.objects.values_list('cliente__nombre', 'fecha', 'total', 'cancelado')),
+            sorted(UbicacionCamion.objects.values_list('conductor__username', 'timestamp', 'latitud')),
+        )
+
+    def test_volumenes_saldos_y_determinismo(self):
+        # Bloques pequeños para repartir el trabajo en varios bloques
+        with mock.patch.object(sintetico, 'TAMANO_BLOQUE', 3):
+            primera = self._sembrar()
+            self.assertEqual(sintetico.volumenes_actuales(), {
+                'clientes': 7, 'despachos': 90, 'pagos': 20, 'ubicaciones': 50,
+            })
+            self.assertEqual(Device.objects.filter(name__startswith=sintetico.PREFIJO).count(), 2)
+            for cliente in Cliente.objects.all():
+                despachos = cliente.despacho_set.aggregate(t=Sum('total'))['t'] or 0
+                pagos = cliente.pagos.aggregate(t=Sum('monto'))['t'] or 0
+                self.assertEqual(cliente.saldo, despachos - pagos)
+            self.assertEqual(UbicacionCamion.objects.filter(activo=True).count(), 2)
+            self.assertFalse(UbicacionCamion.objects.filter(
+                timestamp__gt=timezone.make_aware(datetime(2025, 3, 1)),
+            ).exists())
+
+            with self.assertRaises(CommandError):
+                self._sembrar()
+            self.assertEqual(self._sembrar('--borrar'), primera)
+
+
+# El servidor de pruebas comparte su única conexión SQLite en memoria entre
+# hilos: con peticiones simultáneas se bloquea, así que cada corrida usa un solo
+# usuario virtual. Por lo mismo no aplican los presupuestos de consultas. Con el
+# hasher por defecto cada inicio de sesión tarda casi un segundo.
+@override_settings(PRESUPUESTO_CONSULTAS_MODO='',
+                   PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class PruebaCargaTests(LiveServerTestCase):
+    """
+    Prueba de carga corta contra un servidor real: un conductor y un
+    despachador simulados recorren sus rutas y se informa cada URL.
+    """
+    def _carga(self, conductores, despachadores):
+        salida = os.path.join(tempfile.mkdtemp(), 'carga.json')
+        call_command(
+            'prueba_carga', '--url', self.live_server_url,
+            '--conductores', str(conductores), '--despachadores', str(despachadores),
+            '--duracion', '1', '--calentamiento', '0.5', '--pausa-conductor', '0.05',
+            '--pausa-despachador', '0.05', '--salida', salida, stdout=StringIO(),
+        )
+        with open(salida, encoding='utf-8') as archivo:
+            return {r['nombre']: r for r in json.load(archivo)['resultados']}
+
+    def test_conductores_y_despachadores_simulados(self):
+        cache.clear()
+        sintetico.sembrar(clientes=5, despachos=30, pagos=5, ubicaciones=10, conductores=1)
+
+        gps = self._carga(1, 0)['clientes:api_guardar_ubicacion']
+        self.assertGreater(gps['peticiones'], 0)
+        self.assertEqual(gps['errores'], 0)
+        self.assertIsNotNone(gps['p99_ms'])
+
+        despachos_hoy = self._carga(0, 1)['clientes:api_despachos_hoy']
+        self.assertGreater(despachos_hoy['peticiones'], 0)
+        self.assertEqual(despachos_hoy['errores'], 0)
+
+
+class ArranqueTests(TestCase):
+    """
+    El comando de arranque solo trabaja cuando hay cambios: la segunda vez no
+    recolecta estáticos y --comprobar falla si la huella guardada no coincide.
+    """
+    def test_recolecta_solo_si_cambian_los_estaticos(self):
+        with override_settings(STATIC_ROOT=tempfile.mkdtemp()):
+            salida = StringIO()
+            call_command('arranque', stdout=salida)
+            self.assertIn('migraciones: al día', salida.getvalue())
+            self.assertIn('estáticos: recolectados', salida.getvalue())
+
+            with mock.patch('clientes.management.commands.arranque.call_command') as llamada:
+                salida = StringIO()
+                call_command('arranque', stdout=salida)
+            llamada.assert_not_called()
+            self.assertIn('estáticos: al día', salida.getvalue())
+
+            guardar_huella('otra')
+            with self.assertRaises(CommandError):
+                call_command('arranque', '--comprobar', stdout=StringIO())
+
+    def test_estaticos_al_construir_y_web_sin_recolectar(self):
+        with override_settings(STATIC_ROOT=tempfile.mkdtemp()):
+            # Al construir la imagen no hay base de datos: solo estáticos y huella
+            salida = StringIO()
+            with self.assertNumQueries(0):
+                call_command('arranque', '--solo-estaticos', stdout=salida)
+            self.assertIn('estáticos: recolectados', salida.getvalue())
+            self.assertNotIn('migraciones', salida.getvalue())
+
+            # release y web no vuelven a recolectar: la huella vino en la imagen
+            with mock.patch('clientes.management.commands.arranque.call_command') as llamada:
+                salida = StringIO()
+                call_command('arranque', '--sin-estaticos', stdout=salida)
+            llamada.assert_not_called()
+            self.assertIn('migraciones: al día', salida.getvalue())
+            self.assertNotIn('estáticos', salida.getvalue())
+
+        with override_settings(STATIC_ROOT=tempfile.mkdtemp()):
+            salida = StringIO()
+            call_command('arranque', '--sin-estaticos', stdout=salida)
+            self.assertIn('estáticos: no están recolectados', salida.getvalue())
+
+
+# Tamaño máximo de un bloque <script>/<style> dentro de una plantilla: el
+# código de cada página va en clientes/static/ (con hash y caché inmutable)
+LIMITE_BLOQUE_EN_LINEA = 4096
+
+
+class PlantillasTests(TestCase):
+    """Las plantillas no llevan bloques grandes de JS/CSS en línea."""
+    def test_sin_bloques_en_linea_grandes(self):
+        bloque = re.compile(r'<(script|style)(?![^>]*\bsrc=)[^>]*>(.*?)</\1>', re.S)
+        excesos = []
+        for ruta in glob.glob(os.path.join(settings.BASE_DIR, '*', 'templates', '**', '*.html'), recursive=True):
+            with open(ruta, encoding='utf-8') as archivo:
+                contenido = archivo.read()
+            for encontrado in bloque.finditer(contenido):
+                if len(encontrado.group(2).encode()) > LIMITE_BLOQUE_EN_LINEA:
+                    linea = contenido.count('\n', 0, encontrado.start()) + 1
+                    excesos.append(f'{os.path.relpath(ruta, settings.BASE_DIR)}:{linea} <{encontrado.group(1)}>')
+        self.assertEqual(excesos, [], 'Mover a clientes/static/ los bloques en línea de más de 4 KB')
+
+    def test_estaticos_de_pagina_referenciados(self):
+        empresa = Usuario.objects.create_user(username='empresa_plantillas', password='x', tipo_usuario=Usuario.EMPRESA)
+        with en_empresa(empresa):
+            cliente = Cliente.objects.create(nombre='Ana', apellido='Pérez', direccion='Calle Larga 123', telefono='111')
+        self.client.force_login(empresa)
+        respuesta = self.client.get(reverse('clientes:detalle_cliente', args=[cliente.pk]))
+        self.assertContains(respuesta, 'clientes/js/detalle_cliente.js')
+        self.assertContains(respuesta, 'clientes/css/detalle_cliente.css')
+        self.assertContains(respuesta, reverse('clientes:api_cliente_despachos', args=[cliente.pk]))
+
+
+class FragmentosTests(TestCase):
+    """
+    Caché de filas por versión: al volver a mostrar un listado solo se
+    renderizan las filas guardadas desde la última vez.
+    """
+    def setUp(self):
+        cache.clear()
+        self.directorio = tempfile.mkdtemp()
+        self.empresa = Usuario.objects.create_user(username='empresa', password='x', tipo_usuario='empresa')
+        self.client.force_login(self.empresa)
+        self.enterContext(en_empresa(self.empresa))
+        self.clientes = [
+            Cliente.objects.create(nombre=f'Cliente{i}', apellido='Prueba', direccion='Calle 1', telefono='1')
+            for i in range(3)
+        ]
+
+    def _fragmentos(self, url):
+        """Aciertos y fallos de la caché de fragmentos en una petición."""
+        with override_settings(MONITORING_CONFIG={'PERFORMANCE_MONITORING': True, 'METRICS_DIR': self.directorio}):
+            with mock.patch('water_delivery.metricas.RegistroMetricas.registrar') as registrar:
+                respuesta = self.client.get(url)
+        medicion = registrar.call_args.args[3]
+        return respuesta, {nombre: tuple(cuentas) for nombre, cuentas in (medicion.fragmentos or {}).items()}
+
+    def test_version_sube_en_cada_guardado(self):
+        cliente = self.clientes[0]
+        self.assertEqual(cliente.version, 1)
+        cliente.save()
+        cliente.activo = False
+        cliente.save(update_fields=['activo'])
+        cliente.refresh_from_db()
+        self.assertEqual(cliente.version, 3)
+
+    def test_lista_solo_renderiza_las_filas_cambiadas(self):
+        url = reverse('clientes:lista_clientes')
+        _, cuentas = self._fragmentos(url)
+        self.assertEqual(cuentas['fila_cliente:v1'], (0, 3))
+        _, cuentas = self._fragmentos(url)
+        self.assertEqual(cuentas['fila_cliente:v1'], (3, 0))
+
+        cambiado = self.clientes[1]
+        cambiado.nombre = 'Renombrado'
+        cambiado.save()
+        respuesta, cuentas = self._fragmentos(url)
+        self.assertEqual(cuentas['fila_cliente:v1'], (2, 1))
+        self.assertContains(respuesta, 'Renombrado')
+
+    def test_historial_de_despachos_usa_filas_en_cache(self):
+        cliente = self.clientes[0]
+        despacho = Despacho.objects.create(cliente=cliente, cantidad_botellones=2)
+        Despacho.objects.create(cliente=cliente, cantidad_botellones=1)
+        url = reverse('clientes:api_cliente_despachos', args=[cliente.pk])
+        self._fragmentos(url)
+
+        despacho.entregado = True
+        despacho.save(update_fields=['entregado'])
+        respuesta, cuentas = self._fragmentos(url)
+        self.assertEqual(cuentas['fila_despacho:v1'], (1, 1))
+        filas = {fila['id']: fila for fila in respuesta.json()['despachos']}
+        self.assertTrue(filas[despacho.pk]['entregado'])
+
+    def test_metricas_por_fragmento(self):
+        registro = RegistroMetricas(self.directorio)
+        medicion = Medicion()
+        medicion.fragmentos = {'fila_cliente:v1': [5, 1]}
+        registro.registrar('clientes:lista_clientes', 200, 0.01, medicion, 100)
+        registro.volcar()
+        texto = texto_prometheus(*metricas_combinadas(self.directorio))
+        self.assertIn('water_delivery_fragment_cache_hits_total{fragmento="fila_cliente:v1"} 5', texto)
+        self.assertIn('water_delivery_fragment_cache_misses_total{fragmento="fila_cliente:v1"} 1', texto)
+
+
+class AntiguedadSaldosTests(TestCase):
+    """
+    Antigüedad de saldos: pagos aplicados en orden FIFO, tramos por días,
+    corte al cierre del día y caché por fecha.
+    """
+    def setUp(self):
+        cache.clear()
+        self.empresa = Usuario.objects.create_user(username='empresa', password='x', tipo_usuario='empresa')
+        self.enterContext(en_empresa(self.empresa))
+        self.ayer = timezone.localdate() - timedelta(days=1)
+
+    def _despacho(self, cliente, dias, total):
+        momento = timezone.make_aware(datetime.combine(self.ayer - timedelta(days=dias), datetime.min.time().replace(hour=10)))
+        return Despacho.objects.create(cliente=cliente, fecha=momento, cantidad_botellones=1, total=Decimal(total))
+
+    def _pago(self, cliente, dias, monto):
+        pago = Pago.objects.create(cliente=cliente, monto=Decimal(monto))
+        momento = timezone.make_aware(datetime.combine(self.ayer - timedelta(days=dias), datetime.min.time().replace(hour=12)))
+        Pago.objects.filter(pk=pago.pk).update(fecha=momento)
+
+    def test_pagos_fifo_y_tramos(self):
+        ana = Cliente.objects.create(nombre='Ana', apellido='Pérez', direccion='Calle 1', telefono='1')
+        self._despacho(ana, 100, '10.00')
+        self._despacho(ana, 45, '20.00')
+        self._despacho(ana, 5, '30.00')
+        self._pago(ana, 2, '15.00')
+        # Lo de hoy no entra en el cierre de ayer
+        Despacho.objects.create(cliente=ana, cantidad_botellones=1, total=Decimal('99.00'))
+        Pago.objects.create(cliente=ana, monto=Decimal('50.00'))
+        # Con saldo a favor no aparece
+        luis = Cliente.objects.create(nombre='Luis', apellido='Gil', direccion='Calle 2', telefono='2')
+        self._despacho(luis, 70, '5.00')
+        self._pago(luis, 60, '8.00')
+
+        informe = calcular_antiguedad(self.ayer)
+        self.assertEqual(len(informe['clientes']), 1)
+        fila = informe['clientes'][0]
+        self.assertEqual(fila['id'], ana.pk)
+        self.assertEqual(
+            [fila[clave] for clave in ('dias_0_30', 'dias_31_60', 'dias_61_90', 'mas_90', 'total')],
+            [Decimal('30.00'), Decimal('15.00'), Decimal('0.00'), Decimal('0.00'), Decimal('45.00')],
+        )
+        self.assertEqual(informe['totales']['total'], Decimal('45.00'))
+
+    def test_coincide_con_aplicar_pagos_en_python(self):
+        with mock.patch.object(sintetico, 'TAMANO_BLOQUE', 4):
+            sintetico.sembrar(clientes=12, despachos=400, pagos=60, ubicaciones=0, conductores=1, dias=200)
+        informe = {fila['id']: fila for fila in calcular_antiguedad(self.ayer)['clientes']}
+        limite = timezone.make_aware(datetime.combine(timezone.localdate(), datetime.min.time()))
+        for cliente in Cliente.objects.all():
+            pagado = cliente.pagos.filter(fecha__lt=limite).aggregate(total=Sum('monto'))['total'] or 0
+            esperado = defaultdict(Decimal)
+            for despacho in cliente.despacho_set.filter(fecha__lt=limite).order_by('fecha', 'id'):
+                aplicado = min(pagado, despacho.total)
+                pagado -= aplicado
+                dias = (self.ayer - timezone.localtime(despacho.fecha).date()).days
+                tramo = 'dias_0_30' if dias <= 30 else 'dias_31_60' if dias <= 60 else 'dias_61_90' if dias <= 90 else 'mas_90'
+                esperado[tramo] += despacho.total - aplicado
+            if sum(esperado.values()) <= 0:
+                self.assertNotIn(cliente.pk, informe)
+                continue
+            for tramo in ('dias_0_30', 'dias_31_60', 'dias_61_90', 'mas_90'):
+                self.assertEqual(informe[cliente.pk][tramo], esperado[tramo], (cliente.pk, tramo))
+
+    def test_vista_api_y_cache_del_dia(self):
+        ana = Cliente.objects.create(nombre='Ana', apellido='Pérez', direccion='Calle 1', telefono='1')
+        self._despacho(ana, 3, '12.50')
+        self.client.force_login(self.empresa)
+
+        respuesta = self.client.get(reverse('clientes:antiguedad_saldos'))
+        self.assertContains(respuesta, 'Ana Pérez')
+        self.assertContains(respuesta, '$12,50')
+
+        # El informe del día ya está en caché: otro despacho viejo no cambia nada hasta recalcular
+        self._despacho(ana, 40, '7.50')
+        with self.assertNumQueries(0):
+            informe_antiguedad(self.ayer)
+        datos = self.client.get(reverse('clientes:api_antiguedad_saldos')).json()
+        self.assertEqual(datos['totales']['total'], 12.5)
+        datos = self.client.get(reverse('clientes:api_antiguedad_saldos'), {'recalcular': '1'}).json()
+        self.assertEqual(datos['totales']['total'], 20.0)
+        self.assertEqual(datos['clientes'][0]['dias_31_60'], 7.5)
+
+        hoy = timezone.localdate().isoformat()
+        self.assertEqual(self.client.get(reverse('clientes:api_antiguedad_saldos'), {'fecha': hoy}).status_code, 400)
+
+
+class PrediccionPedidosTests(TestCase):
+    """
+    Predicción del próximo pedido: intervalo con peso exponencial calculado en
+    bloque con NumPy, tabla guardada y API de pedidos para hoy.
+    """
+    def setUp(self):
+        self.empresa = Usuario.objects.create_user(username='empresa', password='x', tipo_usuario='empresa')
+        self.enterContext(en_empresa(self.empresa))
+        self.hoy = timezone.localdate()
+
+    def _cliente(self, nombre, hace_dias):
+        cliente = Cliente.objects.create(nombre=nombre, apellido='Test', direccion='Calle 1', telefono='1')
+        for dias in hace_dias:
+            momento = timezone.make_aware(datetime.combine(self.hoy - timedelta(days=dias), datetime.min.time().replace(hour=10)))
+            Despacho.objects.create(cliente=cliente, fecha=momento, cantidad_botellones=1)
+        return cliente
+
+    def test_coincide_con_media_exponencial_en_python(self):
+        with mock.patch.object(sintetico, 'TAMANO_BLOQUE', 4):
+            sintetico.sembrar(clientes=15, despachos=300, pagos=0, ubicaciones=0, conductores=1, dias=120)
+        clientes, dias = cargar_historial(self.hoy - timedelta(days=365))
+        resultado = calcular_predicciones(clientes, dias, vida_media=2, min_pedidos=3)
+        calculados = {int(c): i for i, c in enumerate(resultado['cliente'])}
+
+        historial = defaultdict(set)
+        for cliente_id, fecha in Despacho.objects.values_list('cliente_id', 'fecha'):
+            historial[cliente_id].add(timezone.localtime(fecha).date().toordinal())
+        for cliente_id, dias_cliente in historial.items():
+            dias_cliente = sorted(dias_cliente)
+            if len(dias_cliente) < 3:
+                self.assertNotIn(cliente_id, calculados)
+                continue
+            intervalos = [b - a for a, b in zip(dias_cliente, dias_cliente[1:])]
+            pesos = [0.5 ** ((len(intervalos) - 1 - i) / 2) for i in range(len(intervalos))]
+            media = sum(p * x for p, x in zip(pesos, intervalos)) / sum(pesos)
+            varianza = sum(p * (x - media) ** 2 for p, x in zip(pesos, intervalos)) / sum(pesos)
+            i = calculados[cliente_id]
+            self.assertAlmostEqual(resultado['intervalo'][i], media, places=9)
+            self.assertAlmostEqual(resultado['desviacion'][i], varianza ** 0.5, places=9)
+            self.assertEqual(resultado['ultimo'][i], dias_cliente[-1])
+            self.assertEqual(resultado['pedidos'][i], len(dias_cliente))
+
+    def test_comando_guarda_y_api_lee_la_tabla(self):
+        # Pide cada 7 días y el último fue hace 7: le toca hoy
+        semanal = self._cliente('Semanal', [28, 21, 14, 7, 7])
+        # Pide cada 10 días y el último fue hace 2
+        self._cliente('Decenal', [22, 12, 2])
+        # También le toca hoy, pero pide después de calcular la predicción
+        servido = self._cliente('Servido', [35, 28, 21, 14, 7])
+        # Con dos pedidos no hay predicción
+        self._cliente('Nuevo', [10, 3])
+
+        salida = StringIO()
+        call_command('predecir_pedidos', stdout=salida)
+        self.assertIn('3 predicciones guardadas', salida.getvalue())
+        prediccion = PrediccionPedido.objects.get(cliente=semanal)
+        self.assertEqual(prediccion.pedidos, 4)
+        self.assertEqual(prediccion.intervalo_dias, 7.0)
+        self.assertEqual(prediccion.proxima_fecha, self.hoy)
+        self.assertEqual((prediccion.desde, prediccion.hasta), (self.hoy - timedelta(days=1), self.hoy + timedelta(days=1)))
+        self.assertEqual(prediccion.nuevos_desde, inicio_del_dia(self.hoy - timedelta(days=6)))
+
+        Despacho.objects.create(cliente=servido, cantidad_botellones=1)
+
+        self.client.force_login(self.empresa)
+        with self.assertNumQueries(3):
+            datos = self.client.get(reverse('clientes:api_pedidos_previstos')).json()
+        self.assertEqual([c['nombre'] for c in datos['clientes']], ['Semanal Test'])
+        self.assertEqual(datos['clientes'][0]['estado'], 'previsto')
+
+        # Dentro de 9 días: el semanal está atrasado y al decenal le toca (al servido no, ya pidió)
+        dentro = (self.hoy + timedelta(days=9)).isoformat()
+        datos = self.client.get(reverse('clientes:api_pedidos_previstos'), {'fecha': dentro}).json()
+        self.assertEqual([(c['nombre'], c['estado']) for c in datos['clientes']],
+                         [('Semanal Test', 'atrasado'), ('Decenal Test', 'previsto')])
+
+        # Un cliente que ya no tiene predicción se borra al recalcular
+        Cliente.objects.filter(pk=semanal.pk).update(activo=False)
+        call_command('predecir_pedidos', stdout=StringIO())
+        self.assertFalse(PrediccionPedido.objects.filter(cliente=semanal).exists())
+
+
+class AsignacionDespachosTests(TestCase):
+    """
+    Asignación de despachos a conductores y camiones: manifiesto por conductor,
+    reparto equilibrado y despachos del día limitados al conductor.
+    """
+    def setUp(self):
+        self.empresa = Usuario.objects.create_user(username='empresa', email='e@x.com', password='x', tipo_usuario='empresa')
+        self.ana = Usuario.objects.create_user(username='ana', email='a@x.com', password='x', tipo_usuario='conductor', camion_asignado='Camión 001', empresa=self.empresa)
+        self.luis = Usuario.objects.create_user(username='luis', email='l@x.com', password='x', tipo_usuario='conductor', camion_asignado='Camión 002', empresa=self.empresa)
+        self.enterContext(en_empresa(self.empresa))
+        self.cliente = Cliente.objects.create(nombre='Carla', apellido='Ruiz', direccion='Calle 1', telefono='1')
+
+    def _despacho(self, cantidad, conductor=None, **extra):
+        return Despacho.objects.create(
+            cliente=self.cliente, cantidad_botellones=cantidad, conductor=conductor,
+            camion=conductor.camion_asignado if conductor else '', **extra,
+        )
+
+    def test_crear_asigna_al_conductor_o_al_menos_cargado(self):
+        self._despacho(5, self.ana)
+        self.client.force_login(self.empresa)
+        datos = self.client.post(reverse('clientes:api_crear_despacho'), json.dumps({
+            'cliente_id': self.cliente.id, 'cantidad': 2,
+        }), content_type='application/json').json()
+        self.assertEqual((datos['despacho']['conductor_id'], datos['despacho']['camion']), (self.luis.id, 'Camión 002'))
+
+        self.client.force_login(self.ana)
+        datos = self.client.post(reverse('clientes:api_crear_despacho'), json.dumps({
+            'cliente_id': self.cliente.id, 'cantidad': 1,
+        }), content_type='application/json').json()
+        self.assertEqual(datos['despacho']['conductor_id'], self.ana.id)
+
+    def test_manifiesto_y_despachos_del_dia_solo_del_conductor(self):
+        self._despacho(3, self.ana, entregado=True)
+        pendiente = self._despacho(2, self.ana)
+        self._despacho(4, self.ana, cancelado=True)
+        self._despacho(6, self.luis)
+
+        self.client.force_login(self.ana)
+        with self.assertNumQueries(2):
+            datos = self.client.get(reverse('clientes:api_manifiesto')).json()
+        self.assertEqual(datos['camion'], 'Camión 001')
+        self.assertEqual(datos['despachos'][0]['id'], pendiente.id)
+        self.assertEqual(datos['totales'], {'despachos': 2, 'pendientes': 1, 'botellones': 5, 'botellones_pendientes': 2})
+        self.assertEqual(len(self.client.get(reverse('clientes:api_despachos_hoy')).json()['despachos']), 3)
+
+        # La empresa ve todos y elige el manifiesto de cualquier conductor
+        self.client.force_login(self.empresa)
+        self.assertEqual(len(self.client.get(reverse('clientes:api_despachos_hoy')).json()['despachos']), 4)
+        datos = self.client.get(reverse('clientes:api_manifiesto'), {'conductor': self.luis.id}).json()
+        self.assertEqual(datos['totales']['botellones'], 6)
+        self.assertEqual(self.client.get(reverse('clientes:api_manifiesto')).status_code, 400)
+
+    def test_repartir_equilibra_botellones_y_asignar_cambia_conductor(self):
+        self._despacho(4, self.ana)
+        for cantidad in (6, 3, 2, 1):
+            self._despacho(cantidad)
+        self._despacho(5, entregado=True)
+
+        self.client.force_login(self.empresa)
+        datos = self.client.post(reverse('clientes:api_repartir_despachos'), '{}', content_type='application/json').json()
+        self.assertEqual(datos['asignados'], 4)
+        carga = {fila['conductor_id']: fila['botellones'] for fila in datos['carga']}
+        self.assertEqual(carga, {self.ana.id: 8, self.luis.id: 8})
+        self.assertEqual(Despacho.objects.filter(conductor__isnull=True).count(), 1)
+
+        despacho = Despacho.objects.filter(conductor=self.luis).first()
+        version = despacho.version
+        datos = self.client.post(reverse('clientes:api_asignar_despacho', args=[despacho.id]),
+                                 json.dumps({'conductor_id': self.ana.id}), content_type='application/json').json()
+        self.assertEqual(datos['camion'], 'Camión 001')
+        despacho.refresh_from_db()
+        self.assertEqual((despacho.conductor, despacho.version), (self.ana, version + 1))
+
+    def test_repartir_no_pisa_lo_asignado_mientras_reparte(self):
+        primero = self._despacho(3)
+        self._despacho(2)
+        carga_del_dia = asignacion.carga_del_dia
+
+        def asignar_a_mano_y_cargar(fecha):
+            # Otra petición asigna el despacho entre la lectura y el UPDATE del reparto
+            Despacho.objects.filter(pk=primero.pk).update(conductor=self.luis)
+            return carga_del_dia(fecha)
+
+        with mock.patch.object(asignacion, 'carga_del_dia', side_effect=asignar_a_mano_y_cargar):
+            asignados, omitidos = repartir(timezone.localdate())
+        self.assertEqual((sum(asignados.values()), omitidos), (1, 1))
+        primero.refresh_from_db()
+        self.assertEqual(primero.conductor, self.luis)
+        self.assertFalse(Despacho.objects.filter(conductor__isnull=True).exists())
+
+
+class EmpresasTests(TestCase):
+    """
+    Varias empresas en un despliegue: cada petición solo ve las filas de la
+    empresa de su usuario y las filas nuevas quedan en esa empresa.
+    """
+    def setUp(self):
+        cache.clear()
+        self.norte = Usuario.objects.create_user(username='norte', email='n@x.com', password='x', tipo_usuario='empresa')
+        self.sur = Usuario.objects.create_user(username='sur', email='s@x.com', password='x', tipo_usuario='empresa')
+        self.conductor_sur = Usuario.objects.create_user(username='chofer', email='c@x.com', password='x', empresa=self.sur)
+        with en_empresa(self.norte):
+            self.ana = Cliente.objects.create(nombre='Ana', apellido='Norte', direccion='Calle 1', telefono='1')
+            Despacho.objects.create(cliente=self.ana, cantidad_botellones=2, total=Decimal('5.00'))
+        with en_empresa(self.sur):
+            self.luis = Cliente.objects.create(nombre='Luis', apellido='Sur', direccion='Calle 2', telefono='2')
+
+    def test_cada_empresa_ve_solo_lo_suyo(self):
+        self.assertEqual(Despacho.todos.get().empresa, self.norte)
+        self.client.force_login(self.sur)
+        nombres = [c['nombre'] for c in self.client.get(reverse('clientes:api_clientes')).json()['clientes']]
+        self.assertEqual(nombres, ['Luis Sur'])
+        self.assertEqual(self.client.get(reverse('clientes:detalle_cliente', args=[self.ana.pk])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('clientes:api_resumen_header')).json()['despachos_hoy'], 0)
+
+        # El conductor trabaja para su empresa y crea despachos para sus clientes
+        self.client.force_login(self.conductor_sur)
+        def crear(cliente):
+            return self.client.post(reverse('clientes:api_crear_despacho'), json.dumps({
+                'cliente_id': cliente.pk, 'cantidad': 1,
+            }), content_type='application/json')
+        self.assertEqual(crear(self.ana).status_code, 400)
+        self.assertTrue(crear(self.luis).json()['success'])
+        self.assertEqual(Despacho.todos.filter(empresa=self.sur).count(), 1)
+
+        self.client.force_login(self.norte)
+        self.assertEqual(self.client.get(reverse('clientes:api_resumen_header')).json()['despachos_hoy'], 1)
+
+    def test_sin_ambito_se_ven_todas(self):
+        self.assertEqual(Cliente.objects.count(), 2)
+        with en_empresa(self.sur):
+            self.assertEqual(list(Cliente.objects.all()), [self.luis])
+            nuevo = Cliente.objects.create(nombre='Eva', apellido='Sur', direccion='Calle 3', telefono='3')
+        self.assertEqual(nuevo.empresa, self.sur)
+        with en_empresa(None):
+            self.assertFalse(Cliente.objects.exists())
+
+    def test_usuarios_de_oficina_comparten_la_empresa(self):
+        oficina = Usuario.objects.create_user(
+            username='oficina_sur', email='o@x.com', password='x', tipo_usuario='empresa', empresa=self.sur,
+        )
+        self.client.force_login(oficina)
+        nombres = [c['nombre'] for c in self.client.get(reverse('clientes:api_clientes')).json()['clientes']]
+        self.assertEqual(nombres, ['Luis Sur'])
+
+        # La empresa de un usuario adicional tiene que ser la principal
+        otra = Usuario(username='otra', tipo_usuario='empresa', empresa=oficina)
+        with self.assertRaises(ValidationError):
+            otra.clean()
+
+    def test_la_empresa_vincula_a_un_conductor_registrado(self):
+        nuevo = Usuario.objects.create_user(username='nuevo', email='nu@x.com', password='x')
+        url = reverse('clientes:api_vincular_conductor')
+        self.client.force_login(self.norte)
+        respuesta = self.client.post(url, json.dumps({'username': 'nuevo'}), content_type='application/json')
+        self.assertTrue(respuesta.json()['success'])
+        nuevo.refresh_from_db()
+        self.assertEqual(nuevo.empresa, self.norte)
+
+        # Un conductor que ya tiene empresa no se le quita a otra
+        respuesta = self.client.post(url, json.dumps({'username': 'chofer'}), content_type='application/json')
+        self.assertEqual(respuesta.status_code, 404)
+        self.conductor_sur.refresh_from_db()
+        self.assertEqual(self.conductor_sur.empresa, self.sur)
+
+    def test_asignar_empresa_a_filas_sin_empresa(self):
+        with en_empresa(None):
+            viejo = Cliente.objects.create(nombre='Olga', apellido='Vieja', direccion='Calle 4', telefono='4')
+            Despacho.objects.create(cliente=viejo, cantidad_botellones=1, total=Decimal('2.50'))
+            Pago.objects.create(cliente=viejo, monto=Decimal('2.50'))
+        suelto = Usuario.objects.create_user(username='suelto', email='su@x.com', password='x')
+
+        with self.assertRaises(CommandError):
+            call_command('asignar_empresa', '--empresa', 'norte', '--conductores', 'chofer', stdout=StringIO())
+        salida = StringIO()
+        call_command('asignar_empresa', '--empresa', 'norte', '--conductores', 'suelto', stdout=salida)
+        self.assertIn('1 clientes (1 despachos, 1 pagos', salida.getvalue())
+        self.assertFalse(Cliente.todos.filter(empresa__isnull=True).exists())
+        self.assertEqual(Despacho.todos.get(cliente=viejo).empresa, self.norte)
+        self.assertEqual(Pago.todos.get(cliente=viejo).empresa, self.norte)
+        suelto.refresh_from_db()
+        self.assertEqual(suelto.empresa, self.norte)
+
+
+@override_settings(AUDIT_CONFIG={'LOG_DATA_CHANGES': True, 'AUDIT_RETENTION_DAYS': 30, 'AUDIT_BACKGROUND_FLUSH': False})
+class AuditoriaTests(TestCase):
+    """
+    Registro de auditoría: quién, qué, antes y después de cada cambio, escrito
+    por lotes fuera de la petición y borrado al vencer la retención.
+    """
+    def setUp(self):
+        # Búfer propio de cada prueba, sin hilo: se vacía a mano
+        self.enterContext(mock.patch.object(auditoria, '_bufer', None))
+        self.empresa = Usuario.objects.create_user(username='empresa', email='e@x.com', password='x', tipo_usuario='empresa')
+        self.enterContext(en_empresa(self.empresa))
+
+    def _registros(self):
+        return list(RegistroAuditoria.objects.order_by('id').values_list('accion', 'modelo', 'antes', 'despues'))
+
+    def test_alta_edicion_y_baja_con_valores_antes_y_despues(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            cliente = Cliente.objects.create(nombre='Ana', apellido='Ruiz', direccion='Calle 1', telefono='1')
+            despacho = Despacho.objects.create(cliente=cliente, cantidad_botellones=2, total=Decimal('5.00'))
+        with self.captureOnCommitCallbacks(execute=True):
+            despacho = Despacho.objects.get(pk=despacho.pk)
+            despacho.cantidad_botellones = 3
+            despacho.save()
+            despacho.save()  # Sin cambios: no se registra
+            despacho.delete()
+        # Nada se escribe hasta vaciar el búfer
+        self.assertFalse(RegistroAuditoria.objects.exists())
+        self.assertEqual(auditoria.buffer().vaciar(), 4)
+
+        registros = self._registros()
+        self.assertEqual([(accion, modelo) for accion, modelo, _, _ in registros], [
+            ('crear', 'clientes.cliente'), ('crear', 'clientes.despacho'),
+            ('editar', 'clientes.despacho'), ('eliminar', 'clientes.despacho'),
+        ])
+        self.assertEqual(registros[1][3]['total'], '5.00')
+        self.assertNotIn('version', registros[1][3])
+        self.assertEqual(registros[2][2:], ({'cantidad_botellones': 2}, {'cantidad_botellones': 3}))
+        self.assertEqual(registros[3][2]['cantidad_botellones'], 3)
+        self.assertEqual(set(RegistroAuditoria.objects.values_list('empresa', flat=True)), {self.empresa.id})
+
+    def test_la_peticion_no_inserta_y_registra_quien(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            cliente = Cliente.objects.create(nombre='Ana', apellido='Ruiz', direccion='Calle 1', telefono='1')
+            despacho = Despacho.objects.create(cliente=cliente, cantidad_botellones=2)
+        auditoria.buffer().vaciar()
+
+        self.client.force_login(self.empresa)
+        with CaptureQueriesContext(connection) as consultas, self.captureOnCommitCallbacks(execute=True):
+            datos = self.client.post(reverse('clientes:api_marcar_entregado', args=[despacho.id]),
+                                     json.dumps({'entregado': True}), content_type='application/json').json()
+        self.assertTrue(datos['success'])
+        self.assertFalse([c['sql'] for c in consultas.captured_queries if 'registroauditoria' in c['sql']])
+
+        auditoria.buffer().vaciar()
+        registro = RegistroAuditoria.objects.get(accion='editar')
+        self.assertEqual((registro.usuario_id, registro.objeto_id), (self.empresa.id, str(despacho.id)))
+        self.assertEqual((registro.antes, registro.despues), ({'entregado': False}, {'entregado': True}))
+
+    def test_reparto_dispositivos_y_retencion(self):
+        conductor = Usuario.objects.create_user(username='ana', email='a@x.com', password='x', camion_asignado='C1', empresa=self.empresa)
+        cliente = Cliente.objects.create(nombre='Ana', apellido='Ruiz', direccion='Calle 1', telefono='1')
+        despacho = Despacho.objects.create(cliente=cliente, cantidad_botellones=2)
+        dispositivo = Device.objects.create(name='Tablet')
+        with self.captureOnCommitCallbacks(execute=True):
+            repartir(timezone.localdate())
+            dispositivo = Device.objects.get(pk=dispositivo.pk)
+            dispositivo.last_seen = timezone.now()
+            dispositivo.save(update_fields=['last_seen'])  # No se audita
+            dispositivo.active = False
+            dispositivo.save()
+        auditoria.buffer().vaciar()
+        self.assertEqual(self._registros(), [
+            ('editar', 'clientes.despacho', {'conductor_id': None, 'camion': ''}, {'conductor_id': conductor.id, 'camion': 'C1'}),
+            ('editar', 'usuarios.device', {'active': True}, {'active': False}),
+        ])
+        self.assertEqual(RegistroAuditoria.objects.first().objeto_id, str(despacho.id))
+
+        with self.assertRaises(ValueError):
+            RegistroAuditoria.objects.first().save()
+        RegistroAuditoria.objects.filter(modelo='usuarios.device').update(fecha=timezone.now() - timedelta(days=31))
+        salida = StringIO()
+        call_command('purgar_auditoria', stdout=salida)
+        self.assertIn('1 registros', salida.getvalue())
+        self.assertEqual(RegistroAuditoria.objects.count(), 1)
+
+    def test_cambio_de_precio_del_cliente_audita_sus_despachos(self):
+        cliente = Cliente.objects.create(nombre='Ana', apellido='Ruiz', direccion='Calle 1', telefono='1',
+                                         precio_botellon=Decimal('2.50'))
+        despacho = Despacho.objects.create(cliente=cliente, cantidad_botellones=2, precio_unitario=Decimal('2.50'))
+        auditoria.buffer().pendientes.clear()
+
+        self.client.force_login(self.empresa)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('clientes:editar_cliente', args=[cliente.pk]), {
+                'nombre': 'Ana', 'apellido': 'Ruiz', 'direccion': 'Avenida Principal 10', 'telefono': '04141234567',
+                'precio_botellon': '3.00', 'activo': 'on',
+            })
+        auditoria.buffer().vaciar()
+        registro = RegistroAuditoria.objects.get(modelo='clientes.despacho')
+        self.assertEqual(registro.objeto_id, str(despacho.id))
+        self.assertEqual((registro.antes, registro.despues), ({'precio_unitario': '2.50'}, {'precio_unitario': '3.00'}))
+
+    def test_registro_invalido_y_base_de_datos_caida(self):
+        bufer = auditoria.buffer()
+        registro = {
+            'fecha': timezone.now(), 'usuario_id': None, 'empresa_id': self.empresa.id, 'accion': 'editar',
+            'modelo': 'clientes.cliente', 'objeto_id': '1', 'antes': {}, 'despues': {},
+        }
+        # Solo se descarta el registro que no se puede guardar
+        bufer.pendientes.extend([registro, {**registro, 'antes': {'x': object()}}, registro])
+        with self.assertLogs('water_delivery.auditoria', 'ERROR'):
+            self.assertEqual(bufer.vaciar(), 2)
+        self.assertEqual(RegistroAuditoria.objects.count(), 2)
+
+        # Con la base de datos caída se reintenta sin pasar del máximo, y no para siempre
+        bufer.reintentos, bufer.maximo = 1, 2
+        bufer.pendientes.extend([registro] * 3)
+        with mock.patch.object(type(RegistroAuditoria.objects), 'bulk_create', side_effect=OperationalError):
+            with self.assertRaises(OperationalError):
+                bufer.vaciar()
+            self.assertEqual(len(bufer.pendientes), 2)
+            with self.assertLogs('water_delivery.auditoria', 'ERROR'), self.assertRaises(OperationalError):
+                bufer.vaciar()
+        self.assertFalse(bufer.pendientes)
+        self.assertEqual(RegistroAuditoria.objects.count(), 2)
+
+
+class BitacoraTests(TestCase):
+    """
+    Logs por cola: JSON con id de petición, usuario y vista, escritos desde
+    otro hilo, sin bloquear si la cola se llena y sin volcados DEBUG por defecto.
+    """
+    def _registro(self, muestreo, **opciones):
+        salida = StringIO()
+        manejador = bitacora.ManejadorEnCola([{'class': 'logging.StreamHandler', 'stream': salida}], **opciones)
+        manejador.addFilter(bitacora.FiltroContexto())
+        manejador.addFilter(bitacora.FiltroMuestreo(muestreo))
+        registro = logging.getLogger(f'pruebas.bitacora.{self._testMethodName}')
+        registro.setLevel(logging.DEBUG)
+        registro.propagate = False
+        registro.addHandler(manejador)
+        self.addCleanup(registro.removeHandler, manejador)
+        return registro, manejador, salida
+
+    def test_registros_json_con_contexto_de_la_peticion(self):
+        registro, manejador, salida = self._registro(muestreo=1)
+        usuario = Usuario.objects.create_user(username='empresa', email='e@x.com', password='x', tipo_usuario='empresa')
+        self.client.force_login(usuario)
+        with mock.patch('clientes.views.logger', registro):
+            respuesta = self.client.post(reverse('clientes:nuevo_cliente'), {'nombre': 'Ana'}, HTTP_X_REQUEST_ID='abc-123')
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            registro.exception('Fuera de la petición', extra={'lote': 7})
+        manejador.listener.stop()
+
+        self.assertEqual(respuesta['X-Request-ID'], 'abc-123')
+        self.assertRegex(self.client.get(reverse('clientes:api_clientes'), HTTP_X_REQUEST_ID='no válido')['X-Request-ID'], r'^[0-9a-f]{32}$')
+        volcado, error = [json.loads(linea) for linea in salida.getvalue().splitlines()]
+        self.assertEqual(
+            (volcado['nivel'], volcado['request_id'], volcado['usuario'], volcado['vista']),
+            ('DEBUG', 'abc-123', usuario.id, 'clientes:nuevo_cliente'),
+        )
+        self.assertEqual((error['request_id'], error['lote']), (None, 7))
+        self.assertIn('ZeroDivisionError', error['excepcion'])
+
+    def test_respuestas_de_error_con_el_id_de_la_peticion(self):
+        _, manejador, salida = self._registro(muestreo=0)
+        # django.request registra el 400 después de que BitacoraMiddleware terminó
+        logging.getLogger('django.request').addHandler(manejador)
+        self.addCleanup(logging.getLogger('django.request').removeHandler, manejador)
+        usuario = Usuario.objects.create_user(username='empresa', email='e@x.com', password='x', tipo_usuario='empresa')
+        self.client.force_login(usuario)
+        self.client.post(reverse('clientes:api_crear_despacho'), '{', content_type='application/json',
+                         HTTP_X_REQUEST_ID='err-400')
+        manejador.listener.stop()
+
+        aviso = json.loads(salida.getvalue().splitlines()[-1])
+        self.assertEqual(
+            (aviso['nivel'], aviso['request_id'], aviso['usuario'], aviso['vista']),
+            ('WARNING', 'err-400', usuario.id, 'clientes:api_crear_despacho'),
+        )
+        self.assertNotIn('request', aviso)
+
+    def test_sin_volcados_debug_y_sin_bloquear_con_la_cola_llena(self):
+        # Por defecto (LOG_DEBUG_MUESTREO=0) la app ni siquiera arma los volcados
+        self.assertFalse(logging.getLogger('clientes.views').isEnabledFor(logging.DEBUG))
+
+        registro, manejador, salida = self._registro(muestreo=0, maximo=2)
+        registro.debug('Descartado por el muestreo')
+        manejador.listener.stop()
+        for numero in range(5):
+            registro.info('Mensaje %d', numero)
+        self.assertEqual(manejador.descartados, 3)
+
+        # Al haber sitio otra vez se avisa cuántos se perdieron
+        manejador.listener.start()
+        registro.info('Después')
+        manejador.listener.stop()
+        mensajes = [json.loads(linea)['mensaje'] for linea in salida.getvalue().splitlines()]
+        self.assertEqual(mensajes[:2], ['Mensaje 0', 'Mensaje 1'])
+        self.assertIn('Cola de logs llena: 3 registros descartados', mensajes)
+
+
+class ArchivoMovimientosTests(TestCase):
+    """
+    Archivo de períodos cerrados: los movimientos salen de las tablas activas
+    y el SaldoInicial de cada cliente conserva saldos, estados e informes.
+    """
+    def setUp(self):
+        cache.clear()
+        self.empresa = Usuario.objects.create_user(username='empresa', password='x', tipo_usuario='empresa')
+        self.enterContext(en_empresa(self.empresa))
+        self.hoy = timezone.localdate()
+        self.ana = Cliente.objects.create(nombre='Ana', apellido='Pérez', direccion='Calle 1', telefono='1')
+        self.luis = Cliente.objects.create(nombre='Luis', apellido='Gil', direccion='Calle 2', telefono='2')
+        # Hace más de un año: se archiva todo menos el despacho pendiente
+        self._despacho(self.ana, 500, 4, entregado=True)
+        self._despacho(self.ana, 480, 2, cancelado=True)
+        self.pendiente = self._despacho(self.ana, 470, 1)
+        self._pago(self.ana, 460, '6.00')
+        self._despacho(self.luis, 450, 2, entregado=True)
+        self._pago(self.luis, 440, '8.00')
+        # Último mes: se queda en las tablas activas
+        self._despacho(self.ana, 20, 3, entregado=True)
+        self._pago(self.ana, 10, '2.50')
+        self.reciente = self._pago(self.luis, 5, '1.00')
+
+    def _momento(self, dias):
+        return timezone.make_aware(datetime.combine(self.hoy - timedelta(days=dias), datetime.min.time().replace(hour=10)))
+
+    def _despacho(self, cliente, dias, cantidad, **estado):
+        return Despacho.objects.create(
+            cliente=cliente, fecha=self._momento(dias), cantidad_botellones=cantidad,
+            total=Decimal('2.50') * cantidad, **estado,
+        )
+
+    def _pago(self, cliente, dias, monto):
+        pago = Pago.objects.create(cliente=cliente, monto=Decimal(monto))
+        Pago.objects.filter(pk=pago.pk).update(fecha=self._momento(dias))
+        return pago
+
+    def _calculos(self):
+        desde = self.hoy - timedelta(days=30)
+        ayer = self.hoy - timedelta(days=1)
+        estado = EstadoCuenta(self.ana, desde=desde)
+        return {
+            'saldos': [saldo_actual(cliente.pk) for cliente in (self.ana, self.luis)],
+            'estado': (estado.count(), estado.saldo_inicial, [m['saldo'] for m in estado[0:10]], estado.saldo_final),
+            'completo': EstadoCuenta(self.luis).saldo_final,
+            'previos': movimientos_por_cliente([self.luis.pk], desde=desde)[self.luis.pk]['saldo_inicial'],
+            'antiguedad': calcular_antiguedad(ayer)['clientes'],
+            'deuda': calcular_resumen_dashboard()['total_deuda'],
+        }
+
+    def test_archivar_conserva_saldos_estados_e_informes(self):
+        antes = self._calculos()
+        salida = StringIO()
+        with self.assertLogs('clientes.archivo') as registros:
+            call_command('archivar_movimientos', '--lote', '2', stdout=salida)
+        self.assertEqual(len(registros.output), 3)  # Dos lotes de despachos y uno de pagos
+        self.assertIn('3 despachos y 2 pagos', salida.getvalue())
+
+        self.assertEqual(self._calculos(), antes)
+        self.assertEqual(DespachoArchivado.objects.count(), 3)
+        self.assertEqual(PagoArchivado.objects.count(), 2)
+        self.assertEqual(set(Despacho.objects.filter(fecha__lt=corte_de_archivo(12)).values_list('pk', flat=True)), {self.pendiente.pk})
+        saldo = SaldoInicial.objects.get(cliente=self.ana)
+        self.assertEqual(
+            (saldo.cargos, saldo.abonos, saldo.saldo, saldo.despachos, saldo.entregados, saldo.botellones, saldo.pagos),
+            (Decimal('15.00'), Decimal('6.00'), Decimal('9.00'), 2, 1, 6, 1),
+        )
+        self.assertEqual(saldo.empresa_id, self.empresa.id)
+        # Lo archivado ya no vuelve a moverse
+        self.assertEqual(archivar(corte_de_archivo(12)), {'despachos': 0, 'pagos': 0})
+
+        with self.assertRaises(CommandError):
+            call_command('archivar_movimientos', '--meses', '2')
+
+    def test_detalle_y_recalculo_de_saldo_con_archivo(self):
+        with self.assertLogs('clientes.archivo'):
+            archivar(corte_de_archivo(12))
+        self.client.force_login(self.empresa)
+        respuesta = self.client.get(reverse('clientes:detalle_cliente', kwargs={'pk': self.ana.pk}))
+        self.assertEqual(
+            [respuesta.context[clave] for clave in ('total_despachos', 'despachos_entregados', 'despachos_pendientes', 'total_botellones')],
+            [4, 2, 1, 10],
+        )
+
+        # Editar o borrar movimientos recalcula el saldo a partir del SaldoInicial
+        self.client.post(reverse('clientes:eliminar_pago', kwargs={'pago_id': self.reciente.pk}))
+        self.luis.refresh_from_db()
+        self.assertEqual(self.luis.saldo, Decimal('-3.00'))
+        self.client.get(reverse('clientes:editar_cliente', kwargs={'pk': self.ana.pk}))
+        self.ana.refresh_from_db()
+        self.assertEqual((self.ana.saldo, self.ana.debe_total), (Decimal('16.50'), 7))
+
+    def test_cambio_de_precio_recalcula_lo_archivado(self):
+        with self.assertLogs('clientes.archivo'):
+            archivar(corte_de_archivo(12))
+        self.client.force_login(self.empresa)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('clientes:editar_cliente', kwargs={'pk': self.ana.pk}), {
+                'nombre': 'Ana', 'apellido': 'Pérez', 'direccion': 'Avenida Principal 10', 'telefono': '04141234567',
+                'precio_botellon': '3.00', 'activo': 'on',
+            })
+        # Los 10 botellones al nuevo precio, archivados o no, menos los 8,50 pagados
+        self.ana.refresh_from_db()
+        self.assertEqual((self.ana.saldo, saldo_actual(self.ana.pk)), (Decimal('21.50'), Decimal('21.50')))
+        saldo = SaldoInicial.objects.get(cliente=self.ana)
+        self.assertEqual((saldo.cargos, saldo.saldo), (Decimal('18.00'), Decimal('12.00')))
+        self.assertEqual(set(DespachoArchivado.objects.filter(cliente=self.ana).values_list('total', flat=True)),
+                         {Decimal('12.00'), Decimal('6.00')})
+        # El otro cliente no cambia
+        self.assertEqual(SaldoInicial.objects.get(cliente=self.luis).cargos, Decimal('5.00'))
+
+
+class ParticionesTests(TestCase):
+    """
+    Particiones mensuales: nombres y límites por mes local, el DDL de la
+    conversión en PostgreSQL y qué particiones vencidas se sueltan. En SQLite
+    las tablas son normales y el mantenimiento no hace nada.
+    """
+    def test_meses_y_nombres(self):
+        self.assertEqual(particiones.sumar_meses(date(2025, 11, 1), 3), date(2026, 2, 1))
+        self.assertEqual(particiones.sumar_meses(date(2025, 1, 1), -13), date(2023, 12, 1))
+        desde, hasta = particiones.limites_mes(date(2025, 12, 1))
+        self.assertEqual((timezone.localtime(desde).date(), timezone.localtime(hasta).date()), (date(2025, 12, 1), date(2026, 1, 1)))
+        self.assertEqual(timezone.localtime(desde).hour, 0)
+        nombre = particiones.nombre_particion('clientes_despacho', date(2025, 3, 1))
+        self.assertEqual(nombre, 'clientes_despacho_p202503')
+        self.assertEqual(particiones.mes_de_particion(nombre), date(2025, 3, 1))
+        self.assertIsNone(particiones.mes_de_particion('clientes_despacho' + particiones.SUFIJO_DEFECTO))
+
+    def test_en_sqlite_no_hace_nada(self):
+        self.assertFalse(particiones.particionado())
+        self.assertEqual(particiones.asegurar_particiones(repartir_defecto=True), [])
+        self.assertEqual(particiones.soltar_vencidas(), ([], []))
+        salida = StringIO()
+        call_command('particiones', stdout=salida)
+        self.assertIn('no es PostgreSQL', salida.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('particiones', '--meses', '0')
+
+    def test_conversion_en_postgresql(self):
+        ejecutadas = []
+        primera = timezone.make_aware(datetime.combine(particiones.sumar_meses(timezone.localdate().replace(day=1), -2), datetime.min.time()))
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                pass
+
+            def execute(self, sql, params=None):
+                ejecutadas.append(sql)
+
+            def fetchall(self):
+                if 'pg_index' in ejecutadas[-1]:
+                    return [('CREATE INDEX clientes_de_cliente_idx ON public.clientes_despacho USING btree (cliente_id, fecha)',)]
+                return [('clientes_despacho_cliente_id_fk', 'FOREIGN KEY (cliente_id) REFERENCES clientes_cliente(id) DEFERRABLE INITIALLY DEFERRED')]
+
+            def fetchone(self):
+                return (primera,)
+
+        editor = mock.Mock()
+        editor.connection.vendor = 'postgresql'
+        editor.connection.ops = connection.ops
+        editor.connection.cursor = Cursor
+        with override_settings(PARTICIONES={'MESES_ADELANTE': 2}):
+            particiones.particionar(editor, Despacho)
+
+        self.assertIn('PARTITION BY RANGE ("fecha")', ejecutadas[4])
+        creadas = [sql.split('"')[1] for sql in ejecutadas if 'PARTITION OF' in sql]
+        # Dos meses con datos, el actual, dos adelante y la partición por defecto
+        self.assertEqual(len(creadas), 6)
+        self.assertTrue(creadas[-1].endswith(particiones.SUFIJO_DEFECTO))
+        despues_de_copiar = ejecutadas[ejecutadas.index('INSERT INTO "clientes_despacho" SELECT * FROM "clientes_despacho_sin_particionar"'):]
+        self.assertIn('PRIMARY KEY ("id", "fecha")', ' '.join(despues_de_copiar))
+        self.assertIn('CREATE INDEX clientes_de_cliente_idx ON public.clientes_despacho USING btree (cliente_id, fecha)', despues_de_copiar)
+        self.assertTrue(any(sql.startswith('ALTER TABLE "clientes_despacho" ADD CONSTRAINT "clientes_despacho_cliente_id_fk"') for sql in despues_de_copiar))
+
+    def test_soltar_vencidas_respeta_retencion_y_despachos_sin_archivar(self):
+        hoy = date(2026, 10, 19)
+        existentes = {
+            'clientes.Despacho': {date(2025, 8, 1): 'd_p202508', date(2025, 9, 1): 'd_p202509', date(2025, 10, 1): 'd_p202510'},
+            'clientes.UbicacionCamion': {date(2026, 6, 1): 'u_p202606', date(2026, 7, 1): 'u_p202607'},
+        }
+        with mock.patch.object(particiones, 'particionado', return_value=True), \
+                mock.patch.object(particiones, 'particiones', side_effect=lambda modelo, alias: existentes[modelo._meta.label]), \
+                mock.patch.object(particiones, '_vacia', side_effect=lambda nombre, alias: nombre != 'd_p202509'), \
+                mock.patch.object(particiones, 'soltar_particion') as soltar:
+            soltadas, conservadas = particiones.soltar_vencidas(hoy)
+        # Despachos: 12 meses (hasta octubre de 2025); ubicaciones: 3 (hasta julio de 2026)
+        self.assertEqual(soltadas, ['d_p202508', 'u_p202606'])
+        self.assertEqual(conservadas, ['d_p202509'])
+        self.assertEqual(soltar.call_count, 2)
@@ -17,6 +17,8 @@ urlpatterns = [
     path('nuevo/', ClienteCreateView.as_view(), name='nuevo_cliente'),
     # Detalle de cliente
     path('<int:pk>/', ClienteDetailView.as_view(), name='detalle_cliente'),
+    # Estado de cuenta del cliente (despachos y pagos con saldo acumulado)
+    path('<int:pk>/estado-cuenta/', estado_cuenta, name='estado_cuenta'),
     # Editar cliente
     path('editar/<int:pk>/', ClienteUpdateView.as_view(), name='editar_cliente'),
     # Nuevo despacho
@@ -34,6 +36,8 @@ urlpatterns = [
     # Editar/eliminar pago
     path('pago/<int:pago_id>/editar/', editar_pago, name='editar_pago'),
     path('pago/<int:pago_id>/eliminar/', eliminar_pago, name='eliminar_pago'),
+    # Antigüedad de saldos (deuda por tramos de días, pagos aplicados en orden FIFO)
+    path('antiguedad-saldos/', antiguedad_saldos, name='antiguedad_saldos'),
     # Dashboard de despachos
     path('dashboard-despachos/', dashboard_despachos, name='dashboard_despachos'),
     # Historial de despachos
@@ -43,6 +47,8 @@ urlpatterns = [
     # =====================
     # API: lista de clientes activos
     path('api/clientes/', api_clientes_activos, name='api_clientes'),
+    # API: contadores del encabezado (resumen del día en caché)
+    path('api/resumen-header/', api_resumen_header, name='api_resumen_header'),
     # API: despachos de hoy
     path('api/despachos-hoy/', api_despachos_hoy, name='api_despachos_hoy'),
     # API: despachos recientes (últimos 10 días)
@@ -57,10 +63,29 @@ urlpatterns = [
     path('api/marcar-entregado/<int:despacho_id>/', api_marcar_entregado, name='api_marcar_entregado'),
     # API: marcar despacho como cancelado descontado
     path('api/marcar-cancelado/<int:despacho_id>/', api_marcar_cancelado, name='api_marcar_cancelado'),
+    # API: asignar un despacho a un conductor y repartir los del día
+    path('api/asignar-despacho/<int:despacho_id>/', api_asignar_despacho, name='api_asignar_despacho'),
+    path('api/repartir-despachos/', api_repartir_despachos, name='api_repartir_despachos'),
+    # API: manifiesto del conductor y carga de cada conductor en el día
+    path('api/manifiesto/', api_manifiesto, name='api_manifiesto'),
+    path('api/carga-conductores/', api_carga_conductores, name='api_carga_conductores'),
+    # API: sumar a la empresa un conductor recién registrado
+    path('api/vincular-conductor/', api_vincular_conductor, name='api_vincular_conductor'),
+    # API: estado de cuenta paginado de un cliente
+    path('api/clientes/<int:pk>/estado-cuenta/', api_estado_cuenta, name='api_estado_cuenta'),
+    # API: antigüedad de saldos al cierre de un día
+    path('api/antiguedad-saldos/', api_antiguedad_saldos, name='api_antiguedad_saldos'),
+    # API: clientes que deberían pedir hoy según la predicción guardada
+    path('api/pedidos-previstos/', api_pedidos_previstos, name='api_pedidos_previstos'),
+    # API: historial de despachos y pagos de un cliente, por páginas (detalle del cliente)
+    path('api/clientes/<int:pk>/despachos/', api_cliente_despachos, name='api_cliente_despachos'),
+    path('api/clientes/<int:pk>/pagos/', api_cliente_pagos, name='api_cliente_pagos'),
     # API: guardar ubicación del camión
     path('api/guardar-ubicacion/', api_guardar_ubicacion, name='api_guardar_ubicacion'),
     # API: información del conductor
     path('api/conductor-info/', api_conductor_info, name='api_conductor_info'),
+    # API: última ubicación activa de los conductores
+    path('api/ubicaciones/', api_ubicaciones, name='api_ubicaciones'),
     # Ruta del camión en tiempo real
     path('ruta/', ruta_camion, name='ruta_camion'),
 ]
\ No newline at end of file
@@ -9,22 +9,44 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.views.generic import ListView, CreateView, UpdateView, DetailView
 from django.urls import reverse_lazy
-from django.db.models import Sum
-from django.http import JsonResponse
+from django.db.models import Count, Exists, F, OuterRef, Sum
+from django.db.models.functions import Coalesce
+from django.http import HttpResponseNotAllowed, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods, require_POST
 from django.contrib.auth.decorators import login_required
 from django.db.models import Q
+from collections import defaultdict
 from datetime import date, datetime
+from asgiref.sync import sync_to_async
 import json
-from .models import Cliente, Despacho, Pago, UbicacionCamion, ConfiguracionRastreo
+from .models import Cliente, Despacho, Pago, PrediccionPedido, UbicacionCamion, ConfiguracionRastreo
+from usuarios.models import Usuario
 from .forms import ClienteForm, ClienteEditForm, PagoForm
+from .estado_cuenta import EstadoCuenta, recalcular_saldo
+from .resumenes import resumen_dashboard, resumen_header
+from .antiguedad import TRAMOS, informe_antiguedad
+from .archivo import cambiar_precio_archivado
+from .asignacion import asignar, carga_del_dia, conductor_menos_cargado, conductores_activos, rango_del_dia, repartir
+from water_delivery.auditoria import registrar_actualizacion
+from water_delivery.cache import etiqueta_modelo, invalidar_etiquetas
+from water_delivery.empresas import empresa_de, filtrar_por_empresa
+from water_delivery.fragmentos import filas_en_cache, precargar
+from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponseForbidden
 from django.contrib import messages
 from django.utils import timezone
 from decimal import Decimal
-from django.db import models
+from django.db import transaction
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Caché de filas por versión (ver water_delivery/fragmentos.py): subir el
+# sufijo cuando cambie el HTML de la fila o los campos de la fila de la API
+FRAGMENTO_FILA_CLIENTE = 'fila_cliente:v1'
+FRAGMENTO_FILA_DESPACHO = 'fila_despacho:v1'
 
 # Decorador para empresa
 
@@ -91,18 +113,12 @@ def dashboard(request):
     """
     Vista para el panel de control principal.
     Muestra resumen de clientes activos, deuda total y despachos pendientes.
+    Las cifras salen de la caché de resúmenes (una sola consulta al recalcular).
     """
-    from datetime import datetime
-    
-    total_clientes = Cliente.objects.filter(activo=True).count()
-    total_deuda = Cliente.objects.aggregate(Sum('debe_total'))['debe_total__sum'] or 0
-    despachos_pendientes = Despacho.objects.filter(entregado=False).count()
     fecha_actual = datetime.now().strftime('%d/%m/%Y %H:%M')
     
     return render(request, 'clientes/dashboard.html', {
-        'total_clientes': total_clientes,
-        'total_deuda': total_deuda,
-        'despachos_pendientes': despachos_pendientes,
+        **resumen_dashboard(),
         'fecha_actual': fecha_actual,
     })
 
@@ -144,6 +160,14 @@ def api_clientes_activos(request):
     
     return JsonResponse({'clientes': clientes_list})
 
+@login_required
+def api_resumen_header(request):
+    """
+    API con los contadores del encabezado (despachos y botellones de hoy,
+    clientes activos). Responde desde caché; las escrituras la invalidan.
+    """
+    return JsonResponse({'success': True, **resumen_header()})
+
 @login_required
 def api_despachos_hoy(request):
     """
@@ -162,9 +186,18 @@ def api_despachos_hoy(request):
     else:
         fecha_filtrada = date.today()
 
+    inicio, fin = rango_del_dia(fecha_filtrada)
     despachos = Despacho.objects.filter(
-        fecha__date=fecha_filtrada
-    ).select_related('cliente').order_by('-fecha')
+        fecha__gte=inicio, fecha__lt=fin
+    ).select_related('cliente', 'conductor').order_by('-fecha')
+    # Un conductor solo ve los despachos que tiene asignados; la empresa puede
+    # filtrar por ?conductor=<id> o ?conductor=sin_asignar
+    if getattr(request.user, 'tipo_usuario', None) != 'empresa':
+        despachos = despachos.filter(conductor=request.user)
+    elif request.GET.get('conductor') == 'sin_asignar':
+        despachos = despachos.filter(conductor__isnull=True)
+    elif request.GET.get('conductor', '').isdigit():
+        despachos = despachos.filter(conductor_id=request.GET['conductor'])
 
     despachos_list = []
     for despacho in despachos:
@@ -177,7 +210,8 @@ def api_despachos_hoy(request):
             'notas': despacho.notas or '',
             'fecha': timezone.localtime(despacho.fecha).strftime('%Y-%m-%d'),
             'entregado': despacho.entregado,
-            'cancelado': despacho.cancelado
+            'cancelado': despacho.cancelado,
+            **_asignacion_despacho(despacho),
         })
 
     return JsonResponse({
@@ -218,6 +252,13 @@ def api_crear_despacho(request):
                     'success': False,
                     'message': 'La fecha proporcionada es inválida.'
                 }, status=400)
+        # Conductor: quien lo crea si es conductor; si no, el elegido o el menos cargado del día
+        if getattr(request.user, 'tipo_usuario', None) == 'conductor':
+            conductor = request.user
+        elif data.get('conductor_id'):
+            conductor = get_object_or_404(conductores_activos(), id=data.get('conductor_id'))
+        else:
+            conductor = conductor_menos_cargado(timezone.localtime(fecha_despacho).date())
         # Crear el despacho
         despacho = Despacho.objects.create(
             cliente=cliente,
@@ -225,7 +266,9 @@ def api_crear_despacho(request):
             notas=notas,
             precio_unitario=precio,
             total=total,
-            fecha=fecha_despacho
+            fecha=fecha_despacho,
+            conductor=conductor,
+            camion=conductor.camion_asignado if conductor else ''
         )
         # Sumar el total al saldo del cliente
         cliente.saldo += total
@@ -241,7 +284,8 @@ def api_crear_despacho(request):
                 'notas': notas,
                 'fecha': timezone.localtime(despacho.fecha).strftime('%Y-%m-%d'),
                 'entregado': despacho.entregado,
-                'cancelado': despacho.cancelado
+                'cancelado': despacho.cancelado,
+                **_asignacion_despacho(despacho),
             }
         })
     except Exception as e:
@@ -442,6 +486,176 @@ def api_marcar_cancelado(request, despacho_id):
             'message': f'Error al actualizar estado de cancelación: {str(e)}'
         }, status=400)
 
+# ASIGNACIÓN DE DESPACHOS A CONDUCTORES (ver clientes/asignacion.py)
+
+def _nombre_conductor(conductor):
+    return f"{conductor.first_name} {conductor.last_name}".strip() or conductor.username
+
+def _asignacion_despacho(despacho):
+    """Conductor y camión de un despacho para las respuestas JSON."""
+    return {
+        'conductor_id': despacho.conductor_id,
+        'conductor': _nombre_conductor(despacho.conductor) if despacho.conductor_id else '',
+        'camion': despacho.camion,
+    }
+
+def _carga_conductores(fecha):
+    return [
+        {
+            'conductor_id': conductor.id,
+            'conductor': _nombre_conductor(conductor),
+            'camion': conductor.camion_asignado,
+            'despachos': conductor.despachos,
+            'pendientes': conductor.pendientes,
+            'botellones': conductor.botellones,
+        }
+        for conductor in carga_del_dia(fecha)
+    ]
+
+@empresa_o_conductor
+@login_required
+def api_manifiesto(request):
+    """
+    Manifiesto de un conductor: sus despachos de ?fecha= (por defecto hoy),
+    primero los pendientes, con los totales de su camión. El conductor ve el
+    suyo; la empresa indica ?conductor=<id>.
+    """
+    try:
+        fecha = _parsear_fecha_param(request.GET.get('fecha')) or timezone.localdate()
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Fecha inválida: use AAAA-MM-DD.'}, status=400)
+
+    if request.user.tipo_usuario == 'conductor':
+        conductor = request.user
+    elif request.GET.get('conductor', '').isdigit():
+        conductor = get_object_or_404(conductores_activos(), id=request.GET['conductor'])
+    else:
+        return JsonResponse({'success': False, 'message': 'Indique el conductor (?conductor=<id>).'}, status=400)
+
+    inicio, fin = rango_del_dia(fecha)
+    despachos = Despacho.objects.filter(
+        conductor=conductor, fecha__gte=inicio, fecha__lt=fin
+    ).select_related('cliente').order_by('entregado', 'fecha')
+
+    despachos_list = []
+    totales = {'despachos': 0, 'pendientes': 0, 'botellones': 0, 'botellones_pendientes': 0}
+    for despacho in despachos:
+        despachos_list.append({
+            'id': despacho.id,
+            'cliente': f"{despacho.cliente.nombre} {despacho.cliente.apellido}",
+            'direccion': despacho.cliente.direccion,
+            'telefono': despacho.cliente.telefono,
+            'cantidad': despacho.cantidad_botellones,
+            'hora': timezone.localtime(despacho.fecha).strftime('%H:%M'),
+            'notas': despacho.notas or '',
+            'entregado': despacho.entregado,
+            'cancelado': despacho.cancelado,
+            'camion': despacho.camion,
+        })
+        if despacho.cancelado:
+            continue
+        totales['despachos'] += 1
+        totales['botellones'] += despacho.cantidad_botellones
+        if not despacho.entregado:
+            totales['pendientes'] += 1
+            totales['botellones_pendientes'] += despacho.cantidad_botellones
+
+    return JsonResponse({
+        'success': True,
+        'fecha': fecha.isoformat(),
+        'conductor_id': conductor.id,
+        'conductor': _nombre_conductor(conductor),
+        'camion': conductor.camion_asignado,
+        'totales': totales,
+        'despachos': despachos_list,
+    })
+
+@solo_empresa
+@login_required
+def api_carga_conductores(request):
+    """API con los despachos y botellones de cada conductor en ?fecha= (por defecto hoy)."""
+    try:
+        fecha = _parsear_fecha_param(request.GET.get('fecha')) or timezone.localdate()
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Fecha inválida: use AAAA-MM-DD.'}, status=400)
+    return JsonResponse({'success': True, 'fecha': fecha.isoformat(), 'carga': _carga_conductores(fecha)})
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@solo_empresa
+@login_required
+def api_asignar_despacho(request, despacho_id):
+    """API para asignar un despacho a un conductor, o dejarlo sin asignar con conductor_id nulo"""
+    despacho = get_object_or_404(Despacho, id=despacho_id)
+    try:
+        data = json.loads(request.body or '{}')
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'JSON inválido.'}, status=400)
+
+    conductor_id = data.get('conductor_id')
+    conductor = get_object_or_404(conductores_activos(), id=conductor_id) if conductor_id else None
+    asignar(despacho, conductor)
+    return JsonResponse({
+        'success': True,
+        'message': f'Despacho asignado a {_nombre_conductor(conductor)}.' if conductor else 'Despacho sin asignar.',
+        **_asignacion_despacho(despacho),
+    })
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@solo_empresa
+@login_required
+def api_repartir_despachos(request):
+    """
+    API para repartir entre los conductores los despachos pendientes sin
+    asignar de una fecha (por defecto hoy), equilibrando los botellones.
+    """
+    try:
+        data = json.loads(request.body or '{}')
+        fecha = _parsear_fecha_param(data.get('fecha')) or timezone.localdate()
+    except (TypeError, ValueError):
+        return JsonResponse({'success': False, 'message': 'Datos inválidos: fecha en formato AAAA-MM-DD.'}, status=400)
+
+    asignados, omitidos = repartir(fecha)
+    total = sum(asignados.values())
+    mensaje = f'{total} despachos repartidos entre {len(asignados)} conductores.'
+    if omitidos:
+        mensaje += f' {omitidos} ya no estaban pendientes sin conductor y no se tocaron.'
+    return JsonResponse({
+        'success': True,
+        'message': mensaje,
+        'asignados': total,
+        'omitidos': omitidos,
+        'carga': _carga_conductores(fecha),
+    })
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@solo_empresa
+@login_required
+def api_vincular_conductor(request):
+    """
+    API para sumar a la empresa un conductor recién registrado, indicando su
+    nombre de usuario. Solo conductores sin empresa: no se quitan a otra.
+    """
+    try:
+        data = json.loads(request.body or '{}')
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'JSON inválido.'}, status=400)
+
+    conductor = Usuario.objects.filter(
+        username=data.get('username') or '', tipo_usuario=Usuario.CONDUCTOR, empresa__isnull=True,
+    ).first()
+    if conductor is None:
+        return JsonResponse({'success': False, 'message': 'No hay un conductor sin empresa con ese usuario.'}, status=404)
+    conductor.empresa_id = empresa_de(request.user)
+    conductor.save(update_fields=['empresa'])
+    return JsonResponse({
+        'success': True,
+        'message': f'{_nombre_conductor(conductor)} ahora trabaja para la empresa.',
+        'conductor_id': conductor.pk,
+    })
+
 # VISTAS PRINCIPALES MEJORADAS
 
 class ClienteListView(ListView):
@@ -519,6 +733,9 @@ class ClienteListView(ListView):
                 'botellones_color': botellones_color,
             })
         context['clientes_info'] = clientes_info
+        # Filas ya renderizadas de los clientes sin cambios, en una sola lectura
+        # (el nombre es el mismo que usa {% fragmento %} en la plantilla)
+        context['fragmentos'] = precargar(FRAGMENTO_FILA_CLIENTE, clientes)
         context['clientes_select'] = Cliente.objects.all().order_by('nombre', 'apellido')
         return context
 
@@ -547,10 +764,8 @@ class ClienteCreateView(CreateView):
         Maneja el envío del formulario POST.
         Asegura que el precio del botellón se procese correctamente.
         """
-        # Log para depuración
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.info(f"[DEBUG] POST data: {request.POST}")
+        # Volcado de depuración (muestreado con LOG_DEBUG_MUESTREO)
+        logger.debug("Nuevo cliente, POST: %s", request.POST)
         
         # Procesar el formulario normalmente
         return super().post(request, *args, **kwargs)
@@ -560,28 +775,23 @@ class ClienteCreateView(CreateView):
         Método que se ejecuta cuando el formulario es válido.
         Asegura que el precio del botellón se guarde correctamente.
         """
-        # Log para depuración
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.info(f"[DEBUG] form_valid - datos limpios: {form.cleaned_data}")
-        logger.info(f"[DEBUG] POST data: {self.request.POST}")
+        logger.debug("Nuevo cliente, datos limpios: %s", form.cleaned_data)
         
         # Obtener el precio del formulario
         precio_form = form.cleaned_data.get('precio_botellon')
-        logger.info(f"[DEBUG] Precio del formulario: {precio_form}")
         
         # Llamar al método padre para guardar el cliente
         response = super().form_valid(form)
         
         # Obtener el cliente creado
         cliente = self.object
-        logger.info(f"[DEBUG] Cliente creado: {cliente.nombre} {cliente.apellido}, precio: {cliente.precio_botellon}")
+        logger.info("Cliente %s creado, precio: %s", cliente.pk, cliente.precio_botellon)
         
         # Verificar que el precio se guardó correctamente
         if precio_form and precio_form != Decimal('2.50'):
             # Si se especificó un precio diferente, asegurarse de que se guarde
             if cliente.precio_botellon != precio_form:
-                logger.info(f"[DEBUG] Actualizando precio de {cliente.precio_botellon} a {precio_form}")
+                logger.debug("Actualizando precio de %s a %s", cliente.precio_botellon, precio_form)
                 cliente.precio_botellon = precio_form
                 cliente.save()
         
@@ -604,16 +814,8 @@ class ClienteUpdateView(UpdateView):
         return super().dispatch(request, *args, **kwargs)
     def get_object(self, queryset=None):
         cliente = super().get_object(queryset)
-        # Recalcular debe_total cada vez que se entra a editar
-        despachos_todos = cliente.despacho_set.all()
-        total_despachos = despachos_todos.aggregate(total=models.Sum('total'))['total'] or 0
-        total_pagos = cliente.pagos.aggregate(total=models.Sum('monto'))['total'] or 0
-        cliente.saldo = total_despachos - total_pagos
-        if float(cliente.precio_botellon) > 0:
-            cliente.debe_total = int(round(float(cliente.saldo) / float(cliente.precio_botellon))) if float(cliente.saldo) > 0 else 0
-        else:
-            cliente.debe_total = 0
-        cliente.save()
+        # Recalcular saldo y debe_total cada vez que se entra a editar
+        recalcular_saldo(cliente, debe_total=True)
         return cliente
     
     def get_initial(self):
@@ -629,12 +831,8 @@ class ClienteUpdateView(UpdateView):
             initial['precio_botellon'] = 2.50
         return initial
     def post(self, request, *args, **kwargs):
-        import logging
-        logger = logging.getLogger(__name__)
-        
-        # Log the raw POST data
-        logger.info(f"[DEBUG] POST data: {request.POST}")
-        logger.info(f"[DEBUG] Files: {request.FILES}")
+        # Volcado de depuración (muestreado con LOG_DEBUG_MUESTREO)
+        logger.debug("Editar cliente, POST: %s", request.POST)
         
         # Handle deactivation from list
         if "activo" in request.POST and request.POST.get("activo") == "false":
@@ -643,58 +841,41 @@ class ClienteUpdateView(UpdateView):
             cliente.save()
             return redirect(self.success_url)
             
-        # Log form data before validation
-        form = self.get_form()
-        logger.info(f"[DEBUG] Form data: {form.data}")
-        logger.info(f"[DEBUG] Form errors: {form.errors if not form.is_valid() else 'No errors'}")
-        
         return super().post(request, *args, **kwargs)
     def form_valid(self, form):
-        import logging
-        logger = logging.getLogger(__name__)
-        
         try:
-            logger.info("[DEBUG] Form is valid, processing...")
-            logger.info(f"[DEBUG] Form cleaned_data: {form.cleaned_data}")
+            logger.debug("Editar cliente, datos limpios: %s", form.cleaned_data)
             
             # Guardar el formulario primero para obtener el objeto cliente actualizado
             response = super().form_valid(form)
             cliente = self.object
-            logger.info(f"[DEBUG] Cliente after save: {cliente.__dict__}")
-            
-            # Log de depuración
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.info(f"[DEBUG] Formulario válido - Datos: {form.cleaned_data}")
-            
-            # Actualizar todos los despachos con el nuevo precio
-            despachos_todos = cliente.despacho_set.all()
-            actualizados = 0
             
-            for despacho in despachos_todos:
-                try:
-                    despacho.precio_unitario = cliente.precio_botellon
-                    despacho.total = despacho.precio_unitario * despacho.cantidad_botellones
-                    despacho.save()
-                    actualizados += 1
-                except Exception as e:
-                    logger.error(f"Error al actualizar despacho {despacho.id}: {str(e)}")
+            # Actualizar todos los despachos con el nuevo precio en un solo UPDATE
+            # (update() no envía señales: la caché y la auditoría van aquí)
+            # El precio como quedó guardado (con sus decimales), igual que en la auditoría de despachos
+            cliente.refresh_from_db(fields=['precio_botellon'])
+            precio = cliente.precio_botellon
+            with transaction.atomic():
+                # Despachos por precio anterior, para auditar cada cambio de precio
+                por_precio = defaultdict(list)
+                for despacho_id, anterior in cliente.despacho_set.select_for_update().values_list('id', 'precio_unitario'):
+                    por_precio[anterior].append(despacho_id)
+                actualizados = cliente.despacho_set.update(
+                    precio_unitario=precio,
+                    total=F('cantidad_botellones') * precio,
+                    version=F('version') + 1,
+                )
+                for anterior, ids in por_precio.items():
+                    if anterior != precio:
+                        registrar_actualizacion(Despacho, ids, {'precio_unitario': anterior}, {'precio_unitario': precio})
+                # Los archivados también, o el saldo dependería de si el archivo ya corrió
+                actualizados += cambiar_precio_archivado(cliente.pk, precio)
+            transaction.on_commit(lambda: invalidar_etiquetas(etiqueta_modelo(Despacho)))
             
-            # Recalcular saldo total
+            # Recalcular saldo total y debe_total (botellones adeudados)
             try:
-                total_despachos = despachos_todos.aggregate(total=models.Sum('total'))['total'] or 0
-                total_pagos = cliente.pagos.aggregate(total=models.Sum('monto'))['total'] or 0
-                cliente.saldo = total_despachos - total_pagos
-                
-                # Recalcular debe_total (botellones adeudados)
-                if float(cliente.precio_botellon) > 0:
-                    cliente.debe_total = int(round(float(cliente.saldo) / float(cliente.precio_botellon))) if float(cliente.saldo) > 0 else 0
-                else:
-                    cliente.debe_total = 0
-                
-                # Guardar los cambios en el cliente
-                cliente.save(update_fields=['saldo', 'debe_total'])
-                logger.info(f"[DEBUG] Cliente {cliente.id} actualizado correctamente")
+                recalcular_saldo(cliente, debe_total=True)
+                logger.info("Cliente %s actualizado, %s despachos al nuevo precio", cliente.id, actualizados)
                 
                 if actualizados > 0:
                     messages.success(self.request, f"Se actualizaron {actualizados} despachos al nuevo precio y se recalculó la deuda.")
@@ -711,7 +892,7 @@ class ClienteUpdateView(UpdateView):
                     })
                     
             except Exception as e:
-                logger.error(f"Error al recalcular saldos para cliente {cliente.id}: {str(e)}")
+                logger.exception("Error al recalcular saldos para cliente %s", cliente.id)
                 if self.request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                     return JsonResponse({
                         'success': False,
@@ -722,7 +903,7 @@ class ClienteUpdateView(UpdateView):
             return response
             
         except Exception as e:
-            logger.error(f"Error en form_valid: {str(e)}")
+            logger.exception("Error al guardar el cliente %s", form.instance.pk)
             if self.request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                 return JsonResponse({
                     'success': False,
@@ -749,10 +930,7 @@ class ClienteUpdateView(UpdateView):
         # Comentario detallado: Este método asegura que el template reciba el objeto 'cliente' correctamente.
         context = super().get_context_data(**kwargs)
         context['cliente'] = self.object
-        # Log para depuración (aparecerá en consola del servidor)
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.info(f"[DEBUG] Contexto en editar_cliente: cliente={self.object} debe_total={self.object.debe_total} saldo={self.object.saldo}")
+        logger.debug("Editar cliente %s: debe_total=%s saldo=%s", self.object.pk, self.object.debe_total, self.object.saldo)
         return context
 
 class ClienteDetailView(DetailView):
@@ -764,27 +942,196 @@ class ClienteDetailView(DetailView):
             return acceso_denegado_conductor(request)
         return super().dispatch(request, *args, **kwargs)
     
+    def get_queryset(self):
+        # El resumen de lo archivado viene en el mismo JOIN
+        return super().get_queryset().select_related('saldo_inicial')
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Obtener todos los despachos del cliente ordenados por fecha
-        context['despachos'] = self.object.despacho_set.all().order_by('-fecha')
         context['pago_form'] = PagoForm()
-        
-        # Estadísticas del cliente
-        total_despachos = context['despachos'].count()
-        despachos_entregados = context['despachos'].filter(entregado=True).count()
-        despachos_pendientes = context['despachos'].filter(entregado=False).count()
-        total_botellones = sum(d.cantidad_botellones for d in context['despachos'])
-        
-        context.update({
-            'total_despachos': total_despachos,
-            'despachos_entregados': despachos_entregados,
-            'despachos_pendientes': despachos_pendientes,
-            'total_botellones': total_botellones,
-        })
-        
+        # Estadísticas del cliente en una sola consulta; los historiales de
+        # despachos y pagos los carga la página por partes (ver api_cliente_despachos)
+        estadisticas = self.object.despacho_set.aggregate(
+            total_despachos=Count('pk'),
+            despachos_entregados=Count('pk', filter=Q(entregado=True)),
+            despachos_pendientes=Count('pk', filter=Q(entregado=False, cancelado=False)),
+            total_botellones=Coalesce(Sum('cantidad_botellones'), 0),
+        )
+        # Los despachos archivados siguen contando (ver clientes/archivo.py)
+        archivado = getattr(self.object, 'saldo_inicial', None)
+        if archivado is not None:
+            estadisticas['total_despachos'] += archivado.despachos
+            estadisticas['despachos_entregados'] += archivado.entregados
+            estadisticas['total_botellones'] += archivado.botellones
+        context.update(estadisticas)
         return context
 
+# --- HISTORIAL DEL CLIENTE (carga por partes) ---
+
+HISTORIAL_POR_PAGINA = 20
+
+def _pagina_historial(request, queryset):
+    """
+    Devuelve los registros de la página ?page= y si hay más después.
+    Se pide un registro extra en lugar de contar el total, así el costo de
+    cada página no depende de cuántos registros tenga el cliente.
+    """
+    try:
+        numero = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        numero = 1
+    inicio = (numero - 1) * HISTORIAL_POR_PAGINA
+    registros = list(queryset[inicio:inicio + HISTORIAL_POR_PAGINA + 1])
+    return numero, registros[:HISTORIAL_POR_PAGINA], len(registros) > HISTORIAL_POR_PAGINA
+
+def _fila_despacho(despacho):
+    fecha_local = timezone.localtime(despacho.fecha)
+    return {
+        'id': despacho.id,
+        'fecha': fecha_local.strftime('%d/%m/%Y'),
+        'hora': fecha_local.strftime('%H:%M'),
+        'cantidad': despacho.cantidad_botellones,
+        'entregado': despacho.entregado,
+        'cancelado': despacho.cancelado,
+        'notas': despacho.notas or '',
+    }
+
+@solo_empresa
+@login_required
+def api_cliente_despachos(request, pk):
+    """
+    API con el historial de despachos de un cliente, del más reciente al más antiguo.
+    Parámetro: page (20 despachos por página).
+    """
+    cliente = get_object_or_404(Cliente, pk=pk)
+    numero, despachos, hay_mas = _pagina_historial(
+        request, cliente.despacho_set.order_by('-fecha', '-id')
+    )
+    # Solo se arman las filas de despachos que cambiaron desde la última vez
+    despachos_list = filas_en_cache(FRAGMENTO_FILA_DESPACHO, despachos, _fila_despacho)
+    return JsonResponse({
+        'success': True,
+        'pagina': numero,
+        'hay_mas': hay_mas,
+        'despachos': despachos_list,
+    })
+
+@solo_empresa
+@login_required
+def api_cliente_pagos(request, pk):
+    """
+    API con el historial de pagos de un cliente, del más reciente al más antiguo.
+    Parámetro: page (20 pagos por página).
+    """
+    cliente = get_object_or_404(Cliente, pk=pk)
+    numero, pagos, hay_mas = _pagina_historial(request, cliente.pagos.order_by('-fecha', '-id'))
+    pagos_list = []
+    for pago in pagos:
+        pagos_list.append({
+            'id': pago.id,
+            'fecha': timezone.localtime(pago.fecha).strftime('%d/%m/%Y %H:%M'),
+            'monto': f'{pago.monto:.2f}',
+            'observaciones': pago.observaciones or '',
+        })
+    return JsonResponse({
+        'success': True,
+        'pagina': numero,
+        'hay_mas': hay_mas,
+        'pagos': pagos_list,
+    })
+
+# --- ESTADO DE CUENTA ---
+
+MOVIMIENTOS_POR_PAGINA = 50
+
+def _parsear_fecha_param(valor):
+    """Convierte un parámetro AAAA-MM-DD en fecha (None si viene vacío)."""
+    if not valor:
+        return None
+    return datetime.strptime(valor, '%Y-%m-%d').date()
+
+def _paginar_estado_cuenta(request, cliente):
+    """
+    Construye el estado de cuenta del cliente para el rango ?desde=&hasta=
+    y devuelve la página solicitada. Lanza ValueError si el rango es inválido.
+    """
+    desde = _parsear_fecha_param(request.GET.get('desde'))
+    hasta = _parsear_fecha_param(request.GET.get('hasta'))
+    if desde and hasta and desde > hasta:
+        raise ValueError('La fecha inicial es posterior a la final.')
+    estado = EstadoCuenta(cliente, desde, hasta)
+    pagina = Paginator(estado, MOVIMIENTOS_POR_PAGINA).get_page(request.GET.get('page'))
+    return estado, pagina
+
+@solo_empresa
+@login_required
+def estado_cuenta(request, pk):
+    """
+    Vista del estado de cuenta de un cliente: despachos y pagos intercalados
+    con el saldo después de cada movimiento, filtrable por rango de fechas.
+    """
+    cliente = get_object_or_404(Cliente, pk=pk)
+    try:
+        estado, pagina = _paginar_estado_cuenta(request, cliente)
+    except ValueError:
+        messages.error(request, 'Rango de fechas inválido. Usa AAAA-MM-DD.')
+        return redirect('clientes:estado_cuenta', pk=cliente.pk)
+    return render(request, 'clientes/estado_cuenta.html', {
+        'cliente': cliente,
+        'estado': estado,
+        'pagina': pagina,
+        'movimientos': pagina.object_list,
+        'desde': request.GET.get('desde', ''),
+        'hasta': request.GET.get('hasta', ''),
+    })
+
+@solo_empresa
+@login_required
+def api_estado_cuenta(request, pk):
+    """
+    API del estado de cuenta paginado de un cliente.
+    Parámetros: desde, hasta (AAAA-MM-DD, opcionales) y page.
+    """
+    cliente = get_object_or_404(Cliente, pk=pk)
+    try:
+        estado, pagina = _paginar_estado_cuenta(request, cliente)
+    except ValueError:
+        return JsonResponse({
+            'success': False,
+            'message': 'Rango de fechas inválido. Usa AAAA-MM-DD.'
+        }, status=400)
+
+    movimientos_list = []
+    for movimiento in pagina.object_list:
+        fecha_local = timezone.localtime(movimiento['fecha'])
+        movimientos_list.append({
+            'tipo': movimiento['tipo'],
+            'id': movimiento['id'],
+            'fecha': fecha_local.strftime('%Y-%m-%d'),
+            'hora': fecha_local.strftime('%H:%M'),
+            'cantidad': movimiento['cantidad'],
+            'detalle': movimiento['detalle'],
+            'cargo': float(movimiento['cargo']),
+            'abono': float(movimiento['abono']),
+            'saldo': float(movimiento['saldo']),
+        })
+
+    return JsonResponse({
+        'success': True,
+        'cliente': {
+            'id': cliente.id,
+            'nombre': f"{cliente.nombre} {cliente.apellido}",
+        },
+        'saldo_inicial': float(estado.saldo_inicial),
+        'total_cargos': float(estado.resumen['total_cargos']),
+        'total_abonos': float(estado.resumen['total_abonos']),
+        'saldo_final': float(estado.saldo_final),
+        'pagina': pagina.number,
+        'total_paginas': pagina.paginator.num_pages,
+        'total_movimientos': pagina.paginator.count,
+        'movimientos': movimientos_list,
+    })
+
 @empresa_o_conductor
 @login_required
 def marcar_entregado(request, pk):
@@ -858,11 +1205,7 @@ def editar_pago(request, pago_id):
     form = PagoForm(request.POST, instance=pago)
     if form.is_valid():
         form.save()
-        # Recalcular saldo del cliente
-        total_despachos = cliente.despacho_set.aggregate(total=models.Sum('total'))['total'] or 0
-        total_pagos = cliente.pagos.aggregate(total=models.Sum('monto'))['total'] or 0
-        cliente.saldo = total_despachos - total_pagos
-        cliente.save(update_fields=['saldo'])
+        recalcular_saldo(cliente)
         messages.success(request, 'Pago actualizado correctamente.')
     else:
         # Mostrar primer error encontrado
@@ -878,14 +1221,137 @@ def eliminar_pago(request, pago_id):
     pago = get_object_or_404(Pago, pk=pago_id)
     cliente = pago.cliente
     pago.delete()
-    # Recalcular saldo del cliente
-    total_despachos = cliente.despacho_set.aggregate(total=models.Sum('total'))['total'] or 0
-    total_pagos = cliente.pagos.aggregate(total=models.Sum('monto'))['total'] or 0
-    cliente.saldo = total_despachos - total_pagos
-    cliente.save(update_fields=['saldo'])
+    recalcular_saldo(cliente)
     messages.success(request, 'Pago eliminado correctamente.')
     return redirect('clientes:detalle_cliente', pk=cliente.pk)
 
+# --- ANTIGÜEDAD DE SALDOS ---
+
+ANTIGUEDAD_POR_PAGINA = 50
+
+def _informe_antiguedad(request):
+    """Informe de ?fecha= (por defecto ayer). Lanza ValueError si la fecha no es válida."""
+    fecha = _parsear_fecha_param(request.GET.get('fecha'))
+    return informe_antiguedad(fecha, recalcular=request.GET.get('recalcular') == '1')
+
+@solo_empresa
+@login_required
+def antiguedad_saldos(request):
+    """
+    Deuda de cada cliente repartida por antigüedad (0-30, 31-60, 61-90 y más de
+    90 días), al cierre del día indicado, con los pagos aplicados en orden FIFO.
+    """
+    try:
+        informe = _informe_antiguedad(request)
+    except ValueError:
+        messages.error(request, 'Fecha inválida: use AAAA-MM-DD y un día ya terminado.')
+        return redirect('clientes:antiguedad_saldos')
+    pagina = Paginator(informe['clientes'], ANTIGUEDAD_POR_PAGINA).get_page(request.GET.get('page'))
+    claves = [clave for clave, _, _ in TRAMOS]
+    return render(request, 'clientes/antiguedad_saldos.html', {
+        'informe': informe,
+        'tramos': [nombre for _, nombre, _ in TRAMOS],
+        'totales': [(nombre, informe['totales'][clave]) for clave, nombre, _ in TRAMOS],
+        'filas': [
+            {'id': fila['id'], 'nombre': fila['nombre'], 'total': fila['total'],
+             'montos': [fila[clave] for clave in claves]}
+            for fila in pagina.object_list
+        ],
+        'pagina': pagina,
+        'fecha': informe['fecha'].isoformat(),
+    })
+
+@solo_empresa
+@login_required
+def api_antiguedad_saldos(request):
+    """
+    API del informe de antigüedad de saldos.
+    Parámetros: fecha (AAAA-MM-DD, por defecto ayer), page (100 clientes por página)
+    y recalcular=1 para no usar la caché del día.
+    """
+    try:
+        informe = _informe_antiguedad(request)
+    except ValueError:
+        return JsonResponse({
+            'success': False,
+            'message': 'Fecha inválida: use AAAA-MM-DD y un día ya terminado.'
+        }, status=400)
+    pagina = Paginator(informe['clientes'], 100).get_page(request.GET.get('page'))
+    claves = [clave for clave, _, _ in TRAMOS] + ['total']
+    return JsonResponse({
+        'success': True,
+        'fecha': informe['fecha'].isoformat(),
+        'calculado': timezone.localtime(informe['calculado']).isoformat(),
+        'tramos': [{'clave': clave, 'nombre': nombre} for clave, nombre, _ in TRAMOS],
+        'totales': {clave: float(informe['totales'][clave]) for clave in claves},
+        'total_clientes': len(informe['clientes']),
+        'pagina': pagina.number,
+        'total_paginas': pagina.paginator.num_pages,
+        'clientes': [
+            {'id': fila['id'], 'nombre': fila['nombre'], **{clave: float(fila[clave]) for clave in claves}}
+            for fila in pagina.object_list
+        ],
+    })
+
+@empresa_o_conductor
+@login_required
+def api_pedidos_previstos(request):
+    """
+    Clientes que deberían pedir en ?fecha= (por defecto hoy) según PrediccionPedido:
+    aquellos cuya banda de confianza ya empezó y que no han recibido despachos
+    desde el último pedido usado en la predicción. No recalcula nada del historial
+    (eso lo hace el comando predecir_pedidos). Página de 100 clientes (?page=).
+    """
+    try:
+        fecha = _parsear_fecha_param(request.GET.get('fecha')) or timezone.localdate()
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Fecha inválida: use AAAA-MM-DD.'}, status=400)
+
+    # Rango sobre la fecha guardada (no fecha__date): usa el índice y las particiones por mes
+    pedido_posterior = Despacho.objects.filter(
+        cliente_id=OuterRef('cliente_id'), fecha__gte=OuterRef('nuevos_desde')
+    )
+    previstos = (
+        filtrar_por_empresa(PrediccionPedido.objects.all(), 'cliente__empresa')
+        .filter(desde__lte=fecha, cliente__activo=True)
+        .exclude(Exists(pedido_posterior))
+        .select_related('cliente')
+        .order_by('proxima_fecha', 'cliente_id')
+    )
+    pagina = Paginator(previstos, 100).get_page(request.GET.get('page'))
+
+    clientes = []
+    for prediccion in pagina.object_list:
+        cliente = prediccion.cliente
+        if prediccion.hasta < fecha:
+            estado = 'atrasado'
+        elif prediccion.proxima_fecha <= fecha:
+            estado = 'previsto'
+        else:
+            estado = 'posible'
+        clientes.append({
+            'id': cliente.id,
+            'nombre': f'{cliente.nombre} {cliente.apellido}',
+            'direccion': cliente.direccion,
+            'telefono': cliente.telefono,
+            'estado': estado,
+            'ultimo_pedido': prediccion.ultimo_pedido.isoformat(),
+            'proxima_fecha': prediccion.proxima_fecha.isoformat(),
+            'desde': prediccion.desde.isoformat(),
+            'hasta': prediccion.hasta.isoformat(),
+            'intervalo_dias': prediccion.intervalo_dias,
+            'desviacion_dias': prediccion.desviacion_dias,
+            'dias_atraso': max((fecha - prediccion.proxima_fecha).days, 0),
+        })
+    return JsonResponse({
+        'success': True,
+        'fecha': fecha.isoformat(),
+        'total_clientes': pagina.paginator.count,
+        'pagina': pagina.number,
+        'total_paginas': pagina.paginator.num_pages,
+        'clientes': clientes,
+    })
+
 @empresa_o_conductor
 @login_required
 def historial_despachos(request):
@@ -934,17 +1400,38 @@ def api_despachos_recientes(request):
     
     return JsonResponse({'dias': resultado})
 
-@csrf_exempt
-@require_http_methods(["POST"])
-@login_required
-def api_guardar_ubicacion(request):
+# --- APIS DE RASTREO (asíncronas) ---
+# Los conductores envían su posición cada pocos segundos: estas vistas son
+# asíncronas y usan el ORM asíncrono, para que un worker ASGI pueda atender
+# muchas conexiones a la vez (ver water_delivery/asgi.py). En WSGI funcionan
+# igual. Los decoradores de este archivo son síncronos, así que la
+# autenticación y el método se verifican dentro de cada vista.
+
+async def _usuario_autenticado(request):
+    """Usuario de la petición, o None si no inició sesión (sin bloquear el event loop)."""
+    def cargar():
+        return request.user if request.user.is_authenticated else None
+    return await sync_to_async(cargar)()
+
+def _no_autenticado():
+    return JsonResponse({
+        'success': False,
+        'message': 'Debes iniciar sesión'
+    }, status=401)
+
+async def api_guardar_ubicacion(request):
     """
     API para guardar la ubicación del camión en tiempo real.
     Recibe latitud, longitud y precisión del GPS del conductor.
     """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    usuario = await _usuario_autenticado(request)
+    if usuario is None:
+        return _no_autenticado()
     try:
         # Verificar que el usuario sea conductor
-        if not hasattr(request.user, 'tipo_usuario') or request.user.tipo_usuario != 'conductor':
+        if getattr(usuario, 'tipo_usuario', None) != 'conductor':
             return JsonResponse({
                 'success': False,
                 'message': 'Solo los conductores pueden actualizar su ubicación'
@@ -955,7 +1442,6 @@ def api_guardar_ubicacion(request):
         latitud = data.get('latitud')
         longitud = data.get('longitud')
         precision = data.get('precision', 0)
-        timestamp = data.get('timestamp')
         
         # Validar datos requeridos
         if not latitud or not longitud:
@@ -965,14 +1451,14 @@ def api_guardar_ubicacion(request):
             }, status=400)
         
         # Desactivar ubicaciones anteriores del conductor
-        UbicacionCamion.objects.filter(
-            conductor=request.user,
+        await UbicacionCamion.objects.filter(
+            conductor=usuario,
             activo=True
-        ).update(activo=False)
+        ).aupdate(activo=False)
         
         # Crear nueva ubicación
-        ubicacion = UbicacionCamion.objects.create(
-            conductor=request.user,
+        ubicacion = await UbicacionCamion.objects.acreate(
+            conductor=usuario,
             latitud=latitud,
             longitud=longitud,
             senal_gps='Buena' if precision < 20 else 'Regular' if precision < 50 else 'Mala',
@@ -997,36 +1483,66 @@ def api_guardar_ubicacion(request):
             'message': f'Error interno: {str(e)}'
         }, status=500)
 
-@login_required
-def api_conductor_info(request):
+# El GPS del conductor envía JSON sin token CSRF
+api_guardar_ubicacion.csrf_exempt = True
+
+async def api_conductor_info(request):
     """
     API para obtener la información del conductor conectado.
     """
-    try:
-        # Verificar que el usuario sea conductor
-        if not hasattr(request.user, 'tipo_usuario') or request.user.tipo_usuario != 'conductor':
-            return JsonResponse({
-                'success': False,
-                'message': 'Solo los conductores pueden acceder a esta información'
-            }, status=403)
-        
-        # Obtener información del conductor
-        conductor_name = f"{request.user.first_name} {request.user.last_name}".strip()
-        if not conductor_name:
-            conductor_name = request.user.username
-        
-        return JsonResponse({
-            'success': True,
-            'conductor_name': conductor_name,
-            'conductor_id': request.user.id,
-            'email': request.user.email
-        })
-        
-    except Exception as e:
+    usuario = await _usuario_autenticado(request)
+    if usuario is None:
+        return _no_autenticado()
+    # Verificar que el usuario sea conductor
+    if getattr(usuario, 'tipo_usuario', None) != 'conductor':
         return JsonResponse({
             'success': False,
-            'message': f'Error interno: {str(e)}'
-        }, status=500)
+            'message': 'Solo los conductores pueden acceder a esta información'
+        }, status=403)
+    
+    # Obtener información del conductor
+    conductor_name = f"{usuario.first_name} {usuario.last_name}".strip()
+    if not conductor_name:
+        conductor_name = usuario.username
+    
+    return JsonResponse({
+        'success': True,
+        'conductor_name': conductor_name,
+        'conductor_id': usuario.id,
+        'email': usuario.email
+    })
+
+async def api_ubicaciones(request):
+    """
+    API con la última ubicación activa de cada conductor.
+    La empresa ve a todos los conductores; un conductor, solo la suya.
+    """
+    usuario = await _usuario_autenticado(request)
+    if usuario is None:
+        return _no_autenticado()
+    ubicaciones = UbicacionCamion.objects.filter(activo=True).select_related('conductor').order_by('-timestamp')
+    if getattr(usuario, 'tipo_usuario', None) != 'empresa':
+        ubicaciones = ubicaciones.filter(conductor=usuario)
+    else:
+        ubicaciones = filtrar_por_empresa(ubicaciones, 'conductor__empresa')
+
+    ubicaciones_list = []
+    async for ubicacion in ubicaciones:
+        conductor = ubicacion.conductor
+        ubicaciones_list.append({
+            'conductor_id': conductor.id,
+            'conductor_name': f"{conductor.first_name} {conductor.last_name}".strip() or conductor.username,
+            'latitud': float(ubicacion.latitud),
+            'longitud': float(ubicacion.longitud),
+            'velocidad': float(ubicacion.velocidad) if ubicacion.velocidad is not None else None,
+            'bateria': ubicacion.bateria,
+            'senal_gps': ubicacion.senal_gps,
+            'timestamp': ubicacion.timestamp.isoformat(),
+        })
+    return JsonResponse({
+        'success': True,
+        'ubicaciones': ubicaciones_list,
+    })
 
 @solo_empresa
 @login_required
@@ -1035,13 +1551,7 @@ def marcar_pendiente(request, pk):
     if despacho.entregado:
         despacho.entregado = False
         despacho.save()
-        # Recalcular saldo del cliente
-        cliente = despacho.cliente
-        despachos = cliente.despacho_set.all()
-        total_despachos = despachos.aggregate(total=models.Sum('total'))['total'] or 0
-        total_pagos = cliente.pagos.aggregate(total=models.Sum('monto'))['total'] or 0
-        cliente.saldo = total_despachos - total_pagos
-        cliente.save()
+        recalcular_saldo(despacho.cliente)
         messages.success(request, 'El despacho fue marcado como pendiente.')
     return redirect('clientes:detalle_cliente', pk=despacho.cliente.pk)
 
@@ -1052,12 +1562,7 @@ def eliminar_despacho(request, pk):
     cliente = despacho.cliente
     if request.method == 'POST':
         despacho.delete()
-        # Recalcular saldo del cliente
-        despachos = cliente.despacho_set.all()
-        total_despachos = despachos.aggregate(total=models.Sum('total'))['total'] or 0
-        total_pagos = cliente.pagos.aggregate(total=models.Sum('monto'))['total'] or 0
-        cliente.saldo = total_despachos - total_pagos
-        cliente.save()
+        recalcular_saldo(cliente)
         messages.success(request, 'Despacho eliminado correctamente.')
         return redirect('clientes:detalle_cliente', pk=cliente.pk)
     return redirect('clientes:detalle_cliente', pk=cliente.pk)
@@ -1071,7 +1576,7 @@ def ruta_camion(request):
     """
     # Obtener la configuración de rastreo
     configuracion = ConfiguracionRastreo.objects.filter(
-        empresa=request.user,
+        empresa_id=empresa_de(request.user) if request.user.tipo_usuario == 'empresa' else None,
         rastreo_activo=True
     ).first()
     
@@ -1083,21 +1588,24 @@ def ruta_camion(request):
             activo=True
         ).order_by('-timestamp').first()
     
-    # Obtener despachos pendientes para el conductor
+    # Obtener despachos pendientes del conductor (el propio si quien mira es conductor)
+    conductor = request.user if request.user.tipo_usuario == 'conductor' else getattr(configuracion, 'conductor_asignado', None)
     despachos_pendientes = []
-    if configuracion and configuracion.conductor_asignado:
+    if conductor:
         despachos_pendientes = Despacho.objects.filter(
-            entregado=False
+            conductor=conductor,
+            entregado=False,
+            cancelado=False
         ).order_by('fecha')[:5]
     
-    # Estadísticas del día
-    hoy = timezone.now().date()
+    # Estadísticas del día (por rango de fecha: usa el índice y, en PostgreSQL, solo la partición del mes)
+    inicio, fin = rango_del_dia(timezone.localdate())
     despachos_hoy = Despacho.objects.filter(
-        fecha__date=hoy
+        fecha__gte=inicio, fecha__lt=fin
     ).count()
     
     despachos_completados = Despacho.objects.filter(
-        fecha__date=hoy,
+        fecha__gte=inicio, fecha__lt=fin,
         entregado=True
     ).count()
     
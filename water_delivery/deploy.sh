@@ -21,6 +21,10 @@ pip install -r requirements.txt
 echo "🗄️ Ejecutando migraciones..."
 python manage.py migrate
 
+# Crear la tabla de caché compartida (no hace nada si la caché no es db://)
+echo "🧠 Creando tabla de caché..."
+python manage.py createcachetable
+
 # Recolectar archivos estáticos
 echo "📁 Recolectando archivos estáticos..."
 python manage.py collectstatic --noinput
@@ -10,8 +10,8 @@ from .models import Usuario, Device
 
 class UsuarioAdmin(UserAdmin):
     # Lista de campos a mostrar en la tabla principal
-    list_display = ('username', 'email', 'mostrar_tipo_usuario', 'is_active', 'is_superuser', 'camion_asignado')
-    list_filter = ('tipo_usuario', 'is_active', 'is_superuser')
+    list_display = ('username', 'email', 'mostrar_tipo_usuario', 'empresa', 'is_active', 'is_superuser', 'camion_asignado')
+    list_filter = ('tipo_usuario', 'empresa', 'is_active', 'is_superuser')
     search_fields = ('username', 'email', 'tipo_usuario')
     ordering = ('-is_superuser', '-is_active', 'username')
     
@@ -20,6 +20,7 @@ class UsuarioAdmin(UserAdmin):
         ('Datos adicionales', {
             'fields': (
                 'tipo_usuario',
+                'empresa',
                 'telefono',
                 'direccion',
                 'camion_asignado',
@@ -0,0 +1,63 @@
+# =============================================
+# BACKEND DE AUTENTICACIÓN CON USUARIO EN CACHÉ
+# =============================================
+# En cada petición autenticada AuthenticationMiddleware carga el Usuario de la
+# sesión con una consulta. Este backend guarda por unos minutos, en la caché
+# compartida, los campos que usan el middleware de login y los decoradores
+# solo_empresa/empresa_o_conductor (tipo_usuario, is_active, ...). El resto de
+# campos queda diferido y se lee de la base de datos solo si una vista lo usa.
+#
+# El hash de la contraseña no se guarda: la caché puede ser Redis, una tabla
+# o archivos. Para verificar que la sesión siga siendo válida tras un cambio de
+# clave Django solo necesita get_session_auth_hash() (un HMAC con SECRET_KEY),
+# que es lo que se guarda. La entrada se borra al guardar o eliminar el
+# usuario (ver usuarios/signals.py).
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db import router
+
+from water_delivery.cache import CacheCompartida
+
+cache_usuarios = CacheCompartida('usuarios')
+
+CLAVE_USUARIO = 'usuario:{id}'
+TIEMPO_CACHE_USUARIO = 60 * 5
+CAMPOS_CACHEADOS = [
+    'id', 'last_login', 'username', 'first_name', 'last_name', 'email',
+    'tipo_usuario', 'camion_asignado', 'empresa_id', 'is_active', 'is_staff', 'is_superuser',
+]
+
+
+def invalidar_usuario(usuario_id):
+    """Descarta el usuario en caché (se llama al guardarlo o eliminarlo)."""
+    cache_usuarios.delete(CLAVE_USUARIO.format(id=usuario_id))
+
+
+class UsuarioCacheBackend(ModelBackend):
+    """
+    ModelBackend que resuelve el usuario de la sesión desde la caché.
+    La autenticación con usuario y contraseña no cambia.
+    """
+
+    def get_user(self, user_id):
+        UserModel = get_user_model()
+        clave = CLAVE_USUARIO.format(id=user_id)
+        datos = cache_usuarios.get(clave)
+        if datos is None:
+            try:
+                usuario = UserModel._default_manager.only(*CAMPOS_CACHEADOS, 'password').get(pk=user_id)
+            except UserModel.DoesNotExist:
+                return None
+            datos = {campo: getattr(usuario, campo) for campo in CAMPOS_CACHEADOS}
+            datos['hash_sesion'] = usuario.get_session_auth_hash()
+            cache_usuarios.set(clave, datos, timeout=TIEMPO_CACHE_USUARIO)
+        else:
+            # Instancia con los campos de la caché; los demás se cargan al accederlos.
+            # from_db espera los valores en el orden de los campos del modelo.
+            campos = [f.attname for f in UserModel._meta.concrete_fields if f.attname in datos]
+            usuario = UserModel.from_db(
+                router.db_for_read(UserModel), campos, [datos[campo] for campo in campos]
+            )
+            usuario.hash_sesion_cacheado = datos.get('hash_sesion')
+        return usuario if self.user_can_authenticate(usuario) else None
@@ -12,15 +12,38 @@ from django.utils import timezone
 from django.contrib.auth import logout
 from urllib.parse import urlencode
 
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
 class LoginRequiredMiddleware:
     """
     Middleware personalizado que exige autenticación en todas las páginas,
     excepto en las rutas exentas definidas en 'exempt_paths'.
     """
+    # Compatible con vistas síncronas y asíncronas (ver las APIs de rastreo)
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.redireccion_login(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        # La sesión y el usuario se cargan de forma perezosa y pueden consultar
+        # la base de datos: la verificación corre fuera del event loop
+        respuesta = await sync_to_async(self.redireccion_login)(request)
+        return respuesta or await self.get_response(request)
+
+    def redireccion_login(self, request):
+        """
+        Devuelve la redirección al login si la petición la necesita, o None
+        para dejarla continuar.
+        """
         # URLs que NO requieren login (páginas públicas)
         exempt_paths = [
             '/',  # Raíz del sitio
@@ -33,12 +56,12 @@ class LoginRequiredMiddleware:
             '/media/',
             '/favicon.ico',
             '/.well-known/',
+            '/metricas/',  # Se autentica con token propio (ver water_delivery/metricas.py)
         ]
         
         # Evitar bucles: si ya estamos en login, no redirigir de nuevo
         if request.path.startswith('/usuarios/login/'):
-            response = self.get_response(request)
-            return response
+            return None
         
         # Si el usuario no está autenticado y la URL no es pública, redirige al login
         # Manejar casos de sesión corrupta o expirada verificando is_authenticated de forma segura
@@ -78,8 +101,7 @@ class LoginRequiredMiddleware:
                     return redirect('usuarios:login')
         
         # Si está autenticado o la URL es pública, continúa normalmente
-        response = self.get_response(request)
-        return response
+        return None
 
 
 class DeviceDBMiddleware:
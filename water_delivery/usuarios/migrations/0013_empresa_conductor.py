@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:54
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0012_device'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='empresa',
+            field=models.ForeignKey(blank=True, limit_choices_to={'tipo_usuario': 'empresa'}, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='conductores', to=settings.AUTH_USER_MODEL, verbose_name='Empresa'),
+        ),
+    ]
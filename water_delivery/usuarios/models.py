@@ -6,6 +6,7 @@
 # adicionales como dirección, teléfono, camión asignado y recuperación de contraseña.
 
 from django.contrib.auth.models import AbstractUser
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils import timezone
 
@@ -63,10 +64,43 @@ class Usuario(AbstractUser):
         verbose_name="Camión asignado"
     )  # Camión asignado al conductor (opcional)
 
+    empresa = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='conductores',
+        limit_choices_to={'tipo_usuario': EMPRESA},
+        verbose_name="Empresa"
+    )  # Empresa del conductor, o la principal de un usuario empresa adicional (ver water_delivery/empresas.py)
+
     class Meta:
         verbose_name = "Usuario del sistema"
         verbose_name_plural = "Usuarios del sistema"
 
+    def clean(self):
+        super().clean()
+        # La empresa es siempre la principal: sin cadenas ni ciclos de empresas
+        if self.empresa_id is None:
+            return
+        if self.empresa_id == self.pk or self.empresa.empresa_id is not None or (
+                self.pk and self.conductores.exists()):
+            raise ValidationError({'empresa': (
+                'Elija la empresa principal (un usuario empresa que no pertenezca a otra). '
+                'Un usuario con conductores propios no puede pertenecer a otra empresa.'
+            )})
+
+    # Hash de sesión guardado por UsuarioCacheBackend en lugar de la contraseña
+    hash_sesion_cacheado = None
+
+    def get_session_auth_hash(self):
+        """Usa el hash de sesión de la caché si lo hay: así no se lee la contraseña."""
+        return self.hash_sesion_cacheado or super().get_session_auth_hash()
+
+    def set_password(self, raw_password):
+        self.hash_sesion_cacheado = None
+        super().set_password(raw_password)
+
     def __str__(self):
         """Representación legible del usuario"""
         return f"{self.username} ({self.get_tipo_usuario_display()})"
@@ -77,7 +111,9 @@ class Usuario(AbstractUser):
 # =============================================
 import secrets
 
-class Device(models.Model):
+from water_delivery.auditoria import AuditadoMixin
+
+class Device(AuditadoMixin, models.Model):
     """
     Dispositivo autorizado a acceder a la app.
     La validación se hace mediante un token único que el dispositivo envía
@@ -89,6 +125,9 @@ class Device(models.Model):
     last_seen = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Se actualiza en cada petición del dispositivo (ver usuarios/middleware.py)
+    campos_no_auditados = ('last_seen',)
+
     class Meta:
         verbose_name = "Dispositivo autorizado"
         verbose_name_plural = "Dispositivos autorizados"
@@ -0,0 +1,37 @@
+# =============================================
+# SEÑALES DE LA APP DE USUARIOS
+# =============================================
+# Borra de la caché el usuario guardado por UsuarioCacheBackend cuando se
+# modifica o elimina (cambio de tipo, desactivación, contraseña, ...). Se borra
+# en el momento y otra vez al confirmar la transacción, por si una petición
+# concurrente volvió a guardar la fila anterior mientras tanto.
+#
+# Los cambios de dispositivos autorizados van al registro de auditoría (ver
+# water_delivery/auditoria.py).
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from water_delivery.auditoria import registrar_borrado, registrar_guardado
+
+from .backends import invalidar_usuario
+from .models import Device, Usuario
+
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def invalidar_cache_usuario(sender, instance, **kwargs):
+    usuario_id = instance.pk
+    invalidar_usuario(usuario_id)
+    transaction.on_commit(lambda: invalidar_usuario(usuario_id))
+
+
+@receiver(post_save, sender=Device)
+def auditar_guardado_dispositivo(sender, instance, created, **kwargs):
+    registrar_guardado(instance, created)
+
+
+@receiver(post_delete, sender=Device)
+def auditar_borrado_dispositivo(sender, instance, **kwargs):
+    registrar_borrado(instance)
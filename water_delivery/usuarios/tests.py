@@ -4,8 +4,10 @@
 # Este archivo contiene pruebas unitarias para la recuperación de contraseña
 # y validación de usuarios del sistema.
 
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
+from .backends import CLAVE_USUARIO, UsuarioCacheBackend, cache_usuarios
 from .models import Usuario
 
 class UsuarioTests(TestCase):
@@ -49,4 +51,59 @@ class UsuarioTests(TestCase):
         Prueba que la vista de recuperación funciona correctamente.
         """
         response = self.client.get(reverse('usuarios:recuperar'))
-        self.assertEqual(response.status_code, 200)
\ No newline at end of file
+        self.assertEqual(response.status_code, 200)
+
+class UsuarioEnCacheTests(TestCase):
+    """
+    Pruebas de la sesión y el usuario en caché: las peticiones autenticadas
+    no consultan la base de datos antes de llegar a la vista.
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = Usuario.objects.create_user(
+            username='empresa', email='empresa@example.com', password='testpass123', tipo_usuario='empresa',
+        )
+        self.client.login(username='empresa', password='testpass123')
+        self.url = reverse('clientes:api_resumen_header')
+
+    def test_peticion_autenticada_sin_consultas(self):
+        self.client.get(self.url)
+        # Sesión, usuario y resumen ya están en caché
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_campos_no_cacheados_se_cargan_al_usarlos(self):
+        backend = UsuarioCacheBackend()
+        backend.get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            usuario = backend.get_user(self.user.pk)
+            self.assertEqual(usuario.tipo_usuario, 'empresa')
+        with self.assertNumQueries(1):
+            self.assertEqual(usuario.telefono, '0000000000')
+
+    def test_usuario_desactivado_se_invalida(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_la_cache_no_guarda_la_contrasena(self):
+        backend = UsuarioCacheBackend()
+        backend.get_user(self.user.pk)
+        datos = cache_usuarios.get(CLAVE_USUARIO.format(id=self.user.pk))
+        self.assertNotIn('password', datos)
+        self.assertNotIn(self.user.password, datos.values())
+        # La sesión se sigue verificando sin leer la contraseña
+        with self.assertNumQueries(0):
+            usuario = backend.get_user(self.user.pk)
+            self.assertEqual(usuario.get_session_auth_hash(), self.user.get_session_auth_hash())
+
+    def test_cambio_de_contrasena_cierra_la_sesion(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('otraclave456')
+            self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 302)
@@ -96,7 +96,11 @@ class CustomRegisterView(CreateView):
         Si el formulario es válido, registra el usuario y muestra mensaje de éxito.
         """
         response = super().form_valid(form)
-        messages.success(self.request, '¡Registro exitoso! Ahora puedes iniciar sesión.')
+        mensaje = '¡Registro exitoso! Ahora puedes iniciar sesión.'
+        if self.object.tipo_usuario == Usuario.CONDUCTOR:
+            # Sin empresa el conductor no ve despachos ni sus ubicaciones llegan a ninguna
+            mensaje += f' Pide a tu empresa que vincule tu usuario "{self.object.username}" para ver sus despachos.'
+        messages.success(self.request, mensaje)
         return response
 
     def form_invalid(self, form):
@@ -0,0 +1,115 @@
+# =============================================
+# ARRANQUE RÁPIDO E IDEMPOTENTE
+# =============================================
+# Antes cada arranque de un contenedor ejecutaba migrate, createcachetable y
+# collectstatic aunque no hubiera nada nuevo, lo que sumaba varios segundos a
+# cada reinicio y a cada réplica nueva. Aquí se comprueba primero si hay algo
+# que hacer:
+#
+# - Migraciones: el plan de MigrationExecutor (una consulta a django_migrations).
+# - Tabla de caché: solo si la caché es db:// y la tabla no existe.
+# - Estáticos: una huella (sha256) de los archivos que encontraría collectstatic
+#   y del almacenamiento configurado, guardada en STATIC_ROOT junto al manifiesto.
+#
+# Lo usa el comando `manage.py arranque`: los estáticos se recolectan al
+# construir la imagen (--solo-estaticos) y la huella viaja con ellos, porque lo
+# que escriben la fase release o web se pierde en Heroku y Railway. wsgi.py y
+# asgi.py informan cuánto tardó cada proceso en estar listo.
+
+import hashlib
+import os
+import sys
+import time
+
+from django.conf import settings
+from django.contrib.staticfiles.finders import get_finders
+from django.contrib.staticfiles.storage import ManifestFilesMixin, staticfiles_storage
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+ARCHIVO_HUELLA = '.huella_estaticos'
+
+# Los mismos patrones que ignora collectstatic por defecto
+PATRONES_IGNORADOS = ['CVS', '.*', '*~']
+
+
+def migraciones_pendientes(alias=DEFAULT_DB_ALIAS):
+    """Migraciones que aplicaría `migrate`, como 'app.nombre'."""
+    connection = connections[alias]
+    connection.prepare_database()
+    executor = MigrationExecutor(connection)
+    objetivos = executor.loader.graph.leaf_nodes()
+    plan = executor.migration_plan(objetivos)
+    return [f'{migracion.app_label}.{migracion.name}' for migracion, _ in plan]
+
+
+def tablas_cache_pendientes():
+    """Tablas de caché en base de datos (db://) que aún no existen."""
+    pendientes = []
+    for alias in settings.CACHES:
+        cache = caches[alias]
+        if not isinstance(cache, DatabaseCache):
+            continue
+        connection = connections[DEFAULT_DB_ALIAS]
+        if cache._table not in connection.introspection.table_names():
+            pendientes.append(cache._table)
+    return pendientes
+
+
+def huella_estaticos():
+    """
+    sha256 de las rutas y contenidos de los estáticos de origen y de la clase
+    de almacenamiento: cambia si cambia cualquier archivo que collectstatic copiaría.
+    """
+    archivos = {}
+    for finder in get_finders():
+        for ruta, almacenamiento in finder.list(PATRONES_IGNORADOS):
+            prefijo = getattr(almacenamiento, 'prefix', None) or ''
+            destino = os.path.join(prefijo, ruta)
+            # Como collectstatic, gana el primero que encuentra cada ruta
+            archivos.setdefault(destino, almacenamiento.path(ruta))
+
+    huella = hashlib.sha256(staticfiles_storage.__class__.__qualname__.encode())
+    for destino in sorted(archivos):
+        huella.update(destino.encode())
+        with open(archivos[destino], 'rb') as archivo:
+            for bloque in iter(lambda: archivo.read(1 << 16), b''):
+                huella.update(bloque)
+    return huella.hexdigest()
+
+
+def _ruta_huella():
+    return os.path.join(settings.STATIC_ROOT, ARCHIVO_HUELLA)
+
+
+def huella_recolectada():
+    """Huella guardada tras el último collectstatic, o None si falta (o falta el manifiesto)."""
+    if not settings.STATIC_ROOT:
+        return None
+    if isinstance(staticfiles_storage, ManifestFilesMixin) and not staticfiles_storage.exists(
+        staticfiles_storage.manifest_name
+    ):
+        return None
+    try:
+        with open(_ruta_huella(), encoding='utf-8') as archivo:
+            return archivo.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def guardar_huella(huella):
+    os.makedirs(settings.STATIC_ROOT, exist_ok=True)
+    temporal = f'{_ruta_huella()}.{os.getpid()}'
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        archivo.write(huella)
+    os.replace(temporal, _ruta_huella())
+
+
+def informar_arranque(inicio, tipo):
+    """Una línea en stderr (la recoge gunicorn/uvicorn) con lo que tardó el proceso en estar listo."""
+    sys.stderr.write(
+        f'[arranque] pid {os.getpid()}: aplicación {tipo} lista en {time.monotonic() - inicio:.2f}s\n'
+    )
+    sys.stderr.flush()
@@ -2,13 +2,45 @@
 ASGI config for water_delivery project.
 
 Expone la variable ASGI application para servidores compatibles (Daphne, Uvicorn, etc).
+
+Perfil de rastreo: las APIs de GPS (guardar-ubicacion, conductor-info,
+ubicaciones) son vistas asíncronas, así que un solo worker ASGI atiende cientos
+de conexiones de conductores a la vez. El resto de la app sigue en gunicorn con
+workers síncronos; el proxy envía a este servidor solo las rutas de rastreo:
+
+    # App completa (sin cambios)
+    gunicorn water_delivery.wsgi:application --workers 4 --bind 127.0.0.1:8000
+
+    # APIs de rastreo
+    gunicorn water_delivery.asgi:application -k uvicorn.workers.UvicornWorker \
+        --workers 2 --bind 127.0.0.1:8001
+    # o, sin gunicorn:
+    uvicorn water_delivery.asgi:application --workers 2 --port 8001
+
+    # nginx
+    location ~ ^/clientes/api/(guardar-ubicacion|conductor-info|ubicaciones)/ {
+        proxy_pass http://127.0.0.1:8001;
+    }
+
+Requiere `uvicorn` (no está en requirements.txt porque el despliegue por
+defecto no lo usa). En este perfil WhiteNoise se desactiva (PERFIL_ASGI) porque
+es solo síncrono y obligaría a procesar las peticiones de una en una.
 """
 
 import os
+import time
+
+_inicio = time.monotonic()
 
-from django.core.asgi import get_asgi_application
+from django.core.asgi import get_asgi_application  # noqa: E402
 
 # Configuración del entorno y obtención de la aplicación ASGI
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'water_delivery.settings')
+os.environ.setdefault('PERFIL_ASGI', 'True')
 
 application = get_asgi_application()
+
+# Tiempo de arranque del proceso (ver water_delivery/arranque.py)
+from water_delivery.arranque import informar_arranque  # noqa: E402
+
+informar_arranque(_inicio, 'ASGI')
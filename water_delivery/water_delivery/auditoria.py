@@ -0,0 +1,333 @@
+# =============================================
+# REGISTRO DE AUDITORÍA CON ESCRITURA DIFERIDA
+# =============================================
+# Implementa AUDIT_CONFIG['LOG_DATA_CHANGES']: cada alta, edición o baja de
+# Cliente, Despacho, Pago y Device deja un RegistroAuditoria con quién, qué,
+# valores antes y después, y cuándo. Las filas nunca se modifican; solo las
+# borra la retención (AUDIT_RETENTION_DAYS).
+#
+# Los registros no se insertan durante la petición:
+# - Los modelos auditados (AuditadoMixin) recuerdan los valores con que se
+#   leyeron, así que comparar antes y después no necesita otra consulta.
+# - Las señales arman el registro en memoria y, al confirmarse la
+#   transacción, lo dejan en el búfer del proceso.
+# - Un hilo del proceso vacía el búfer por lotes con bulk_create cada
+#   AUDIT_FLUSH_INTERVAL segundos, o antes si se juntan AUDIT_BATCH_SIZE, y
+#   una vez al día borra los registros vencidos. Al salir el proceso se
+#   vacía lo que quede.
+#
+# Si la base de datos no responde, el lote vuelve al búfer y se reintenta en el
+# próximo vaciado, hasta AUDIT_MAX_RETRIES veces seguidas; después se descarta
+# (queda en el log). Si lo que falla es un registro, el lote se parte en
+# mitades hasta aislarlo y solo ese se descarta. El búfer no pasa de
+# AUDIT_BUFFER_MAX registros (se descartan los más antiguos).
+
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import timedelta
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import InterfaceError, OperationalError, ProgrammingError, close_old_connections, models, transaction
+from django.utils import timezone
+
+from .empresas import SIN_AMBITO, empresa_actual
+
+logger = logging.getLogger(__name__)
+
+CREAR = 'crear'
+EDITAR = 'editar'
+ELIMINAR = 'eliminar'
+
+# Campos que cambian en cada guardado y no aportan nada al registro
+CAMPOS_NO_AUDITADOS = {'version'}
+
+INTERVALO_VOLCADO = 5  # segundos
+TAMANO_LOTE = 500
+MAXIMO_BUFER = 50000
+REINTENTOS = 60  # vaciados seguidos con la base de datos caída (5 minutos con el intervalo por defecto)
+INTERVALO_PURGA = 24 * 3600  # segundos
+
+# Fallos de la base de datos que no dependen de los registros: el lote se reintenta
+ERRORES_DE_CONEXION = (InterfaceError, OperationalError, ProgrammingError)
+
+# Petición en curso, para saber quién hizo el cambio
+_peticion = ContextVar('peticion_auditoria', default=None)
+
+
+def configuracion():
+    return getattr(settings, 'AUDIT_CONFIG', {})
+
+
+def auditoria_activa():
+    return bool(configuracion().get('LOG_DATA_CHANGES'))
+
+
+def dias_retencion():
+    return configuracion().get('AUDIT_RETENTION_DAYS', 365)
+
+
+class AuditadoMixin(models.Model):
+    """
+    Modelo cuyas altas, ediciones y bajas se auditan. Guarda los valores con
+    que se leyó de la base de datos para registrar solo lo que cambió.
+    `campos_no_auditados` excluye campos que cambian a menudo sin interés.
+    """
+    campos_no_auditados = ()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        if auditoria_activa():
+            instancia._valores_auditados = valores_auditados(instancia)
+        return instancia
+
+
+def valores_auditados(instancia):
+    """Valores cargados de los campos auditados, por attname (los diferidos no están)."""
+    excluidos = CAMPOS_NO_AUDITADOS.union(instancia.campos_no_auditados)
+    datos = instancia.__dict__
+    return {
+        campo.attname: datos[campo.attname]
+        for campo in instancia._meta.concrete_fields
+        if campo.attname in datos and campo.name not in excluidos
+    }
+
+
+def _usuario_actual():
+    peticion = _peticion.get()
+    usuario = getattr(peticion, 'user', None)
+    if usuario is not None and usuario.is_authenticated:
+        return usuario.pk
+    return None
+
+
+def _empresa_del_ambito():
+    empresa = empresa_actual()
+    return None if empresa is SIN_AMBITO else empresa
+
+
+def _registrar(modelo, objeto_id, empresa_id, accion, antes, despues):
+    registro = {
+        'fecha': timezone.now(),
+        'usuario_id': _usuario_actual(),
+        'empresa_id': empresa_id,
+        'accion': accion,
+        'modelo': modelo._meta.label_lower,
+        'objeto_id': str(objeto_id),
+        'antes': antes,
+        'despues': despues,
+    }
+    # Solo lo confirmado: un cambio deshecho con la transacción no se audita
+    transaction.on_commit(lambda: buffer().agregar(registro))
+
+
+def _registrar_instancia(instancia, accion, antes, despues):
+    empresa_id = instancia.empresa_id if hasattr(instancia, 'empresa_id') else _empresa_del_ambito()
+    _registrar(type(instancia), instancia.pk, empresa_id, accion, antes, despues)
+
+
+def registrar_guardado(instancia, creado):
+    """Audita un save(): el alta completa o solo los campos que cambiaron."""
+    if not auditoria_activa():
+        return
+    actuales = valores_auditados(instancia)
+    anteriores = getattr(instancia, '_valores_auditados', None)
+    instancia._valores_auditados = actuales
+    if creado:
+        _registrar_instancia(instancia, CREAR, None, actuales)
+        return
+    if anteriores is None:
+        # No se leyó de la base de datos: no hay valores anteriores
+        _registrar_instancia(instancia, EDITAR, None, actuales)
+        return
+    cambiados = [campo for campo, valor in actuales.items() if anteriores.get(campo, valor) != valor]
+    if cambiados:
+        _registrar_instancia(
+            instancia, EDITAR,
+            {campo: anteriores[campo] for campo in cambiados},
+            {campo: actuales[campo] for campo in cambiados},
+        )
+
+
+def registrar_borrado(instancia):
+    """Audita un delete() con los últimos valores de la fila."""
+    if auditoria_activa():
+        _registrar_instancia(instancia, ELIMINAR, valores_auditados(instancia), None)
+
+
+def registrar_actualizacion(modelo, ids, antes, despues):
+    """
+    Audita un update() masivo (que no envía señales): una edición por fila
+    con los mismos valores antes y después para todas, en la empresa del ámbito.
+    """
+    if not auditoria_activa():
+        return
+    empresa_id = _empresa_del_ambito()
+    for objeto_id in ids:
+        _registrar(modelo, objeto_id, empresa_id, EDITAR, antes, despues)
+
+
+class BuferAuditoria:
+    """Registros pendientes del proceso actual y el hilo que los escribe por lotes."""
+
+    def __init__(self):
+        opciones = configuracion()
+        self.pid = os.getpid()
+        self.intervalo = opciones.get('AUDIT_FLUSH_INTERVAL', INTERVALO_VOLCADO)
+        self.lote = opciones.get('AUDIT_BATCH_SIZE', TAMANO_LOTE)
+        self.maximo = opciones.get('AUDIT_BUFFER_MAX', MAXIMO_BUFER)
+        self.reintentos = opciones.get('AUDIT_MAX_RETRIES', REINTENTOS)
+        self.en_segundo_plano = opciones.get('AUDIT_BACKGROUND_FLUSH', True)
+        self.pendientes = deque()
+        self.candado = threading.Lock()
+        self.despertar = threading.Event()
+        self.hilo = None
+        self.descartados = 0
+        self.fallos = 0
+        self.ultima_purga = 0.0
+
+    def agregar(self, registro):
+        with self.candado:
+            if len(self.pendientes) >= self.maximo:
+                self.pendientes.popleft()
+                self.descartados += 1
+            self.pendientes.append(registro)
+            lleno = len(self.pendientes) >= self.lote
+            if self.hilo is None and self.en_segundo_plano:
+                self._arrancar()
+        if lleno:
+            self.despertar.set()
+
+    def _arrancar(self):
+        self.hilo = threading.Thread(target=self._trabajar, name='auditoria', daemon=True)
+        self.hilo.start()
+        atexit.register(self.vaciar)
+
+    def _trabajar(self):
+        while True:
+            self.despertar.wait(self.intervalo)
+            self.despertar.clear()
+            try:
+                close_old_connections()
+                self.vaciar()
+                if time.monotonic() - self.ultima_purga >= INTERVALO_PURGA:
+                    self.ultima_purga = time.monotonic()
+                    purgar_vencidos()
+            except Exception:
+                logger.exception('No se pudo escribir el registro de auditoría')
+
+    def vaciar(self):
+        """Escribe todos los registros pendientes; devuelve cuántos."""
+        RegistroAuditoria = apps.get_model('clientes', 'RegistroAuditoria')
+        escritos = 0
+        while True:
+            with self.candado:
+                lote = [self.pendientes.popleft() for _ in range(min(self.lote, len(self.pendientes)))]
+                descartados, self.descartados = self.descartados, 0
+            if descartados:
+                logger.warning('Búfer de auditoría lleno: %d registros descartados', descartados)
+            if not lote:
+                return escritos
+            try:
+                escritos += self._escribir(RegistroAuditoria, lote)
+            except ERRORES_DE_CONEXION:
+                self.fallos += 1
+                if self.fallos > self.reintentos:
+                    logger.error('Auditoría sin base de datos tras %d intentos: %d registros descartados',
+                                 self.fallos, len(lote))
+                    self.fallos = 0
+                    raise
+                # Lo que faltó escribir vuelve al principio, en orden, sin pasar del máximo
+                with self.candado:
+                    self.pendientes.extendleft(reversed(lote))
+                    while len(self.pendientes) > self.maximo:
+                        self.pendientes.popleft()
+                        self.descartados += 1
+                raise
+            self.fallos = 0
+
+    def _escribir(self, RegistroAuditoria, lote):
+        """
+        Escribe el lote y devuelve cuántos registros guardó. Si un registro no
+        se puede guardar, parte el lote en mitades hasta aislarlo y lo descarta.
+        Ante un error de conexión, `lote` queda con lo que falta escribir.
+        """
+        try:
+            with transaction.atomic():
+                RegistroAuditoria.objects.bulk_create(RegistroAuditoria(**registro) for registro in lote)
+        except ERRORES_DE_CONEXION:
+            raise
+        except Exception:
+            if len(lote) == 1:
+                logger.exception('Registro de auditoría descartado, no se puede guardar: %r', lote[0])
+                lote.clear()
+                return 0
+            primera, segunda = lote[:len(lote) // 2], lote[len(lote) // 2:]
+            try:
+                return self._escribir(RegistroAuditoria, primera) + self._escribir(RegistroAuditoria, segunda)
+            finally:
+                lote[:] = primera + segunda
+        escritos = len(lote)
+        lote.clear()
+        return escritos
+
+
+_bufer = None
+_candado_bufer = threading.Lock()
+
+
+def buffer():
+    """Búfer del proceso actual (se crea de nuevo tras un fork de gunicorn)."""
+    global _bufer
+    with _candado_bufer:
+        if _bufer is None or _bufer.pid != os.getpid():
+            _bufer = BuferAuditoria()
+        return _bufer
+
+
+def purgar_vencidos(dias=None):
+    """Borra los registros más antiguos que la retención; devuelve cuántos."""
+    RegistroAuditoria = apps.get_model('clientes', 'RegistroAuditoria')
+    limite = timezone.now() - timedelta(days=dias_retencion() if dias is None else dias)
+    borrados, _ = RegistroAuditoria.objects.filter(fecha__lt=limite).delete()
+    return borrados
+
+
+class AuditoriaMiddleware:
+    """Deja la petición en una variable de contexto para saber quién hace cada cambio."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not auditoria_activa():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _peticion.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _peticion.reset(token)
+
+    async def __acall__(self, request):
+        token = _peticion.set(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            _peticion.reset(token)
@@ -0,0 +1,291 @@
+# =============================================
+# LOGS ESTRUCTURADOS SIN BLOQUEAR LA PETICIÓN
+# =============================================
+# Los registros de log salen de la petición por una cola en memoria
+# (ManejadorEnCola, un QueueHandler) y un QueueListener en un hilo aparte
+# los escribe en sus destinos (consola, archivos). La petición solo arma el
+# mensaje y lo encola: nunca espera al disco. Si la cola se llena se
+# descartan registros (y se avisa cuántos) antes que bloquear.
+#
+# Cada registro lleva el id de la petición (cabecera X-Request-ID, que se
+# devuelve también en la respuesta), el usuario y la vista, y los destinos
+# lo escriben como una línea JSON (o texto legible en desarrollo).
+#
+# Los volcados de datos de formularios van en DEBUG y se muestrean con
+# LOG_DEBUG_MUESTREO (0 los desactiva, 1 los deja todos); sin muestreo el
+# logger de la app ni siquiera arma el mensaje.
+#
+# settings.py usa logging_en_cola() para construir LOGGING.
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import re
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.functional import empty
+from django.utils.module_loading import import_string
+
+TAMANO_COLA = 10000
+CABECERA_ID = 'X-Request-ID'
+_ID_VALIDO = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+# Atributos propios de LogRecord: el resto son datos pasados con extra={...}
+_ATRIBUTOS_REGISTRO = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {
+    'message', 'asctime', 'request_id', 'usuario', 'vista',
+    # django.request pasa la petición entera: ya van su id y su vista
+    'request',
+}
+
+# Petición en curso: (id, request)
+_peticion = ContextVar('peticion_bitacora', default=None)
+
+
+def id_peticion():
+    """Id de la petición en curso (None fuera de una petición)."""
+    actual = _peticion.get()
+    return actual[0] if actual else None
+
+
+class FiltroContexto(logging.Filter):
+    """Agrega request_id, usuario y vista de la petición en curso al registro."""
+
+    def filter(self, record):
+        actual = _peticion.get()
+        record.request_id, record.usuario, record.vista = None, None, None
+        if actual is not None:
+            record.request_id, request = actual
+        else:
+            # django.request registra los 4xx/5xx cuando BitacoraMiddleware ya
+            # salió: la petición viene en el propio registro
+            request = getattr(record, 'request', None)
+            record.request_id = _id_de(request)
+        if request is not None:
+            record.usuario = _usuario_cargado(request)
+            coincidencia = getattr(request, 'resolver_match', None)
+            record.vista = coincidencia.view_name if coincidencia else None
+        return True
+
+
+def _id_de(request):
+    # El que fijó BitacoraMiddleware o, si no pasó por él, el de la cabecera
+    identificador = getattr(request, 'id_peticion', None)
+    if identificador is None:
+        recibido = getattr(request, 'META', {}).get('HTTP_X_REQUEST_ID', '')
+        identificador = recibido if _ID_VALIDO.match(recibido) else None
+    return identificador
+
+
+def _usuario_cargado(request):
+    # Sin forzar la carga: un log no debe consultar la sesión ni el usuario
+    usuario = getattr(request, 'user', None)
+    if usuario is None or getattr(usuario, '_wrapped', None) is empty:
+        return None
+    return usuario.pk if usuario.is_authenticated else None
+
+
+class FiltroMuestreo(logging.Filter):
+    """Deja pasar una fracción `tasa` de los registros DEBUG; los demás niveles, todos."""
+
+    def __init__(self, tasa=0.0):
+        super().__init__()
+        self.tasa = float(tasa)
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        return self.tasa >= 1 or random.random() < self.tasa
+
+
+class FormatoJSON(logging.Formatter):
+    """Una línea JSON por registro, con el contexto de la petición y los datos extra."""
+
+    def format(self, record):
+        datos = {
+            'fecha': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensaje': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+            'usuario': getattr(record, 'usuario', None),
+            'vista': getattr(record, 'vista', None),
+            'proceso': record.process,
+        }
+        datos.update((clave, valor) for clave, valor in vars(record).items() if clave not in _ATRIBUTOS_REGISTRO)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            datos['excepcion'] = record.exc_text
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+_formato_excepcion = logging.Formatter()
+
+FORMATOS = {
+    'json': FormatoJSON,
+    'texto': lambda: logging.Formatter('{levelname} [{request_id}] {name}: {message}', style='{'),
+}
+
+
+class _Escritor(QueueListener):
+    """QueueListener que puede detenerse aunque la cola esté llena."""
+
+    def enqueue_sentinel(self):
+        # Solo al detenerse: el hilo sigue vaciando la cola, así que hay sitio enseguida
+        self.queue.put(self._sentinel)
+
+
+class ManejadorEnCola(QueueHandler):
+    """
+    Encola los registros sin bloquear y los escribe desde un QueueListener en
+    los `destinos`: diccionarios con 'class', 'level', 'formato' ('json' o
+    'texto') y los argumentos del handler, p. ej.
+    {'class': 'logging.handlers.WatchedFileHandler', 'filename': ...}.
+    """
+
+    def __init__(self, destinos=(), maximo=TAMANO_COLA):
+        super().__init__(queue.Queue(maximo))
+        self.maximo = maximo
+        self.destinos = [self._crear_destino(dict(destino)) for destino in destinos]
+        self.descartados = 0
+        self._arrancar()
+        atexit.register(self._detener)
+
+    @staticmethod
+    def _crear_destino(opciones):
+        clase = import_string(opciones.pop('class'))
+        nivel = opciones.pop('level', logging.NOTSET)
+        formato = FORMATOS[opciones.pop('formato', 'json')]()
+        handler = clase(**opciones)
+        handler.setLevel(nivel)
+        handler.setFormatter(formato)
+        return handler
+
+    def _arrancar(self):
+        self.pid = os.getpid()
+        self.listener = _Escritor(self.queue, *self.destinos, respect_handler_level=True)
+        self.listener.start()
+
+    def _detener(self):
+        # Escribe lo que quede en la cola antes de salir
+        if self.pid == os.getpid() and self.listener._thread is not None:
+            self.listener.stop()
+
+    def prepare(self, record):
+        # El mensaje y la traza se arman aquí (los argumentos pueden cambiar
+        # después); el formato JSON y la escritura, en el hilo del listener
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _formato_excepcion.formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self.pid != os.getpid():
+            # El hilo del listener no sobrevive a un fork (gunicorn --preload)
+            self.queue = queue.Queue(self.maximo)
+            self._arrancar()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+            return
+        if self.descartados:
+            descartados, self.descartados = self.descartados, 0
+            aviso = logging.LogRecord(
+                record.name, logging.WARNING, __file__, 0,
+                'Cola de logs llena: %d registros descartados', (descartados,), None,
+            )
+            FiltroContexto().filter(aviso)
+            try:
+                self.queue.put_nowait(self.prepare(aviso))
+            except queue.Full:
+                self.descartados += descartados
+
+
+def logging_en_cola(destinos, muestreo_debug=0.0, apps=('clientes', 'usuarios'), seguridad=None):
+    """
+    LOGGING para settings: root y django van por un ManejadorEnCola con
+    `destinos`; las `apps` bajan a DEBUG solo si hay muestreo. `seguridad`
+    son los destinos del logger 'security' (por defecto, los mismos).
+    """
+    filtros = ['contexto', 'muestreo']
+    handlers = {
+        'cola': {'()': 'water_delivery.bitacora.ManejadorEnCola', 'destinos': destinos, 'filters': filtros},
+    }
+    if seguridad is not None:
+        handlers['cola_seguridad'] = {
+            '()': 'water_delivery.bitacora.ManejadorEnCola', 'destinos': seguridad, 'filters': filtros,
+        }
+    nivel_apps = 'DEBUG' if muestreo_debug > 0 else 'INFO'
+    return {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'filters': {
+            'contexto': {'()': 'water_delivery.bitacora.FiltroContexto'},
+            'muestreo': {'()': 'water_delivery.bitacora.FiltroMuestreo', 'tasa': muestreo_debug},
+        },
+        'handlers': handlers,
+        'root': {'handlers': ['cola'], 'level': 'INFO'},
+        'loggers': {
+            'django': {'handlers': ['cola'], 'level': 'INFO', 'propagate': False},
+            'security': {
+                'handlers': ['cola_seguridad' if seguridad is not None else 'cola'],
+                'level': 'WARNING', 'propagate': False,
+            },
+            **{app: {'level': nivel_apps} for app in apps},
+        },
+    }
+
+
+class BitacoraMiddleware:
+    """
+    Da a cada petición un id (el de la cabecera X-Request-ID si es válido) que
+    llevan todos sus registros de log y que se devuelve en la respuesta.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _id(request):
+        recibido = request.headers.get(CABECERA_ID, '')
+        return recibido if _ID_VALIDO.match(recibido) else uuid.uuid4().hex
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        identificador = self._id(request)
+        request.id_peticion = identificador
+        token = _peticion.set((identificador, request))
+        try:
+            respuesta = self.get_response(request)
+        finally:
+            _peticion.reset(token)
+        respuesta[CABECERA_ID] = identificador
+        return respuesta
+
+    async def __acall__(self, request):
+        identificador = self._id(request)
+        request.id_peticion = identificador
+        token = _peticion.set((identificador, request))
+        try:
+            respuesta = await self.get_response(request)
+        finally:
+            _peticion.reset(token)
+        respuesta[CABECERA_ID] = identificador
+        return respuesta
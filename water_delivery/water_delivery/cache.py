@@ -0,0 +1,190 @@
+# =============================================
+# CAPA DE CACHÉ COMPARTIDA ENTRE PROCESOS
+# =============================================
+# Con varios workers de gunicorn cada proceso tiene su propia LocMemCache, así
+# que una invalidación solo se ve en el worker que la hizo. Este módulo:
+#
+# - Elige el backend según CACHE_URL (ver `caches_desde_url`): Redis, tabla de
+#   base de datos o archivos; LocMem queda solo para desarrollo y tests.
+# - Agrupa las claves por espacio de nombres y versión, para poder cambiar el
+#   formato de un valor sin chocar con lo que ya hay guardado.
+# - Invalida por etiquetas: cada valor guarda la versión de sus etiquetas
+#   (p. ej. 'clientes.despacho') y deja de ser válido cuando alguna cambia.
+# - Evita la estampida: ante un fallo de caché solo un proceso reconstruye el
+#   valor (candado con `cache.add`) y los demás esperan a que aparezca.
+
+import time
+import uuid
+from urllib.parse import parse_qsl, urlparse
+
+from django.core.cache import caches
+
+from water_delivery.metricas import anotar_cache
+
+PREFIJO_ETIQUETA = 'etiqueta:'
+# Cuánto puede tardar una reconstrucción antes de que otro proceso la reintente
+TIEMPO_CANDADO = 30
+INTERVALO_ESPERA = 0.05
+
+
+def caches_desde_url(url, directorio_archivos='/var/tmp/water_delivery_cache'):
+    """
+    Devuelve la configuración CACHES para la URL indicada:
+
+    - redis://host:6379/0 (o rediss://): servidor Redis, requiere el paquete `redis`.
+    - db:// o db://nombre_tabla: tabla de la base de datos (crear con `createcachetable`).
+    - file:///ruta/directorio: archivos en disco, compartidos por los procesos del servidor.
+    - locmem:// o vacío: memoria del proceso (solo desarrollo y tests).
+
+    Se puede añadir ?prefijo=... para separar instalaciones que comparten el servidor.
+    """
+    partes = urlparse(url or 'locmem://')
+    opciones = dict(parse_qsl(partes.query))
+    esquema = partes.scheme
+    if esquema in ('redis', 'rediss'):
+        default = {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': url.split('?')[0],
+        }
+    elif esquema == 'db':
+        default = {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': partes.netloc or 'water_delivery_cache',
+        }
+    elif esquema == 'file':
+        default = {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': partes.path or directorio_archivos,
+        }
+    elif esquema == 'locmem':
+        default = {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': partes.netloc or 'water-delivery',
+        }
+    else:
+        raise ValueError(f'CACHE_URL no soportada: {url}')
+    if opciones.get('prefijo'):
+        default['KEY_PREFIX'] = opciones['prefijo']
+    return {'default': default}
+
+
+def etiqueta_modelo(modelo):
+    """Etiqueta de caché de un modelo, p. ej. 'clientes.despacho'."""
+    return modelo._meta.label_lower
+
+
+def _clave_etiqueta(etiqueta):
+    return f'{PREFIJO_ETIQUETA}{etiqueta}'
+
+
+def invalidar_etiquetas(*etiquetas, alias='default'):
+    """
+    Invalida todos los valores guardados con alguna de estas etiquetas, en
+    cualquier espacio de nombres. Se asigna una versión nueva y única (no un
+    incremento), así que dos invalidaciones simultáneas nunca se pisan.
+    """
+    caches[alias].set_many(
+        {_clave_etiqueta(etiqueta): uuid.uuid4().hex for etiqueta in etiquetas},
+        timeout=None,
+    )
+
+
+class CacheCompartida:
+    """
+    Acceso a la caché para un espacio de nombres (p. ej. 'clientes').
+
+    `version` se sube cuando cambia la forma de los valores guardados en el
+    espacio; las claves viejas simplemente dejan de leerse y expiran solas.
+    """
+
+    def __init__(self, espacio, version=1, alias='default'):
+        self.espacio = espacio
+        self.version = version
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def clave(self, nombre):
+        return f'{self.espacio}:v{self.version}:{nombre}'
+
+    def _versiones_etiquetas(self, etiquetas, leidas):
+        """Versión actual de cada etiqueta; las que no existen se crean."""
+        versiones = {}
+        for etiqueta in etiquetas:
+            clave = _clave_etiqueta(etiqueta)
+            version = leidas.get(clave)
+            if version is None:
+                nueva = uuid.uuid4().hex
+                # Si otro proceso la creó primero, se usa la suya
+                if not self.cache.add(clave, nueva, timeout=None):
+                    nueva = self.cache.get(clave, nueva)
+                version = nueva
+            versiones[etiqueta] = version
+        return versiones
+
+    def _leer(self, nombre, etiquetas):
+        """
+        Lee el valor y las versiones de sus etiquetas en una sola ida al backend.
+        Devuelve (encontrado, valor, versiones_actuales).
+        """
+        clave = self.clave(nombre)
+        leidas = self.cache.get_many([clave, *(_clave_etiqueta(e) for e in etiquetas)])
+        versiones = self._versiones_etiquetas(etiquetas, leidas)
+        guardado = leidas.get(clave)
+        if guardado is not None and guardado['etiquetas'] == versiones:
+            return True, guardado['valor'], versiones
+        return False, None, versiones
+
+    def get(self, nombre, etiquetas=()):
+        """Valor guardado si sigue vigente, o None."""
+        encontrado, valor, _ = self._leer(nombre, etiquetas)
+        anotar_cache(encontrado)
+        return valor
+
+    def set(self, nombre, valor, etiquetas=(), timeout=None, versiones=None):
+        if versiones is None:
+            versiones = self._versiones_etiquetas(etiquetas, self.cache.get_many(
+                [_clave_etiqueta(e) for e in etiquetas]
+            ))
+        self.cache.set(self.clave(nombre), {'etiquetas': versiones, 'valor': valor}, timeout)
+
+    def delete(self, nombre):
+        self.cache.delete(self.clave(nombre))
+
+    def obtener(self, nombre, construir, etiquetas=(), timeout=None, espera=TIEMPO_CANDADO):
+        """
+        Devuelve el valor en caché o lo construye con `construir()`.
+
+        Si varios procesos fallan a la vez, solo el que consigue el candado
+        llama a `construir`; el resto espera (hasta `espera` segundos) a que
+        el valor aparezca. Si el constructor falla o tarda demasiado, los que
+        esperan lo calculan por su cuenta sin guardarlo.
+        """
+        encontrado, valor, versiones = self._leer(nombre, etiquetas)
+        anotar_cache(encontrado)
+        if encontrado:
+            return valor
+
+        candado = self.clave(f'{nombre}:candado')
+        if self.cache.add(candado, 1, timeout=TIEMPO_CANDADO):
+            try:
+                valor = construir()
+                self.set(nombre, valor, etiquetas, timeout, versiones)
+                return valor
+            finally:
+                self.cache.delete(candado)
+
+        limite = time.monotonic() + espera
+        while time.monotonic() < limite:
+            time.sleep(INTERVALO_ESPERA)
+            # El candado se mira antes que el valor: si ya no está y el valor
+            # tampoco, el constructor terminó sin guardar (error) y no hay que seguir esperando
+            en_construccion = self.cache.get(candado) is not None
+            encontrado, valor, _ = self._leer(nombre, etiquetas)
+            if encontrado:
+                return valor
+            if not en_construccion:
+                break
+        return construir()
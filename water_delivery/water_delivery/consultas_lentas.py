@@ -0,0 +1,160 @@
+# =============================================
+# REGISTRO MUESTREADO DE CONSULTAS LENTAS
+# =============================================
+# Un execute_wrapper mide cada sentencia SQL y, si supera el umbral
+# configurado (CONSULTAS_LENTAS['UMBRAL_MS']), la anota con probabilidad
+# MUESTREO en un archivo JSONL: vista que la originó, huella de la consulta
+# normalizada (literales y listas IN reemplazados), duración y parámetros.
+#
+# Solo se mide el tiempo de cada consulta; el coste de escribir se limita con
+# el umbral y el muestreo. El resumen por huella, con el EXPLAIN de las peores
+# cuando se pide, lo da `python manage.py consultas_lentas`.
+#
+# Los parámetros pueden contener datos personales o hashes de contraseña: el
+# archivo debe tener los mismos permisos que los logs (PARAMETROS=False los omite).
+
+import contextvars
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from datetime import date, datetime, time as hora
+from decimal import Decimal
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+
+from water_delivery.metricas import instalar_envoltorio
+
+LARGO_MAXIMO_PARAMETRO = 200
+FUERA_DE_PETICION = '(fuera de petición)'
+
+_RE_CADENA = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r'\b\d+(?:\.\d+)?\b')
+_RE_LISTA_IN = re.compile(r'\bIN\s*\((?:\s*\?\s*,?)+\)', re.IGNORECASE)
+_RE_ESPACIOS = re.compile(r'\s+')
+
+_candado_archivo = threading.Lock()
+# Petición en curso: {'vista': ..., 'ruta': ...}; process_view completa la vista
+_origen = contextvars.ContextVar('origen_consulta', default=None)
+
+
+def configuracion():
+    return getattr(settings, 'CONSULTAS_LENTAS', {})
+
+
+def normalizar_sql(sql):
+    """
+    Forma canónica de una sentencia: sin literales ni marcadores concretos y
+    con las listas IN colapsadas, para agrupar las que solo cambian en valores.
+    """
+    texto = _RE_CADENA.sub('?', sql)
+    texto = texto.replace('%s', '?')
+    texto = _RE_NUMERO.sub('?', texto)
+    texto = _RE_LISTA_IN.sub('IN (...)', texto)
+    return _RE_ESPACIOS.sub(' ', texto).strip()
+
+
+def huella(sql_normalizado):
+    return hashlib.sha1(sql_normalizado.encode()).hexdigest()[:12]
+
+
+def _parametro_json(valor):
+    if valor is None or isinstance(valor, (bool, int, float)):
+        return valor
+    if isinstance(valor, (datetime, date, hora)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    if isinstance(valor, (list, tuple)):
+        return [_parametro_json(v) for v in valor]
+    texto = str(valor)
+    return texto if len(texto) <= LARGO_MAXIMO_PARAMETRO else texto[:LARGO_MAXIMO_PARAMETRO] + '…'
+
+
+def anotar(registro, archivo):
+    """Agrega una línea al archivo (la escritura de una línea con O_APPEND no se mezcla entre procesos)."""
+    linea = json.dumps(registro, ensure_ascii=False) + '\n'
+    with _candado_archivo:
+        os.makedirs(os.path.dirname(archivo) or '.', exist_ok=True)
+        with open(archivo, 'a', encoding='utf-8') as destino:
+            destino.write(linea)
+
+
+def medir_consulta(execute, sql, params, many, context):
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duracion_ms = (time.perf_counter() - inicio) * 1000
+        opciones = configuracion()
+        if (opciones.get('ACTIVO')
+                and duracion_ms >= opciones.get('UMBRAL_MS', 0)
+                and random.random() < opciones.get('MUESTREO', 1.0)):
+            origen = _origen.get() or {}
+            normalizada = normalizar_sql(sql)
+            anotar({
+                'fecha': timezone.now().isoformat(),
+                'vista': origen.get('vista') or FUERA_DE_PETICION,
+                'ruta': origen.get('ruta'),
+                'alias': context['connection'].alias,
+                'huella': huella(normalizada),
+                'sql_normalizado': normalizada,
+                'sql': sql,
+                'parametros': (
+                    # executemany: solo el primer juego de parámetros
+                    _parametro_json(params[0] if many and params else params)
+                    if opciones.get('PARAMETROS', True) else None
+                ),
+                'muchas': bool(many),
+                'duracion_ms': round(duracion_ms, 3),
+                # Para estimar el total real al resumir
+                'muestreo': opciones.get('MUESTREO', 1.0),
+            }, opciones['ARCHIVO'])
+
+
+class ConsultasLentasMiddleware:
+    """
+    Activa el registro (CONSULTAS_LENTAS['ACTIVO']) y anota qué vista origina
+    cada consulta. Las consultas previas a resolver la URL (sesión, usuario)
+    quedan con la vista '(middleware)' y la ruta de la petición.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not configuracion().get('ACTIVO'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        instalar_envoltorio(medir_consulta)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        marca = _origen.set({'vista': '(middleware)', 'ruta': request.path})
+        try:
+            return self.get_response(request)
+        finally:
+            _origen.reset(marca)
+
+    async def __acall__(self, request):
+        marca = _origen.set({'vista': '(middleware)', 'ruta': request.path})
+        try:
+            return await self.get_response(request)
+        finally:
+            _origen.reset(marca)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Se modifica el diccionario (no la variable) para que el cambio se
+        # vea aunque process_view corra en otro hilo por sync_to_async
+        origen = _origen.get()
+        if origen is not None and request.resolver_match is not None:
+            origen['vista'] = request.resolver_match.view_name
+        return None
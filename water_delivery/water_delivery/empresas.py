@@ -0,0 +1,137 @@
+# =============================================
+# ÁMBITO DE EMPRESA (VARIAS DISTRIBUIDORAS EN UN DESPLIEGUE)
+# =============================================
+# Cada Cliente, Despacho y Pago pertenece a una empresa (su usuario de tipo
+# empresa) y cada conductor a la empresa para la que trabaja (Usuario.empresa,
+# que fija la propia empresa con api_vincular_conductor o el admin). Los
+# usuarios empresa adicionales de una misma oficina apuntan con
+# Usuario.empresa a la principal y comparten su ámbito. EmpresaMiddleware
+# fija la empresa de la petición en una variable de contexto y EmpresaManager,
+# el manager por defecto de esos modelos, filtra siempre por ella. Así cada
+# consulta lee solo las filas de su empresa usando los índices que empiezan
+# por `empresa`, y una empresa no ve los datos de otra.
+#
+# Fuera de una petición (comandos, migraciones, shell) no hay ámbito y los
+# managers devuelven todas las filas; `en_empresa(...)` fija uno a mano. Los
+# usuarios sin empresa (y las filas anteriores a las empresas) quedan en el
+# ámbito None, separado de todas las empresas.
+#
+# Las consultas con SQL propio (antigüedad de saldos) y las cachés de
+# resúmenes tienen que incluir la empresa por su cuenta (ver empresa_actual()).
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import models
+
+# Sin ámbito: los managers no filtran (procesos fuera de una petición)
+SIN_AMBITO = object()
+
+_empresa_actual = ContextVar('empresa_actual', default=SIN_AMBITO)
+
+
+def empresa_de(usuario):
+    """
+    Id de la empresa de un usuario: la principal a la que pertenece o, si es
+    un usuario empresa sin ella, la propia. None si no tiene.
+    """
+    if not getattr(usuario, 'is_authenticated', False):
+        return None
+    if usuario.tipo_usuario == 'empresa':
+        return usuario.empresa_id or usuario.pk
+    return usuario.empresa_id
+
+
+class _EmpresaDeLaPeticion:
+    """Empresa del usuario de la petición, resuelta solo si alguna consulta la necesita."""
+
+    def __init__(self, request):
+        self.request = request
+
+    def resolver(self):
+        if not hasattr(self, 'empresa'):
+            self.empresa = empresa_de(self.request.user)
+        return self.empresa
+
+
+def empresa_actual():
+    """Id de la empresa del ámbito actual, None (sin empresa) o SIN_AMBITO."""
+    empresa = _empresa_actual.get()
+    if isinstance(empresa, _EmpresaDeLaPeticion):
+        return empresa.resolver()
+    return empresa
+
+
+def clave_empresa():
+    """El ámbito actual como texto, para separar por empresa las claves de caché."""
+    empresa = empresa_actual()
+    if empresa is SIN_AMBITO:
+        return 'todas'
+    return 'ninguna' if empresa is None else str(empresa)
+
+
+@contextmanager
+def en_empresa(empresa):
+    """Fija el ámbito a `empresa` (usuario empresa, id, None o SIN_AMBITO) dentro del bloque."""
+    if isinstance(empresa, models.Model):
+        empresa = empresa.pk
+    token = _empresa_actual.set(empresa)
+    try:
+        yield
+    finally:
+        _empresa_actual.reset(token)
+
+
+def filtrar_por_empresa(queryset, campo='empresa'):
+    """Restringe el queryset a la empresa del ámbito siguiendo `campo` (p. ej. 'cliente__empresa')."""
+    empresa = empresa_actual()
+    if empresa is SIN_AMBITO:
+        return queryset
+    if empresa is None:
+        return queryset.filter(**{f'{campo}__isnull': True})
+    return queryset.filter(**{f'{campo}_id': empresa})
+
+
+def sql_empresa(columna):
+    """Condición ' AND columna ...' y sus parámetros para filtrar por empresa en SQL propio."""
+    empresa = empresa_actual()
+    if empresa is SIN_AMBITO:
+        return '', []
+    if empresa is None:
+        return f' AND {columna} IS NULL', []
+    return f' AND {columna} = %s', [empresa]
+
+
+class EmpresaManager(models.Manager):
+    """Manager por defecto de los modelos por empresa: solo las filas del ámbito actual."""
+
+    def get_queryset(self):
+        return filtrar_por_empresa(super().get_queryset())
+
+
+class EmpresaMiddleware:
+    """
+    Fija el ámbito de la petición a la empresa del usuario autenticado. Va
+    después de LoginRequiredMiddleware, que ya cargó el usuario.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # Las páginas públicas no consultan modelos por empresa ni cargan el usuario
+        with en_empresa(_EmpresaDeLaPeticion(request)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        # Cargar el usuario puede consultar la base de datos: fuera del event loop
+        empresa = await sync_to_async(empresa_de)(request.user)
+        with en_empresa(empresa):
+            return await self.get_response(request)
@@ -12,6 +12,8 @@ from .settings import *
 # =====================
 DEBUG = False
 SECRET_KEY = config('SECRET_KEY')
+# El conteo de consultas por vista es para desarrollo (ver water_delivery/presupuestos.py)
+PRESUPUESTO_CONSULTAS_MODO = config('PRESUPUESTO_CONSULTAS_MODO', default='')
 
 # IPs permitidas de la empresa (configurar según necesidad)
 ALLOWED_HOSTS = config('ALLOWED_HOSTS', default='localhost').split(',')
@@ -60,59 +62,27 @@ CSRF_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Strict'
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 SESSION_COOKIE_AGE = 3600  # 1 hora
+# Las sesiones deben poder revocarse desde el servidor: nunca cookies firmadas
+SESSION_ENGINE = MODOS_SESION['cached_db']
 
 # =====================
 # Configuración de Logging Empresarial
 # =====================
-LOGGING = {
-    'version': 1,
-    'disable_existing_loggers': False,
-    'formatters': {
-        'verbose': {
-            'format': '[ENTERPRISE] {levelname} {asctime} {module} {process:d} {thread:d} {ip} {user} {message}',
-            'style': '{',
-        },
-        'security': {
-            'format': '[SECURITY] {asctime} {levelname} {ip} {user} {action}',
-            'style': '{',
-        },
-    },
-    'handlers': {
-        'file': {
-            'level': 'INFO',
-            'class': 'logging.FileHandler',
-            'filename': os.path.join(BASE_DIR, 'logs', 'enterprise.log'),
-            'formatter': 'verbose',
-        },
-        'security_file': {
-            'level': 'WARNING',
-            'class': 'logging.FileHandler',
-            'filename': os.path.join(BASE_DIR, 'logs', 'security.log'),
-            'formatter': 'security',
-        },
-        'console': {
-            'level': 'INFO',
-            'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
-        },
-    },
-    'root': {
-        'handlers': ['console', 'file'],
-        'level': 'INFO',
-    },
-    'loggers': {
-        'django': {
-            'handlers': ['console', 'file'],
-            'level': 'INFO',
-            'propagate': False,
-        },
-        'security': {
-            'handlers': ['security_file', 'console'],
-            'level': 'WARNING',
-            'propagate': False,
-        },
-    },
-}
+# Archivos en JSON escritos desde el hilo de la cola (ver water_delivery/bitacora.py).
+# WatchedFileHandler reabre el archivo si logrotate lo rota.
+LOGGING = logging_en_cola(
+    [
+        {'class': 'logging.StreamHandler', 'level': 'INFO', 'formato': 'json'},
+        {'class': 'logging.handlers.WatchedFileHandler', 'level': 'INFO', 'formato': 'json',
+         'filename': os.path.join(BASE_DIR, 'logs', 'enterprise.log')},
+    ],
+    muestreo_debug=LOG_DEBUG_MUESTREO,
+    seguridad=[
+        {'class': 'logging.StreamHandler', 'level': 'WARNING', 'formato': 'json'},
+        {'class': 'logging.handlers.WatchedFileHandler', 'level': 'WARNING', 'formato': 'json',
+         'filename': os.path.join(BASE_DIR, 'logs', 'security.log')},
+    ],
+)
 
 # Crear directorio de logs si no existe
 os.makedirs(os.path.join(BASE_DIR, 'logs'), exist_ok=True)
@@ -143,6 +113,9 @@ BACKUP_CONFIG = {
 MONITORING_CONFIG = {
     'HEALTH_CHECK_ENABLED': True,
     'PERFORMANCE_MONITORING': True,
+    # Métricas por vista en /metricas/ (ver water_delivery/metricas.py)
+    'METRICS_DIR': config('METRICS_DIR', default=''),
+    'METRICS_TOKEN': config('METRICS_TOKEN', default=''),
     'ERROR_TRACKING': True,
     'UPTIME_MONITORING': True,
 }
@@ -150,11 +123,13 @@ MONITORING_CONFIG = {
 # =====================
 # Configuración de Auditoría
 # =====================
+# LOG_DATA_CHANGES: registro de cambios con escritura diferida (water_delivery/auditoria.py)
 AUDIT_CONFIG = {
+    **AUDIT_CONFIG,
     'LOG_USER_ACTIONS': True,
     'LOG_ADMIN_ACTIONS': True,
     'LOG_DATA_CHANGES': True,
-    'AUDIT_RETENTION_DAYS': 365,
+    'AUDIT_RETENTION_DAYS': config('AUDIT_RETENTION_DAYS', default=365, cast=int),
 }
 
 # =====================
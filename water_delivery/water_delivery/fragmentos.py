@@ -0,0 +1,71 @@
+# =============================================
+# CACHÉ DE FRAGMENTOS POR FILA
+# =============================================
+# Cada fila de un listado (un cliente en lista_clientes, un despacho en el
+# historial de detalle_cliente) se guarda ya renderizada con la clave
+# nombre:pk:version. Como `version` sube en cada save() (VersionFilaMixin), una
+# fila guardada nunca queda vieja: al volver a mostrar el listado solo se
+# renderizan las filas que cambiaron, y las versiones viejas expiran solas.
+#
+# No hace falta invalidar nada, pero sí subir la versión del fragmento en el
+# nombre ('fila_cliente:v2') cuando cambie su HTML o su formato.
+#
+# Las filas de una página se leen con un solo get_many (`precargar` para las
+# plantillas con {% fragmento %}, `filas_en_cache` para las APIs) y cada lectura
+# cuenta en las métricas por fragmento (water_delivery_fragment_cache_*).
+
+from django.core.cache import caches
+
+from water_delivery.metricas import anotar_fragmento
+
+PREFIJO = 'fragmento'
+# Las claves no caducan por contenido; el tiempo solo limpia versiones viejas
+DURACION_FRAGMENTO = 24 * 3600
+
+
+def clave_fragmento(nombre, objeto):
+    return f'{PREFIJO}:{nombre}:{objeto.pk}:{objeto.version}'
+
+
+def precargar(nombre, objetos, alias='default'):
+    """
+    Lee de una vez los fragmentos de estos objetos. Devuelve un dict
+    clave -> HTML (None si falta) para pasar en el contexto como `fragmentos`.
+    """
+    claves = [clave_fragmento(nombre, objeto) for objeto in objetos]
+    guardados = caches[alias].get_many(claves) if claves else {}
+    return {clave: guardados.get(clave) for clave in claves}
+
+
+def leer(nombre, clave, precargados=None, alias='default'):
+    """Fragmento guardado (o None), usando lo precargado si la clave está ahí."""
+    if precargados is not None and clave in precargados:
+        valor = precargados[clave]
+    else:
+        valor = caches[alias].get(clave)
+    anotar_fragmento(nombre, valor is not None)
+    return valor
+
+
+def guardar(clave, valor, alias='default'):
+    caches[alias].set(clave, valor, DURACION_FRAGMENTO)
+
+
+def filas_en_cache(nombre, objetos, construir, alias='default'):
+    """
+    Devuelve [construir(objeto) ...] en el mismo orden, construyendo solo las
+    filas que no están en caché para su versión actual.
+    """
+    objetos = list(objetos)
+    claves = [clave_fragmento(nombre, objeto) for objeto in objetos]
+    guardados = caches[alias].get_many(claves) if claves else {}
+    filas, nuevos = [], {}
+    for objeto, clave in zip(objetos, claves):
+        fila = guardados.get(clave)
+        anotar_fragmento(nombre, fila is not None)
+        if fila is None:
+            fila = nuevos[clave] = construir(objeto)
+        filas.append(fila)
+    if nuevos:
+        caches[alias].set_many(nuevos, DURACION_FRAGMENTO)
+    return filas
@@ -0,0 +1,485 @@
+# =============================================
+# MÉTRICAS DE RENDIMIENTO POR VISTA
+# =============================================
+# Implementa MONITORING_CONFIG['PERFORMANCE_MONITORING']. Por cada petición se
+# anota, según el nombre de la URL: tiempo total, tiempo y cantidad de
+# consultas SQL, aciertos y fallos de la caché compartida y tamaño de la
+# respuesta.
+#
+# - Los usuarios empresa reciben la cabecera Server-Timing (visible en la
+#   pestaña de red del navegador).
+# - Las lecturas de la caché de fragmentos se cuentan además por fragmento,
+#   para ver la tasa de aciertos de cada listado.
+# - Cada worker acumula histogramas en memoria y los vuelca cada pocos
+#   segundos a un archivo propio en memoria compartida (/dev/shm por defecto);
+#   /metricas/ suma los archivos de todos los workers y responde en formato de
+#   texto de Prometheus. Requiere un usuario empresa o el token METRICS_TOKEN:
+#
+#     scrape_configs:
+#       - job_name: water_delivery
+#         metrics_path: /metricas/
+#         authorization: {credentials: <METRICS_TOKEN>}
+#
+# Los contadores de workers ya terminados siguen contando en el total, como
+# exige Prometheus (los contadores no bajan), pero sus archivos no se
+# acumulan: cada worker vuelca lo suyo al salir y, al leer /metricas/ (o al
+# arrancar un worker que reusa el pid), los archivos de pids muertos se suman a
+# metricas-terminados.json y se borran, con un candado de archivo entre
+# procesos.
+
+import atexit
+import contextvars
+import hmac
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows (desarrollo): sin candado entre procesos
+    fcntl = None
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import request_started
+from django.db import connections
+from django.http import HttpResponse
+
+PREFIJO_METRICA = 'water_delivery'
+INTERVALO_VOLCADO = 5  # segundos
+SIN_RUTA = 'sin_ruta'
+ARCHIVO_TERMINADOS = 'metricas-terminados.json'
+
+# Límites superiores de las cubetas de cada histograma
+CUBETAS = {
+    'request_duration_seconds': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    'db_duration_seconds': (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+    'db_queries': (0, 1, 2, 5, 10, 20, 50, 100),
+    'response_size_bytes': (1000, 5000, 20000, 100000, 500000, 2000000),
+}
+AYUDAS = {
+    'request_duration_seconds': 'Tiempo total de la petición',
+    'db_duration_seconds': 'Tiempo dentro de la base de datos por petición',
+    'db_queries': 'Consultas SQL por petición',
+    'response_size_bytes': 'Tamaño del cuerpo de la respuesta',
+    'requests_total': 'Peticiones atendidas por código de estado',
+    'cache_hits_total': 'Aciertos de la caché compartida',
+    'cache_misses_total': 'Fallos de la caché compartida',
+    'fragment_cache_hits_total': 'Filas servidas desde la caché de fragmentos',
+    'fragment_cache_misses_total': 'Filas renderizadas de nuevo (no estaban en la caché de fragmentos)',
+}
+
+# Medición de la petición en curso; las consultas hechas desde sync_to_async
+# también la ven porque el contexto se copia al hilo
+_medicion = contextvars.ContextVar('medicion_peticion', default=None)
+
+
+def configuracion():
+    return getattr(settings, 'MONITORING_CONFIG', {})
+
+
+class Medicion:
+    """Lo acumulado durante una petición."""
+
+    __slots__ = ('consultas', 'tiempo_db', 'aciertos', 'fallos', 'fragmentos')
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo_db = 0.0
+        self.aciertos = 0
+        self.fallos = 0
+        # fragmentos[nombre] = [aciertos, fallos]; se crea solo si hace falta
+        self.fragmentos = None
+
+
+def anotar_cache(acierto):
+    """Lo llama la caché compartida en cada lectura (no hace nada fuera de una petición)."""
+    medicion = _medicion.get()
+    if medicion is not None:
+        if acierto:
+            medicion.aciertos += 1
+        else:
+            medicion.fallos += 1
+
+
+def anotar_fragmento(nombre, acierto):
+    """Lectura de la caché de fragmentos (ver water_delivery/fragmentos.py)."""
+    medicion = _medicion.get()
+    if medicion is None:
+        return
+    anotar_cache(acierto)
+    if medicion.fragmentos is None:
+        medicion.fragmentos = defaultdict(lambda: [0, 0])
+    medicion.fragmentos[nombre][0 if acierto else 1] += 1
+
+
+def _medir_consulta(execute, sql, params, many, context):
+    medicion = _medicion.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicion.consultas += 1
+        medicion.tiempo_db += time.perf_counter() - inicio
+
+
+def instalar_envoltorio(envoltorio):
+    """
+    Instala un execute_wrapper permanente en todas las conexiones, en
+    cualquier hilo. Las conexiones son por hilo; request_started se envía en el
+    hilo donde correrán las consultas de la petición (también en ASGI, donde es
+    el hilo de sync_to_async), así que basta con revisar las de ese hilo.
+    """
+    def instalar(**kwargs):
+        for conexion in connections.all():
+            if envoltorio not in conexion.execute_wrappers:
+                conexion.execute_wrappers.append(envoltorio)
+
+    uid = f'envoltorio_{envoltorio.__module__}.{envoltorio.__name__}'
+    request_started.connect(instalar, weak=False, dispatch_uid=uid)
+    instalar()
+
+
+class RegistroMetricas:
+    """
+    Histogramas y contadores del proceso actual. Se vuelcan a
+    `<directorio>/metricas-<pid>.json` cada INTERVALO_VOLCADO segundos.
+    """
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        self.pid = os.getpid()
+        self.candado = threading.Lock()
+        self.ultimo_volcado = 0.0
+        # histogramas[metrica][vista] = {'cubetas': [...], 'suma': x, 'cuenta': n}
+        self.histogramas = defaultdict(dict)
+        # contadores[metrica][etiquetas_json] = n
+        self.contadores = defaultdict(lambda: defaultdict(float))
+        # Si un worker anterior tuvo este pid, lo suyo pasa al total de terminados
+        # antes de que el primer volcado lo sobrescriba
+        with bloqueo(directorio):
+            compactar(directorio, pids=[self.pid])
+        atexit.register(self._volcar_al_salir)
+
+    def observar(self, metrica, vista, valor):
+        limites = CUBETAS[metrica]
+        histograma = self.histogramas[metrica].get(vista)
+        if histograma is None:
+            histograma = {'cubetas': [0] * len(limites), 'suma': 0.0, 'cuenta': 0}
+            self.histogramas[metrica][vista] = histograma
+        # Cubetas no acumuladas aquí; se acumulan al exportar
+        indice = bisect_left(limites, valor)
+        if indice < len(limites):
+            histograma['cubetas'][indice] += 1
+        histograma['suma'] += valor
+        histograma['cuenta'] += 1
+
+    def sumar(self, metrica, etiquetas, cantidad=1):
+        if cantidad:
+            self.contadores[metrica][json.dumps(etiquetas, sort_keys=True)] += cantidad
+
+    def registrar(self, vista, estado, duracion, medicion, tamano):
+        with self.candado:
+            self.observar('request_duration_seconds', vista, duracion)
+            self.observar('db_duration_seconds', vista, medicion.tiempo_db)
+            self.observar('db_queries', vista, medicion.consultas)
+            self.observar('response_size_bytes', vista, tamano)
+            self.sumar('requests_total', {'vista': vista, 'estado': f'{estado // 100}xx'})
+            self.sumar('cache_hits_total', {'vista': vista}, medicion.aciertos)
+            self.sumar('cache_misses_total', {'vista': vista}, medicion.fallos)
+            for fragmento, (aciertos, fallos) in (medicion.fragmentos or {}).items():
+                self.sumar('fragment_cache_hits_total', {'fragmento': fragmento}, aciertos)
+                self.sumar('fragment_cache_misses_total', {'fragmento': fragmento}, fallos)
+            if time.monotonic() - self.ultimo_volcado >= INTERVALO_VOLCADO:
+                self._volcar()
+
+    def volcar(self):
+        with self.candado:
+            self._volcar()
+
+    def _volcar(self):
+        self.ultimo_volcado = time.monotonic()
+        datos = {'histogramas': self.histogramas, 'contadores': self.contadores}
+        _escribir(self.directorio, f'metricas-{self.pid}.json', datos)
+
+    def _volcar_al_salir(self):
+        # Un hijo de fork hereda el atexit del padre: solo vuelca el registro vigente del proceso
+        if self.pid == os.getpid() and _registro is self:
+            self.volcar()
+
+
+def _escribir(directorio, nombre, datos):
+    os.makedirs(directorio, exist_ok=True)
+    # Escritura atómica: quien lee nunca ve un archivo a medias
+    descriptor, temporal = tempfile.mkstemp(dir=directorio, prefix='.metricas-')
+    with os.fdopen(descriptor, 'w') as archivo:
+        json.dump(datos, archivo)
+    os.replace(temporal, os.path.join(directorio, nombre))
+
+
+@contextmanager
+def bloqueo(directorio):
+    """Candado exclusivo entre procesos sobre `<directorio>/.candado`."""
+    os.makedirs(directorio, exist_ok=True)
+    with open(os.path.join(directorio, '.candado'), 'a') as archivo:
+        if fcntl is not None:
+            fcntl.flock(archivo, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(archivo, fcntl.LOCK_UN)
+
+
+def _pid_de(nombre):
+    coincidencia = re.fullmatch(r'metricas-(\d+)\.json', nombre)
+    return int(coincidencia.group(1)) if coincidencia else None
+
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Existe pero es de otro usuario
+        return True
+    return True
+
+
+def _leer(ruta):
+    try:
+        with open(ruta) as archivo:
+            return json.load(archivo)
+    except (OSError, ValueError):
+        return None
+
+
+def _sumar_datos(histogramas, contadores, datos):
+    for metrica, por_vista in datos.get('histogramas', {}).items():
+        for vista, histograma in por_vista.items():
+            total = histogramas[metrica].get(vista)
+            if total is None:
+                histogramas[metrica][vista] = {
+                    'cubetas': list(histograma['cubetas']),
+                    'suma': histograma['suma'],
+                    'cuenta': histograma['cuenta'],
+                }
+                continue
+            total['cubetas'] = [a + b for a, b in zip(total['cubetas'], histograma['cubetas'])]
+            total['suma'] += histograma['suma']
+            total['cuenta'] += histograma['cuenta']
+    for metrica, por_etiquetas in datos.get('contadores', {}).items():
+        for etiquetas, valor in por_etiquetas.items():
+            contadores[metrica][etiquetas] += valor
+
+
+def compactar(directorio, pids=None):
+    """
+    Suma a ARCHIVO_TERMINADOS los archivos de los procesos que ya terminaron
+    (o los de `pids`, vivos o no) y los borra. Devuelve cuántos archivos
+    compactó. Se llama con bloqueo(directorio) tomado.
+    """
+    if not os.path.isdir(directorio):
+        return 0
+    rutas = []
+    for nombre in os.listdir(directorio):
+        pid = _pid_de(nombre)
+        if pid is not None and (pid in pids if pids is not None else not _proceso_vivo(pid)):
+            rutas.append(os.path.join(directorio, nombre))
+    if not rutas:
+        return 0
+    histogramas = defaultdict(dict)
+    contadores = defaultdict(lambda: defaultdict(float))
+    for ruta in [os.path.join(directorio, ARCHIVO_TERMINADOS)] + rutas:
+        datos = _leer(ruta)
+        if datos is not None:
+            _sumar_datos(histogramas, contadores, datos)
+    # Primero el total nuevo y después el borrado: un corte en medio cuenta de
+    # más (una vez), nunca de menos
+    _escribir(directorio, ARCHIVO_TERMINADOS, {'histogramas': histogramas, 'contadores': contadores})
+    for ruta in rutas:
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+    return len(rutas)
+
+
+_registro = None
+_candado_registro = threading.Lock()
+
+
+def directorio_metricas():
+    directorio = configuracion().get('METRICS_DIR')
+    if directorio:
+        return directorio
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, 'water_delivery_metricas')
+
+
+def registro():
+    """Registro del proceso actual (se crea de nuevo tras un fork de gunicorn)."""
+    global _registro
+    directorio = directorio_metricas()
+    with _candado_registro:
+        if _registro is None or _registro.pid != os.getpid() or _registro.directorio != directorio:
+            _registro = RegistroMetricas(directorio)
+        return _registro
+
+
+def metricas_combinadas(directorio):
+    """Suma los archivos de todos los workers (antes compacta los de workers terminados)."""
+    histogramas = defaultdict(dict)
+    contadores = defaultdict(lambda: defaultdict(float))
+    if not os.path.isdir(directorio):
+        return histogramas, contadores
+    # Con el candado la compactación de otro proceso no se ve a medias
+    with bloqueo(directorio):
+        compactar(directorio)
+        for nombre in sorted(os.listdir(directorio)):
+            if not (nombre.startswith('metricas-') and nombre.endswith('.json')):
+                continue
+            datos = _leer(os.path.join(directorio, nombre))
+            if datos is not None:
+                _sumar_datos(histogramas, contadores, datos)
+    return histogramas, contadores
+
+
+def _etiquetas(valores):
+    def escapar(texto):
+        return str(texto).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{clave}="{escapar(valor)}"' for clave, valor in valores.items())
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) and not valor.is_integer() else str(int(valor))
+
+
+def texto_prometheus(histogramas, contadores):
+    """Formato de exposición de texto de Prometheus (versión 0.0.4)."""
+    lineas = []
+    for metrica, limites in CUBETAS.items():
+        nombre = f'{PREFIJO_METRICA}_{metrica}'
+        lineas += [f'# HELP {nombre} {AYUDAS[metrica]}', f'# TYPE {nombre} histogram']
+        for vista, histograma in sorted(histogramas.get(metrica, {}).items()):
+            acumulado = 0
+            for limite, cantidad in zip(limites, histograma['cubetas']):
+                acumulado += cantidad
+                etiquetas = _etiquetas({'vista': vista, 'le': _numero(limite)})
+                lineas.append(f'{nombre}_bucket{{{etiquetas}}} {acumulado}')
+            etiquetas = _etiquetas({'vista': vista, 'le': '+Inf'})
+            lineas.append(f'{nombre}_bucket{{{etiquetas}}} {histograma["cuenta"]}')
+            etiquetas = _etiquetas({'vista': vista})
+            lineas.append(f'{nombre}_sum{{{etiquetas}}} {_numero(histograma["suma"])}')
+            lineas.append(f'{nombre}_count{{{etiquetas}}} {histograma["cuenta"]}')
+    for metrica in ('requests_total', 'cache_hits_total', 'cache_misses_total',
+                    'fragment_cache_hits_total', 'fragment_cache_misses_total'):
+        nombre = f'{PREFIJO_METRICA}_{metrica}'
+        lineas += [f'# HELP {nombre} {AYUDAS[metrica]}', f'# TYPE {nombre} counter']
+        for etiquetas, valor in sorted(contadores.get(metrica, {}).items()):
+            lineas.append(f'{nombre}{{{_etiquetas(json.loads(etiquetas))}}} {_numero(valor)}')
+    return '\n'.join(lineas) + '\n'
+
+
+def _es_empresa(request):
+    usuario = getattr(request, 'user', None)
+    return bool(usuario is not None and usuario.is_authenticated
+                and getattr(usuario, 'tipo_usuario', None) == 'empresa')
+
+
+def _tamano_respuesta(respuesta):
+    if respuesta.streaming:
+        return int(respuesta.get('Content-Length') or 0)
+    return len(respuesta.content)
+
+
+def server_timing(duracion, medicion):
+    return ', '.join([
+        f'total;dur={duracion * 1000:.1f}',
+        f'db;dur={medicion.tiempo_db * 1000:.1f};desc="{medicion.consultas} consultas"',
+        f'cache;desc="{medicion.aciertos} aciertos, {medicion.fallos} fallos"',
+    ])
+
+
+class MetricasMiddleware:
+    """
+    Mide cada petición y la registra bajo el nombre de su URL. Debe ir primero
+    en MIDDLEWARE para que el tiempo incluya al resto de middlewares.
+    Funciona igual con vistas síncronas y asíncronas (perfil ASGI).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not configuracion().get('PERFORMANCE_MONITORING'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        instalar_envoltorio(_medir_consulta)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        medicion = Medicion()
+        marca = _medicion.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            respuesta = self.get_response(request)
+        finally:
+            _medicion.reset(marca)
+        self.registrar(request, respuesta, time.perf_counter() - inicio, medicion, _es_empresa(request))
+        return respuesta
+
+    async def __acall__(self, request):
+        medicion = Medicion()
+        marca = _medicion.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            respuesta = await self.get_response(request)
+        finally:
+            _medicion.reset(marca)
+        duracion = time.perf_counter() - inicio
+        # request.user puede consultar la base de datos: fuera del event loop
+        es_empresa = await sync_to_async(_es_empresa)(request)
+        self.registrar(request, respuesta, duracion, medicion, es_empresa)
+        return respuesta
+
+    def registrar(self, request, respuesta, duracion, medicion, es_empresa):
+        coincidencia = getattr(request, 'resolver_match', None)
+        vista = coincidencia.view_name if coincidencia and coincidencia.view_name else SIN_RUTA
+        registro().registrar(vista, respuesta.status_code, duracion, medicion, _tamano_respuesta(respuesta))
+        if es_empresa:
+            respuesta['Server-Timing'] = server_timing(duracion, medicion)
+
+
+def _token_valido(request):
+    esperado = configuracion().get('METRICS_TOKEN')
+    autorizacion = request.headers.get('Authorization', '')
+    if not esperado or not autorizacion.startswith('Bearer '):
+        return False
+    return hmac.compare_digest(autorizacion[len('Bearer '):].encode(), esperado.encode())
+
+
+def metricas_prometheus(request):
+    """Métricas de todos los workers en formato Prometheus (empresa o token)."""
+    if not (_token_valido(request) or _es_empresa(request)):
+        return HttpResponse('No autorizado', status=401, content_type='text/plain; charset=utf-8')
+    if not configuracion().get('PERFORMANCE_MONITORING'):
+        return HttpResponse('Monitoreo de rendimiento desactivado', status=404,
+                            content_type='text/plain; charset=utf-8')
+    # Lo de este worker se vuelca antes para que la respuesta esté al día
+    registro().volcar()
+    histogramas, contadores = metricas_combinadas(directorio_metricas())
+    return HttpResponse(texto_prometheus(histogramas, contadores),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,299 @@
+# =============================================
+# PARTICIONES MENSUALES EN POSTGRESQL
+# =============================================
+# UbicacionCamion recibe una fila por minuto y camión y Despacho crece cada
+# día, pero casi todas las consultas piden rangos recientes de fecha. En
+# PostgreSQL las dos tablas están particionadas por mes (PARTITION BY RANGE
+# sobre su fecha): una consulta con `fecha >= ... AND fecha < ...` solo lee
+# las particiones de esos meses, y cada partición tiene sus propios índices,
+# pequeños.
+#
+# - La migración 0016 convierte las tablas existentes: crea la tabla
+#   particionada con las particiones que cubren los datos, copia las filas y
+#   vuelve a crear índices y claves foráneas. La clave primaria pasa a ser
+#   (id, fecha), porque PostgreSQL exige la columna de partición en ella; para
+#   Django la clave sigue siendo `id`, que sale de una secuencia.
+# - Una partición por defecto recibe las filas de meses sin partición, así
+#   que ninguna inserción falla si una partición se crea tarde.
+# - Las particiones nuevas se crean como tabla suelta y se enganchan con
+#   ATTACH PARTITION, que no bloquea las lecturas ni las escrituras de la
+#   tabla; antes se mueven a ella las filas de su mes que hubiera en la
+#   partición por defecto.
+# - Las vencidas se desenganchan (DETACH) y se borran con DROP TABLE: cuesta
+#   lo mismo con mil filas que con millones, a diferencia de un DELETE.
+#
+# `manage.py arranque` crea las particiones de los próximos meses en cada
+# despliegue y `manage.py particiones` (una vez al día o a la semana) además
+# reparte la partición por defecto y suelta las vencidas. En SQLite y otros
+# motores las tablas son normales y todo esto no hace nada.
+
+import re
+from datetime import date, datetime, time
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+MESES_ADELANTE = 3
+
+# Tabla particionada -> columna de partición y retención por defecto en meses.
+# Los despachos viejos se archivan (ver clientes/archivo.py): de Despacho solo
+# se sueltan las particiones vencidas que ya quedaron vacías.
+TABLAS = {
+    'clientes.Despacho': {'campo': 'fecha', 'retencion_meses': 12, 'solo_vacias': True},
+    'clientes.UbicacionCamion': {'campo': 'timestamp', 'retencion_meses': 3, 'solo_vacias': False},
+}
+
+SUFIJO_DEFECTO = '_pdefecto'
+_NOMBRE_MES = re.compile(r'_p(\d{4})(\d{2})$')
+
+
+def configuracion():
+    return getattr(settings, 'PARTICIONES', {})
+
+
+def meses_adelante():
+    return configuracion().get('MESES_ADELANTE', MESES_ADELANTE)
+
+
+def retencion_meses(etiqueta):
+    """Meses que se conservan de la tabla `etiqueta` ('app.Modelo')."""
+    return configuracion().get('RETENCION_MESES', {}).get(etiqueta, TABLAS[etiqueta]['retencion_meses'])
+
+
+def particionado(alias=DEFAULT_DB_ALIAS):
+    """Si el motor de `alias` usa particiones (solo PostgreSQL)."""
+    return connections[alias].vendor == 'postgresql'
+
+
+def sumar_meses(mes, meses):
+    """Primer día del mes `meses` meses después (o antes, si es negativo) de `mes`."""
+    numero = mes.year * 12 + mes.month - 1 + meses
+    return date(numero // 12, numero % 12 + 1, 1)
+
+
+def mes_de(momento):
+    """Primer día del mes local de un datetime."""
+    return timezone.localtime(momento).date().replace(day=1)
+
+
+def limites_mes(mes):
+    """Límites [desde, hasta) del mes local `mes` como datetimes conscientes."""
+    return (
+        timezone.make_aware(datetime.combine(mes, time.min)),
+        timezone.make_aware(datetime.combine(sumar_meses(mes, 1), time.min)),
+    )
+
+
+def nombre_particion(tabla, mes):
+    """Nombre de la partición de `tabla` para el mes, p. ej. clientes_despacho_p202610."""
+    return f'{tabla}_p{mes:%Y%m}'
+
+
+def mes_de_particion(nombre):
+    """Mes de una partición por su nombre (None para la partición por defecto)."""
+    coincidencia = _NOMBRE_MES.search(nombre)
+    if coincidencia is None:
+        return None
+    return date(int(coincidencia.group(1)), int(coincidencia.group(2)), 1)
+
+
+def _literal(momento):
+    # Los límites de una partición van en el DDL, que no admite parámetros;
+    # siempre son medianoches calculadas aquí, nunca datos del usuario
+    return f"'{momento.isoformat(sep=' ')}'"
+
+
+def _tabla_y_columna(modelo):
+    return modelo._meta.db_table, modelo._meta.get_field(TABLAS[modelo._meta.label]['campo']).column
+
+
+# --- Conversión inicial (migración) ---
+
+def particionar(schema_editor, modelo):
+    """
+    Convierte la tabla de `modelo` (un modelo histórico de la migración) en
+    una tabla particionada por mes con las mismas filas, índices y claves
+    foráneas. No hace nada fuera de PostgreSQL.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    qn = connection.ops.quote_name
+    tabla, columna = _tabla_y_columna(modelo)
+    pk = modelo._meta.pk.column
+    anterior = f'{tabla}_sin_particionar'
+    with connection.cursor() as cursor:
+        # Índices (salvo la clave primaria) y claves foráneas, para recrearlos igual
+        cursor.execute(
+            'SELECT pg_get_indexdef(indexrelid) FROM pg_index WHERE indrelid = %s::regclass AND NOT indisprimary',
+            [tabla],
+        )
+        indices = [fila[0] for fila in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+            [tabla],
+        )
+        foraneas = cursor.fetchall()
+        cursor.execute(f'SELECT MIN({qn(columna)}) FROM {qn(tabla)}')
+        primera = cursor.fetchone()[0]
+
+        cursor.execute(f'ALTER TABLE {qn(tabla)} RENAME TO {qn(anterior)}')
+        cursor.execute(
+            f'CREATE TABLE {qn(tabla)} (LIKE {qn(anterior)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY RANGE ({qn(columna)})'
+        )
+        actual = timezone.localdate().replace(day=1)
+        mes = mes_de(primera) if primera is not None else actual
+        while mes <= sumar_meses(actual, meses_adelante()):
+            desde, hasta = limites_mes(mes)
+            cursor.execute(
+                f'CREATE TABLE {qn(nombre_particion(tabla, mes))} PARTITION OF {qn(tabla)} '
+                f'FOR VALUES FROM ({_literal(desde)}) TO ({_literal(hasta)})'
+            )
+            mes = sumar_meses(mes, 1)
+        cursor.execute(f'CREATE TABLE {qn(tabla + SUFIJO_DEFECTO)} PARTITION OF {qn(tabla)} DEFAULT')
+
+        # Las filas se copian antes de crear los índices: es más rápido
+        cursor.execute(f'INSERT INTO {qn(tabla)} SELECT * FROM {qn(anterior)}')
+        cursor.execute(f'DROP TABLE {qn(anterior)}')
+
+        # La columna de identidad se fue con la tabla anterior: el id sale de una secuencia
+        secuencia = f'{tabla}_{pk}_seq'
+        cursor.execute(f'CREATE SEQUENCE {qn(secuencia)} OWNED BY {qn(tabla)}.{qn(pk)}')
+        cursor.execute(f'SELECT setval(%s, COALESCE(MAX({qn(pk)}), 0) + 1, false) FROM {qn(tabla)}', [secuencia])
+        cursor.execute(f"ALTER TABLE {qn(tabla)} ALTER COLUMN {qn(pk)} SET DEFAULT nextval('{secuencia}'::regclass)")
+
+        cursor.execute(f'ALTER TABLE {qn(tabla)} ADD CONSTRAINT {qn(tabla + "_pkey")} PRIMARY KEY ({qn(pk)}, {qn(columna)})')
+        for definicion in indices:
+            cursor.execute(definicion)
+        for nombre, definicion in foraneas:
+            cursor.execute(f'ALTER TABLE {qn(tabla)} ADD CONSTRAINT {qn(nombre)} {definicion}')
+        cursor.execute(f'ANALYZE {qn(tabla)}')
+
+
+# --- Mantenimiento ---
+
+def particiones(modelo, alias=DEFAULT_DB_ALIAS):
+    """Nombres de las particiones mensuales de `modelo`, por mes."""
+    connection = connections[alias]
+    tabla, _ = _tabla_y_columna(modelo)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = %s::regclass',
+            [tabla],
+        )
+        nombres = [fila[0] for fila in cursor.fetchall()]
+    return {mes_de_particion(nombre): nombre for nombre in nombres if mes_de_particion(nombre) is not None}
+
+
+def meses_en_defecto(modelo, alias=DEFAULT_DB_ALIAS):
+    """Meses (locales) con filas en la partición por defecto de `modelo`."""
+    connection = connections[alias]
+    qn = connection.ops.quote_name
+    tabla, columna = _tabla_y_columna(modelo)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT DISTINCT date_trunc('month', {qn(columna)} AT TIME ZONE %s) FROM {qn(tabla + SUFIJO_DEFECTO)}",
+            [settings.TIME_ZONE],
+        )
+        return sorted(fila[0].date() for fila in cursor.fetchall())
+
+
+def crear_particion(modelo, mes, alias=DEFAULT_DB_ALIAS):
+    """
+    Crea la partición del mes de `modelo` sin bloquear la tabla: tabla
+    suelta, filas del mes desde la partición por defecto y ATTACH PARTITION.
+    """
+    connection = connections[alias]
+    qn = connection.ops.quote_name
+    tabla, columna = _tabla_y_columna(modelo)
+    nombre = nombre_particion(tabla, mes)
+    desde, hasta = limites_mes(mes)
+    with transaction.atomic(using=alias), connection.cursor() as cursor:
+        cursor.execute(f'CREATE TABLE {qn(nombre)} (LIKE {qn(tabla)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        cursor.execute(
+            f'WITH movidas AS (DELETE FROM {qn(tabla + SUFIJO_DEFECTO)} '
+            f'WHERE {qn(columna)} >= %s AND {qn(columna)} < %s RETURNING *) '
+            f'INSERT INTO {qn(nombre)} SELECT * FROM movidas',
+            [desde, hasta],
+        )
+        # Los índices de la tabla particionada se crean solos en la partición
+        cursor.execute(
+            f'ALTER TABLE {qn(tabla)} ATTACH PARTITION {qn(nombre)} '
+            f'FOR VALUES FROM ({_literal(desde)}) TO ({_literal(hasta)})'
+        )
+    return nombre
+
+
+def soltar_particion(modelo, nombre, alias=DEFAULT_DB_ALIAS):
+    """Desengancha la partición y borra su tabla con todas sus filas."""
+    connection = connections[alias]
+    qn = connection.ops.quote_name
+    tabla, _ = _tabla_y_columna(modelo)
+    with transaction.atomic(using=alias), connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {qn(tabla)} DETACH PARTITION {qn(nombre)}')
+        cursor.execute(f'DROP TABLE {qn(nombre)}')
+
+
+def _vacia(nombre, alias):
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {connection.ops.quote_name(nombre)})')
+        return not cursor.fetchone()[0]
+
+
+def modelos_particionados():
+    return [apps.get_model(etiqueta) for etiqueta in TABLAS]
+
+
+def particiones_pendientes(meses=None, hoy=None, repartir_defecto=False, alias=DEFAULT_DB_ALIAS):
+    """
+    (modelo, mes) de las particiones que faltan desde el mes actual hasta
+    `meses` meses adelante y, con `repartir_defecto`, de los meses con filas
+    en la partición por defecto.
+    """
+    if not particionado(alias):
+        return []
+    meses = meses_adelante() if meses is None else meses
+    actual = (hoy or timezone.localdate()).replace(day=1)
+    pendientes = []
+    for modelo in modelos_particionados():
+        buscados = {sumar_meses(actual, n) for n in range(meses + 1)}
+        if repartir_defecto:
+            buscados.update(meses_en_defecto(modelo, alias))
+        pendientes.extend((modelo, mes) for mes in sorted(buscados - set(particiones(modelo, alias))))
+    return pendientes
+
+
+def asegurar_particiones(meses=None, hoy=None, repartir_defecto=False, alias=DEFAULT_DB_ALIAS):
+    """Crea las particiones pendientes (ver particiones_pendientes); devuelve sus nombres."""
+    return [
+        crear_particion(modelo, mes, alias)
+        for modelo, mes in particiones_pendientes(meses, hoy, repartir_defecto, alias)
+    ]
+
+
+def soltar_vencidas(hoy=None, alias=DEFAULT_DB_ALIAS):
+    """
+    Suelta las particiones de meses anteriores a la retención de cada tabla
+    (las de Despacho, solo si ya están vacías). Devuelve (soltadas, conservadas).
+    """
+    if not particionado(alias):
+        return [], []
+    actual = (hoy or timezone.localdate()).replace(day=1)
+    soltadas, conservadas = [], []
+    for modelo in modelos_particionados():
+        etiqueta = modelo._meta.label
+        limite = sumar_meses(actual, -retencion_meses(etiqueta))
+        for mes, nombre in sorted(particiones(modelo, alias).items()):
+            if mes >= limite:
+                continue
+            if TABLAS[etiqueta]['solo_vacias'] and not _vacia(nombre, alias):
+                conservadas.append(nombre)
+                continue
+            soltar_particion(modelo, nombre, alias)
+            soltadas.append(nombre)
+    return soltadas, conservadas
@@ -0,0 +1,123 @@
+# =============================================
+# PRESUPUESTO DE CONSULTAS POR VISTA
+# =============================================
+# Cada vista tiene declarado cuántas consultas SQL puede hacer como máximo en
+# una petición completa (sesión y usuario incluidos, con la caché vacía). El
+# número no depende del volumen de datos: si una vista empieza a consultar por
+# cada fila (N+1), se pasa del presupuesto aunque los tests usen pocos datos.
+#
+# - Los presupuestos se declaran en settings.PRESUPUESTOS_CONSULTAS por nombre
+#   de URL ('clientes:dashboard'), o en la propia vista con @presupuesto_consultas.
+# - En los tests: `with dentro_del_presupuesto('clientes:dashboard'): ...`
+# - En desarrollo, PresupuestoConsultasMiddleware revisa cada petición y
+#   registra un aviso (PRESUPUESTO_CONSULTAS_MODO='registrar') o lanza
+#   PresupuestoExcedido ('error').
+
+import logging
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+MODOS = ('registrar', 'error')
+
+
+class PresupuestoExcedido(AssertionError):
+    """Una petición hizo más consultas de las que tiene presupuestadas."""
+
+
+def presupuesto_consultas(maximo):
+    """Declara el presupuesto directamente en una vista (tiene prioridad sobre settings)."""
+    def decorador(vista):
+        vista.presupuesto_consultas = maximo
+        return vista
+    return decorador
+
+
+def presupuesto_de(nombre_url, vista=None):
+    """Presupuesto de una vista o nombre de URL, o None si no tiene."""
+    if vista is not None and getattr(vista, 'presupuesto_consultas', None) is not None:
+        return vista.presupuesto_consultas
+    return getattr(settings, 'PRESUPUESTOS_CONSULTAS', {}).get(nombre_url)
+
+
+class ContadorConsultas:
+    """execute_wrapper que cuenta las consultas (y guarda su SQL para los mensajes)."""
+
+    def __init__(self):
+        self.consultas = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.consultas.append(sql)
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.consultas)
+
+    @contextmanager
+    def contando(self):
+        """Cuenta en todas las conexiones configuradas mientras dura el bloque."""
+        with ExitStack() as pila:
+            for conexion in connections.all():
+                pila.enter_context(conexion.execute_wrapper(self))
+            yield self
+
+
+def mensaje_exceso(nombre_url, presupuesto, contador):
+    lineas = [f'{nombre_url}: {len(contador)} consultas (presupuesto: {presupuesto})']
+    lineas += [f'  {n}. {sql}' for n, sql in enumerate(contador.consultas, 1)]
+    return '\n'.join(lineas)
+
+
+@contextmanager
+def dentro_del_presupuesto(nombre_url, presupuesto=None):
+    """
+    Falla con PresupuestoExcedido si el bloque hace más consultas que el
+    presupuesto de `nombre_url` (o el indicado). Sin presupuesto declarado
+    también falla, para que ninguna vista nueva quede sin revisar.
+    """
+    if presupuesto is None:
+        presupuesto = presupuesto_de(nombre_url)
+    if presupuesto is None:
+        raise PresupuestoExcedido(f'{nombre_url} no tiene presupuesto de consultas declarado')
+    contador = ContadorConsultas()
+    with contador.contando():
+        yield contador
+    if len(contador) > presupuesto:
+        raise PresupuestoExcedido(mensaje_exceso(nombre_url, presupuesto, contador))
+
+
+class PresupuestoConsultasMiddleware:
+    """
+    Compara las consultas de cada petición con el presupuesto de su vista.
+    Debe ir al principio de MIDDLEWARE para contar también la sesión y el
+    usuario. Solo síncrono: en el perfil ASGI las consultas corren en otros
+    hilos y no se podrían contar, así que allí no se activa.
+    """
+
+    def __init__(self, get_response):
+        self.modo = getattr(settings, 'PRESUPUESTO_CONSULTAS_MODO', '')
+        if not self.modo:
+            raise MiddlewareNotUsed
+        if self.modo not in MODOS:
+            raise ValueError(f'PRESUPUESTO_CONSULTAS_MODO debe ser uno de {MODOS}, no {self.modo!r}')
+        self.get_response = get_response
+
+    def __call__(self, request):
+        contador = ContadorConsultas()
+        with contador.contando():
+            respuesta = self.get_response(request)
+
+        coincidencia = getattr(request, 'resolver_match', None)
+        if coincidencia is None:
+            return respuesta
+        presupuesto = presupuesto_de(coincidencia.view_name, coincidencia.func)
+        if presupuesto is not None and len(contador) > presupuesto:
+            mensaje = mensaje_exceso(coincidencia.view_name, presupuesto, contador)
+            if self.modo == 'error':
+                raise PresupuestoExcedido(mensaje)
+            logger.warning(mensaje)
+        return respuesta
@@ -13,6 +13,8 @@ from .settings import *
 # =====================
 DEBUG = False
 SECRET_KEY = config('SECRET_KEY')
+# El conteo de consultas por vista es para desarrollo (ver water_delivery/presupuestos.py)
+PRESUPUESTO_CONSULTAS_MODO = config('PRESUPUESTO_CONSULTAS_MODO', default='')
 
 # Configurar hosts permitidos
 ALLOWED_HOSTS = config('ALLOWED_HOSTS', default='localhost').split(',')
@@ -51,38 +53,11 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 # =====================
 # Configuración de Logging
 # =====================
-LOGGING = {
-    'version': 1,
-    'disable_existing_loggers': False,
-    'formatters': {
-        'verbose': {
-            'format': '{levelname} {asctime} {module} {process:d} {thread:d} {message}',
-            'style': '{',
-        },
-        'simple': {
-            'format': '{levelname} {message}',
-            'style': '{',
-        },
-    },
-    'handlers': {
-        'console': {
-            'level': 'INFO',
-            'class': 'logging.StreamHandler',
-            'formatter': 'simple',
-        },
-    },
-    'root': {
-        'handlers': ['console'],
-        'level': 'INFO',
-    },
-    'loggers': {
-        'django': {
-            'handlers': ['console'],
-            'level': 'INFO',
-            'propagate': False,
-        },
-    },
-}
+# Líneas JSON en la consola, escritas desde el hilo de la cola (ver water_delivery/bitacora.py)
+LOGGING = logging_en_cola(
+    [{'class': 'logging.StreamHandler', 'level': 'INFO', 'formato': 'json'}],
+    muestreo_debug=LOG_DEBUG_MUESTREO,
+)
 
 # =====================
 # Configuración de Email (Opcional)
@@ -95,14 +70,14 @@ EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 
 # =====================
-# Configuración de Cache (Opcional)
+# Configuración de Cache
 # =====================
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-    }
-}
+# Los workers de gunicorn son procesos separados: la caché debe ser compartida
+# para que las invalidaciones se vean en todos. Por defecto se usa una tabla de
+# la base de datos (creada con `createcachetable` al desplegar); con REDIS_URL o
+# CACHE_URL=redis://... se usa Redis, y con CACHE_URL=file:///ruta, archivos.
+from .cache import caches_desde_url
+CACHES = caches_desde_url(config('CACHE_URL', default=config('REDIS_URL', default='db://')))
 
 # =====================
 # Configuración de Sesiones
@@ -5,6 +5,7 @@
 
 import os
 import logging
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from decouple import config
 from django.http import HttpResponseForbidden
 from django.conf import settings
@@ -22,13 +23,29 @@ class IPRestrictionMiddleware:
     Middleware para restringir acceso solo a IPs específicas de la empresa
     En desarrollo (DEBUG=True), no aplica restricciones.
     """
+    # Compatible con vistas síncronas y asíncronas (ver las APIs de rastreo)
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.acceso_denegado(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        # La verificación no consulta la base de datos: puede correr en el event loop
+        return self.acceso_denegado(request) or await self.get_response(request)
+
+    def acceso_denegado(self, request):
+        """Respuesta 403 si la IP no está permitida, o None para dejar pasar la petición."""
         # En desarrollo, no aplicar restricciones
         if settings.DEBUG:
-            return self.get_response(request)
+            return None
         
         # Rutas exentas (públicas)
         exempt_paths = [
@@ -40,7 +57,7 @@ class IPRestrictionMiddleware:
         
         # Permitir acceso a rutas públicas
         if any(request.path.startswith(path) for path in exempt_paths):
-            return self.get_response(request)
+            return None
         
         # Obtener IP del cliente
         client_ip = self.get_client_ip(request)
@@ -53,7 +70,7 @@ class IPRestrictionMiddleware:
                 '<p>Si crees que esto es un error, contacta al administrador del sistema.</p>'
             )
         
-        return self.get_response(request)
+        return None
     
     def get_client_ip(self, request):
         """
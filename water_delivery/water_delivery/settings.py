@@ -13,6 +13,7 @@
 # - Validación de contraseñas
 # - Internacionalización
 # - Archivos estáticos
+# - Logs y auditoría
 # - Email y seguridad
 
 from pathlib import Path
@@ -78,6 +79,18 @@ else:
 SESSION_COOKIE_SECURE = config('SESSION_COOKIE_SECURE', default=not DEBUG, cast=bool)
 SESSION_COOKIE_HTTPONLY = config('SESSION_COOKIE_HTTPONLY', default=True, cast=bool)
 
+# Almacenamiento de sesiones, elegible por entorno con SESSION_MODE:
+# - cached_db: caché compartida respaldada por la tabla de sesiones (por defecto).
+# - signed_cookies: la sesión viaja firmada en la cookie, sin consultas (no se
+#   puede revocar desde el servidor hasta que expira).
+# - db: solo base de datos (comportamiento anterior).
+MODOS_SESION = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = MODOS_SESION[config('SESSION_MODE', default='cached_db')]
+
 # Configuración SSL y seguridad adicional
 SECURE_SSL_REDIRECT = config('SECURE_SSL_REDIRECT', default=False, cast=bool)
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
@@ -116,6 +129,12 @@ CRISPY_TEMPLATE_PACK = "bootstrap5"
 # =====================
 # Authentication Settings
 AUTH_USER_MODEL = 'usuarios.Usuario'
+# El usuario de la sesión se resuelve desde la caché (ver usuarios/backends.py).
+# ModelBackend se mantiene para las sesiones abiertas antes de este cambio.
+AUTHENTICATION_BACKENDS = [
+    'usuarios.backends.UsuarioCacheBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
 LOGIN_URL = 'usuarios:login'
 LOGIN_REDIRECT_URL = 'clientes:lista_clientes'  
 LOGOUT_REDIRECT_URL = 'usuarios:login'
@@ -123,11 +142,24 @@ LOGOUT_REDIRECT_URL = 'usuarios:login'
 # =====================
 # Middleware
 # =====================
+# PERFIL_ASGI lo activa water_delivery/asgi.py para los workers de rastreo
+PERFIL_ASGI = config('PERFIL_ASGI', default=False, cast=bool)
+
 # Middleware
 MIDDLEWARE = [
+    # Id de la petición para los logs (water_delivery/bitacora.py)
+    'water_delivery.bitacora.BitacoraMiddleware',
+    # Métricas por vista (MONITORING_CONFIG): primero, para medir toda la petición
+    'water_delivery.metricas.MetricasMiddleware',
+    # Registro de consultas lentas (CONSULTAS_LENTAS)
+    'water_delivery.consultas_lentas.ConsultasLentasMiddleware',
+    # Después, para contar también las consultas de sesión y usuario (solo síncrono)
+    'water_delivery.presupuestos.PresupuestoConsultasMiddleware' if not PERFIL_ASGI else None,
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # CORS debe ir lo más arriba posible
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # Para servir archivos estáticos
+    # Para servir archivos estáticos. Es solo síncrono: en el perfil ASGI (ver asgi.py)
+    # se omite para no serializar las peticiones, y los estáticos los sirve el proxy.
+    'whitenoise.middleware.WhiteNoiseMiddleware' if not PERFIL_ASGI else None,
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -135,6 +167,10 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'usuarios.middleware.LoginRequiredMiddleware',
+    # Ámbito de empresa de la petición para los modelos por empresa (water_delivery/empresas.py)
+    'water_delivery.empresas.EmpresaMiddleware',
+    # Quién hace cada cambio, para el registro de auditoría (AUDIT_CONFIG)
+    'water_delivery.auditoria.AuditoriaMiddleware',
     # Middleware de seguridad para acceso privado (solo en producción)
     'water_delivery.security.IPRestrictionMiddleware' if not DEBUG else None,
     # Middleware de control por dispositivo deshabilitado
@@ -301,6 +337,13 @@ if STATIC_ROOT is None:
         # En producción, usa la ruta absoluta
         STATIC_ROOT = '/opt/water_delivery_main/static/'
 
+# Fuera de desarrollo, collectstatic pone un hash en el nombre de cada archivo
+# (WhiteNoise los sirve con caché inmutable de un año) y guarda variantes .gz
+# y .br precomprimidas. El JS y CSS de cada página vive en clientes/static/ y
+# no dentro de la plantilla, así que el HTML solo lleva los datos.
+if not DEBUG:
+    STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+
 # Media files
 MEDIA_URL = '/media/'
 # MEDIA_ROOT puede ser sobrescrito desde .env, si no usa ruta por defecto según DEBUG
@@ -323,6 +366,137 @@ CORS_ALLOW_CREDENTIALS = True
 # Default primary key
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# =====================
+# Caché
+# =====================
+# CACHE_URL elige el backend (ver water_delivery/cache.py). Sin valor se usa la
+# memoria del proceso, suficiente para desarrollo y tests; con varios workers
+# hay que usar un backend compartido (redis://, db:// o file://).
+from water_delivery.cache import caches_desde_url
+CACHES = caches_desde_url(config('CACHE_URL', default=''))
+
+# =====================
+# Presupuesto de consultas por vista
+# =====================
+# Máximo de consultas SQL por petición de cada vista, con la caché vacía (ver
+# water_delivery/presupuestos.py). Los tests fallan si una vista se pasa o si
+# una URL nueva no tiene presupuesto; en desarrollo el middleware avisa en el log.
+# Al cambiar una vista a propósito, subir su número aquí en el mismo commit.
+PRESUPUESTO_CONSULTAS_MODO = config('PRESUPUESTO_CONSULTAS_MODO', default='registrar' if DEBUG else '')
+PRESUPUESTOS_CONSULTAS = {
+    'clientes:dashboard': 3,
+    'clientes:lista_clientes': 4,
+    'clientes:nuevo_cliente': 4,
+    'clientes:detalle_cliente': 4,
+    'clientes:estado_cuenta': 5,
+    'clientes:editar_cliente': 19,
+    'clientes:nuevo_despacho': 6,
+    'clientes:marcar_entregado': 4,
+    'clientes:marcar_pendiente': 8,
+    'clientes:eliminar_despacho': 8,
+    'clientes:toggle_cliente_status': 4,
+    'clientes:registrar_pago': 5,
+    'clientes:editar_pago': 8,
+    'clientes:eliminar_pago': 8,
+    'clientes:antiguedad_saldos': 4,
+    'clientes:dashboard_despachos': 4,
+    'clientes:historial_despachos': 2,
+    'clientes:api_clientes': 3,
+    'clientes:api_resumen_header': 4,
+    'clientes:api_despachos_hoy': 3,
+    'clientes:api_despachos_recientes': 3,
+    'clientes:api_crear_despacho': 5,
+    'clientes:api_crear_cliente': 3,
+    'clientes:api_eliminar_despacho': 6,
+    'clientes:api_marcar_entregado': 4,
+    'clientes:api_marcar_cancelado': 7,
+    'clientes:api_asignar_despacho': 6,
+    'clientes:api_repartir_despachos': 8,
+    'clientes:api_manifiesto': 3,
+    'clientes:api_carga_conductores': 3,
+    'clientes:api_vincular_conductor': 3,
+    'clientes:api_estado_cuenta': 5,
+    'clientes:api_antiguedad_saldos': 3,
+    'clientes:api_pedidos_previstos': 3,
+    'clientes:api_cliente_despachos': 4,
+    'clientes:api_cliente_pagos': 4,
+    'clientes:api_guardar_ubicacion': 4,
+    'clientes:api_conductor_info': 2,
+    'clientes:api_ubicaciones': 3,
+    'clientes:ruta_camion': 5,
+    'usuarios:login': 10,
+    'usuarios:logout': 4,
+    'usuarios:register': 3,
+    'usuarios:recuperar': 2,
+    'usuarios:resetear_con_token': 6,
+}
+
+# =====================
+# Monitoreo de rendimiento
+# =====================
+# PERFORMANCE_MONITORING activa water_delivery/metricas.py: Server-Timing para
+# usuarios empresa y /metricas/ en formato Prometheus (con METRICS_TOKEN como
+# token Bearer para el servidor de Prometheus).
+MONITORING_CONFIG = {
+    'PERFORMANCE_MONITORING': config('PERFORMANCE_MONITORING', default=False, cast=bool),
+    'METRICS_DIR': config('METRICS_DIR', default=''),
+    'METRICS_TOKEN': config('METRICS_TOKEN', default=''),
+}
+
+# Consultas SQL que superan UMBRAL_MS, muestreadas, en un archivo JSONL (ver
+# water_delivery/consultas_lentas.py); resumen con `manage.py consultas_lentas`.
+CONSULTAS_LENTAS = {
+    'ACTIVO': config('CONSULTAS_LENTAS', default=False, cast=bool),
+    'UMBRAL_MS': config('CONSULTAS_LENTAS_UMBRAL_MS', default=100, cast=float),
+    'MUESTREO': config('CONSULTAS_LENTAS_MUESTREO', default=1.0, cast=float),
+    'PARAMETROS': config('CONSULTAS_LENTAS_PARAMETROS', default=True, cast=bool),
+    'ARCHIVO': config('CONSULTAS_LENTAS_ARCHIVO', default=os.path.join(BASE_DIR, 'logs', 'consultas_lentas.jsonl')),
+}
+
+# =====================
+# Logs
+# =====================
+# Todos los logs pasan por una cola y un hilo aparte (ver
+# water_delivery/bitacora.py): la petición nunca espera a la consola ni al
+# disco. LOG_DEBUG_MUESTREO es la fracción de volcados DEBUG de datos de
+# formularios que se escriben (0: ninguno).
+from .bitacora import logging_en_cola
+LOG_DEBUG_MUESTREO = config('LOG_DEBUG_MUESTREO', default=0.0, cast=float)
+LOGGING = logging_en_cola(
+    [{'class': 'logging.StreamHandler', 'formato': config('LOG_FORMATO', default='texto')}],
+    muestreo_debug=LOG_DEBUG_MUESTREO,
+)
+
+# =====================
+# Auditoría
+# =====================
+# Altas, ediciones y bajas de Cliente, Despacho, Pago y Device en
+# RegistroAuditoria, escritas por lotes desde un hilo de cada proceso (ver
+# water_delivery/auditoria.py); se borran pasados AUDIT_RETENTION_DAYS.
+AUDIT_CONFIG = {
+    'LOG_DATA_CHANGES': config('AUDIT_LOG_DATA_CHANGES', default=False, cast=bool),
+    'AUDIT_RETENTION_DAYS': config('AUDIT_RETENTION_DAYS', default=365, cast=int),
+    'AUDIT_FLUSH_INTERVAL': config('AUDIT_FLUSH_INTERVAL', default=5, cast=float),
+    'AUDIT_BATCH_SIZE': config('AUDIT_BATCH_SIZE', default=500, cast=int),
+    'AUDIT_BUFFER_MAX': config('AUDIT_BUFFER_MAX', default=50000, cast=int),
+    'AUDIT_MAX_RETRIES': config('AUDIT_MAX_RETRIES', default=60, cast=int),
+}
+
+# =====================
+# Particiones
+# =====================
+# En PostgreSQL, Despacho y UbicacionCamion están particionadas por mes (ver
+# water_delivery/particiones.py). `manage.py arranque` crea las particiones de
+# los próximos MESES_ADELANTE meses y `manage.py particiones` suelta las
+# anteriores a RETENCION_MESES (las de despachos, solo ya archivadas).
+PARTICIONES = {
+    'MESES_ADELANTE': config('PARTICIONES_MESES_ADELANTE', default=3, cast=int),
+    'RETENCION_MESES': {
+        'clientes.Despacho': config('PARTICIONES_RETENCION_DESPACHOS', default=12, cast=int),
+        'clientes.UbicacionCamion': config('PARTICIONES_RETENCION_UBICACIONES', default=3, cast=int),
+    },
+}
+
 # =====================
 # Email y seguridad
 # =====================
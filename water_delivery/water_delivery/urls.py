@@ -11,6 +11,8 @@ from django.shortcuts import redirect
 from django.conf import settings
 from django.conf.urls.static import static
 
+from water_delivery.metricas import metricas_prometheus
+
 # Función para redirigir la raíz al login (vista home)
 def redirect_to_login(request):
     return redirect('usuarios:login')
@@ -22,6 +24,9 @@ urlpatterns = [
     # Redirigir la raíz del sitio al login
     path('', redirect_to_login, name='home'),
     
+    # Métricas de rendimiento para Prometheus (usuario empresa o token)
+    path('metricas/', metricas_prometheus, name='metricas'),
+    
     # Apps
     path('usuarios/', include('usuarios.urls', namespace='usuarios')),
     path('clientes/', include('clientes.urls', namespace='clientes')),
@@ -6,8 +6,11 @@ Expone la variable WSGI application para servidores compatibles (gunicorn, uWSGI
 
 import os
 import sys
+import time
 from pathlib import Path
 
+_inicio = time.monotonic()
+
 from django.core.wsgi import get_wsgi_application
 
 # Añadir el directorio del proyecto al path
@@ -24,3 +27,8 @@ try:
 except Exception as e:
     print(f"Error loading WSGI application: {e}")
     raise
+
+# Tiempo de arranque del proceso (ver water_delivery/arranque.py)
+from water_delivery.arranque import informar_arranque  # noqa: E402
+
+informar_arranque(_inicio, 'WSGI')